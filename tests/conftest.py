@@ -0,0 +1,20 @@
+"""
+Outside of Blender, make the tools importable and fall back to the fake `bpy` / `mathutils`
+modules in `fake_blender_modules`.
+"""
+
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(__file__)
+TOOLS_DIR = os.path.join(os.path.dirname(TESTS_DIR), 'tools')
+FAKE_BLENDER_DIR = os.path.join(TESTS_DIR, 'fake_blender_modules')
+
+try:
+    import bpy  # noqa: F401
+except ImportError:
+    sys.path.insert(0, FAKE_BLENDER_DIR)
+
+for path in [TOOLS_DIR, TESTS_DIR]:
+    if path not in sys.path:
+        sys.path.insert(0, path)
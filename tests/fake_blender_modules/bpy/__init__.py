@@ -0,0 +1,285 @@
+"""
+Lightweight stand-in for Blender's `bpy`, implementing just enough of the scene, objects, meshes
+and collections API for the tools to run outside of Blender.
+
+Use `fake_scene.load_structure` to populate the scene from a structure export.
+"""
+
+import numpy as np
+from mathutils import Matrix, Vector
+
+
+class BpyCollection(list):
+    """
+    A list which supports name lookups and `foreach_get`, like `bpy_prop_collection`. Membership
+    of items is tracked by identity so that linking thousands of lights stays linear.
+    """
+
+    def __init__(self, items=()):
+        super().__init__(items)
+        self._ids = {id(item) for item in self}
+
+    def append(self, item):
+        super().append(item)
+        self._ids.add(id(item))
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def remove(self, item):
+        super().remove(item)
+        self._ids.discard(id(item))
+
+    def remove_all(self, items):
+        ids = {id(item) for item in items} & self._ids
+        if ids:
+            self[:] = [item for item in self if id(item) not in ids]
+            self._ids -= ids
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            for item in self:
+                if item.name == key:
+                    return item
+            raise KeyError(f"bpy_prop_collection[key]: key \"{key}\" not found")
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        if isinstance(key, str):
+            return any(item.name == key for item in self)
+        return id(key) in self._ids
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def foreach_get(self, attr, seq):
+        values = np.array([getattr(item, attr) for item in self], dtype=float).reshape(-1)
+        seq[:] = values.astype(np.asarray(seq).dtype)
+
+    def foreach_set(self, attr, seq):
+        values = np.asarray(seq).reshape(len(self), -1)
+        for item, value in zip(self, values):
+            setattr(item, attr, value[0] if len(value) == 1 else value)
+
+
+class ID:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"bpy.data.{type(self).__name__.lower()}s['{self.name}']"
+
+
+class MeshVertex:
+    def __init__(self, index, co):
+        self.index = index
+        self.co = Vector(co)
+        self.select = True
+
+
+class MeshLoop:
+    def __init__(self, index, vertex_index):
+        self.index = index
+        self.vertex_index = vertex_index
+
+
+class MeshEdge:
+    def __init__(self, index, vertices):
+        self.index = index
+        self.vertices = tuple(vertices)
+        self.select = True
+
+
+class MeshPolygon:
+    def __init__(self, mesh, index, vertices, loop_start):
+        self.mesh = mesh
+        self.index = index
+        self.vertices = tuple(vertices)
+        self.loop_start = loop_start
+        self.loop_total = len(vertices)
+        self.select = True
+
+    def __repr__(self):
+        return f"bpy.data.meshes['{self.mesh.name}'].polygons[{self.index}]"
+
+    def _coords(self):
+        return np.array([self.mesh.vertices[index].co for index in self.vertices])
+
+    @property
+    def center(self):
+        return Vector(self._coords().mean(axis=0))
+
+    @property
+    def normal(self):
+        """
+        Newell's method, like Blender.
+        """
+        coords = self._coords()
+        normal = np.cross(coords, np.roll(coords, -1, axis=0)).sum(axis=0)
+        return Vector(normal).normalized()
+
+    @property
+    def area(self):
+        coords = self._coords()
+        return float(np.linalg.norm(np.cross(coords, np.roll(coords, -1, axis=0)).sum(axis=0)) / 2)
+
+
+class Mesh(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.vertices = BpyCollection()
+        self.edges = BpyCollection()
+        self.loops = BpyCollection()
+        self.polygons = BpyCollection()
+
+    def from_pydata(self, vertices, edges, faces):
+        self.vertices = BpyCollection(MeshVertex(i, co) for i, co in enumerate(vertices))
+        self.loops = BpyCollection()
+        self.polygons = BpyCollection()
+        edge_set = {tuple(sorted(edge)) for edge in edges}
+        for face in faces:
+            polygon = MeshPolygon(self, len(self.polygons), face, len(self.loops))
+            self.polygons.append(polygon)
+            for i, vertex_index in enumerate(face):
+                self.loops.append(MeshLoop(len(self.loops), vertex_index))
+                edge_set.add(tuple(sorted((vertex_index, face[(i + 1) % len(face)]))))
+        self.edges = BpyCollection(MeshEdge(i, edge) for i, edge in enumerate(sorted(edge_set)))
+
+    def update(self):
+        pass
+
+
+class Light(ID):
+    def __init__(self, name, type='POINT'):
+        super().__init__(name)
+        self.type = type
+        self.energy = 10.0
+
+
+class Object(ID):
+    def __init__(self, name, object_data=None):
+        super().__init__(name)
+        self.data = object_data
+        self.matrix_world = Matrix.Identity(4)
+        self.location = Vector((0, 0, 0))
+        self.rotation_mode = 'XYZ'
+        self.mode = 'OBJECT'
+        self._selected = False
+
+    @property
+    def type(self):
+        if isinstance(self.data, Mesh):
+            return 'MESH'
+        if isinstance(self.data, Light):
+            return 'LIGHT'
+        return 'EMPTY'
+
+    @property
+    def users_collection(self):
+        return [coll for coll in data.collections if self in coll.objects]
+
+    def select_get(self):
+        return self._selected
+
+    def select_set(self, state):
+        self._selected = state
+
+
+class CollectionObjects(BpyCollection):
+    def link(self, obj):
+        if obj not in self:
+            self.append(obj)
+        if obj not in data.objects:
+            data.objects.append(obj)
+
+    def unlink(self, obj):
+        self.remove(obj)
+
+
+class Collection(ID):
+    def __init__(self, name):
+        super().__init__(name)
+        self.objects = CollectionObjects()
+        self.children = BpyCollection()
+
+    @property
+    def all_objects(self):
+        objects = BpyCollection(self.objects)
+        for child in self.children:
+            objects.extend(obj for obj in child.all_objects if obj not in objects)
+        return objects
+
+
+class IDCollection(BpyCollection):
+    def __init__(self, id_type):
+        super().__init__()
+        self.id_type = id_type
+
+    def new(self, name, *args, **kwargs):
+        item = self.id_type(name, *args, **kwargs)
+        self.append(item)
+        return item
+
+
+class BlendData:
+    def __init__(self):
+        self.filepath = ''
+        self.collections = IDCollection(Collection)
+        self.objects = IDCollection(Object)
+        self.meshes = IDCollection(Mesh)
+        self.lights = IDCollection(Light)
+
+
+class LayerObjects(BpyCollection):
+    @property
+    def active(self):
+        return context.object
+
+    @active.setter
+    def active(self, obj):
+        context.object = obj
+
+
+class ViewLayer:
+    def __init__(self):
+        self.objects = LayerObjects()
+
+
+class Context:
+    def __init__(self):
+        self.object = None
+        self.view_layer = ViewLayer()
+
+    @property
+    def blend_data(self):
+        return data
+
+    @property
+    def selected_objects(self):
+        return [obj for obj in data.objects if obj.select_get()]
+
+    @property
+    def active_object(self):
+        return self.object
+
+
+data = BlendData()
+context = Context()
+
+
+def reset():
+    """
+    Start from an empty scene.
+    """
+    global data, context
+    data.__init__()
+    context.__init__()
+
+
+from . import ops, path, props, types, utils  # noqa: E402
+
+__all__ = ['context', 'data', 'ops', 'path', 'props', 'reset', 'types', 'utils']
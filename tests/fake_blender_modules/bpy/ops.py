@@ -0,0 +1,42 @@
+"""
+The `bpy.ops.object` operators used by the tools.
+"""
+
+import bpy
+
+
+class ObjectOps:
+    @staticmethod
+    def mode_set(mode='OBJECT'):
+        if bpy.context.object is not None:
+            bpy.context.object.mode = mode
+        return {'FINISHED'}
+
+    @staticmethod
+    def select_all(action='TOGGLE'):
+        objects = bpy.data.objects
+        if action == 'TOGGLE':
+            action = 'DESELECT' if any(obj.select_get() for obj in objects) else 'SELECT'
+        for obj in objects:
+            obj.select_set({'SELECT': True, 'DESELECT': False}.get(action, not obj.select_get()))
+        return {'FINISHED'}
+
+    @staticmethod
+    def delete(override=None, use_global=False, confirm=True):
+        """
+        Delete the selected objects, or `override['selected_objects']`.
+        """
+        if override and 'selected_objects' in override:
+            targets = list(override['selected_objects'])
+        else:
+            targets = bpy.context.selected_objects
+        for coll in bpy.data.collections:
+            coll.objects.remove_all(targets)
+        bpy.data.objects.remove_all(targets)
+        bpy.context.view_layer.objects.remove_all(targets)
+        if any(obj is bpy.context.object for obj in targets):
+            bpy.context.object = None
+        return {'FINISHED'}
+
+
+object = ObjectOps()
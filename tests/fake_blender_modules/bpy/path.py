@@ -0,0 +1,9 @@
+import os
+
+
+def basename(path):
+    return os.path.basename(path[2:] if path.startswith('//') else path)
+
+
+def abspath(path):
+    return os.path.abspath(path[2:] if path.startswith('//') else path)
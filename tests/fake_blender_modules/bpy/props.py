@@ -0,0 +1,10 @@
+"""
+Property definitions return their keyword arguments, which is enough for class bodies to load.
+"""
+
+
+def _property(**kwargs):
+    return kwargs
+
+
+BoolProperty = FloatProperty = IntProperty = StringProperty = EnumProperty = _property
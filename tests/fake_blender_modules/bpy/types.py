@@ -0,0 +1,18 @@
+"""
+Base classes for add-on registration.
+"""
+
+from . import Collection, Light, Mesh, MeshPolygon, Object  # noqa: F401
+
+
+class Operator:
+    bl_idname = ''
+    bl_label = ''
+
+    def report(self, type, message):
+        print(f"{', '.join(sorted(type))}: {message}")
+
+
+class Panel:
+    bl_label = ''
+    layout = None
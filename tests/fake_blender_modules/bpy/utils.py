@@ -0,0 +1,9 @@
+REGISTERED_CLASSES = []
+
+
+def register_class(cls):
+    REGISTERED_CLASSES.append(cls)
+
+
+def unregister_class(cls):
+    REGISTERED_CLASSES.remove(cls)
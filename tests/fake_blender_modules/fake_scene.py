@@ -0,0 +1,56 @@
+"""
+Populate the fake `bpy` scene from a structure export (see `tools/export_structure.py`), so that
+the layout tools can be run outside of Blender.
+"""
+
+import json
+import os
+
+import bpy
+from mathutils import Matrix
+
+LED_COLLECTION_NAME = 'LEDs'
+DEBUG_COLLECTION_NAME = 'DEBUG'
+
+
+def load_structure(path, blend_path=None, selected_polygons=None):
+    """
+    Reset the scene and add the meshes of the structure export at `path`. The last mesh becomes
+    the active object. If `selected_polygons` is given, only those polygons are selected and the
+    active object is put in edit mode.
+
+    `blend_path` is used as the filepath of the fake blend file, which determines the names of
+    exported files; by default it is derived from the structure file name.
+    """
+    with open(path) as stream:
+        structures = json.load(stream)['structures']
+
+    bpy.reset()
+    if blend_path is None:
+        blend_path = os.path.splitext(os.path.basename(path))[0].split('_')[0] + '.blend'
+    bpy.data.filepath = blend_path
+
+    scene_coll = bpy.data.collections.new('Collection')
+    for name in [LED_COLLECTION_NAME, DEBUG_COLLECTION_NAME]:
+        bpy.data.collections.new(name)
+
+    obj = None
+    for structure in structures:
+        mesh = bpy.data.meshes.new(structure['name'])
+        mesh.from_pydata(
+            structure['vertices'], structure.get('edges', []), structure.get('faces', []))
+        obj = bpy.data.objects.new(structure['name'], mesh)
+        obj.matrix_world = Matrix(structure['matrix'])
+        obj.location = obj.matrix_world.translation
+        scene_coll.objects.link(obj)
+        bpy.context.view_layer.objects.append(obj)
+
+    if obj is not None:
+        obj.select_set(True)
+        bpy.context.view_layer.objects.active = obj
+        if selected_polygons is not None:
+            selected_polygons = set(selected_polygons)
+            for polygon in obj.data.polygons:
+                polygon.select = polygon.index in selected_polygons
+            obj.mode = 'EDIT'
+    return obj
@@ -0,0 +1,594 @@
+"""
+NumPy backed stand-in for Blender's `mathutils`, implementing the parts of `Vector`, `Matrix`,
+`Quaternion` and `Euler` used by the tools, with the same conventions as Blender:
+
+- matrices are indexed [row][column], and multiply column vectors (`matrix @ vector`)
+- a 4x4 matrix times a 3D vector treats the vector as a point (implicit w = 1)
+- `Vector[:]` gives a tuple, and `Matrix[i]` gives a row vector which writes through
+"""
+
+from math import acos, atan2, cos, hypot, pi, sin, sqrt
+
+import numpy as np
+
+EPSILON = 1e-6
+AXES = {'X': (1, 0, 0), 'Y': (0, 1, 0), 'Z': (0, 0, 1)}
+
+
+def _clamp_unit(value):
+    return max(-1.0, min(1.0, value))
+
+
+class Vector:
+    def __init__(self, seq=(0.0, 0.0, 0.0)):
+        self._v = np.array(seq, dtype=float).reshape(-1).copy()
+        if not 2 <= len(self._v) <= 4:
+            raise ValueError(f"Vector(): expected a sequence of 2 to 4 numbers, got {seq!r}")
+
+    @classmethod
+    def _wrap(cls, array):
+        vec = cls.__new__(cls)
+        vec._v = array
+        return vec
+
+    # sequence protocol
+
+    def __len__(self):
+        return len(self._v)
+
+    def __iter__(self):
+        return iter(self._v.tolist())
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return tuple(self._v[key].tolist())
+        return float(self._v[key])
+
+    def __setitem__(self, key, value):
+        self._v[key] = value
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array(self._v, dtype=dtype)
+
+    def __repr__(self):
+        return f"Vector(({', '.join(f'{v:.4f}' for v in self._v)}))"
+
+    def __eq__(self, other):
+        if not isinstance(other, Vector):
+            return NotImplemented
+        return len(self) == len(other) and bool(np.all(self._v == other._v))
+
+    __hash__ = None
+
+    # components
+
+    def _component(index):
+        def get(self):
+            return float(self._v[index])
+
+        def set_(self, value):
+            self._v[index] = value
+        return property(get, set_)
+
+    x = _component(0)
+    y = _component(1)
+    z = _component(2)
+    w = _component(3)
+    del _component
+
+    # arithmetic
+
+    def __add__(self, other):
+        return Vector(self._v + Vector._coerce(other))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return Vector(self._v - Vector._coerce(other))
+
+    def __rsub__(self, other):
+        return Vector(Vector._coerce(other) - self._v)
+
+    def __mul__(self, other):
+        if isinstance(other, (Matrix, Quaternion)):
+            return NotImplemented
+        return Vector(self._v * Vector._coerce(other))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        return Vector(self._v / other)
+
+    def __neg__(self):
+        return Vector(-self._v)
+
+    def __matmul__(self, other):
+        if isinstance(other, Vector):
+            return self.dot(other)
+        if isinstance(other, Matrix):
+            return Vector(self._v @ other._m)
+        return NotImplemented
+
+    @staticmethod
+    def _coerce(other):
+        if isinstance(other, Vector):
+            return other._v
+        return np.asarray(other, dtype=float)
+
+    # methods
+
+    @property
+    def magnitude(self):
+        return float(np.linalg.norm(self._v))
+
+    length = magnitude
+
+    @property
+    def length_squared(self):
+        return float(self._v @ self._v)
+
+    def copy(self):
+        return Vector(self._v)
+
+    def to_tuple(self, precision=-1):
+        if precision == -1:
+            return tuple(self._v.tolist())
+        return tuple(round(v, precision) for v in self._v.tolist())
+
+    def to_2d(self):
+        return Vector(self._v[:2])
+
+    def to_3d(self):
+        return Vector(np.concatenate([self._v, np.zeros(3)])[:3])
+
+    def to_4d(self):
+        return Vector(np.concatenate([self._v[:3], np.zeros(3 - min(len(self._v), 3)), [1.0]]))
+
+    def normalized(self):
+        magnitude = self.magnitude
+        if magnitude == 0:
+            return self.copy()
+        return Vector(self._v / magnitude)
+
+    def normalize(self):
+        self._v[:] = self.normalized()._v
+
+    def dot(self, other):
+        return float(self._v @ Vector._coerce(other))
+
+    def cross(self, other):
+        other = Vector._coerce(other)
+        if len(self._v) == 2:
+            return float(self._v[0] * other[1] - self._v[1] * other[0])
+        return Vector(np.cross(self._v, other))
+
+    def angle(self, other, fallback=None):
+        other = Vector(other) if not isinstance(other, Vector) else other
+        magnitudes = self.magnitude * other.magnitude
+        if magnitudes == 0:
+            if fallback is None:
+                raise ValueError("Vector.angle(other): zero length vectors have no valid angle")
+            return fallback
+        return acos(_clamp_unit(self.dot(other) / magnitudes))
+
+    def angle_signed(self, other, fallback=None):
+        if len(self._v) != 2:
+            raise ValueError("Vector.angle_signed(other): only 2D vectors are supported")
+        other = Vector._coerce(other)
+        if not self.magnitude or not np.linalg.norm(other):
+            if fallback is None:
+                raise ValueError(
+                    "Vector.angle_signed(other): zero length vectors have no valid angle")
+            return fallback
+        perp_dot = self._v[1] * other[0] - self._v[0] * other[1]
+        return atan2(perp_dot, float(self._v @ other))
+
+    def rotation_difference(self, other):
+        """
+        The shortest arc quaternion which rotates this vector onto `other`.
+        """
+        v1 = self.to_3d().normalized()
+        v2 = Vector(other).to_3d().normalized()
+        axis = v1.cross(v2)
+        if axis.magnitude > EPSILON:
+            return Quaternion(axis.normalized(), acos(_clamp_unit(v1.dot(v2))))
+        if v1.dot(v2) > 0:
+            return Quaternion()
+        return Quaternion(_ortho(v1).normalized(), pi)
+
+    def orthogonal(self):
+        return _ortho(self)
+
+
+def _ortho(vec):
+    x, y, z = vec.to_3d()
+    axis = int(np.argmax(np.abs([x, y, z])))
+    return Vector([
+        (-y - z, x, x),
+        (y, -x - z, y),
+        (z, z, -x - y),
+    ][axis])
+
+
+class Matrix:
+    def __init__(self, rows=None):
+        if rows is None:
+            rows = np.identity(4)
+        if isinstance(rows, Matrix):
+            rows = rows._m
+        self._m = np.array([np.asarray(row, dtype=float) for row in rows], dtype=float)
+        if self._m.ndim != 2 or not (2 <= self._m.shape[0] <= 4 and 2 <= self._m.shape[1] <= 4):
+            raise ValueError(f"Matrix(): expected 2x2 to 4x4 rows, got {rows!r}")
+
+    @classmethod
+    def _wrap(cls, array):
+        mat = cls.__new__(cls)
+        mat._m = array
+        return mat
+
+    # construction
+
+    @classmethod
+    def Identity(cls, size):
+        return cls._wrap(np.identity(size))
+
+    @classmethod
+    def Translation(cls, vector):
+        mat = np.identity(4)
+        vector = Vector._coerce(vector)
+        mat[:len(vector), 3] = vector[:3]
+        return cls._wrap(mat)
+
+    @classmethod
+    def Rotation(cls, angle, size, axis=None):
+        if size == 2:
+            rotation = np.array([[cos(angle), -sin(angle)], [sin(angle), cos(angle)]])
+            return cls._wrap(rotation)
+        if isinstance(axis, str):
+            axis = AXES[axis.upper()]
+        axis = np.asarray(Vector._coerce(axis), dtype=float)
+        norm = np.linalg.norm(axis)
+        rotation = np.identity(3)
+        if norm > 0:
+            x, y, z = axis / norm
+            c, s = cos(angle), sin(angle)
+            cross = np.array([[0, -z, y], [z, 0, -x], [-y, x, 0]])
+            rotation = c * np.identity(3) + s * cross + (1 - c) * np.outer((x, y, z), (x, y, z))
+        return cls._wrap(_resize(rotation, size))
+
+    @classmethod
+    def Scale(cls, factor, size, axis=None):
+        dims = min(size, 3)
+        if axis is None:
+            scale = np.identity(dims) * factor
+        else:
+            axis = Vector._coerce(axis)[:dims]
+            axis = axis / np.linalg.norm(axis)
+            scale = np.identity(dims) + (factor - 1) * np.outer(axis, axis)
+        return cls._wrap(_resize(scale, size))
+
+    @classmethod
+    def Shear(cls, plane, size, factor):
+        if size == 2:
+            return cls._wrap(np.array([[1.0, factor], [0.0, 1.0]]))
+        shear = np.identity(3)
+        cells = {
+            'XY': [(0, 2), (1, 2)],
+            'XZ': [(0, 1), (2, 1)],
+            'YZ': [(1, 0), (2, 0)],
+        }[plane.upper()]
+        for (row, col), value in zip(cells, factor):
+            shear[row, col] = value
+        return cls._wrap(_resize(shear, size))
+
+    # sequence protocol
+
+    def __len__(self):
+        return self._m.shape[0]
+
+    def __iter__(self):
+        return (Vector._wrap(row) for row in self._m)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return tuple(Vector._wrap(row) for row in self._m[key])
+        return Vector._wrap(self._m[key])
+
+    def __setitem__(self, key, value):
+        self._m[key] = Vector._coerce(value)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array(self._m, dtype=dtype)
+
+    def __repr__(self):
+        rows = ',\n        '.join(
+            '(' + ', '.join(f'{v:.4f}' for v in row) + ')' for row in self._m)
+        return f"Matrix(({rows}))"
+
+    def __eq__(self, other):
+        if not isinstance(other, Matrix):
+            return NotImplemented
+        return self._m.shape == other._m.shape and bool(np.all(self._m == other._m))
+
+    __hash__ = None
+
+    # arithmetic
+
+    def __matmul__(self, other):
+        if isinstance(other, Matrix):
+            return Matrix._wrap(self._m @ other._m)
+        if isinstance(other, Vector):
+            rows, cols = self._m.shape
+            if len(other) == cols:
+                return Vector(self._m @ other._v)
+            if len(other) == cols - 1:
+                return Vector((self._m @ np.append(other._v, 1.0))[:rows - 1])
+            raise ValueError(f"Matrix @ Vector: {rows}x{cols} matrix with {len(other)}D vector")
+        return NotImplemented
+
+    def __mul__(self, other):
+        return Matrix._wrap(self._m * other)
+
+    __rmul__ = __mul__
+
+    def __add__(self, other):
+        return Matrix._wrap(self._m + np.asarray(other))
+
+    def __sub__(self, other):
+        return Matrix._wrap(self._m - np.asarray(other))
+
+    # properties
+
+    @property
+    def translation(self):
+        return Vector(self._m[:3, 3])
+
+    @translation.setter
+    def translation(self, vector):
+        self._m[:3, 3] = Vector._coerce(vector)[:3]
+
+    @property
+    def col(self):
+        return tuple(Vector._wrap(col) for col in self._m.T)
+
+    @property
+    def row(self):
+        return tuple(self)
+
+    def determinant(self):
+        return float(np.linalg.det(self._m))
+
+    # conversion
+
+    def copy(self):
+        return Matrix._wrap(self._m.copy())
+
+    def inverted(self, fallback=None):
+        try:
+            return Matrix._wrap(np.linalg.inv(self._m))
+        except np.linalg.LinAlgError:
+            if fallback is None:
+                raise ValueError("Matrix.inverted(): matrix does not have an inverse")
+            return fallback
+
+    def invert(self):
+        self._m[:] = np.linalg.inv(self._m)
+
+    def transposed(self):
+        return Matrix._wrap(self._m.T.copy())
+
+    def to_2x2(self):
+        return Matrix._wrap(_resize(self._m[:2, :2], 2))
+
+    def to_3x3(self):
+        return Matrix._wrap(_resize(self._m[:3, :3], 3))
+
+    def to_4x4(self):
+        return Matrix._wrap(_resize(self._m[:3, :3], 4, self._m[:3, 3] if len(self) == 4 else None))
+
+    def to_translation(self):
+        return self.translation
+
+    def to_scale(self):
+        return self.decompose()[2]
+
+    def _normalized_rotation(self):
+        rotation = self._m[:3, :3].copy()
+        if rotation.shape != (3, 3):
+            rotation = _resize(self._m, 3)[:3, :3]
+        norms = np.linalg.norm(rotation, axis=0)
+        norms[norms == 0] = 1
+        rotation = rotation / norms
+        if np.linalg.det(rotation) < 0:
+            rotation = -rotation
+        return rotation
+
+    def decompose(self):
+        """
+        Location, rotation (Quaternion) and scale components of a 4x4 matrix.
+        """
+        basis = self._m[:3, :3]
+        scale = np.linalg.norm(basis, axis=0)
+        if np.linalg.det(basis) < 0:
+            scale = -scale
+        return (
+            Vector(self._m[:3, 3]),
+            Quaternion._from_rotation(self._normalized_rotation()),
+            Vector(scale)
+        )
+
+    def to_quaternion(self):
+        return Quaternion._from_rotation(self._normalized_rotation())
+
+    def to_euler(self, order='XYZ', euler_compat=None):
+        if order != 'XYZ':
+            raise NotImplementedError(f"Matrix.to_euler(): unsupported order {order}")
+        m = self._normalized_rotation()
+        cy = hypot(m[0][0], m[1][0])
+        if cy > 16 * np.finfo(np.float32).eps:
+            euler_1 = (atan2(m[2][1], m[2][2]), atan2(-m[2][0], cy), atan2(m[1][0], m[0][0]))
+            euler_2 = (atan2(-m[2][1], -m[2][2]), atan2(-m[2][0], -cy), atan2(-m[1][0], -m[0][0]))
+            if sum(map(abs, euler_2)) < sum(map(abs, euler_1)):
+                euler_1 = euler_2
+        else:
+            euler_1 = (atan2(-m[1][2], m[1][1]), atan2(-m[2][0], cy), 0.0)
+        return Euler(euler_1, order)
+
+
+def _resize(square, size, translation=None):
+    """
+    Embed a square matrix in the top left of a `size` x `size` identity matrix.
+    """
+    resized = np.identity(size)
+    dims = min(size, square.shape[0])
+    resized[:dims, :dims] = square[:dims, :dims]
+    if translation is not None and size == 4:
+        resized[:3, 3] = translation
+    return resized
+
+
+class Quaternion:
+    def __init__(self, seq=(1.0, 0.0, 0.0, 0.0), angle=None):
+        if angle is not None:
+            axis = Vector._coerce(seq)
+            self._q = np.array([cos(angle / 2), *(axis * sin(angle / 2))], dtype=float)
+        else:
+            self._q = np.array(seq, dtype=float).reshape(4).copy()
+
+    @classmethod
+    def _from_rotation(cls, m):
+        """
+        Quaternion from an orthonormal 3x3 rotation matrix, with a non-negative w.
+        """
+        trace = m[0][0] + m[1][1] + m[2][2]
+        if trace > 0:
+            s = 2 * sqrt(trace + 1)
+            q = (s / 4, (m[2][1] - m[1][2]) / s, (m[0][2] - m[2][0]) / s, (m[1][0] - m[0][1]) / s)
+        elif m[0][0] > m[1][1] and m[0][0] > m[2][2]:
+            s = 2 * sqrt(1 + m[0][0] - m[1][1] - m[2][2])
+            q = ((m[2][1] - m[1][2]) / s, s / 4, (m[0][1] + m[1][0]) / s, (m[0][2] + m[2][0]) / s)
+        elif m[1][1] > m[2][2]:
+            s = 2 * sqrt(1 + m[1][1] - m[0][0] - m[2][2])
+            q = ((m[0][2] - m[2][0]) / s, (m[0][1] + m[1][0]) / s, s / 4, (m[1][2] + m[2][1]) / s)
+        else:
+            s = 2 * sqrt(1 + m[2][2] - m[0][0] - m[1][1])
+            q = ((m[1][0] - m[0][1]) / s, (m[0][2] + m[2][0]) / s, (m[1][2] + m[2][1]) / s, s / 4)
+        q = np.array(q)
+        if q[0] < 0:
+            q = -q
+        return cls(q / np.linalg.norm(q))
+
+    def __len__(self):
+        return 4
+
+    def __iter__(self):
+        return iter(self._q.tolist())
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return tuple(self._q[key].tolist())
+        return float(self._q[key])
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array(self._q, dtype=dtype)
+
+    def __repr__(self):
+        return f"Quaternion(({', '.join(f'{v:.4f}' for v in self._q)}))"
+
+    w = property(lambda self: float(self._q[0]))
+    x = property(lambda self: float(self._q[1]))
+    y = property(lambda self: float(self._q[2]))
+    z = property(lambda self: float(self._q[3]))
+
+    @property
+    def magnitude(self):
+        return float(np.linalg.norm(self._q))
+
+    def normalized(self):
+        return Quaternion(self._q / self.magnitude)
+
+    @property
+    def angle(self):
+        """
+        Rotation angle, wrapped to [-π, π] like Blender does.
+        """
+        angle = 2 * acos(_clamp_unit(self.normalized().w))
+        return (angle + pi) % (2 * pi) - pi if angle > pi else angle
+
+    @property
+    def axis(self):
+        w, x, y, z = self.normalized()._q
+        half_sin = sin(acos(_clamp_unit(w)))
+        if abs(half_sin) < EPSILON:
+            half_sin = 1.0
+        axis = np.array([x, y, z]) / half_sin
+        if not np.any(axis):
+            axis = np.array([1.0, 0.0, 0.0])
+        return Vector(axis)
+
+    def conjugated(self):
+        return Quaternion(self._q * [1, -1, -1, -1])
+
+    def inverted(self):
+        return Quaternion(self.conjugated()._q / (self._q @ self._q))
+
+    def to_matrix(self):
+        w, x, y, z = self.normalized()._q
+        return Matrix._wrap(np.array([
+            [1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)],
+            [2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)],
+            [2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)],
+        ]))
+
+    def to_euler(self, order='XYZ'):
+        return self.to_matrix().to_euler(order)
+
+    def __matmul__(self, other):
+        if isinstance(other, Quaternion):
+            w1, x1, y1, z1 = self._q
+            w2, x2, y2, z2 = other._q
+            return Quaternion((
+                w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+                w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+                w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+                w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2,
+            ))
+        if isinstance(other, Vector):
+            return Vector(self.to_matrix()._m @ other.to_3d()._v)
+        return NotImplemented
+
+
+class Euler:
+    def __init__(self, angles=(0.0, 0.0, 0.0), order='XYZ'):
+        self._e = np.array(angles, dtype=float).reshape(3).copy()
+        self.order = order
+
+    def __len__(self):
+        return 3
+
+    def __iter__(self):
+        return iter(self._e.tolist())
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return tuple(self._e[key].tolist())
+        return float(self._e[key])
+
+    def __array__(self, dtype=None, copy=None):
+        return np.array(self._e, dtype=dtype)
+
+    def __repr__(self):
+        return f"Euler(({', '.join(f'{v:.4f}' for v in self._e)}), '{self.order}')"
+
+    x = property(lambda self: float(self._e[0]))
+    y = property(lambda self: float(self._e[1]))
+    z = property(lambda self: float(self._e[2]))
+
+    def to_matrix(self):
+        rotation = np.identity(3)
+        for axis, angle in zip(self.order, self._e):
+            rotation = Matrix.Rotation(angle, 3, axis)._m @ rotation
+        return Matrix._wrap(rotation)
+
+    def to_quaternion(self):
+        return self.to_matrix().to_quaternion()
@@ -0,0 +1,122 @@
+import imp
+import inspect
+import json
+import logging
+import os
+import sys
+import unittest
+
+import numpy as np
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    import color_correction
+    imp.reload(color_correction)
+    from color_correction import ColorCorrection, compile_lut, temporal_dither
+finally:
+    sys.path = PATH
+
+
+def fixture(pixels, **parameters):
+    parameters['pointIndicesJSON'] = json.dumps([[idx, 0] for idx in range(pixels)])
+    return {'parameters': parameters}
+
+
+class TestColorCorrection(unittest.TestCase):
+    def test_compile_lut(self):
+        identity = compile_lut()
+        assert identity.dtype == np.uint8
+        assert np.all(identity == np.arange(256))
+
+        lut = compile_lut(2.0, (1.0, 0.5, 0.0), 0.5)
+        assert lut[0, 255] == 128
+        assert lut[1, 255] == 64
+        assert np.all(lut[2] == 0)
+        assert lut[0, 128] == round((128 / 255) ** 2 * 0.5 * 255)
+
+        wide = compile_lut(dtype=np.uint16)
+        assert wide.dtype == np.uint16
+        assert np.all(wide >> 8 == np.arange(256))
+
+    def test_apply_in_place(self):
+        """
+        Fixtures with the same settings share a table, and the frame is corrected in place.
+        """
+        # Given
+        fixtures = [
+            fixture(5, gamma=2.2),
+            fixture(3, label='dim', brightness=0.25, whiteB=0.5),
+            fixture(4, gamma=2.2),
+        ]
+        correction = ColorCorrection(fixtures)
+        leds = np.random.default_rng(0).integers(0, 256, (12, 3), dtype=np.uint8)
+        expected = leds / 255
+        expected[:5] **= 2.2
+        expected[8:] **= 2.2
+        expected[5:8] *= [0.25, 0.25, 0.125]
+        expected = np.rint(expected * 255)
+
+        # When
+        result = correction.apply(leds)
+
+        # Then
+        # the two settings and the identity table
+        assert len(correction.groups) == 3
+        assert result is leds
+        assert np.all(leds == expected)
+        assert not correction.is_identity()
+        assert ColorCorrection([fixture(2, label='a')]).is_identity()
+
+    def test_apply_uint16(self):
+        # Given
+        correction = ColorCorrection([fixture(2, brightness=0.5)], dtype=np.uint16)
+        leds = np.array([[255, 1, 0], [2, 3, 4]], dtype=np.uint8)
+        out = np.empty(leds.shape, dtype=np.uint16)
+
+        # When
+        correction.apply(leds, out=out)
+
+        # Then
+        assert out[0, 0] == np.rint(0.5 * (255 << 8))
+        assert out[0, 1] == np.rint(0.5 * (1 / 255) * (255 << 8))
+        with self.assertRaises(ValueError):
+            correction.apply(leds)
+
+    def test_invalid_settings(self):
+        with self.assertRaises(ValueError):
+            ColorCorrection([fixture(1, label='a', gamma=0)])
+        with self.assertRaises(ValueError):
+            ColorCorrection([fixture(1, label='b', brightness=1.5)])
+
+    def test_temporal_dither(self):
+        """
+        Dithered frames average out to the fixed point value.
+        """
+        # Given
+        values = np.array([0, 1, 128, 300, 255 << 8], dtype=np.uint16)
+        residue = np.zeros_like(values)
+        out = np.empty(values.shape, dtype=np.uint8)
+
+        # When
+        total = np.zeros(values.shape)
+        for _ in range(256):
+            total += temporal_dither(values, residue, out)
+
+        # Then
+        assert np.all(total == values)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestColorCorrection),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
@@ -0,0 +1,99 @@
+import imp
+import inspect
+import logging
+import os
+import sys
+import unittest
+
+import numpy as np
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import FAKE_BLENDER_DIR, REPO_DIR, TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    sys.path.append(FAKE_BLENDER_DIR)
+    import bpy
+    import fake_scene
+    import common
+    imp.reload(common)
+    from common import (DATA_PATH, format_index_ranges, get_polygon_selection,
+                        get_selected_polygon_indices, get_selected_polygons_suffix, setup_logger)
+    from layout_sweep import parse_index_ranges
+finally:
+    sys.path = PATH
+
+STRUCTURE_FILE = os.path.join(REPO_DIR, DATA_PATH, 'dome_render_6_5_Dome_EDGES.json')
+
+
+class TestIndexRanges(unittest.TestCase):
+    def test_format_index_ranges(self):
+        assert format_index_ranges([]) == ""
+        assert format_index_ranges(np.zeros(0, dtype=int)) == ""
+        assert format_index_ranges([7]) == "7"
+        assert format_index_ranges([0, 1]) == "0to1"
+        assert format_index_ranges([0, 1, 2, 3, 5, 7, 8]) == "0to3 5 7to8"
+        assert format_index_ranges([1, 3, 5]) == "1 3 5"
+        # unsorted and repeated indices
+        assert format_index_ranges([8, 2, 3, 2, 40]) == "2to3 8 40"
+
+    def test_round_trip(self):
+        # Given
+        rng = np.random.default_rng(29)
+        selections = [[], [0], [40], list(range(41)), [0, 2, 4], [5, 6, 7, 9, 10, 30]] + [
+            sorted(rng.choice(200, size, replace=False).tolist()) for size in [1, 10, 100, 199]]
+
+        for indices in selections:
+            # When
+            text = format_index_ranges(indices)
+
+            # Then
+            assert parse_index_ranges(text) == indices, text
+
+        assert parse_index_ranges("0to3, 5 7to8") == [0, 1, 2, 3, 5, 7, 8]
+
+
+@unittest.skipUnless(hasattr(bpy, 'reset'), "needs the fake bpy scene")
+class TestPolygonSelection(unittest.TestCase):
+    def test_edit_mode_selection(self):
+        # Given
+        obj = fake_scene.load_structure(STRUCTURE_FILE, selected_polygons=[9, 3, 4, 5])
+
+        # When
+        mask = get_polygon_selection(obj)
+        polygons, suffix = get_selected_polygons_suffix(obj)
+
+        # Then
+        assert mask.dtype == bool and len(mask) == len(obj.data.polygons)
+        assert np.flatnonzero(mask).tolist() == [3, 4, 5, 9]
+        assert get_selected_polygon_indices(obj).tolist() == [3, 4, 5, 9]
+        assert [index for index, _ in polygons] == [3, 4, 5, 9]
+        assert all(polygon is obj.data.polygons[index] for index, polygon in polygons)
+        assert suffix == "POLYGONS 3to5 9"
+
+    def test_object_mode_selects_all(self):
+        # Given
+        obj = fake_scene.load_structure(STRUCTURE_FILE)
+        obj.data.polygons[0].select = False
+
+        # When
+        polygons, suffix = get_selected_polygons_suffix(obj, 'edges')
+
+        # Then
+        assert get_polygon_selection(obj).all()
+        assert len(get_selected_polygon_indices(obj)) == len(obj.data.polygons) == len(polygons)
+        assert suffix == "ALL EDGES"
+
+
+if __name__ == "__main__":
+    setup_logger(stream_log_level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestIndexRanges),
+        unittest.TestLoader().loadTestsFromTestCase(TestPolygonSelection),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
@@ -0,0 +1,116 @@
+import imp
+import inspect
+import logging
+import os
+import sys
+import time
+import unittest
+
+import numpy as np
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import REPO_DIR, TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    import dome_preview
+    imp.reload(dome_preview)
+    from dome_preview import (FAR_SHADE, DomeView, led_radius, look_at, orbit_cameras,
+                              panel_colours)
+    from common import DATA_PATH, setup_logger
+    from layout_io import load_panels, panel_world_positions
+finally:
+    sys.path = PATH
+
+PANELS_FILE = os.path.join(REPO_DIR, DATA_PATH, 'dome_render_6_5_Dome_ALL_PANELS.json')
+UP = np.array([0.0, 0.0, 1.0])
+
+
+class TestDomePreview(unittest.TestCase):
+    def test_look_at(self):
+        # Given
+        eye = np.array([4.0, -3.0, 2.0])
+        target = np.array([0.0, 1.0, 0.5])
+
+        # When
+        rotation = look_at(eye, target, UP)
+
+        # Then
+        assert np.allclose(rotation @ rotation.T, np.eye(3))
+        camera_target = rotation @ (target - eye)
+        assert np.allclose(camera_target[:2], 0)
+        assert camera_target[2] > 0
+        # world up is up in the image
+        assert (rotation @ UP)[1] > 0
+        with self.assertRaises(ValueError):
+            look_at(np.zeros(3), UP, UP)
+
+    def test_nearest_led_wins(self):
+        """
+        LEDs on the same line of sight are resolved by depth, whatever their order.
+        """
+        # Given
+        eye = np.array([0.0, -5.0, 0.0])
+        positions = np.array([[0.0, 1.0, 0.0], [0.0, 0.0, 0.0], [1.0, 0.0, 0.0]])
+        colours = np.array([[255, 0, 0], [0, 255, 0], [0, 0, 255]], dtype=np.uint8)
+
+        for order in [[0, 1, 2], [2, 1, 0]]:
+            # When
+            view = DomeView(
+                positions[order], eye, np.zeros(3), UP, size=(64, 48), fov=40, radius=0.2)
+            image = view.render(colours[order])
+
+            # Then
+            assert tuple(image[24, 32]) == (0, 255, 0)
+            # the LED to the right is drawn too, and the far one is hidden
+            assert (image[24, 33:] == (0, 0, 255)).all(axis=-1).any()
+            assert not (image == (255, 0, 0)).all(axis=-1).any()
+            assert tuple(image[0, 0]) == dome_preview.BACKGROUND
+
+    def test_leds_behind_the_camera_are_culled(self):
+        # Given
+        positions = np.array([[0.0, 0.0, 0.0], [0.0, -10.0, 0.0]])
+
+        # When
+        view = DomeView(positions, np.array([0.0, -5.0, 0.0]), np.zeros(3), UP, size=(32, 32))
+
+        # Then
+        assert set(view.leds.tolist()) == {0}
+
+    def test_dome_views(self):
+        """
+        Every view of the dome fits in the image and shows most panels.
+        """
+        # Given
+        panels = load_panels(PANELS_FILE)
+        positions = np.concatenate([panel_world_positions(panel) for panel in panels])
+        colours = panel_colours(panels)
+        radius = led_radius(panels)
+        start = time.perf_counter()
+
+        for name, eye, target, up in orbit_cameras(positions):
+            # When
+            view = DomeView(positions, eye, target, up, radius=radius)
+            image = view.render(colours)
+
+            # Then
+            assert not image[[0, -1]].any() and not image[:, [0, -1]].any(), name
+            drawn = set(map(tuple, image.reshape(-1, 3)[view.pixels]))
+            assert len(drawn) > 100, name
+            assert len(np.unique(view.leds)) > len(positions) / 3, name
+            assert view.shade.max() <= 1 and view.shade.min() >= FAR_SHADE - 1e-9
+        # the time depends on the machine, so it's logged rather than asserted
+        logging.info(f"rendered the dome views in {1e3 * (time.perf_counter() - start):.1f} ms")
+
+
+if __name__ == "__main__":
+    setup_logger(stream_log_level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestDomePreview),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
@@ -0,0 +1,169 @@
+import imp
+import inspect
+import json
+import logging
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    import export_manifest
+    imp.reload(export_manifest)
+    from export_manifest import (MANIFEST_FILE, content_hash, export_json, export_status,
+                                 file_hash, load_manifest, main, value_hash, write_if_changed)
+    from common import setup_logger
+finally:
+    sys.path = PATH
+
+
+class TestExportManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'dome_HEX.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_write_if_changed(self):
+        # Given
+        digest, written = write_if_changed(self.path, "{}")
+        os.utime(self.path, ns=(0, 0))
+
+        # When
+        same_digest, rewritten = write_if_changed(self.path, b"{}")
+
+        # Then
+        assert written and not rewritten
+        assert digest == same_digest == content_hash("{}")
+        assert os.stat(self.path).st_mtime_ns == 0
+
+        # When
+        _, written = write_if_changed(self.path, "[]")
+
+        # Then
+        assert written
+        with open(self.path) as stream:
+            assert stream.read() == "[]"
+        # no temporary files are left behind, and the permissions are the usual ones
+        assert os.listdir(self.tmp_dir.name) == ['dome_HEX.json']
+        umask = os.umask(0)
+        os.umask(umask)
+        assert os.stat(self.path).st_mode & 0o777 == 0o666 & ~umask
+
+    def test_export_json_matches_json_dump(self):
+        """
+        Exports are formatted like before, so that existing exports are not rewritten.
+        """
+        # Given
+        serialised = {'p': [{'name': '[0]', 'pixels': [[0, 0], [1, 0]], 'spacing': 0.25}]}
+
+        # When
+        export_json(self.path, serialised)
+
+        # Then
+        with open(self.path) as stream:
+            assert stream.read() == json.dumps(serialised, indent=4)
+
+    def test_export_status(self):
+        # Given
+        inputs = {'mesh': value_hash([[0, [[0, 0, 0]]]]), 'config': value_hash({'a': 1})}
+
+        # When
+        assert export_status(self.path) == 'missing'
+        written = export_json(self.path, {'p': []}, inputs=inputs)
+        rewritten = export_json(self.path, {'p': []}, inputs=inputs)
+
+        # Then
+        assert written and not rewritten
+        manifest = load_manifest(os.path.join(self.tmp_dir.name, MANIFEST_FILE))
+        assert manifest == {'dome_HEX.json': {
+            'sha256': content_hash(json.dumps({'p': []}, indent=4)), 'inputs': inputs}}
+        assert export_status(self.path) is None
+        assert export_status(self.path, inputs) is None
+        assert export_status(self.path, {**inputs, 'config': value_hash({'a': 2})}) == 'inputs'
+
+        # When
+        with open(self.path, 'a') as stream:
+            stream.write("\n")
+
+        # Then
+        assert export_status(self.path, inputs) == 'modified'
+        other = os.path.join(self.tmp_dir.name, 'other.json')
+        with open(other, 'w') as stream:
+            stream.write("{}")
+        assert export_status(other) == 'unrecorded'
+
+    def test_export_status_files(self):
+        """
+        Input files are recorded relative to the manifest, and the command line notices when
+        one of them changes, without the input hashes.
+        """
+        # Given
+        config_dir = os.path.join(self.tmp_dir.name, 'config')
+        os.makedirs(config_dir)
+        config_file = os.path.join(config_dir, 'layouts.json')
+        with open(config_file, 'w') as stream:
+            stream.write('{"layouts": []}')
+        export_json(self.path, {'p': []}, inputs={'mesh': value_hash([])}, files=[config_file])
+
+        def check():
+            with mock.patch.object(sys, 'argv', ['export_manifest.py', self.tmp_dir.name]):
+                with self.assertRaises(SystemExit) as context:
+                    main()
+            return context.exception.code
+
+        # Then
+        manifest = load_manifest(os.path.join(self.tmp_dir.name, MANIFEST_FILE))
+        assert manifest['dome_HEX.json']['files'] == {
+            'config/layouts.json': file_hash(config_file)}
+        assert export_status(self.path) is None
+        assert check() == 0
+
+        # When
+        with open(config_file, 'w') as stream:
+            stream.write('{"layouts": [], "workers": 2}')
+
+        # Then
+        assert export_status(self.path) == 'files'
+        assert check() == 1
+
+        # When
+        os.remove(config_file)
+
+        # Then
+        assert export_status(self.path) == 'files'
+
+    def test_failed_serialisation_keeps_export(self):
+        # Given
+        export_json(self.path, {'p': []})
+
+        # When
+        with self.assertRaises(TypeError):
+            export_json(self.path, {'p': [object()]})
+
+        # Then
+        assert export_status(self.path) is None
+        assert sorted(os.listdir(self.tmp_dir.name)) == sorted([MANIFEST_FILE, 'dome_HEX.json'])
+
+    def test_value_hash_ignores_dict_order(self):
+        assert value_hash({'a': 1, 'b': [1.5, None]}) == value_hash({'b': [1.5, None], 'a': 1})
+        assert value_hash({'a': 1}) != value_hash({'a': 1.0001})
+
+
+if __name__ == "__main__":
+    setup_logger(stream_log_level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestExportManifest),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
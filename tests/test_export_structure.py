@@ -0,0 +1,78 @@
+import imp
+import inspect
+import logging
+import os
+import sys
+import unittest
+
+import numpy as np
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import FAKE_BLENDER_DIR, REPO_DIR, TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    sys.path.append(FAKE_BLENDER_DIR)
+    import bpy
+    import fake_scene
+    import export_structure
+    imp.reload(export_structure)
+    from export_structure import EXPORT_TYPE, serialise_object, serialise_object_fast
+    from common import DATA_PATH, setup_logger
+finally:
+    sys.path = PATH
+
+STRUCTURE_FILE = os.path.join(REPO_DIR, DATA_PATH, 'dome_render_6_5_Dome_EDGES.json')
+
+
+@unittest.skipUnless(hasattr(bpy, 'reset'), "needs the fake bpy scene")
+class TestExportStructure(unittest.TestCase):
+    def assert_same_export(self, obj):
+        # When
+        expected = serialise_object(obj, EXPORT_TYPE)
+        fast = serialise_object_fast(obj, EXPORT_TYPE)
+
+        # Then
+        assert set(fast) == set(expected)
+        for key in ['type', 'name', 'matrix', 'faces']:
+            assert fast[key] == expected[key], key
+        # Blender stores vertex coordinates as 32 bit floats, which `foreach_get` reads as such
+        assert fast['vertices'] == np.float32(expected['vertices']).tolist()
+        # the Python path collects the edges in a set
+        assert fast['edges'] == sorted(map(list, expected['edges']))
+        return fast
+
+    def test_fast_export_all(self):
+        # Given
+        obj = fake_scene.load_structure(STRUCTURE_FILE)
+
+        # When
+        fast = self.assert_same_export(obj)
+
+        # Then the decagon base is exported along with the triangles
+        assert len(fast['faces']) == 41
+        assert sorted(map(len, fast['faces']))[-1] == 10
+
+    def test_fast_export_selection(self):
+        # Given
+        selected = [0, 1, 2, 17, 39, 40]
+        obj = fake_scene.load_structure(STRUCTURE_FILE, selected_polygons=selected)
+
+        # When
+        fast = self.assert_same_export(obj)
+
+        # Then
+        assert fast['faces'] == [list(obj.data.polygons[index].vertices) for index in selected]
+
+
+if __name__ == "__main__":
+    setup_logger(stream_log_level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestExportStructure),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
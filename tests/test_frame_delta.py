@@ -0,0 +1,155 @@
+import imp
+import inspect
+import logging
+import os
+import socket
+import sys
+import threading
+import unittest
+
+import numpy as np
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    import frame_delta
+    imp.reload(frame_delta)
+    from frame_delta import DirtyTracker
+    from frame_stream import OPC_PROTOCOL, OpcSink
+finally:
+    sys.path = PATH
+
+
+class TestDirtyTracker(unittest.TestCase):
+    def test_update(self):
+        """
+        Only changed fixtures are dirty until their keepalive is due.
+        """
+        # Given
+        tracker = DirtyTracker([0, 4, 6], [4, 6, 10], keepalive=1.0, overhead=4)
+        leds = np.zeros((10, 3), dtype=np.uint8)
+
+        # When
+        first = tracker.update(leds, now=0.0)
+        unchanged = tracker.update(leds, now=0.1)
+        leds[5, 2] = 1
+        changed = tracker.update(leds, now=0.2)
+        again = tracker.update(leds, now=0.3)
+        keepalive = tracker.update(leds, now=1.1)
+
+        # Then
+        assert first.tolist() == [True, True, True]
+        assert unchanged.tolist() == [False, False, False]
+        assert changed.tolist() == [False, True, False]
+        assert again.tolist() == [False, False, False]
+        assert keepalive.tolist() == [True, False, True]
+        assert tracker.frames == 5
+        assert tracker.fixtures_sent == 6
+        assert tracker.fixtures_skipped == 9
+        # 16, 10 and 16 bytes per fixture
+        assert tracker.bytes_sent == 42 + 10 + 32
+        assert tracker.bytes_saved == 42 * 5 - 84
+
+    def test_partial_updates(self):
+        """
+        A change is compared with the last frame sent, not the last frame seen.
+        """
+        # Given
+        tracker = DirtyTracker([0, 2], [2, 4], keepalive=np.inf)
+        leds = np.zeros((4, 3), dtype=np.uint8)
+        tracker.update(leds, now=0)
+
+        # When
+        leds[0] = 1
+        leds[3] = 1
+        tracker.last[3] = 1
+        dirty = tracker.update(leds, now=1)
+        leds[0] = 0
+        reverted = tracker.update(leds, now=2)
+
+        # Then
+        assert dirty.tolist() == [True, False]
+        assert reverted.tolist() == [True, False]
+        assert np.all(tracker.last == leds)
+
+    def test_invalidate(self):
+        # Given
+        tracker = DirtyTracker([0, 2], [2, 4], keepalive=np.inf)
+        leds = np.zeros((4, 3), dtype=np.uint8)
+        tracker.update(leds, now=0)
+
+        # When
+        tracker.invalidate([1])
+
+        # Then
+        assert tracker.update(leds, now=1).tolist() == [False, True]
+        assert tracker.update(leds, now=2).tolist() == [False, False]
+
+    def test_opc_sink_skips_unchanged_hosts(self):
+        """
+        An OPC sink with a keepalive only sends the changed channels, and nothing to hosts
+        without changes.
+        """
+        # Given
+        servers = [socket.create_server(('127.0.0.1', 0)) for _ in range(2)]
+        received = [bytearray() for _ in servers]
+
+        def serve(server, data):
+            connection, _ = server.accept()
+            with connection:
+                while True:
+                    chunk = connection.recv(4096)
+                    if not chunk:
+                        return
+                    data.extend(chunk)
+
+        threads = [
+            threading.Thread(target=serve, args=args, daemon=True)
+            for args in zip(servers, received)
+        ]
+        for thread in threads:
+            thread.start()
+        fixtures = [
+            {'parameters': {
+                'protocol': OPC_PROTOCOL, 'host': '127.0.0.1',
+                'port': server.getsockname()[1], 'opcChannel': channel,
+                'pointIndicesJSON': '[[0, 0], [1, 0]]'}}
+            for server, channel in [(servers[0], 0), (servers[0], 1), (servers[1], 0)]
+        ]
+        sink = OpcSink(fixtures, keepalive=60.0)
+        leds = np.zeros((6, 3), dtype=np.uint8)
+
+        # When
+        sink.send(leds)
+        leds[2] = 255
+        sink.send(leds)
+        sink.send(leds)
+        sink.close()
+        for thread in threads:
+            thread.join(1.0)
+        for server in servers:
+            server.close()
+
+        # Then
+        channel_0, channel_1 = bytes([0, 0, 0, 6]), bytes([1, 0, 0, 6])
+        assert bytes(received[0]) == (
+            channel_0 + bytes(6) + channel_1 + bytes(6) + channel_1 + bytes([255] * 3 + [0] * 3))
+        assert bytes(received[1]) == channel_0 + bytes(6)
+        assert sink.tracker.bytes_sent == 4 * 10
+        assert sink.tracker.bytes_saved == 5 * 10
+        assert "50 of 90 bytes saved" in sink.summary()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestDirtyTracker),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
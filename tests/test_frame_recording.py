@@ -0,0 +1,164 @@
+import imp
+import inspect
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    import frame_recording
+    imp.reload(frame_recording)
+    from frame_recording import HEADER, FrameRecorder, FrameRecording, layout_hash
+    from frame_stream import NullSink, TeeSink
+finally:
+    sys.path = PATH
+
+
+class ListSink:
+    def __init__(self):
+        self.frames = []
+
+    def send(self, leds):
+        self.frames.append(leds)
+
+    def close(self):
+        pass
+
+
+def fixture(label, pixels):
+    return {'parameters': {
+        'label': label, 'pointIndicesJSON': json.dumps([[idx, 0] for idx in range(pixels)])}}
+
+
+class TestFrameRecording(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, 'show.ledrec')
+        self.fixtures = [fixture('a', 3), fixture('b', 4)]
+        self.frames = np.random.default_rng(0).integers(0, 256, (5, 7, 3), dtype=np.uint8)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def record(self, frames):
+        recorder = FrameRecorder(self.path, 7, 30.0, layout_hash(self.fixtures))
+        for frame in frames:
+            recorder.send(frame)
+        recorder.close()
+
+    def test_round_trip(self):
+        """
+        Frames are appended after the header, and replayed as read-only views of the file.
+        """
+        # Given
+        self.record(self.frames[:3])
+        self.record(self.frames[3:])
+
+        # When
+        recording = FrameRecording(self.path)
+
+        # Then
+        assert os.path.getsize(self.path) == HEADER.size + 5 * 7 * 3
+        assert (len(recording), recording.pixels, recording.fps) == (5, 7, 30.0)
+        assert np.all(recording.frames == self.frames)
+        frame = recording.frame(7, loop=True)
+        assert np.all(frame == self.frames[2])
+        assert np.shares_memory(frame, recording.frames)
+        assert not frame.flags.writeable
+        recording.check_layout(self.fixtures)
+        with self.assertRaises(ValueError):
+            recording.check_layout(self.fixtures[:1])
+
+    def test_partial_frame(self):
+        """
+        A partial frame from an interrupted recording is ignored, and overwritten by the next.
+        """
+        # Given
+        self.record(self.frames[:2])
+        with open(self.path, 'ab') as stream:
+            stream.write(b'\x01\x02')
+
+        # When
+        partial = len(FrameRecording(self.path))
+        self.record(self.frames[2:3])
+
+        # Then
+        assert partial == 2
+        assert np.all(FrameRecording(self.path).frames == self.frames[:3])
+
+    def test_mismatched_append(self):
+        # Given
+        self.record(self.frames)
+
+        # Then
+        with self.assertRaises(ValueError):
+            FrameRecorder(self.path, 7, 30.0, layout_hash(self.fixtures[::-1]))
+        with self.assertRaises(ValueError):
+            FrameRecorder(self.path, 8, 30.0, layout_hash(self.fixtures))
+        with self.assertRaises(ValueError):
+            FrameRecorder(os.path.join(self.tempdir.name, 'new'), 7, 30.0).send(self.frames[0, :3])
+
+    def test_play(self):
+        """
+        Playback starts anywhere, loops around, and sends views rather than copies.
+        """
+        # Given
+        self.record(self.frames)
+        recording = FrameRecording(self.path)
+        sink = ListSink()
+
+        # When
+        sent, _ = recording.play(TeeSink([sink, NullSink()]), fps=0, start=3, frames=4, loop=True)
+        to_end, _ = recording.play(NullSink(), fps=0, start=3)
+
+        # Then
+        assert sent == 4
+        assert to_end == 2
+        assert np.all(np.array(sink.frames) == self.frames[[3, 4, 0, 1]])
+        assert all(np.shares_memory(frame, recording.frames) for frame in sink.frames)
+
+    def test_play_rate(self):
+        """
+        Unpaced playback of 10k LEDs is never late, and paced playback keeps to the rate when
+        every frame has far more time than it needs.
+        """
+        # Given
+        frames = np.random.default_rng(1).integers(0, 256, (60, 10000, 3), dtype=np.uint8)
+        recorder = FrameRecorder(self.path, 10000, 60.0)
+        for frame in frames:
+            recorder.send(frame)
+        recorder.close()
+        recording = FrameRecording(self.path)
+
+        # When
+        unpaced = recording.play(NullSink(), fps=0, frames=600, loop=True)
+        start = time.perf_counter()
+        paced = recording.play(NullSink(), fps=50.0, frames=10)
+        elapsed = time.perf_counter() - start
+
+        # Then
+        assert unpaced == (600, 0)
+        assert paced == (10, 0)
+        # sleeps are never shorter than asked, so the frames are at least a period apart
+        assert elapsed >= 9 / 50.0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestFrameRecording),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
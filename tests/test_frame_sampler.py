@@ -0,0 +1,111 @@
+import imp
+import inspect
+import logging
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    import frame_sampler
+    imp.reload(frame_sampler)
+    from frame_sampler import build_frame_lut, frame_coordinates, load_frame_lut, sample_frame
+    import layout_io
+    imp.reload(layout_io)
+    from layout_io import transform_grid_positions
+finally:
+    sys.path = PATH
+
+
+class TestFrameSampler(unittest.TestCase):
+    def test_transform_grid_positions(self):
+        # Given
+        pixels = [(0, 0), (1, 0), (0, 1), (3, 2)]
+        grid_origin = [10, -5]
+        grid_matrix = [[-2, 0.5], [0, 1.5]]
+        expected = [(10, -5), (8, -5), (10, -3), (5, -2)]
+
+        # When
+        positions = transform_grid_positions(pixels, grid_origin, grid_matrix)
+
+        # Then
+        assert np.array_equal(positions, expected)
+
+    def test_frame_coordinates_corners(self):
+        # Given
+        grid_positions = [(0, 0), (10, 0), (0, 5), (10, 5)]
+        expected = [(0, 4.75), (9, 4.75), (0, 0.25), (9, 0.25)]
+
+        # When
+        coordinates = frame_coordinates(grid_positions, 10, 6)
+
+        # Then
+        assert np.allclose(coordinates, expected)
+
+    def test_build_frame_lut_weights(self):
+        # Given
+        grid_positions = np.random.default_rng(0).integers(-50, 50, (100, 2))
+
+        # When
+        lut = build_frame_lut(grid_positions, 32, 24)
+
+        # Then
+        assert lut['indices'].shape == (100, 4)
+        assert np.allclose(lut['weights'].sum(axis=1), 1)
+        assert lut['indices'].min() >= 0 and lut['indices'].max() < 32 * 24
+
+    def test_sample_frame_gradient(self):
+        """
+        A linear gradient is reproduced exactly by bilinear sampling.
+        """
+        # Given
+        width, height = 16, 8
+        grid_positions = np.random.default_rng(1).uniform(0, 100, (50, 2)).astype(int)
+        lut = build_frame_lut(grid_positions, width, height, keep_aspect=False)
+        cols, rows = np.meshgrid(np.arange(width), np.arange(height))
+        frame = np.stack([cols * 10.0, rows * 20.0, cols + rows], axis=-1)
+        coordinates = frame_coordinates(grid_positions, width, height, keep_aspect=False)
+        expected = np.stack([
+            coordinates[:, 0] * 10,
+            coordinates[:, 1] * 20,
+            coordinates.sum(axis=1)
+        ], axis=-1)
+
+        # When
+        sampled = sample_frame(frame, lut)
+
+        # Then
+        assert np.allclose(sampled, expected, atol=1e-3)
+
+    def test_load_frame_lut_cached(self):
+        # Given
+        grid_positions = np.array([(0, 0), (4, 2), (7, 9)])
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # When
+            built = load_frame_lut(grid_positions, 8, 8, cache_dir=cache_dir)
+            cached = load_frame_lut(grid_positions, 8, 8, cache_dir=cache_dir)
+
+            # Then
+            assert len(os.listdir(cache_dir)) == 1
+            assert np.array_equal(built['indices'], cached['indices'])
+            assert np.array_equal(built['weights'], cached['weights'])
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestFrameSampler),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
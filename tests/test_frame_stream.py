@@ -0,0 +1,206 @@
+import imp
+import inspect
+import logging
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    import frame_stream
+    imp.reload(frame_stream)
+    from frame_stream import FrameSource, FrameStream, frame_source
+    from common import setup_logger
+finally:
+    sys.path = PATH
+
+GRID_POSITIONS = np.array([[0, 0], [3, 0], [0, 2], [3, 2], [1, 1]])
+FRAME_SHAPE = (4, 6, 3)
+
+
+class ListSink:
+    """
+    Keeps a copy of every LED frame, optionally slowly, and can stop the stream after a number
+    of frames.
+    """
+
+    def __init__(self, delay=0.0, stop_after=None, on_send=None):
+        self.frames = []
+        self.delay = delay
+        self.stop_after = stop_after
+        self.on_send = on_send
+        self.stream = None
+        self.closed = False
+
+    def send(self, leds):
+        if self.on_send is not None:
+            self.on_send(len(self.frames))
+        self.frames.append(leds.copy())
+        time.sleep(self.delay)
+        if self.stop_after is not None and len(self.frames) >= self.stop_after:
+            self.stream.stop()
+
+    def close(self):
+        self.closed = True
+
+
+def solid_frames(values):
+    """
+    Frames of a single colour, so that every LED samples that colour.
+    """
+    for value in values:
+        yield np.full(FRAME_SHAPE, value, dtype=np.uint8)
+
+
+class TestFrameStream(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def stream(self, frames, sink, **kwargs):
+        stream = FrameStream(
+            frames, GRID_POSITIONS, sink, lut_cache_dir=self.tmp_dir.name, **kwargs)
+        sink.stream = stream
+        return stream
+
+    def sent_values(self, sink):
+        for leds in sink.frames:
+            assert leds.shape == (len(GRID_POSITIONS), 3)
+            assert (leds == leds[0, 0]).all()
+        return [int(leds[0, 0]) for leds in sink.frames]
+
+    def test_stream(self):
+        """
+        Every frame reaches the sink in order, and a slow sink holds back the reader.
+        """
+        # Given
+        values = list(range(0, 250, 10))
+        decoded = []
+
+        def frames():
+            for frame in solid_frames(values):
+                decoded.append(frame)
+                yield frame
+
+        ahead = []
+        sink = ListSink(delay=0.002, on_send=lambda sent: ahead.append(len(decoded) - sent))
+        stream = self.stream(frames(), sink, fps=1000.0, read_ahead=2, output_buffers=2)
+
+        # When
+        stream.run()
+
+        # Then
+        assert self.sent_values(sink) == values
+        assert sink.closed
+        assert stream.stats['output'].frames == len(values)
+        # the frame being sent, the other LED buffer, the frame ring and the reader's next frame
+        assert max(ahead) <= 1 + 1 + 2 + 1
+
+    def test_loop_and_stop(self):
+        """
+        A looping stream decodes the frames again for every pass, instead of keeping them.
+        """
+        # Given
+        decoded = []
+
+        def read(values):
+            for frame in solid_frames(values):
+                decoded.append(int(frame[0, 0, 0]))
+                yield frame
+
+        sink = ListSink(stop_after=7)
+        stream = self.stream(FrameSource(read, [10, 20, 30]), sink, fps=1000.0, loop=True)
+
+        # When
+        stream.run()
+
+        # Then
+        assert self.sent_values(sink) == [10, 20, 30, 10, 20, 30, 10]
+        assert decoded[:7] == [10, 20, 30, 10, 20, 30, 10]
+        assert not stream.errors
+
+    def test_loop_needs_frame_source(self):
+        with self.assertRaises(ValueError):
+            self.stream(solid_frames([10, 20]), ListSink(), loop=True).run()
+
+    def test_frame_source(self):
+        """
+        Frame files and raw RGB files are decoded again each time the source is iterated.
+        """
+        # Given
+        frames = [np.full(FRAME_SHAPE, value, dtype=np.uint8) for value in [10, 20, 30]]
+        for idx, frame in enumerate(frames):
+            np.save(os.path.join(self.tmp_dir.name, f'frame_{idx:03d}.npy'), frame)
+        raw_path = os.path.join(self.tmp_dir.name, 'clip.rgb')
+        np.stack(frames).tofile(raw_path)
+        height, width = FRAME_SHAPE[:2]
+
+        for source in [
+            frame_source([self.tmp_dir.name]),
+            frame_source([raw_path], width, height),
+        ]:
+            # When
+            passes = [list(source), list(source)]
+
+            # Then
+            for decoded in passes:
+                assert [int(frame[0, 0, 0]) for frame in decoded] == [10, 20, 30]
+                assert all(frame.shape == FRAME_SHAPE for frame in decoded)
+
+    def test_stage_error(self):
+        """
+        An exception in a stage stops the stream and is raised by `run`.
+        """
+        # Given
+        def frames():
+            yield from solid_frames([10, 20])
+            raise ValueError("corrupt frame")
+
+        sink = ListSink()
+        stream = self.stream(frames(), sink, fps=1000.0)
+
+        # When
+        with self.assertRaises(ValueError):
+            stream.run()
+
+        # Then
+        assert sink.closed
+        assert len(stream.errors) == 1
+
+    def test_first_frame_is_not_late(self):
+        # Given
+        sink = ListSink()
+        stream = self.stream(solid_frames([10]), sink, fps=1.0)
+
+        # When
+        stream.run()
+
+        # Then
+        assert self.sent_values(sink) == [10]
+        assert stream.late_frames == 0
+
+    def test_no_frames(self):
+        with self.assertRaises(ValueError):
+            self.stream(iter([]), ListSink()).run()
+
+
+if __name__ == "__main__":
+    setup_logger(stream_log_level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestFrameStream),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
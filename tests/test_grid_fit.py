@@ -0,0 +1,162 @@
+import imp
+import inspect
+import logging
+import os
+import sys
+import unittest
+
+import numpy as np
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    import grid_fit
+    imp.reload(grid_fit)
+    from grid_fit import (fit_grid_affines, fit_grid_matrices, fit_panel_grids, grid_coordinates,
+                          grid_project_positions)
+finally:
+    sys.path = PATH
+
+
+class TestGridFit(unittest.TestCase):
+    def test_grid_project_positions_on_axis(self):
+        # Given
+        proj_origin = [0, 0, 2]
+        positions = [(1, 0, 2), (0, -2, 0), (0, 0, 0)]
+        expected = [(0.5, 0, 0), (0, -2, 0), (0, 0, 0)]
+
+        # When
+        projected = grid_project_positions(proj_origin, positions)
+
+        # Then
+        assert np.allclose(projected, expected)
+
+    def test_grid_coordinates(self):
+        # Given
+        projected = [(1, 2, 0), (-3, 0.5, 0)]
+
+        # When
+        coordinates = grid_coordinates(projected, 0.5)
+
+        # Then
+        assert np.allclose(coordinates, [(-4, 2), (-1, -6)])
+
+    def test_fit_grid_matrices_exact(self):
+        """
+        Affine panels are fitted exactly, regardless of their pixel counts.
+        """
+        # Given
+        rng = np.random.default_rng(2)
+        expected = rng.normal(size=(3, 2, 2)) * 3
+        origins = rng.integers(-100, 100, (3, 2))
+        panel_pixels = [rng.integers(0, 20, (count, 2)) for count in [5, 40, 12]]
+        panel_targets = [
+            origin + pixels @ matrix.T
+            for pixels, origin, matrix in zip(panel_pixels, origins, expected)
+        ]
+
+        # When
+        matrices, rms, maximum = fit_grid_matrices(panel_pixels, panel_targets, origins)
+
+        # Then
+        assert np.allclose(matrices, expected)
+        assert np.allclose(rms, 0) and np.allclose(maximum, 0)
+
+    def test_fit_grid_matrices_residuals(self):
+        # Given
+        pixels = np.array([(1, 0), (1, 0), (0, 1)])
+        targets = np.array([(1, 0), (3, 0), (0, 1)])
+
+        # When
+        matrices, rms, maximum = fit_grid_matrices([pixels], [targets], [(0, 0)])
+
+        # Then
+        assert np.allclose(matrices[0], [[2, 0], [0, 1]])
+        assert np.isclose(maximum[0], 1)
+        assert np.isclose(rms[0], np.sqrt(2 / 3))
+
+    def test_fit_grid_matrices_collinear(self):
+        # Given
+        pixels = np.array([(0, 0), (1, 0), (2, 0)])
+        targets = pixels * 2
+
+        # When
+        matrices, rms, _ = fit_grid_matrices([pixels], [targets], [(0, 0)])
+
+        # Then
+        assert np.all(np.isfinite(matrices))
+        assert np.allclose(rms, 0)
+
+    def test_fit_grid_affines_exact(self):
+        # Given
+        rng = np.random.default_rng(3)
+        expected_matrices = rng.normal(size=(3, 2, 2)) * 3
+        expected_origins = rng.normal(size=(3, 2)) * 50
+        panel_pixels = [rng.integers(0, 20, (count, 2)) for count in [5, 40, 12]]
+        panel_targets = [
+            origin + pixels @ matrix.T
+            for pixels, origin, matrix in zip(panel_pixels, expected_origins, expected_matrices)
+        ]
+
+        # When
+        origins, matrices = fit_grid_affines(panel_pixels, panel_targets)
+
+        # Then
+        assert np.allclose(origins, expected_origins)
+        assert np.allclose(matrices, expected_matrices)
+
+    def test_fit_panel_grids_origin(self):
+        # Given
+        pixels = np.array([(0, 0), (1, 0), (0, 1), (1, 1)])
+        projected = np.array([
+            (x, y, 0) for x, y in [(0.3, 0.1), (0.3, -0.9), (1.3, 0.1), (1.3, -0.9)]
+        ])
+
+        # When
+        grids = fit_panel_grids([pixels], [projected], 0.5)
+
+        # Then the fitted origin (-0.2, 0.6) is rounded, not truncated
+        assert grids['origins'].tolist() == [[0, 1]]
+        assert np.allclose(grids['matrices'][0], [[2, 0], [0, 2]], atol=0.5)
+        assert grids['max'][0] < 1
+
+    def test_fit_panel_grids_negative_origins(self):
+        """
+        Panels whose pixels are on the global grid are fitted exactly, wherever their pixel
+        origin projects to.
+        """
+        # Given
+        matrix = np.array([[0, -2], [2, 0]])
+        panel_pixels = [np.array([(0, 0), (1, 0), (2, 0), (0, 1), (1, 1)]) + 3, np.array([(5, 5)])]
+        panel_targets = [pixels @ matrix.T + (-7, -3) for pixels in panel_pixels[:1]] + [
+            np.array([(10.2, 3.9)])]
+        quantization = 0.25
+        # invert `grid_coordinates`
+        panel_projected = [
+            np.stack([targets[:, 1], -targets[:, 0], np.zeros(len(targets))], axis=-1)
+            * quantization
+            for targets in panel_targets
+        ]
+
+        # When
+        grids = fit_panel_grids(panel_pixels, panel_projected, quantization)
+
+        # Then
+        assert grids['origins'].tolist() == [[-7, -3], [10, 4]]
+        assert np.allclose(grids['matrices'][0], matrix)
+        assert np.allclose(grids['max'], 0)
+        assert np.isclose(grids['pitch'][0], 2)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestGridFit),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
@@ -0,0 +1,146 @@
+import imp
+import inspect
+import logging
+import os
+import struct
+import sys
+import tempfile
+import time
+import unittest
+import zlib
+
+import numpy as np
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    import grid_preview
+    imp.reload(grid_preview)
+    from grid_preview import (BACKGROUND, COLLISION_COLOUR, encode_png, fixture_colours,
+                              render_grid_preview, start_preview)
+    from common import setup_logger
+finally:
+    sys.path = PATH
+
+
+def decode_png(data):
+    """
+    The (H, W, 3) image of an unfiltered 8 bit RGB PNG, as written by `encode_png`.
+    """
+    assert data[:8] == b'\x89PNG\r\n\x1a\n'
+    offset = 8
+    chunks = {}
+    while offset < len(data):
+        length, = struct.unpack('>I', data[offset:offset + 4])
+        kind = data[offset + 4:offset + 8]
+        body = data[offset + 8:offset + 8 + length]
+        crc, = struct.unpack('>I', data[offset + 8 + length:offset + 12 + length])
+        assert crc == zlib.crc32(kind + body) & 0xffffffff, kind
+        chunks[kind] = chunks.get(kind, b'') + body
+        offset += 12 + length
+    width, height, depth, colour_type = struct.unpack('>IIBB', chunks[b'IHDR'][:10])
+    assert (depth, colour_type) == (8, 2)
+    scanlines = np.frombuffer(zlib.decompress(chunks[b'IDAT']), dtype=np.uint8)
+    scanlines = scanlines.reshape(height, width * 3 + 1)
+    assert not scanlines[:, 0].any()
+    return scanlines[:, 1:].reshape(height, width, 3)
+
+
+class TestGridPreview(unittest.TestCase):
+    def test_encode_png_round_trip(self):
+        # Given
+        image = np.random.default_rng(48).integers(0, 256, (7, 5, 3), dtype=np.uint8)
+
+        # When
+        decoded = decode_png(encode_png(image))
+
+        # Then
+        assert np.array_equal(decoded, image)
+
+    def test_fixture_colours_are_distinct(self):
+        colours = fixture_colours(40)
+        assert colours.shape == (40, 3)
+        assert len({tuple(colour) for colour in colours}) == 40
+
+    def test_render_grid_preview(self):
+        """
+        Pixels are drawn in their fixture colour, wiring at half brightness, and collisions in
+        the collision colour, with the grid y axis pointing up.
+        """
+        # Given
+        scale = 4
+        margin = 1
+        panel_positions = [
+            np.array([[0, 0], [3, 0], [3, 2]]),
+            np.array([[5, 2], [3, 2]]),
+        ]
+        colours = fixture_colours(2)
+
+        def pixel(image, x, y):
+            # positions span x 0..5 and y 0..2
+            return tuple(image[(2 + margin - y) * scale + scale // 2,
+                               (x + margin) * scale + scale // 2])
+
+        # When
+        image = render_grid_preview(panel_positions, scale=scale, margin=margin)
+
+        # Then
+        assert image.shape == ((2 + 2 * margin + 1) * scale, (5 + 2 * margin + 1) * scale, 3)
+        assert pixel(image, 0, 0) == tuple(colours[0])
+        assert pixel(image, 5, 2) == tuple(colours[1])
+        assert pixel(image, 3, 2) == COLLISION_COLOUR
+        # wiring between (0, 0) and (3, 0), and (5, 2) and (3, 2)
+        assert pixel(image, 1, 0) == tuple(colours[0] // 2)
+        assert pixel(image, 4, 2) == tuple(colours[1] // 2)
+        # no wiring between panels, or where there are no pixels
+        assert pixel(image, 4, 1) == BACKGROUND
+        assert pixel(image, 0, 2) == BACKGROUND
+
+    def test_render_empty(self):
+        assert render_grid_preview([]).shape == (1, 1, 3)
+
+    def test_start_preview_of_10k_pixels(self):
+        # Given
+        rows = [
+            [(x if y % 2 == 0 else 99 - x, y) for x in range(100)] for y in range(100)
+        ]
+        grid_info = {
+            f"[{idx}]": {'pixels': sum(rows[idx * 10:(idx + 1) * 10], [])} for idx in range(10)
+        }
+        grid_info['[9]']['grid_origin'] = [0, -1]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'mapping.png')
+
+            # When
+            start = time.perf_counter()
+            with self.assertLogs(level=logging.WARNING) as logs:
+                start_preview(grid_info, path).join()
+            elapsed = time.perf_counter() - start
+
+            # Then
+            with open(path, 'rb') as stream:
+                image = decode_png(stream.read())
+        # the time depends on the machine, so it's logged rather than asserted
+        logging.info(f"previewed {100 * 100} pixels in {1e3 * elapsed:.1f} ms")
+        scale, margin = grid_preview.DEFAULT_SCALE, grid_preview.DEFAULT_MARGIN
+        assert image.shape[:2] == ((99 + 2 * margin) * scale, (100 + 2 * margin) * scale)
+        # the last panel was moved down a row onto the top row of the one before
+        assert len(logs.output) == 100
+        assert all(output.endswith("mapped by [8], [9]") for output in logs.output)
+        assert (image == COLLISION_COLOUR).all(axis=-1).any()
+
+
+if __name__ == "__main__":
+    setup_logger(stream_log_level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestGridPreview),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
@@ -0,0 +1,124 @@
+import imp
+import inspect
+import logging
+import os
+import sys
+import unittest
+
+import numpy as np
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    import grid_quantization
+    imp.reload(grid_quantization)
+    from grid_quantization import (count_collisions, grid_extent, optimise_quantization,
+                                   pack_positions, panel_collisions, resolve_offsets)
+finally:
+    sys.path = PATH
+
+
+def scaled_grid_positions(panel_points):
+    """
+    Grid positions which truncate each panel's points after dividing them by the quantization.
+    """
+    def panel_grid_positions(quantization, offsets=None):
+        if offsets is None:
+            offsets = np.zeros((len(panel_points), 2))
+        return [
+            np.trunc(offset + np.asarray(points) / quantization).astype(int)
+            for points, offset in zip(panel_points, offsets)
+        ]
+    return panel_grid_positions
+
+
+class TestGridQuantization(unittest.TestCase):
+    def test_pack_positions_unique(self):
+        # Given
+        positions = np.array([(x, y) for x in range(-3, 4) for y in range(-5, 2)])
+
+        # When
+        keys = pack_positions(positions)
+
+        # Then
+        assert len(np.unique(keys)) == len(positions)
+        keys = pack_positions([(1, 2), (1, 2), (2, 1)])
+        assert keys[0] == keys[1] != keys[2]
+
+    def test_count_collisions(self):
+        # Given
+        panels = [[(0, 0), (1, 0), (2, 0)], [(2, 0), (3, 0)], [(0, 0), (5, 5)]]
+
+        # When
+        collisions = count_collisions(panels)
+        per_panel = panel_collisions(panels)
+
+        # Then
+        assert collisions == 2
+        assert per_panel.tolist() == [2, 1, 1]
+
+    def test_resolve_offsets(self):
+        # Given
+        panels = [
+            [(x, y) for x in range(4) for y in range(4)],
+            [(x, 3) for x in range(4)],
+            [(x, 4) for x in range(4, 8)],
+        ]
+
+        # When
+        offsets, remaining = resolve_offsets(panels, radius=1)
+
+        # Then
+        assert remaining == 0
+        assert count_collisions([np.add(p, o) for p, o in zip(panels, offsets)]) == 0
+
+    def test_optimise_quantization(self):
+        """
+        Two rows of points 1.0 apart, 1.5 apart from each other, are collision free for all
+        quantizations up to 1.0 (and for some larger ones).
+        """
+        # Given
+        xs = np.arange(10, dtype=float)
+        panel_points = [
+            np.stack([xs, np.zeros_like(xs)], axis=-1) + 0.01,
+            np.stack([xs, np.full_like(xs, 1.5)], axis=-1) + 0.01,
+        ]
+        panel_grid_positions = scaled_grid_positions(panel_points)
+        start = 0.5
+
+        # When
+        optimised = optimise_quantization(panel_grid_positions, start)
+
+        # Then
+        assert optimised['collisions'] == 0
+        assert 1.0 <= optimised['quantization'] < 1.1
+        assert count_collisions(panel_grid_positions(optimised['quantization'])) == 0
+        assert count_collisions(panel_grid_positions(optimised['quantization'] * 1.1)) > 0
+        assert grid_extent(panel_grid_positions(optimised['quantization'])) == (10, 2)
+
+    def test_optimise_quantization_overlapping(self):
+        # Given
+        points = np.array([(0.5, 0.5), (1.5, 0.5)])
+        panel_grid_positions = scaled_grid_positions([points, points])
+
+        # When
+        optimised = optimise_quantization(panel_grid_positions, 1.0)
+
+        # Then
+        assert optimised['quantization'] == 1.0
+        assert optimised['collisions'] == 2
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestGridQuantization),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
@@ -0,0 +1,126 @@
+import imp
+import inspect
+import logging
+import os
+import sys
+import tempfile
+import unittest
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import TESTS_DIR, TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    import layout_addon
+    imp.reload(layout_addon)
+    from layout_addon import ModuleCache, find_test_modules, module_imports
+    from common import setup_logger
+finally:
+    sys.path = PATH
+
+# module names which don't clash with the tools
+MODULES = {
+    'addon_fixture_base': "VALUE = 1\n",
+    'addon_fixture_user': "from addon_fixture_base import VALUE\nDOUBLE = 2 * VALUE\n",
+    'addon_fixture_other': "import os\nNAME = 'other'\n",
+}
+
+
+class TestModuleCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.mtime = 1e9
+        for name, source in MODULES.items():
+            self.write(name, source)
+        self.cache = ModuleCache([self.tmp_dir.name])
+        self.path = sys.path[:]
+
+    def tearDown(self):
+        sys.path = self.path
+        for name in MODULES:
+            sys.modules.pop(name, None)
+        self.tmp_dir.cleanup()
+
+    def write(self, name, source):
+        """
+        Write a module with a newer mtime than the last, so that changes are seen regardless of
+        the file system's mtime resolution.
+        """
+        path = os.path.join(self.tmp_dir.name, f"{name}.py")
+        with open(path, 'w') as stream:
+            stream.write(source)
+        self.mtime += 10
+        os.utime(path, (self.mtime, self.mtime))
+
+    def test_load_order(self):
+        # When
+        order = self.cache.load_order('addon_fixture_user')
+
+        # Then
+        assert order == ['addon_fixture_base', 'addon_fixture_user']
+        assert self.cache.dependencies('addon_fixture_other') == []
+
+    def test_reload_on_mtime(self):
+        # Given
+        user = self.cache.load('addon_fixture_user')
+        assert user.DOUBLE == 2
+        generation = self.cache.generation
+
+        # When
+        unchanged = self.cache.load('addon_fixture_user')
+
+        # Then
+        assert unchanged is user
+        assert self.cache.generation == generation
+
+        # When
+        self.write('addon_fixture_base', "VALUE = 5\n")
+        user = self.cache.load('addon_fixture_user')
+
+        # Then the module which imports the changed one is reloaded too
+        assert user.DOUBLE == 10
+        assert self.cache.generation == generation + 2
+        assert 'addon_fixture_other' not in sys.modules
+
+        # When
+        base_loaded_at = self.cache.loaded_at['addon_fixture_base']
+        self.write('addon_fixture_user', "from addon_fixture_base import VALUE\nDOUBLE = -VALUE\n")
+        user = self.cache.load('addon_fixture_user')
+
+        # Then only the changed module is reloaded
+        assert user.DOUBLE == -5
+        assert self.cache.loaded_at['addon_fixture_base'] == base_loaded_at
+
+    def test_new_dependency(self):
+        # Given
+        assert self.cache.load('addon_fixture_other').NAME == 'other'
+
+        # When
+        self.write('addon_fixture_other', "from addon_fixture_base import VALUE\nNAME = VALUE\n")
+
+        # Then
+        assert self.cache.load_order('addon_fixture_other') == [
+            'addon_fixture_base', 'addon_fixture_other']
+        assert self.cache.load('addon_fixture_other').NAME == 1
+
+    def test_tool_imports(self):
+        # When
+        light_layout = module_imports(os.path.join(TOOLS_DIR, 'light_layout.py'))
+
+        # Then
+        assert {'common', 'panel_geometry', 'grid_preview', 'export_manifest'} <= light_layout
+        assert 'tolerant' in module_imports(os.path.join(TOOLS_DIR, 'panel_geometry.py'))
+        assert 'test_layout_addon' in find_test_modules(TESTS_DIR)
+
+
+if __name__ == "__main__":
+    setup_logger(stream_log_level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestModuleCache),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
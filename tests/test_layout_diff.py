@@ -0,0 +1,108 @@
+import imp
+import inspect
+import json
+import logging
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import REPO_DIR, TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    import layout_diff
+    imp.reload(layout_diff)
+    from layout_diff import (angle_differences, diff_layouts, format_diff, load_layout,
+                             panel_changed)
+finally:
+    sys.path = PATH
+
+DATA_DIR = os.path.join(REPO_DIR, 'LEDPortalSimulator', 'data')
+OG_FILE = os.path.join(DATA_DIR, 'TeleCortex_Dome_5630_Panels_Full_OG')
+BACK_FILE = os.path.join(DATA_DIR, 'TeleCortex_Dome_5630_Panels_Full_BACK')
+
+
+class TestLayoutDiff(unittest.TestCase):
+    def test_angle_differences(self):
+        assert np.allclose(
+            angle_differences(np.array([170, -170, 10]), np.array([-170, 170, 20])),
+            [20, -20, 10])
+
+    def test_load_layout(self):
+        # When
+        layout = load_layout(OG_FILE + '.json', OG_FILE + '.lxm')
+
+        # Then
+        assert len(layout['names']) == len(layout['labels']) == 12
+        assert layout['labels'][0] == 'SRU'
+        assert layout['offsets'][-1] == len(layout['positions']) == layout['counts'].sum()
+        # the first pixel of each panel is at the fixture location
+        with open(OG_FILE + '.lxm') as stream:
+            fixture = json.load(stream)['fixtures'][0]
+        pixel = json.loads(fixture['parameters']['pointIndicesJSON'])[0]
+        with open(OG_FILE + '.json') as stream:
+            matrix = np.array(json.load(stream)['p'][0]['matrix'])
+        assert np.allclose(layout['positions'][0], matrix[:3, :2] @ pixel + matrix[:3, 3])
+
+    def test_diff_og_back(self):
+        """
+        The BACK variant shares five panels with the OG layout, rewired to other controllers.
+        """
+        # Given
+        layout_og = load_layout(OG_FILE + '.json', OG_FILE + '.lxm')
+        layout_back = load_layout(BACK_FILE + '.json', BACK_FILE + '.lxm')
+
+        # When
+        diff = diff_layouts(layout_og, layout_back)
+
+        # Then
+        assert diff['match'] == 'label'
+        assert diff['keys'] == ['SRU', 'SLIU', 'SLU', 'BU', 'SRIU']
+        assert len(diff['removed']) == len(diff['added']) == 7
+        bu = diff['panels'][3]
+        assert bu['count_change'] == 0 and bu['max_displacement'] < 1e-6
+        assert bu['parameter_changes'] == {
+            'host': ('still-brook', 'lingering-brook'), 'opcChannel': (2, 1)}
+        assert bu['max_grid_change'] > 0
+        assert format_diff(diff).splitlines()[-1] == \
+            "5 panels matched by label, 5 changed, 7 removed, 7 added"
+
+    def test_diff_moved_panel(self):
+        # Given
+        with open(OG_FILE + '.json') as stream:
+            panels = json.load(stream)['p']
+        panels[2]['matrix'][0][3] += 0.5
+        panels[4]['pixels'] = panels[4]['pixels'][:-10]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'moved.json')
+            with open(path, 'w') as stream:
+                json.dump({'p': panels}, stream)
+            layout_b = load_layout(path)
+
+        # When
+        diff = diff_layouts(load_layout(OG_FILE + '.json'), layout_b)
+
+        # Then
+        assert diff['match'] == 'name'
+        changed = [panel['key'] for panel in diff['panels'] if panel_changed(panel)]
+        assert changed == [diff['keys'][2], diff['keys'][4]]
+        assert np.isclose(diff['panels'][2]['max_displacement'], 0.5)
+        assert diff['panels'][4]['count_change'] == -10
+        assert diff['panels'][4]['max_displacement'] < 1e-9
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestLayoutDiff),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
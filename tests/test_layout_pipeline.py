@@ -0,0 +1,287 @@
+"""
+End-to-end run of the light layout on a structure export, using the fake `bpy` scene when
+running outside of Blender.
+"""
+
+import imp
+import inspect
+import json
+import logging
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import FAKE_BLENDER_DIR, REPO_DIR, TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    sys.path.append(FAKE_BLENDER_DIR)
+    import bpy
+    import fake_scene
+    import light_layout
+    imp.reload(light_layout)
+    import export_structure
+    imp.reload(export_structure)
+    from common import DATA_PATH, setup_logger
+    from grid_quantization import count_collisions
+    from export_manifest import MANIFEST_FILE, export_status, load_manifest
+    from layout_io import fixture_grid_positions, fixture_offsets
+finally:
+    sys.path = PATH
+
+STRUCTURE_FILE = os.path.join(REPO_DIR, DATA_PATH, 'dome_render_6_5_Dome_EDGES.json')
+
+
+@unittest.skipUnless(hasattr(bpy, 'reset'), "needs the fake bpy scene")
+class TestLayoutPipeline(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp_dir.name)
+        os.makedirs(DATA_PATH)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def test_load_structure(self):
+        # When
+        obj = fake_scene.load_structure(STRUCTURE_FILE)
+
+        # Then
+        assert bpy.context.object is obj
+        assert obj.name == 'Dome'
+        assert len(obj.data.vertices) == 26
+        assert len(obj.data.polygons) == 41
+        assert sum(polygon.loop_total == 3 for polygon in obj.data.polygons) == 40
+        assert obj.matrix_world[2][2] == 3.25
+
+    def exec_tool(self, filename, name='script_wrapper'):
+        """
+        Run a tool the way script_wrapper.py does: exec'd in the wrapper's globals, with the
+        wrapper's `__file__`. Returns the globals.
+        """
+        namespace = {'__name__': name, '__file__': os.path.join(TOOLS_DIR, 'script_wrapper.py')}
+        PATH = sys.path[:]
+        try:
+            sys.path.insert(0, TOOLS_DIR)
+            with open(filename) as stream:
+                exec(compile(stream.read(), filename, 'exec'), namespace)
+        finally:
+            sys.path = PATH
+        return namespace
+
+    def test_script_wrapper_paths(self):
+        for module in [light_layout, export_structure]:
+            # Given
+            path = os.path.join(TOOLS_DIR, f'{module.__name__}.py')
+
+            # When
+            executed = self.exec_tool(path)
+
+            # Then
+            assert executed['THIS_FILE'] == path == module.THIS_FILE
+            assert executed['LOG_FILE'] == module.LOG_FILE == f'{module.__name__}.log'
+
+    def test_main_exports_layout(self):
+        """
+        The triangles of the dome (the decagon base overlaps them in the projection) are laid out
+        on a collision-free global grid, within the grid residual tolerance.
+        """
+        # Given
+        fake_scene.load_structure(STRUCTURE_FILE, selected_polygons=range(40))
+
+        # When
+        light_layout.main()
+
+        # Then
+        with open(os.path.join(DATA_PATH, 'dome_Dome_HEX.json')) as stream:
+            panels = json.load(stream)[light_layout.EXPORT_TYPE.lower()]
+        with open(os.path.join(DATA_PATH, 'dome_Dome_HEX.lxm')) as stream:
+            fixtures = json.load(stream)['fixtures']
+        assert len(panels) == len(fixtures) == 40
+        for panel, fixture in zip(panels, fixtures):
+            assert json.loads(fixture['parameters']['pointIndicesJSON']) == panel['pixels']
+            assert 'globalGridMatrix' in fixture['parameters']
+        offsets = fixture_offsets(fixtures)
+        grid_positions = fixture_grid_positions(fixtures)
+        assert count_collisions(
+            [grid_positions[start:end] for start, end in zip(offsets[:-1], offsets[1:])]) == 0
+        leds = bpy.data.collections[light_layout.LED_COLLECTION_NAME].all_objects
+        assert len(leds) == sum(len(panel['pixels']) for panel in panels)
+        with open('mapping_HEX.png', 'rb') as stream:
+            assert stream.read(8) == b'\x89PNG\r\n\x1a\n'
+        with open(light_layout.LOG_FILE) as stream:
+            assert "residuals are too large" not in stream.read()
+
+    def test_main_skips_unchanged_exports(self):
+        """
+        Running the layout again doesn't rewrite its exports, and the manifest records the inputs
+        of each export.
+        """
+        # Given
+        fake_scene.load_structure(STRUCTURE_FILE, selected_polygons=[12, 13])
+        light_layout.main()
+        exports = [os.path.join(DATA_PATH, f'dome_Dome_HEX.{ext}') for ext in ['json', 'lxm']]
+        for path in exports:
+            os.utime(path, ns=(0, 0))
+
+        # When
+        light_layout.main()
+
+        # Then
+        assert all(os.stat(path).st_mtime_ns == 0 for path in exports)
+        manifest = load_manifest(os.path.join(DATA_PATH, MANIFEST_FILE))
+        assert set(manifest) == {'dome_Dome_HEX.json', 'dome_Dome_HEX.lxm'}
+        assert set(manifest['dome_Dome_HEX.lxm']['inputs']) == {'mesh', 'config', 'overrides'}
+        # the fake blend file is never written, so it's recorded without a hash
+        files = {
+            os.path.basename(name): digest
+            for name, digest in manifest['dome_Dome_HEX.lxm']['files'].items()
+        }
+        assert list(files) == ['dome.blend', 'light_layout.py']
+        assert files['dome.blend'] is None
+        assert all(export_status(path) is None for path in exports)
+
+    def test_settings_edit_makes_exports_stale(self):
+        """
+        Run through script_wrapper.py, the manifest records the layout module as an input file,
+        so editing its settings makes the exports stale. Scene lamps don't change the exports.
+        """
+        # Given
+        fake_scene.load_structure(STRUCTURE_FILE, selected_polygons=[12, 13])
+        module_path = os.path.abspath('light_layout.py')
+        with open(os.path.join(TOOLS_DIR, 'light_layout.py')) as stream:
+            source = stream.read()
+        assert "\nLED_SPACING = 1.0\n" in source
+        with open(module_path, 'w') as stream:
+            stream.write(source)
+        self.exec_tool(module_path, name='__main__')
+        exports = [os.path.join(DATA_PATH, f'dome_Dome_HEX.{ext}') for ext in ['json', 'lxm']]
+        manifest = load_manifest(os.path.join(DATA_PATH, MANIFEST_FILE))
+
+        # Then
+        assert os.path.relpath(module_path, DATA_PATH) in manifest['dome_Dome_HEX.lxm']['files']
+        assert all(export_status(path) is None for path in exports)
+
+        # When
+        with open(module_path, 'w') as stream:
+            stream.write(source.replace("\nLED_SPACING = 1.0\n", "\nLED_SPACING = 0.5\n"))
+
+        # Then
+        assert all(export_status(path) == 'files' for path in exports)
+        layout = light_layout.layout_from_config('LedPortal', 'HEX')
+        assert light_layout.layout_input_hashes({**layout, 'lamps': True}, {}, []) == \
+            light_layout.layout_input_hashes({**layout, 'lamps': False}, {}, [])
+
+    def test_main_layout_config(self):
+        """
+        Several regions and LED configs are laid out from the same selection in one pass.
+        """
+        # Given
+        fake_scene.load_structure(STRUCTURE_FILE, selected_polygons=range(40))
+        config_file = 'layouts.json'
+        with open(config_file, 'w') as stream:
+            json.dump({
+                'layouts': [
+                    {'led_config': 'TeleCortex', 'region': 'OG', 'polygons': [0, 1, 2, 3],
+                     'settings': {'poly_overrides': {'0': {'fixture': {'host': 'damp-frog'}}}}},
+                    {'led_config': 'LedPortal', 'region': 'HEX', 'polygons': [6, 7, 8],
+                     'lamps': True, 'settings': {'poly_overrides': {'6': {'vertex_rotation': 0}}}},
+                ],
+                'workers': 2,
+            }, stream)
+
+        # When
+        light_layout.main(config_file)
+
+        # Then
+        exports = {}
+        for region in ['OG', 'HEX']:
+            with open(os.path.join(DATA_PATH, f'dome_Dome_{region}.lxm')) as stream:
+                exports[region] = json.load(stream)['fixtures']
+        assert [fixture['id'] for fixture in exports['OG']] == [1, 2, 3, 4]
+        assert exports['OG'][0]['parameters']['protocol'] == 3
+        assert exports['OG'][0]['parameters']['label'] == 'SMLU'
+        assert exports['OG'][0]['parameters']['host'] == 'damp-frog'
+        assert [fixture['id'] for fixture in exports['HEX']] == [106, 107, 108]
+        assert exports['HEX'][0]['parameters']['protocol'] == 2
+        leds = bpy.data.collections[light_layout.LED_COLLECTION_NAME].all_objects
+        assert len(leds) == sum(
+            len(json.loads(fixture['parameters']['pointIndicesJSON']))
+            for fixture in exports['HEX'])
+
+    def test_main_lays_out_decagon(self):
+        """
+        The decagon base of the dome is filled like the triangles.
+        """
+        # Given
+        fake_scene.load_structure(STRUCTURE_FILE, selected_polygons=[0, 40])
+
+        # When
+        light_layout.main()
+
+        # Then
+        with open(os.path.join(DATA_PATH, 'dome_Dome_HEX.json')) as stream:
+            panels = json.load(stream)[light_layout.EXPORT_TYPE.lower()]
+        assert [panel['name'] for panel in panels] == ['[0]', '[40]']
+        # the decagon is much larger than a triangle
+        assert len(panels[1]['pixels']) > 5 * len(panels[0]['pixels'])
+        leds = bpy.data.collections[light_layout.LED_COLLECTION_NAME].all_objects
+        assert len(leds) == sum(len(panel['pixels']) for panel in panels)
+
+    def test_main_led_clearance(self):
+        """
+        Neighbouring triangles 12 and 13 have LEDs within two LED spacings of each other.
+        """
+        # Given
+        fake_scene.load_structure(STRUCTURE_FILE, selected_polygons=[12, 13])
+        clearance = light_layout.LED_CLEARANCE
+        light_layout.LED_CLEARANCE = 0.12
+
+        # When
+        try:
+            light_layout.main()
+        finally:
+            light_layout.LED_CLEARANCE = clearance
+
+        # Then
+        mesh = bpy.data.objects['led_clearance_HEX'].data
+        assert len(mesh.edges) == 68
+        led_locations = {
+            tuple(np.round(led.location, 5))
+            for led in bpy.data.collections[light_layout.LED_COLLECTION_NAME].all_objects
+        }
+        assert all(tuple(np.round(vertex.co, 5)) in led_locations for vertex in mesh.vertices)
+
+    def test_load_layout_config_errors(self):
+        for layouts in [
+            [
+                {'led_config': 'LedPortal', 'lamps': True},
+                {'led_config': 'TeleCortex', 'lamps': True},
+            ],
+            [{'led_config': 'LedPortal', 'settings': {'spaceing': 0.1}}],
+            [{'led_config': 'LedPortal', 'regoin': 'HEX'}],
+            [{'led_config': 'NeoPixel'}],
+        ]:
+            with open('layouts.json', 'w') as stream:
+                json.dump({'layouts': layouts}, stream)
+            with self.assertRaises(ValueError):
+                light_layout.load_layout_config('layouts.json')
+
+
+if __name__ == "__main__":
+    setup_logger(stream_log_level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestLayoutPipeline),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
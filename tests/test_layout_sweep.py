@@ -0,0 +1,75 @@
+import imp
+import inspect
+import logging
+import os
+import sys
+import unittest
+from math import inf, sqrt
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import REPO_DIR, TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    import layout_sweep
+    imp.reload(layout_sweep)
+    from layout_sweep import (format_table, load_structure_polygons, parameter_grid,
+                              parse_index_ranges, parse_values, run_sweep)
+finally:
+    sys.path = PATH
+
+STRUCTURE_FILE = os.path.join(
+    REPO_DIR, 'LEDPortalSimulator', 'data', 'dome_render_6_5_Dome_EDGES.json')
+
+
+class TestLayoutSweep(unittest.TestCase):
+    def test_parse_values(self):
+        assert parse_values(['0.1:0.3:0.1']) == [0.1, 0.2, 0.3]
+        assert parse_values(['inf', 'auto', 'none', '2']) == [inf, 'auto', None, 2.0]
+        assert parse_values(['0:2:1'], int) == [0, 1, 2]
+
+    def test_parse_index_ranges(self):
+        assert parse_index_ranges("0to3 5 7to8") == [0, 1, 2, 3, 5, 7, 8]
+
+    def test_parameter_grid(self):
+        # When
+        grid = parameter_grid({'a': [1, 2], 'b': [3], 'c': [4, 5, 6]})
+
+        # Then
+        assert len(grid) == 6
+        assert grid[0] == {'a': 1, 'b': 3, 'c': 4}
+
+    def test_run_sweep_dome(self):
+        """
+        The LedPortal layout has 474 lights on the small dome triangles and 630 on the large ones.
+        """
+        # Given
+        polygons = load_structure_polygons(STRUCTURE_FILE, range(40))
+        parameters = {'grid_gradient': [sqrt(3), inf], 'vertex_rotation': [0, 1]}
+
+        # When
+        results = run_sweep(polygons, parameters, workers=2)
+
+        # Then
+        assert len(results) == 4
+        hex_result = results[1]
+        assert hex_result['grid_gradient'] == sqrt(3) and hex_result['vertex_rotation'] == 1
+        assert hex_result['total'] == 20520
+        assert (hex_result['panel_min'], hex_result['panel_max']) == (474, 630)
+        assert hex_result['errors'] == 0
+        assert 0 < hex_result['fill_min'] <= hex_result['fill_mean'] < 1
+        assert results == run_sweep(polygons, parameters, workers=1)
+        assert len(format_table(results).splitlines()) == 6
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestLayoutSweep),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
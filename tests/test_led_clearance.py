@@ -0,0 +1,93 @@
+import imp
+import inspect
+import logging
+import os
+import sys
+import unittest
+
+import numpy as np
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import REPO_DIR, TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    import led_clearance
+    imp.reload(led_clearance)
+    from layout_io import load_panels
+    from led_clearance import (candidate_pairs, clearance_mesh_data, find_close_pairs,
+                               panel_led_positions, panel_pair_summary, wiring_spacing)
+finally:
+    sys.path = PATH
+
+OG_FILE = os.path.join(
+    REPO_DIR, 'LEDPortalSimulator', 'data', 'TeleCortex_Dome_5630_Panels_Full_OG.json')
+
+
+def brute_force_pairs(positions, panel_ids, threshold):
+    distances = np.linalg.norm(positions[:, np.newaxis] - positions[np.newaxis], axis=-1)
+    first, second = np.nonzero(np.triu(distances < threshold, 1))
+    different = panel_ids[first] != panel_ids[second]
+    return {frozenset(pair) for pair in zip(first[different], second[different])}
+
+
+class TestLedClearance(unittest.TestCase):
+    def test_candidate_pairs_unique(self):
+        # Given
+        positions = np.random.default_rng(1).random((500, 3))
+
+        # When
+        pairs = candidate_pairs(positions, 0.1)
+
+        # Then
+        assert not np.any(pairs[:, 0] == pairs[:, 1])
+        assert len({frozenset(pair) for pair in pairs.tolist()}) == len(pairs)
+
+    def test_find_close_pairs_brute_force(self):
+        # Given
+        rng = np.random.default_rng(0)
+        positions = rng.random((2000, 3)) * [1, 2, 0.5] - 0.5
+        panel_ids = rng.integers(0, 10, len(positions))
+
+        for threshold in [0.02, 0.05, 0.3]:
+            # When
+            pairs, distances = find_close_pairs(positions, panel_ids, threshold)
+
+            # Then
+            assert {frozenset(pair) for pair in pairs.tolist()} == \
+                brute_force_pairs(positions, panel_ids, threshold)
+            assert np.all(np.diff(distances) >= 0) and np.all(distances < threshold)
+            assert np.all(panel_ids[pairs[:, 0]] < panel_ids[pairs[:, 1]])
+
+    def test_og_layout(self):
+        """
+        At the LED spacing, the TeleCortex panels only come too close along a few shared edges.
+        """
+        # Given
+        positions, panel_ids, _ = panel_led_positions(load_panels(OG_FILE))
+        threshold = wiring_spacing(positions, panel_ids)
+
+        # When
+        pairs, distances = find_close_pairs(positions, panel_ids, threshold)
+
+        # Then
+        assert np.isclose(threshold, 1 / 16)
+        assert len(pairs) == 44
+        summary = panel_pair_summary(pairs, distances, panel_ids)
+        assert sum(count for _, count, _ in summary) == len(pairs)
+        assert summary[0][2] == distances[0]
+        vertices, edges = clearance_mesh_data(positions, pairs)
+        assert np.allclose(vertices[edges], positions[pairs])
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestLedClearance),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
@@ -0,0 +1,94 @@
+import imp
+import inspect
+import logging
+import os
+import sys
+import unittest
+
+import numpy as np
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import REPO_DIR, TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    import load_balancer
+    imp.reload(load_balancer)
+    from layout_io import fixture_pixels, load_fixtures, load_panels
+    from load_balancer import (balance, channel_list, current_loads, is_connected, lower_bound,
+                               panel_adjacency, poly_overrides)
+    from output_timing import strip_refresh_rate
+finally:
+    sys.path = PATH
+
+OG_FILE = os.path.join(
+    REPO_DIR, 'LEDPortalSimulator', 'data', 'TeleCortex_Dome_5630_Panels_Full_OG')
+
+
+class TestLoadBalancer(unittest.TestCase):
+    def test_channel_list(self):
+        assert channel_list(['a', 'b:2'], 3) == [
+            ('a', 0), ('a', 1), ('a', 2), ('b', 0), ('b', 1)]
+
+    def test_strip_refresh_rate(self):
+        # 30 us per pixel and a 280 us reset
+        assert np.isclose(strip_refresh_rate(1000), 1 / 30.28e-3)
+
+    def test_balance_random(self):
+        """
+        The busiest channel is close to the lower bound, and within every constraint.
+        """
+        # Given
+        rng = np.random.default_rng(0)
+        pixels = rng.choice([260, 316, 474, 630], 40)
+        channels = channel_list(['a', 'b', 'c'], 4)
+
+        # When
+        max_host_pixels = int(1.05 * pixels.sum() / 3)
+        assignment = balance(pixels, channels, max_panels=5, max_host_pixels=max_host_pixels)
+
+        # Then
+        assert assignment.loads.sum() == pixels.sum()
+        assert np.all(assignment.panel_channels >= 0)
+        assert assignment.loads.max() <= 1.1 * lower_bound(pixels, len(channels))
+        assert max(len(members) for members in assignment.members) <= 5
+        assert assignment.host_loads.max() <= max_host_pixels
+
+    def test_balance_impossible(self):
+        with self.assertRaises(ValueError):
+            balance([300, 300, 300], channel_list(['a'], 2), max_pixels=500)
+
+    def test_balance_og_adjacent(self):
+        """
+        On 2 channels each of 5 hosts, the 12 OG panels need two chains of 2 adjacent panels.
+        """
+        # Given
+        fixtures = load_fixtures(OG_FILE + '.lxm')
+        pixels = [len(fixture_pixels(fixture)) for fixture in fixtures]
+        adjacency = panel_adjacency(load_panels(OG_FILE + '.json'))
+        channels = channel_list(['a', 'b', 'c', 'd', 'e'], 2)
+
+        # When
+        assignment = balance(pixels, channels, adjacency=adjacency)
+
+        # Then
+        assert max(current_loads(fixtures).values()) == 316
+        assert assignment.loads.max() == 2 * 260
+        assert sorted(map(len, assignment.members)) == [1] * 8 + [2] * 2
+        assert all(is_connected(members, adjacency) for members in assignment.members)
+        overrides = poly_overrides(fixtures, assignment)
+        assert overrides[str(fixtures[0]['id'] - 1)]['fixture'] == dict(zip(
+            ['host', 'opcChannel'], channels[assignment.panel_channels[0]]))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestLoadBalancer),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
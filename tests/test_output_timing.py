@@ -0,0 +1,152 @@
+import imp
+import inspect
+import json
+import logging
+import os
+import sys
+import unittest
+
+import numpy as np
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import REPO_DIR, TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    import output_timing
+    imp.reload(output_timing)
+    from layout_io import fixture_label, fixture_pixels, load_fixtures
+    from output_timing import (ARTNET_PROTOCOL, artnet_wire_bytes, dmx_frame_time,
+                               estimate_outputs, fixture_outputs, format_estimate,
+                               strip_refresh_rate, tcp_wire_bytes)
+finally:
+    sys.path = PATH
+
+OG_FILE = os.path.join(
+    REPO_DIR, 'LEDPortalSimulator', 'data', 'TeleCortex_Dome_5630_Panels_Full_OG.lxm')
+
+
+def artnet_fixture(label, pixels, universe=None):
+    parameters = {'label': label, 'host': '10.0.0.1', 'protocol': ARTNET_PROTOCOL}
+    if universe is not None:
+        parameters['artNetUniverse'] = universe
+    parameters['pointIndicesJSON'] = json.dumps([[idx, 0] for idx in range(pixels)])
+    return {'parameters': parameters}
+
+
+class TestOutputTiming(unittest.TestCase):
+    def test_wire_bytes(self):
+        # 170 pixels fill a 512 channel universe, padded to an even length
+        assert artnet_wire_bytes(170) == 18 + 510 + 28 + 38
+        assert artnet_wire_bytes(1) == 18 + 4 + 28 + 38
+        assert tcp_wire_bytes(1460) == (1460 + 78, 1)
+        assert tcp_wire_bytes(1461) == (1461 + 2 * 78, 2)
+        # a full DMX512 frame takes about 22.7 ms
+        assert np.isclose(dmx_frame_time(), 92e-6 + 12e-6 + 513 * 44e-6)
+
+    def test_fixture_outputs_artnet(self):
+        """
+        Art-Net fixtures fill consecutive universes, overlapping fixtures share universes.
+        """
+        # Given
+        fixtures = [
+            artnet_fixture('a', 400, 1),
+            artnet_fixture('b', 100, 3),
+            artnet_fixture('c', 10),
+        ]
+
+        # When
+        outputs, labels, unassigned = fixture_outputs(fixtures)
+
+        # Then
+        assert outputs == {
+            ('artnet', '10.0.0.1', 1): 170,
+            ('artnet', '10.0.0.1', 2): 170,
+            ('artnet', '10.0.0.1', 3): 160,
+        }
+        assert labels[('artnet', '10.0.0.1', 3)] == ['a', 'b']
+        assert unassigned == ['c']
+
+    def test_estimate_artnet(self):
+        """
+        Overfull universes are bottlenecks with a warning, the host adds up its universes.
+        """
+        # Given
+        fixtures = [artnet_fixture('a', 200, 1), artnet_fixture('b', 200, 2)]
+
+        # When
+        rows, _ = estimate_outputs(fixtures)
+
+        # Then
+        by_name = {row['name']: row for row in rows}
+        assert by_name['10.0.0.1 universe 2']['pixels'] == 200
+        assert by_name['10.0.0.1 universe 2']['warnings']
+        assert not by_name['10.0.0.1 universe 1']['warnings']
+        host = by_name['10.0.0.1']
+        assert host['kind'] == 'artnet host'
+        assert host['pixels'] == 400
+        assert host['packets'] == 3
+        wire = artnet_wire_bytes(170) + artnet_wire_bytes(200) + artnet_wire_bytes(30)
+        assert np.isclose(host['fps'], 100e6 / (8 * wire))
+        assert format_estimate(rows).splitlines()[-1].startswith(
+            "bottleneck: universe 10.0.0.1 universe 2")
+
+    def test_estimate_dmx(self):
+        # Given
+        fixtures = [artnet_fixture('a', 170, 1)]
+
+        # When
+        rows, _ = estimate_outputs(fixtures, dmx=True)
+
+        # Then
+        assert np.isclose(rows[0]['fps'], 1 / dmx_frame_time(510))
+
+    def test_estimate_opc(self):
+        """
+        Every OPC channel of the TeleCortex dome drives a strip, which is slower than the network.
+        """
+        # Given
+        fixtures = load_fixtures(OG_FILE)
+
+        # When
+        rows, unassigned = estimate_outputs(fixtures)
+        report = format_estimate(rows, target_fps=110)
+
+        # Then
+        channels = [row for row in rows if row['kind'] == 'channel']
+        hosts = [row for row in rows if row['kind'] == 'opc host']
+        assert len(channels) == 12
+        assert len(hosts) == 5
+        assert sum(row['pixels'] for row in channels) == sum(row['pixels'] for row in hosts)
+        assert sum(row['pixels'] for row in hosts) == sum(
+            len(fixture_pixels(fixture)) for fixture in fixtures
+            if fixture_label(fixture) not in unassigned)
+        slowest = min(rows, key=lambda row: row['fps'])
+        assert slowest['kind'] == 'channel'
+        assert np.isclose(slowest['fps'], strip_refresh_rate(slowest['pixels']))
+        assert slowest['bytes'] == 4 + 3 * slowest['pixels']
+        assert report.count('\n! ') == 2
+        assert f"bottleneck: channel {slowest['name']}" in report
+
+    def test_strip_timing(self):
+        # Given
+        fixtures = [artnet_fixture('a', 100, 1)]
+
+        # When
+        rows, _ = estimate_outputs(fixtures, bit_rate=400e3, reset=50e-6)
+
+        # Then
+        assert np.isclose(rows[0]['fps'], 1 / (100 * 24 / 400e3 + 50e-6))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestOutputTiming),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
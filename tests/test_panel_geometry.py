@@ -0,0 +1,351 @@
+import imp
+import inspect
+import logging
+import os
+import sys
+import unittest
+from math import inf, sqrt
+
+import numpy as np
+from mathutils import Vector
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    import panel_geometry
+    imp.reload(panel_geometry)
+    from panel_geometry import (ATOL, convex_polygon_lattice, convex_polygon_rows,
+                                count_lights_for_convex_polygon, count_lights_for_polygon,
+                                count_lights_for_polygons_array, half_plane_interval,
+                                normalise_polygon, polygon_area, polygon_edge_margins,
+                                polygon_half_planes, polygon_rows, quad_lattice_arguments)
+    import light_layout
+    imp.reload(light_layout)
+    from light_layout import generate_lights_for_convex_polygon, normalise_plane
+    from common import setup_logger
+finally:
+    sys.path = PATH
+
+POLYGONS = [
+    # right triangle
+    [(0, 0), (1.1, 0), (0, 2.2)],
+    # equilateral triangle
+    [(0, 0), (1.22, 0), (0.61, 1.22 * sqrt(3) / 2)],
+    # trapezoid
+    [(0, 0), (2.0, 0), (1.6, 0.9), (0.3, 0.9)],
+]
+
+
+def regular_polygon(sides, radius=0.5):
+    """
+    A regular polygon with a horizontal base edge from the origin.
+    """
+    angles = -np.pi / 2 - np.pi / sides + np.arange(sides) * 2 * np.pi / sides
+    vertices = radius * np.stack([np.cos(angles), np.sin(angles)], axis=-1)
+    return vertices - vertices[0]
+
+
+def solution_lights(solution):
+    """
+    The position of each light of a row solution, by (row, column).
+    """
+    return {
+        (row, column): np.array([
+            solution['horizontal_start'] + column * solution['spacing']
+            + row * solution['spacing_vertical'] / solution['grid_gradient'],
+            solution['vertical_start'] + row * solution['spacing_vertical']])
+        for row, (first, last) in enumerate(solution['rows'])
+        for column in range(first, last + 1)
+    }
+
+
+def lattice_half_planes(arguments, solution):
+    """
+    The half-planes which `convex_polygon_lattice` keeps the lights of `solution` inside: the
+    edges inset by their margins, with the edges which bound the first row moved in by its
+    padding.
+    """
+    normals, offsets = polygon_half_planes(arguments['vertices'], arguments['margins'])
+    low, _, low_edge, high_edge = half_plane_interval(
+        normals, offsets, solution['vertical_start'])
+    padding = solution['horizontal_start'] - low
+    offsets[[low_edge, high_edge]] += padding * np.abs(normals[[low_edge, high_edge], 0])
+    return normals, offsets
+
+
+class TestPanelGeometry(unittest.TestCase):
+    def test_count_lights_matches_generate(self):
+        """
+        Counts match generated lights, and both fail on the same impossible layouts.
+        """
+        # Given
+        parameter_sets = [
+            {'spacing': 0.1},
+            {'spacing': 0.07, 'margin': 0.03, 'grid_gradient': sqrt(3)},
+            {'spacing': 0.05, 'margin': 0.02, 'margin_left': 0.04, 'margin_right': 0.01},
+            {'spacing': 0.06, 'spacing_vertical': 0.05, 'grid_gradient': inf,
+             'margin_vertical_top': 0.0},
+        ]
+
+        for vertices in POLYGONS:
+            for parameters in parameter_sets:
+                args = (vertices[1][0], vertices[2][0], vertices[2][1],
+                        vertices[-1][0], vertices[-1][1])
+
+                # When
+                try:
+                    count, solution = count_lights_for_convex_polygon(*args, **parameters)
+                except AssertionError:
+                    with self.assertRaises(AssertionError):
+                        generate_lights_for_convex_polygon(*args, **parameters)
+                    continue
+                info, lights = generate_lights_for_convex_polygon(*args, **parameters)
+
+                # Then
+                assert count == len(lights), (vertices, parameters)
+                assert np.allclose(solution['spacing'], info['spacing'][0])
+                assert np.allclose(solution['spacing_vertical'], info['spacing'][1])
+
+    def test_normalise_polygon_matches_normalise_plane(self):
+        # Given
+        rng = np.random.default_rng(3)
+        rotation, _ = np.linalg.qr(rng.normal(size=(3, 3)))
+        if np.linalg.det(rotation) < 0:
+            rotation[:, 0] *= -1
+
+        for polygon in POLYGONS:
+            flat = np.array([(x, y, 0) for x, y in polygon], dtype=float)
+            vertices = flat @ rotation.T + [1.0, -2.0, 0.5]
+            world_vertices = [Vector(vertex) for vertex in vertices]
+            center = Vector(vertices.mean(axis=0))
+            normal = Vector(rotation[:, 2])
+            _, expected = normalise_plane(center, normal, world_vertices)
+
+            # When
+            normalised = normalise_polygon(vertices)
+
+            # Then
+            assert np.allclose(normalised, [tuple(vertex)[:2] for vertex in expected], atol=1e-6)
+
+    def test_lattice_matches_rows(self):
+        """
+        The lattice fill gives the same rows as the triangle / quad solver for the LedPortal
+        triangles and the TeleCortex quads.
+        """
+        # Given
+        led_portal_spacing = 1.22 * 2 / (sqrt(3) * 26)
+        cases = [
+            (POLYGONS[1], {
+                'spacing': led_portal_spacing, 'grid_gradient': sqrt(3),
+                'margin': led_portal_spacing * sqrt(3) / 2}),
+            (POLYGONS[1], {'spacing': 0.07, 'margin': 0.03, 'grid_gradient': sqrt(3)}),
+            ([(0, 0), (1.0, 0), (1.0, 0.5), (0, 0.5)], {
+                'spacing': 1 / 16, 'spacing_vertical': 1 / 16, 'grid_gradient': inf,
+                'margin': 0.03, 'margin_vertical_top': 0.0, 'margin_left': 0.03,
+                'margin_right': 0.03}),
+            (POLYGONS[2], {'spacing': 0.06, 'spacing_vertical': 0.05, 'grid_gradient': inf,
+                           'margin_vertical_top': 0.0}),
+        ]
+
+        for vertices, parameters in cases:
+            args = (vertices[1][0], vertices[2][0], vertices[2][1],
+                    vertices[-1][0], vertices[-1][1])
+            lattice_parameters = {
+                key: value for key, value in parameters.items()
+                if key in ['spacing', 'spacing_vertical', 'grid_gradient']
+            }
+            margin_parameters = {
+                key: value for key, value in parameters.items()
+                if key not in lattice_parameters
+            }
+
+            # When
+            expected = convex_polygon_rows(*args, **parameters)
+            solution = convex_polygon_lattice(
+                **quad_lattice_arguments(*args, **margin_parameters), **lattice_parameters)
+
+            # Then
+            assert solution['rows'] == expected['rows'], (vertices, parameters)
+            assert np.isclose(solution['horizontal_start'], expected['horizontal_start'])
+            assert np.isclose(solution['vertical_start'], expected['vertical_start'])
+
+    def test_lattice_matches_rows_randomised(self):
+        """
+        For random triangles and quads, the lattice fill has the same lights as the triangle /
+        quad solver, apart from ties at the edges and the lights the triangle / quad solver puts
+        outside the edges on a positive grid gradient. Equilateral triangles always match.
+        """
+        rng = np.random.default_rng(0)
+        for _ in range(300):
+            # Given
+            grid_gradient = rng.choice([inf, sqrt(3), 2.0, -2.0])
+            spacing, margin = rng.uniform(0.03, 0.2), rng.uniform(0, 0.1)
+            side, height = rng.uniform(0.5, 1.5), rng.uniform(0.4, 1.5)
+            top_left, top_right = np.sort(rng.uniform(0.05, 0.95, 2))
+            cases = [
+                ('equilateral', (side, side / 2, side * sqrt(3) / 2, side / 2, side * sqrt(3) / 2)),
+                ('triangle', (1.0, top_left, height, top_left, height)),
+                ('trapezoid', (1.0, top_right, height, top_left, height)),
+                ('rectangle', (1.0, 1.0, height, 0.0, height)),
+            ]
+
+            for name, args in cases:
+                parameters = {'spacing': spacing, 'grid_gradient': grid_gradient}
+                arguments = quad_lattice_arguments(*args, margin=margin)
+
+                # When
+                solution = convex_polygon_lattice(**arguments, **parameters)
+                try:
+                    expected = convex_polygon_rows(*args, margin=margin, **parameters)
+                except AssertionError:
+                    # the row capacity check of narrow polygons on a positive gradient
+                    assert name != 'equilateral' and grid_gradient > 0, (name, args)
+                    continue
+
+                # Then
+                lights, expected_lights = solution_lights(solution), solution_lights(expected)
+                if name == 'equilateral':
+                    assert lights.keys() == expected_lights.keys(), (args, parameters, margin)
+                if solution['rows']:
+                    assert np.isclose(solution['horizontal_start'], expected['horizontal_start'])
+                    assert np.isclose(solution['vertical_start'], expected['vertical_start'])
+                normals, offsets = lattice_half_planes(arguments, solution)
+                for light in lights.keys() ^ expected_lights.keys():
+                    position = lights.get(light, expected_lights.get(light))
+                    slack = (position @ normals.T - offsets).min() / spacing
+                    tie = abs(slack) <= 2 * ATOL
+                    outside = light in expected_lights and slack < 0 and grid_gradient > 0
+                    assert tie or outside, (name, args, parameters, margin, light, slack)
+
+    def test_no_room(self):
+        """
+        Margins which leave no room give 0 lights for triangles, quads and other polygons alike.
+        """
+        polygons = POLYGONS + [regular_polygon(6)]
+        for grid_gradient in [sqrt(3), inf]:
+            counts = count_lights_for_polygons_array(polygons, 0.05, grid_gradient, [0.8, 2.0])
+            assert counts.tolist() == [[0, 0]] * len(polygons)
+            for vertices in polygons:
+                count, solution = count_lights_for_polygon(
+                    vertices, spacing=0.05, grid_gradient=grid_gradient, margin=2.0)
+                assert count == 0
+        solution = convex_polygon_lattice(
+            regular_polygon(6), spacing=0.05, margin_bottom=0.5, margin_top=0.5)
+        assert solution['rows'] == []
+
+    def test_lattice_fills_convex_polygons(self):
+        """
+        Lights of pentagons, hexagons and decagons are inside the polygon inset by the margin,
+        and every row is a non-empty run of lights.
+        """
+        # Given
+        spacing = 0.04
+        margin = 0.02
+
+        for sides in [5, 6, 10]:
+            vertices = regular_polygon(sides)
+
+            # When
+            count, solution = count_lights_for_polygon(
+                vertices, spacing=spacing, grid_gradient=sqrt(3), margin=margin)
+
+            # Then
+            rows = np.array(solution['rows'])
+            assert np.all(rows[:, 1] >= rows[:, 0]), sides
+            assert count == (rows[:, 1] - rows[:, 0] + 1).sum()
+            row_ys = np.arange(len(rows)) * solution['spacing_vertical']
+            lights = np.array([
+                (solution['horizontal_start'] + y / solution['grid_gradient'] + column * spacing,
+                 solution['vertical_start'] + y)
+                for y, (first, last) in zip(row_ys, rows) for column in range(first, last + 1)
+            ])
+            normals, offsets = polygon_half_planes(vertices, np.full(sides, margin))
+            assert np.all(lights @ normals.T >= offsets - 1e-9), sides
+            # the polygon is mostly filled
+            assert count * spacing * solution['spacing_vertical'] > 0.7 * polygon_area(vertices)
+
+    def test_polygon_edge_margins(self):
+        """
+        Horizontal margins apply to the side edges of quads like in `quad_lattice_arguments`, and
+        to every edge which bounds the rows of a hexagon on that side.
+        """
+        # Given
+        args = [2.0, 1.6, 0.9, 0.3, 0.9]
+        vertices = regular_polygon(6)
+        parameters = {'spacing': 0.04, 'grid_gradient': sqrt(3), 'margin': 0.05}
+
+        # When
+        margins = polygon_edge_margins(POLYGONS[2], 0.05, 0.1, 0.2)
+        hexagon_margins = polygon_edge_margins(vertices, 0.05, 0.1, 0.2)
+        count, solution = count_lights_for_polygon(
+            vertices, margin_left=0.1, margin_right=0.2, **parameters)
+
+        # Then
+        expected = quad_lattice_arguments(
+            *args, margin=0.05, margin_left=0.1, margin_right=0.2)['margins']
+        # the top margin of a quad is vertical, and set with `margin_top` in the lattice
+        assert np.allclose(margins[[0, 1, 3]], expected[[0, 1, 3]])
+        # the base and top of the hexagon keep the margin, and the sides are at 60 degrees
+        sine = sqrt(3) / 2
+        assert np.allclose(
+            hexagon_margins, [0.05, 0.2 * sine, 0.2 * sine, 0.05, 0.1 * sine, 0.1 * sine])
+        assert count < count_lights_for_polygon(vertices, **parameters)[0]
+        lattice = convex_polygon_lattice(vertices, margins=hexagon_margins, **parameters)
+        assert solution['rows'] == lattice['rows']
+
+    def test_horizontal_grid_gradient(self):
+        for vertices in [POLYGONS[1], regular_polygon(5)]:
+            with self.assertRaises(ValueError):
+                polygon_rows(vertices, spacing=0.1, spacing_vertical=0.1, grid_gradient=0.0)
+        assert count_lights_for_polygons_array(POLYGONS, 0.1, 0.0).tolist() == [[-1]] * 3
+
+    def test_count_array_matches_count(self):
+        """
+        Batched counts match the counts of each layout, with -1 where a layout fails.
+        """
+        # Given
+        polygons = POLYGONS + [
+            # a triangle with a horizontal side, which `convex_polygon_rows` can't solve
+            [(0, 0), (1.0, 0), (0.0, 0.0)],
+            regular_polygon(6),
+        ]
+        spacings = np.geomspace(0.02, 1.5, 40)
+        margins = np.concatenate([np.zeros(10), np.linspace(0, 1.5, 30)])
+
+        for grid_gradient in [sqrt(3), inf, -2.0]:
+            # When
+            counts = count_lights_for_polygons_array(polygons, spacings, grid_gradient, margins)
+
+            # Then
+            assert counts.shape == (len(polygons), len(spacings))
+            for index, vertices in enumerate(polygons):
+                for spacing, margin, count in zip(spacings, margins, counts[index]):
+                    try:
+                        expected, _ = count_lights_for_polygon(
+                            vertices, spacing=spacing, grid_gradient=grid_gradient,
+                            margin=margin)
+                    except (AssertionError, ValueError, ZeroDivisionError):
+                        expected = -1
+                    assert count == expected, (index, spacing, margin, grid_gradient)
+            assert (counts[3] == -1).all()
+            # wide margins leave no room for lights
+            assert (counts[:3] > 0).any() and (counts[:3] == 0).any()
+
+    def test_polygon_area(self):
+        assert np.isclose(polygon_area(POLYGONS[0]), 1.21)
+        assert np.isclose(polygon_area(POLYGONS[2]), 0.9 * (2.0 + 1.3) / 2)
+
+
+if __name__ == "__main__":
+    setup_logger(stream_log_level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestPanelGeometry),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
@@ -0,0 +1,136 @@
+import imp
+import inspect
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import unittest
+
+import numpy as np
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    import parallel_render
+    imp.reload(parallel_render)
+    from parallel_render import (PATTERNS, ParallelRenderer, normalise_positions, pixel_chunks,
+                                 render_frames)
+finally:
+    sys.path = PATH
+
+
+def failing_pattern(positions, t, out):
+    raise ValueError("pattern failed")
+
+
+class ListSink:
+    def __init__(self):
+        self.frames = []
+
+    def send(self, leds):
+        self.frames.append(leds.copy())
+
+
+class TestParallelRender(unittest.TestCase):
+    def setUp(self):
+        self.positions = normalise_positions(
+            np.random.default_rng(0).uniform(-3, 5, (500, 3)))
+
+    def test_pixel_chunks(self):
+        offsets = [0, 100, 200, 300, 400]
+        assert pixel_chunks(offsets, 2) == [(0, 200), (200, 400)]
+        assert pixel_chunks(offsets, 3) == [(0, 100), (100, 300), (300, 400)]
+        # never more chunks than fixtures
+        assert pixel_chunks([0, 10, 30], 4) == [(0, 10), (10, 30)]
+        assert pixel_chunks([0, 10], 1) == [(0, 10)]
+
+    def test_normalise_positions(self):
+        positions = normalise_positions([[0, 0], [4, 2]])
+        assert np.allclose(positions, [[-0.5, -0.25, 0], [0.5, 0.25, 0]])
+        assert np.all(np.abs(self.positions) <= 0.5)
+
+    def test_parallel_matches_serial(self):
+        """
+        Every worker renders its chunk of the same frame as the serial renderer.
+        """
+        for pattern in PATTERNS:
+            # Given
+            offsets = [0, 120, 250, 380, 500]
+            serial = ParallelRenderer(pattern, self.positions, offsets, workers=0)
+            parallel = ParallelRenderer(pattern, self.positions, offsets, workers=2)
+
+            # When
+            try:
+                frames = [(serial.render(t).copy(), parallel.render(t).copy()) for t in [0, 1.5]]
+                summary = parallel.summary()
+            finally:
+                serial.close()
+                parallel.close()
+
+            # Then
+            for expected, result in frames:
+                assert np.array_equal(expected, result), pattern
+            assert not np.array_equal(frames[0][0], frames[1][0])
+            assert parallel.chunks == [(0, 250), (250, 500)]
+            assert "worker 1:    250 pixels" in summary
+            assert "2 frames" in summary
+            assert not any(process.is_alive() for process in parallel.processes)
+
+    def test_render_frames_paced(self):
+        """
+        Paced rendering keeps to the rate when every frame has far more time than it needs, and
+        the first frame isn't late.
+        """
+        # Given
+        renderer = ParallelRenderer('plasma', self.positions, [0, 250, 500], workers=0)
+        sink = ListSink()
+
+        # When
+        start = time.perf_counter()
+        try:
+            late = render_frames(renderer, sink, 3, fps=10.0)
+        finally:
+            renderer.close()
+        elapsed = time.perf_counter() - start
+
+        # Then
+        assert late == 0
+        assert len(sink.frames) == 3
+        assert not np.array_equal(sink.frames[0], sink.frames[1])
+        # sleeps are never shorter than asked, so the frames are at least a period apart
+        assert elapsed >= 2 / 10.0
+
+    @unittest.skipUnless(
+        multiprocessing.get_start_method() == 'fork', "workers look up patterns by name")
+    def test_worker_failure(self):
+        # Given
+        PATTERNS['failing'] = failing_pattern
+        try:
+            renderer = ParallelRenderer('failing', self.positions, workers=1)
+
+            # Then
+            with self.assertRaises(RuntimeError):
+                renderer.render(0)
+        finally:
+            del PATTERNS['failing']
+            renderer.close()
+
+    def test_unknown_pattern(self):
+        with self.assertRaises(ValueError):
+            ParallelRenderer('missing', self.positions)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestParallelRender),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
@@ -0,0 +1,223 @@
+import imp
+import inspect
+import logging
+import os
+import pickle
+import sys
+import threading
+import unittest
+
+import numpy as np
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import REPO_DIR, TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    import shared_frames
+    imp.reload(shared_frames)
+    from frame_stream import OpcSink, StageStats
+    from layout_io import fixture_offsets, load_fixtures
+    from shared_frames import SharedFrames, SharedOutputSink, host_groups, send_frames
+finally:
+    sys.path = PATH
+
+OG_FILE = os.path.join(
+    REPO_DIR, 'LEDPortalSimulator', 'data', 'TeleCortex_Dome_5630_Panels_Full_OG.lxm')
+
+
+class LappedSink:
+    """
+    Builds payloads in two halves, and has the writer lap the reader between the halves of the
+    first frame, the way a slow build of a large frame can be overtaken by the renderer.
+    """
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.sent = []
+        self.discarded = []
+
+    def build(self, leds):
+        half = len(leds) // 2
+        first = leds[:half].copy()
+        if not self.discarded and not self.sent:
+            for value in range(1, self.frames.slots + 1):
+                self.frames.write(np.full(leds.shape, value, dtype=np.uint8))
+        return np.concatenate([first, leds[half:]])
+
+    def send_payloads(self, payload):
+        self.sent.append(payload)
+
+    def discard(self, payload):
+        self.discarded.append(payload)
+
+
+class TestSharedFrames(unittest.TestCase):
+    def setUp(self):
+        self.frames = SharedFrames.create(4, slots=3)
+
+    def tearDown(self):
+        self.frames.close()
+
+    def test_read_latest(self):
+        """
+        Readers get a view of the latest published frame, never one that is being written.
+        """
+        # Given
+        assert self.frames.read() is None
+        for value in range(3):
+            self.frames.write(np.full((4, 3), value, dtype=np.uint8))
+
+        # When
+        frame, leds, sequence = self.frames.read()
+        pending = self.frames.begin_write()
+        pending[:] = 7
+        during_write = self.frames.read()
+        self.frames.publish()
+
+        # Then
+        assert frame == 2
+        assert np.all(leds == 2)
+        assert np.shares_memory(leds, self.frames.data)
+        assert self.frames.consistent(frame, sequence)
+        assert during_write[0] == 2
+        assert self.frames.read(after=2)[0] == 3
+        assert self.frames.read(after=3) is None
+
+    def test_torn_frame(self):
+        """
+        A reader holding a slot which was overwritten since notices with `consistent`.
+        """
+        # Given
+        self.frames.write(np.zeros((4, 3), dtype=np.uint8))
+        frame, leds, sequence = self.frames.read()
+
+        # When
+        for value in range(1, 4):
+            self.frames.write(np.full((4, 3), value, dtype=np.uint8))
+
+        # Then
+        assert not self.frames.consistent(frame, sequence)
+        assert np.all(leds == 3)
+        assert self.frames.read(after=frame)[0] == 3
+
+    def test_attach(self):
+        """
+        Other processes attach to the frames by name, and don't unlink the memory on close.
+        """
+        # Given
+        self.frames.write(np.arange(12, dtype=np.uint8).reshape(4, 3))
+
+        # When
+        attached = pickle.loads(pickle.dumps(self.frames))
+        frame, leds, _ = attached.read()
+        leds = leds.copy()
+        attached.close()
+
+        # Then
+        assert frame == 0
+        assert np.all(leds == np.arange(12).reshape(4, 3))
+        assert self.frames.read()[0] == 0
+
+    def test_lapped_frames_are_not_sent(self):
+        """
+        A frame which the writer overwrote while its payload was being built is dropped, and the
+        newest frame is sent instead.
+        """
+        # Given
+        self.frames.write(np.zeros((4, 3), dtype=np.uint8))
+        sink = LappedSink(self.frames)
+        stop_event = threading.Event()
+        stop_event.set()
+        stats = StageStats("output", depth_label="skipped frames")
+
+        # When
+        torn = send_frames(self.frames, sink, stop_event, stats)
+
+        # Then
+        assert torn == 1
+        # the dropped payload was torn: half the first frame, half the last
+        assert len(sink.discarded) == 1
+        assert set(np.unique(sink.discarded[0])) == {0, 3}
+        assert len(sink.sent) == 1
+        assert np.all(sink.sent[0] == 3)
+        assert stats.frames == 1
+
+    def test_opc_sink_discard(self):
+        """
+        Fixtures of discarded payloads are sent with the next frame, even if they didn't change.
+        """
+        # Given
+        fixtures = load_fixtures(OG_FILE)
+        sink = OpcSink(fixtures, hosts=['quiet-hill'], keepalive=60.0)
+        leds = np.zeros((fixture_offsets(fixtures)[-1], 3), dtype=np.uint8)
+        sink.build(leds)
+        leds[:] = 1
+        payloads = sink.build(leds)
+
+        # When
+        sink.discard(payloads)
+        rebuilt = sink.build(leds)
+
+        # Then
+        assert payloads and [address for address, _, _ in rebuilt] == [
+            address for address, _, _ in payloads]
+        assert sum(map(len, (indices for _, indices, _ in rebuilt))) == len(sink.tracker.starts)
+        assert sink.build(leds) == []
+
+    def test_host_groups(self):
+        # Given
+        fixtures = load_fixtures(OG_FILE)
+
+        # When
+        per_host = host_groups(fixtures)
+        pairs = host_groups(fixtures, processes=2)
+
+        # Then
+        assert len(per_host) == 5
+        assert sorted(sum(pairs, [])) == sorted(sum(per_host, []))
+        assert len(pairs) == 2
+
+    def test_opc_sink_hosts(self):
+        # Given
+        fixtures = load_fixtures(OG_FILE)
+
+        # When
+        sink = OpcSink(fixtures, hosts=['quiet-hill'])
+
+        # Then
+        assert [host for host, _ in sink.fixture_slices] == ['quiet-hill']
+
+    def test_output_processes(self):
+        """
+        Every output process sends frames until the last one, and reports its statistics.
+        """
+        # Given
+        fixtures = load_fixtures(OG_FILE)
+        sink = SharedOutputSink(fixtures, processes=2, dry_run=True)
+        leds = np.zeros((fixture_offsets(fixtures)[-1], 3), dtype=np.uint8)
+
+        # When
+        for value in range(20):
+            leds[:] = value
+            sink.send(leds)
+        sink.close()
+
+        # Then
+        assert len(sink.summaries) == 2
+        assert all(frames >= 1 for _, _, frames, _ in sink.summaries)
+        assert all(not process.is_alive() for process in sink.processes)
+        assert "skipped frames" in sink.summary()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestSharedFrames),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
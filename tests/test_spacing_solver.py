@@ -0,0 +1,108 @@
+import imp
+import inspect
+import logging
+import os
+import sys
+import unittest
+
+import numpy as np
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import REPO_DIR, TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    import spacing_solver
+    imp.reload(spacing_solver)
+    from layout_sweep import load_structure_polygons, normalise_polygons
+    from spacing_solver import (panel_count, panel_counts, solve_panels, solve_spacing,
+                                widen_margin)
+finally:
+    sys.path = PATH
+
+STRUCTURE_FILE = os.path.join(
+    REPO_DIR, 'LEDPortalSimulator', 'data', 'dome_render_6_5_Dome_EDGES.json')
+
+
+class TestSpacingSolver(unittest.TestCase):
+    def setUp(self):
+        # a small and a large dome triangle
+        polygons = load_structure_polygons(STRUCTURE_FILE, [0, 5])
+        self.panels = normalise_polygons(polygons, 1)
+
+    def test_solve_spacing_one_universe(self):
+        # When
+        solution = solve_spacing(self.panels, 170)
+
+        # Then
+        spacing, counts = solution['spacing'], solution['counts']
+        assert max(counts) <= 170
+        # a wider spacing loses lights, and tighter spacings either keep the count or go over
+        assert max(panel_count(panel, spacing * 1.01) for panel in self.panels) < max(counts)
+        for tighter in np.linspace(spacing * 0.8, spacing, 50):
+            count = max(panel_count(panel, tighter) for panel in self.panels)
+            assert count == max(counts) or count > 170
+
+    def test_widen_margin(self):
+        # Given
+        solution = solve_spacing(self.panels[:1], 170)
+        spacing, margin = solution['spacing'], solution['margin']
+        count = solution['counts'][0]
+
+        # When
+        widest = widen_margin(self.panels[0], spacing, margin)
+
+        # Then
+        assert widest >= margin
+        assert panel_count(self.panels[0], spacing, margin=widest) == count
+        assert panel_count(self.panels[0], spacing, margin=widest * 1.01) < count
+
+    def test_solve_panels_per_panel(self):
+        # When
+        shared = solve_panels(self.panels, 170, widen=False)
+        separate = solve_panels(self.panels, 170, per_panel=True, widen=False)
+
+        # Then
+        assert shared[0]['spacing'] == shared[1]['spacing']
+        assert separate[0]['spacing'] != separate[1]['spacing']
+        assert all(result['count'] <= 170 for result in shared + separate)
+        # the smaller panel fits more lights when it isn't limited by the larger one
+        assert separate[0]['count'] >= shared[0]['count']
+
+    def test_per_panel_matches_single_panels(self):
+        """
+        Searching all panels together gives each panel the spacing and margin it gets alone.
+        """
+        # When
+        together = solve_panels(self.panels, 170, per_panel=True)
+
+        # Then
+        for panel, result in zip(self.panels, together):
+            alone = solve_panels([panel], 170)[0]
+            assert result == alone
+            assert result['margin'] == widen_margin(
+                panel, result['spacing'], solve_spacing([panel], 170)['margin'])
+
+    def test_panel_counts(self):
+        # Given
+        spacings = np.geomspace(0.01, 0.2, 20)
+
+        # When
+        counts = panel_counts(self.panels, spacings)
+
+        # Then
+        assert counts.tolist() == [
+            [panel_count(panel, spacing) for spacing in spacings] for panel in self.panels]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestSpacingSolver),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
@@ -0,0 +1,216 @@
+import imp
+import inspect
+import logging
+import os
+import sys
+import unittest
+from math import ceil, copysign, floor, inf, isinf, nan
+
+import numpy as np
+
+THIS_FILE = inspect.stack()[-2].filename
+THIS_DIR = os.path.dirname(THIS_FILE)
+
+try:
+    PATH = sys.path[:]
+    sys.path.insert(0, THIS_DIR)
+    import __init__
+    imp.reload(__init__)
+    from __init__ import TOOLS_DIR, debugTestRunner
+    sys.path.insert(0, TOOLS_DIR)
+    import tolerant
+    imp.reload(tolerant)
+    from tolerant import ATOL
+    from common import setup_logger
+finally:
+    sys.path = PATH
+
+SAMPLES = 2000
+
+
+# the helpers as they were before `tolerant.py`, with `np.isclose` on scalars
+def legacy_nan_divide(quotient, dividend):
+    if np.isclose(dividend, 0, atol=ATOL):
+        return nan
+    if dividend is nan:
+        return 0
+    return quotient / dividend
+
+
+def legacy_inf_divide(quotient, dividend):
+    sign = 1 if (quotient >= 0) else -1
+    sign *= 1 if (dividend >= 0) else -1
+    if np.isclose(dividend, 0, atol=ATOL):
+        return copysign(inf, sign)
+    if isinf(dividend):
+        return copysign(0, sign)
+    return quotient / dividend
+
+
+def legacy_rounding(rounding):
+    def legacy(number):
+        closest_int = round(number)
+        if np.isclose(number, closest_int, atol=ATOL):
+            return closest_int
+        return rounding(number)
+    return legacy
+
+
+LEGACY_ROUNDING = {
+    'float_floor': legacy_rounding(floor),
+    'float_ceil': legacy_rounding(ceil),
+    'float_abs_floor': legacy_rounding(lambda number: int(copysign(floor(abs(number)), number))),
+    'float_abs_ceil': legacy_rounding(lambda number: int(copysign(ceil(abs(number)), number))),
+}
+
+
+def legacy_intersect_lines(m1, c1, m2, c2):
+    if isinf(m1) and isinf(m2):
+        return None, None
+    if isinf(m1):
+        return c1, m2 * c1 + c2
+    elif isinf(m2):
+        return c2, m1 * c2 + c1
+    elif np.isclose(m1, m2, atol=ATOL):
+        return None, None
+    intersect_x = (c2 - c1) / (m1 - m2)
+    return intersect_x, m1 * intersect_x + c1
+
+
+def sample_numbers(rng, size=SAMPLES):
+    """
+    Numbers which are awkward for tolerant arithmetic: near integers (just inside and outside the
+    tolerance), halves, tiny and huge numbers, signed zeros and infinities.
+    """
+    integers = rng.integers(-50, 50, size)
+    offsets = rng.choice([0, 1e-12, ATOL / 2, ATOL * 0.999, ATOL * 1.001, 2 * ATOL, 0.5], size)
+    numbers = integers + offsets * rng.choice([-1, 1], size)
+    scattered = len(numbers[::7])
+    numbers[::7] = rng.normal(size=scattered) * 10.0 ** rng.integers(-6, 6, scattered)
+    specials = np.array([0.0, -0.0, ATOL, -ATOL, 0.5, -0.5, 1.5, 2.5, 1e9 + 0.5, -1e12])
+    return np.concatenate([specials, numbers])
+
+
+def same(a, b):
+    """
+    Equal including the sign of zeros and infinities, and NaNs are the same.
+    """
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    return bool(np.all(
+        (a == b) & (np.signbit(a) == np.signbit(b)) | (np.isnan(a) & np.isnan(b))))
+
+
+class TestTolerant(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(47)
+
+    def test_isclose_matches_numpy(self):
+        # Given
+        a = np.concatenate([sample_numbers(self.rng), [inf, -inf, nan, 1.0, inf]])
+        b = np.concatenate([np.rint(a[:-5]), [inf, inf, nan, inf, 1.0]])
+
+        # When
+        scalar = [tolerant.isclose(float(x), float(y)) for x, y in zip(a, b)]
+
+        # Then
+        assert scalar == list(np.isclose(a, b, atol=ATOL))
+        assert np.array_equal(tolerant.isclose_array(a, b), np.isclose(a, b, atol=ATOL))
+
+    def test_rounding_matches_legacy(self):
+        # Given
+        numbers = sample_numbers(self.rng)
+
+        for name, legacy in LEGACY_ROUNDING.items():
+            # When
+            scalar = [getattr(tolerant, name)(float(number)) for number in numbers]
+            array = getattr(tolerant, f"{name}_array")(numbers)
+
+            # Then
+            expected = [legacy(float(number)) for number in numbers]
+            assert scalar == expected, name
+            assert all(isinstance(value, int) for value in scalar), name
+            assert np.array_equal(array, expected), name
+
+    def test_divide_matches_legacy(self):
+        # Given
+        quotients = np.concatenate([sample_numbers(self.rng), [inf, -inf, 0.0, 1.0, -1.0]])
+        dividends = np.concatenate([
+            self.rng.permutation(sample_numbers(self.rng)), [0.0, 1e-9, inf, -inf, -ATOL / 3]])
+        dividends[::11] = inf
+        dividends[5::11] = -inf
+        dividends[7::11] = 0.0
+
+        # When
+        nan_scalar = [tolerant.nan_divide(float(q), float(d)) for q, d in zip(quotients, dividends)]
+        inf_scalar = [tolerant.inf_divide(float(q), float(d)) for q, d in zip(quotients, dividends)]
+
+        # Then
+        nan_expected = [legacy_nan_divide(float(q), float(d)) for q, d in zip(quotients, dividends)]
+        inf_expected = [legacy_inf_divide(float(q), float(d)) for q, d in zip(quotients, dividends)]
+        assert same(nan_scalar, nan_expected)
+        assert same(inf_scalar, inf_expected)
+        with np.errstate(invalid='ignore'):
+            assert same(tolerant.nan_divide_array(quotients, dividends), nan_expected)
+            assert same(tolerant.inf_divide_array(quotients, dividends), inf_expected)
+
+    def test_nan_divide_nan_gradient(self):
+        assert tolerant.nan_divide(1, nan) == 0
+        assert tolerant.nan_divide(1, np.float64(nan)) == 0
+        assert same(tolerant.nan_divide_array([1, 1, 1], [nan, 0, 2]), [0, nan, 0.5])
+
+    def test_inf_divide_broadcasts(self):
+        # Given
+        rows = np.arange(5) * 0.2
+
+        # When
+        result = tolerant.inf_divide_array(rows, inf)
+
+        # Then
+        assert same(result, [tolerant.inf_divide(row, inf) for row in rows])
+
+    def test_intersect_lines_matches_legacy(self):
+        # Given
+        gradients = np.concatenate([
+            self.rng.choice([inf, -inf, 0.0, 1.0, -1.0, np.sqrt(3), 1 + ATOL / 2], 200),
+            self.rng.normal(size=200) * 3])
+        m1, m2 = gradients, self.rng.permutation(gradients)
+        c1, c2 = self.rng.normal(size=(2, len(gradients)))
+
+        # When
+        scalar = [
+            tolerant.intersect_lines(*map(float, values)) for values in zip(m1, c1, m2, c2)]
+        array_x, array_y = tolerant.intersect_lines_array(m1, c1, m2, c2)
+
+        # Then
+        expected = [legacy_intersect_lines(*map(float, values)) for values in zip(m1, c1, m2, c2)]
+        assert scalar == expected
+        expected_x, expected_y = np.array(expected, dtype=float).T
+        with np.errstate(invalid='ignore'):
+            assert same(array_x, expected_x)
+            assert same(array_y, expected_y)
+
+    def test_axis_centered_lines_array(self):
+        # Given
+        spacing = 0.0625
+        axis_lengths = np.concatenate([
+            np.arange(1, 40) * spacing + 0.06, np.arange(1, 40) * spacing + 0.06 + ATOL / 2,
+            self.rng.uniform(0.2, 3.0, 100)])
+
+        # When
+        lines, paddings = tolerant.axis_centered_lines_array(axis_lengths, spacing, 0.03)
+
+        # Then
+        expected = [
+            tolerant.axis_centered_lines(axis_length, spacing, 0.03)
+            for axis_length in axis_lengths
+        ]
+        assert lines.tolist() == [line for line, _ in expected]
+        assert np.allclose(paddings, [padding for _, padding in expected])
+
+
+if __name__ == "__main__":
+    setup_logger(stream_log_level=logging.DEBUG)
+    for suite in [
+        unittest.TestLoader().loadTestsFromTestCase(TestTolerant),
+    ]:
+        debugTestRunner(verbosity=10).run(suite)
@@ -0,0 +1,127 @@
+"""
+Per-fixture colour correction with precomputed lookup tables.
+
+Panel types need different correction (e.g. the large and small TeleCortex panels and the LedPortal
+Art-Net panels), which is stored in the fixture parameters of a `.lxm` export:
+
+- `gamma`: the exponent applied to normalised values, default 1
+- `whiteR`, `whiteG`, `whiteB`: the white point as the scale of each channel, default 1
+- `brightness`: the maximum brightness as a scale of all channels, default 1
+
+These parameters can be set per layout or per polygon with the `fixture` parameters of the
+`overrides` / `poly_overrides` of a layout config (see light_layout.py).
+
+Instead of doing the float math for every pixel of every frame, each distinct setting is compiled
+into a (3, 256) table once. Correcting a frame is then a single gather from the stacked tables,
+through index buffers which are allocated up front.
+"""
+
+import logging
+
+import numpy as np
+
+from layout_io import fixture_label, fixture_offsets
+
+COLOR_PARAMETERS = {
+    'gamma': 1.0,
+    'whiteR': 1.0,
+    'whiteG': 1.0,
+    'whiteB': 1.0,
+    'brightness': 1.0,
+}
+# uint16 tables are 8.8 fixed point, so that adding a dithering residue can't overflow
+UINT16_SCALE = 255 << 8
+
+
+def fixture_color_settings(fixture):
+    """
+    The (gamma, (white r, g, b), brightness) correction settings of a fixture.
+    """
+    parameters = {**COLOR_PARAMETERS, **{
+        key: value for key, value in fixture['parameters'].items() if key in COLOR_PARAMETERS
+    }}
+    settings = (
+        float(parameters['gamma']),
+        (float(parameters['whiteR']), float(parameters['whiteG']), float(parameters['whiteB'])),
+        float(parameters['brightness']),
+    )
+    if settings[0] <= 0:
+        raise ValueError(f"fixture {fixture_label(fixture)} gamma must be positive")
+    if not all(0 <= scale <= 1 for scale in (*settings[1], settings[2])):
+        raise ValueError(
+            f"fixture {fixture_label(fixture)} white point and brightness must be within [0, 1]")
+    return settings
+
+
+def compile_lut(gamma=1.0, white_point=(1.0, 1.0, 1.0), brightness=1.0, dtype=np.uint8):
+    """
+    A (3, 256) table of corrected values for each channel and input value. uint16 tables are
+    8.8 fixed point (see `temporal_dither`).
+    """
+    scale = 255 if np.dtype(dtype) == np.uint8 else UINT16_SCALE
+    levels = (np.arange(256) / 255) ** gamma
+    channel_scales = np.asarray(white_point, dtype=float)[:, np.newaxis] * brightness
+    return np.rint(levels * channel_scales * scale).astype(dtype)
+
+
+class ColorCorrection:
+    """
+    Corrects LED frames of the `fixtures` with one table per distinct colour setting.
+
+    `apply` gathers every LED and channel from the stacked tables in one pass: the flat index of
+    an LED channel is its table offset plus its value, and the table offsets are precomputed.
+    """
+
+    def __init__(self, fixtures, offsets=None, dtype=np.uint8):
+        if offsets is None:
+            offsets = fixture_offsets(fixtures)
+        self.dtype = np.dtype(dtype)
+        groups = {}
+        group_ids = []
+        for fixture in fixtures:
+            settings = fixture_color_settings(fixture)
+            group_ids.append(groups.setdefault(settings, len(groups)))
+        # LEDs which belong to no fixture use an identity table
+        identity = (1.0, (1.0, 1.0, 1.0), 1.0)
+        groups.setdefault(identity, len(groups))
+        self.groups = list(groups)
+        self.luts = np.stack([compile_lut(*settings, dtype=dtype) for settings in self.groups])
+
+        led_groups = np.full(offsets[-1], groups[identity], dtype=np.intp)
+        for group, start, end in zip(group_ids, offsets[:-1], offsets[1:]):
+            led_groups[start:end] = group
+        channel_offsets = np.arange(3, dtype=np.intp) * 256
+        self.table_offsets = led_groups[:, np.newaxis] * (3 * 256) + channel_offsets
+        self.indices = np.empty_like(self.table_offsets)
+        logging.debug(f"colour correction: {len(self.groups)} tables for {len(fixtures)} fixtures")
+
+    def is_identity(self):
+        return all(
+            settings == (1.0, (1.0, 1.0, 1.0), 1.0) for settings in self.groups
+        ) and self.dtype == np.uint8
+
+    def apply(self, leds, out=None):
+        """
+        Correct the (N, 3) uint8 `leds` into `out`, which defaults to `leds` itself for uint8
+        tables. Not thread safe, as the index buffer is shared.
+        """
+        if out is None:
+            if self.dtype != np.uint8:
+                raise ValueError(f"{self.dtype} tables can't correct uint8 LEDs in place")
+            out = leds
+        np.add(self.table_offsets, leds, out=self.indices)
+        # every index is in range, so skip the bounds check (and the buffering that comes with it)
+        np.take(self.luts.reshape(-1), self.indices, out=out, mode='wrap')
+        return out
+
+
+def temporal_dither(values, residue, out):
+    """
+    Reduce 8.8 fixed point uint16 `values` to uint8 `out`, carrying the fractional part of each
+    value over to the next frame in the uint16 `residue` buffer, so that the average over frames
+    keeps the extra precision.
+    """
+    np.add(values, residue, out=residue)
+    np.right_shift(residue, 8, out=out, casting='unsafe')
+    np.bitwise_and(residue, 0xff, out=residue)
+    return out
@@ -1,5 +1,4 @@
 import itertools
-import json
 import logging
 import os
 import re
@@ -12,15 +11,16 @@ import coloredlogs
 import numpy as np
 from mathutils import Vector, Matrix
 
+from export_manifest import export_json  # noqa: F401 (re-exported)
+from panel_geometry import ATOL, TRI_VERTS  # noqa: F401 (re-exported)
+
 ORIGIN_3D = Vector((0, 0, 0))
 X_AXIS_3D = Vector((1, 0, 0))
 Y_AXIS_3D = Vector((0, 1, 0))
 Z_AXIS_3D = Vector((0, 0, 1))
 X_AXIS_2D = Vector((1, 0))
-TRI_VERTS = 3
 QUAD_VERTS = 4
 ENDLTAB = "\n\t"
-ATOL = 1e-3
 LOG_STREAM_FMT = "%(asctime)s %(levelname)s %(message)s"
 DATA_PATH = 'LEDPortalSimulator/data'
 
@@ -184,12 +184,6 @@ def get_out_path(obj, suffix, extension="json"):
     return os.path.join(DATA_PATH, f"{sanitised}.{extension}")
 
 
-def export_json(out_path, serialised):
-    logging.info(f"exporting to {out_path}")
-    with open(out_path, 'w') as stream:
-        json.dump(serialised, stream, indent=4)
-
-
 def apply_to_selected_objects(fun, *args, **kwargs):
     sel_objs = [obj for obj in bpy.context.selected_objects if obj.type == 'MESH']
     logging.info(f"objects: {pformat(sel_objs)}")
@@ -199,6 +193,49 @@ def apply_to_selected_objects(fun, *args, **kwargs):
         yield fun(obj, *args, **kwargs)
 
 
+def foreach_get_array(collection, attr, dtype, width=1):
+    """
+    Read `attr` of every item in a Blender collection into a NumPy array in one call.
+    """
+    array = np.empty(len(collection) * width, dtype=dtype)
+    collection.foreach_get(attr, array)
+    return array.reshape(-1, width) if width > 1 else array
+
+
+def get_polygon_selection(obj):
+    """
+    Boolean mask of the selected polygons of `obj`. Outside of edit mode, all polygons are
+    considered selected.
+    """
+    if bpy.context.object.mode == 'EDIT':
+        return foreach_get_array(obj.data.polygons, 'select', bool)
+    return np.ones(len(obj.data.polygons), dtype=bool)
+
+
+def get_selected_polygon_indices(obj):
+    """
+    Indices of the selected polygons of `obj` as an int array.
+    """
+    return np.flatnonzero(get_polygon_selection(obj))
+
+
+def format_index_ranges(indices):
+    """
+    Compact encoding of a set of indices as ranges of consecutive indices,
+    e.g. [0, 1, 2, 3, 5, 7, 8] -> "0to3 5 7to8"
+    """
+    indices = np.unique(indices)
+    if not len(indices):
+        return ""
+    breaks = np.flatnonzero(np.diff(indices) != 1)
+    starts = indices[np.concatenate([[0], breaks + 1])]
+    ends = indices[np.concatenate([breaks, [len(indices) - 1]])]
+    return ' '.join(
+        f"{start}" if start == end else f"{start}to{end}"
+        for start, end in zip(starts, ends)
+    )
+
+
 def get_selected_polygons_suffix(obj, type_plural='polygons'):
     """
     if not all polygons are selected, then a suffix can be added to the export file to
@@ -206,22 +243,12 @@ def get_selected_polygons_suffix(obj, type_plural='polygons'):
     """
 
     suffix = f"ALL {type_plural.upper()}"
+    polygons = obj.data.polygons
     if bpy.context.object.mode == 'EDIT':
-        selectable = [
-            (polygon, polygon.select)
-            for polygon in obj.data.polygons
-        ]
-        logging.info(f"Selectable Polygons: \n{pformat(selectable)}")
-
-        polygon_enum = [
-            (index, polygon) for index, polygon in enumerate(obj.data.polygons)
-            if polygon.select
-        ]
-        selected_indices = [
-            index for index, polygon in polygon_enum
-        ]
-        suffix = f"{type_plural.upper()} " + ' '.join(map(str, selected_indices))
-        return polygon_enum, suffix
+        selected_indices = get_selected_polygon_indices(obj).tolist()
+        logging.info(f"Selected {len(selected_indices)} of {len(polygons)} {type_plural}")
+        suffix = f"{type_plural.upper()} " + format_index_ranges(selected_indices)
+        return [(index, polygons[index]) for index in selected_indices], suffix
     logging.info(f"collection: {obj.users_collection}")
-    logging.info(f"Selected Polygons: \n{pformat(obj.data.polygons)}")
-    return list(enumerate(obj.data.polygons)), suffix
+    logging.info(f"Selected all {len(polygons)} {type_plural}")
+    return list(enumerate(polygons)), suffix
@@ -0,0 +1,204 @@
+"""
+Render the LEDs of a panel export from a few camera angles, without Blender, to review layouts
+in CI or on a show laptop, or to watch recorded frames offline.
+
+Each LED is projected through a pinhole camera and splatted as a disc whose size shrinks with
+depth. The splat only depends on the camera and the LED positions, so `DomeView` resolves it once:
+all disc fragments are depth sorted and `np.unique` keeps the nearest fragment of every image
+pixel, like a z-buffer. Rendering a frame is then a single gather of LED colours into the image.
+Fragments are dimmed with depth so that the far side of the dome reads as further away.
+
+LEDs are coloured by panel (see `grid_preview.fixture_colours`), or with the frames of a
+recording whose LEDs are in panel export order (see `frame_recording.py`).
+
+    python tools/dome_preview.py dome.json previews/
+    python tools/dome_preview.py dome.json previews/ --recording show.ledrec --frames 100
+"""
+
+import argparse
+import logging
+import os
+from math import ceil, cos, radians, sin, tan
+
+import numpy as np
+
+from grid_preview import fixture_colours, write_png
+from layout_io import load_panels, panel_world_positions
+
+AXES = {'x': 0, 'y': 1, 'z': 2}
+DEFAULT_SIZE = (800, 600)
+DEFAULT_FOV = 50.0
+DEFAULT_VIEWS = 4
+DEFAULT_ELEVATION = 30.0
+# LED disc radius as a fraction of the median distance between LEDs which are wired in sequence
+LED_RADIUS_SCALE = 0.4
+# the largest disc radius in image pixels, so that LEDs right in front of the camera stay cheap
+MAX_SPLAT_RADIUS = 12
+NEAR_PLANE = 1e-3
+# the brightness of the furthest fragments, relative to the nearest
+FAR_SHADE = 0.4
+BACKGROUND = (0, 0, 0)
+
+
+def look_at(eye, target, up):
+    """
+    The (3, 3) rotation from world to camera space, where the camera looks down +z from `eye` at
+    `target` with +y towards `up` (image rows grow downwards).
+    """
+    forward = np.asarray(target, dtype=float) - eye
+    forward /= np.linalg.norm(forward)
+    right = np.cross(forward, up)
+    if np.linalg.norm(right) < 1e-9:
+        raise ValueError(f"camera at {eye} looks along the up axis {up}")
+    right /= np.linalg.norm(right)
+    return np.stack([right, np.cross(right, forward), forward])
+
+
+def orbit_cameras(positions, views=DEFAULT_VIEWS, elevation=DEFAULT_ELEVATION, fov=DEFAULT_FOV,
+                  up_axis='z'):
+    """
+    (name, eye, target, up) of `views` cameras evenly spaced around the LEDs at `elevation`
+    degrees, far enough away for the LEDs' bounding sphere to fit the field of view.
+    """
+    up = np.zeros(3)
+    up[AXES[up_axis]] = 1.0
+    low, high = positions.min(axis=0), positions.max(axis=0)
+    target = (low + high) / 2
+    distance = np.linalg.norm(high - low) / 2 / sin(radians(fov) / 2)
+    # two horizontal axes, right handed with up
+    horizontal = np.roll(np.eye(3), -AXES[up_axis] - 1, axis=0)[:2]
+    cameras = []
+    for view in range(views):
+        azimuth = 2 * np.pi * view / views
+        direction = cos(radians(elevation)) * (
+            cos(azimuth) * horizontal[0] + sin(azimuth) * horizontal[1]
+        ) + sin(radians(elevation)) * up
+        cameras.append((f"view_{view}", target + distance * direction, target, up))
+    return cameras
+
+
+def led_radius(panels):
+    """
+    A disc radius which makes neighbouring LEDs nearly touch.
+    """
+    steps = np.concatenate([
+        np.linalg.norm(np.diff(panel_world_positions(panel), axis=0), axis=1) for panel in panels
+    ] or [np.zeros(0)])
+    steps = steps[steps > 0]
+    return LED_RADIUS_SCALE * float(np.median(steps)) if len(steps) else 0.01
+
+
+class DomeView:
+    """
+    The resolved splat of `positions` seen from a camera: `pixels` are the flat indices of the
+    covered image pixels, `leds` the nearest LED at each of them and `shade` its depth cue.
+    """
+
+    def __init__(self, positions, eye, target, up, size=DEFAULT_SIZE, fov=DEFAULT_FOV,
+                 radius=0.01):
+        self.width, self.height = size
+        positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        camera = (positions - eye) @ look_at(np.asarray(eye, dtype=float), target, up).T
+        depth = camera[:, 2]
+        visible = np.flatnonzero(depth > NEAR_PLANE)
+        depth = depth[visible]
+        focal = self.width / 2 / tan(radians(fov) / 2)
+        centre_x = self.width / 2 + focal * camera[visible, 0] / depth
+        centre_y = self.height / 2 - focal * camera[visible, 1] / depth
+        disc_radius = np.minimum(focal * radius / depth, MAX_SPLAT_RADIUS)
+
+        # every LED gets the fragments of the largest disc, and drops those outside its own
+        extent = ceil(disc_radius.max()) if len(disc_radius) else 0
+        offsets = np.arange(-extent, extent + 1)
+        offset_x, offset_y = [axis.ravel() for axis in np.meshgrid(offsets, offsets)]
+        cols = np.rint(centre_x)[:, np.newaxis].astype(int) + offset_x
+        rows = np.rint(centre_y)[:, np.newaxis].astype(int) + offset_y
+        inside = (
+            (cols - centre_x[:, np.newaxis]) ** 2 + (rows - centre_y[:, np.newaxis]) ** 2
+            <= np.maximum(disc_radius, 0.5)[:, np.newaxis] ** 2
+        ) & (cols >= 0) & (cols < self.width) & (rows >= 0) & (rows < self.height)
+        fragment_leds, _ = np.nonzero(inside)
+        fragment_pixels = rows[inside] * self.width + cols[inside]
+        fragment_depths = depth[fragment_leds]
+
+        # z-buffer: the first fragment of each pixel, by pixel then depth, is the nearest
+        order = np.lexsort((fragment_depths, fragment_pixels))
+        self.pixels, first = np.unique(fragment_pixels[order], return_index=True)
+        nearest = order[first]
+        self.leds = visible[fragment_leds[nearest]]
+        near, far = (depth.min(), depth.max()) if len(depth) else (0.0, 0.0)
+        relative_depth = (fragment_depths[nearest] - near) / max(far - near, 1e-12)
+        self.shade = 1 - (1 - FAR_SHADE) * relative_depth
+        self.image = np.empty((self.height, self.width, 3), dtype=np.uint8)
+
+    def render(self, colours):
+        """
+        The (height, width, 3) uint8 image of the (N, 3) LED `colours`. The image is reused by
+        the next call.
+        """
+        self.image[:] = BACKGROUND
+        fragments = colours[self.leds] * self.shade[:, np.newaxis]
+        self.image.reshape(-1, 3)[self.pixels] = fragments.astype(np.uint8)
+        return self.image
+
+
+def panel_colours(panels):
+    """
+    (N, 3) uint8 colours of every LED of the panels, one colour per panel.
+    """
+    counts = [len(panel['pixels']) for panel in panels]
+    return np.repeat(fixture_colours(len(panels)), counts, axis=0)
+
+
+def main():
+    # local import, the recording format is only needed to replay frames
+    from frame_recording import FrameRecording
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('panels', help="panel export")
+    parser.add_argument('out_dir', help="directory to write the PNGs to")
+    parser.add_argument('--views', type=int, default=DEFAULT_VIEWS)
+    parser.add_argument(
+        '--elevation', type=float, default=DEFAULT_ELEVATION, help="camera elevation in degrees")
+    parser.add_argument('--fov', type=float, default=DEFAULT_FOV, help="field of view in degrees")
+    parser.add_argument('--size', type=int, nargs=2, default=DEFAULT_SIZE, metavar=('W', 'H'))
+    parser.add_argument('--up', choices=list(AXES), default='z', help="world up axis")
+    parser.add_argument('--radius', type=float, help="LED disc radius, default: from the spacing")
+    parser.add_argument('--recording', help="render the frames of this recording")
+    parser.add_argument('--start', type=int, default=0, help="first recorded frame")
+    parser.add_argument('--frames', type=int, help="number of recorded frames to render")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    panels = load_panels(args.panels)
+    positions = np.concatenate([panel_world_positions(panel) for panel in panels])
+    radius = args.radius or led_radius(panels)
+    views = [
+        (name, DomeView(positions, eye, target, up, args.size, args.fov, radius))
+        for name, eye, target, up in orbit_cameras(
+            positions, args.views, args.elevation, args.fov, args.up)
+    ]
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    if not args.recording:
+        colours = panel_colours(panels)
+        for name, view in views:
+            write_png(os.path.join(args.out_dir, f"{name}.png"), view.render(colours))
+        logging.info(f"wrote {len(views)} views of {len(positions)} LEDs to {args.out_dir}")
+        return
+
+    recording = FrameRecording(args.recording)
+    if recording.pixels != len(positions):
+        raise ValueError(
+            f"{args.recording} has {recording.pixels} pixels, {args.panels} has {len(positions)}")
+    end = len(recording) if args.frames is None else min(args.start + args.frames, len(recording))
+    for idx in range(args.start, end):
+        for name, view in views:
+            write_png(
+                os.path.join(args.out_dir, f"{name}_{idx:05d}.png"),
+                view.render(recording.frame(idx)))
+    logging.info(f"wrote {end - args.start} frames of {len(views)} views to {args.out_dir}")
+
+
+if __name__ == '__main__':
+    main()
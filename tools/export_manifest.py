@@ -0,0 +1,192 @@
+"""
+Write exports only when their content changes, atomically, and keep a manifest of what they were
+made from.
+
+Rewriting the `.json` / `.lxm` exports in `LEDPortalSimulator/data` on every run, even when
+nothing changed, makes LX reload the project and churns git. `write_if_changed` hashes the
+serialised content, skips the write if the existing file has the same SHA-256, and otherwise
+writes a temporary file in the same directory and renames it over the export, so readers never
+see a partial file.
+
+Each directory of exports has a `MANIFEST_FILE` which maps every export to the SHA-256 of its
+content, the hashes of its inputs (e.g. `mesh`, `config` and `overrides`, see
+`light_layout.layout_input_hashes`) and the hashes of the input `files` it was made from (e.g. the
+`.blend` file and the layout config, relative to the manifest). An export is stale if it is
+missing, was edited since it was exported, its recorded inputs differ from the current ones, or
+one of its input files changed.
+
+The input hashes are computed from Blender data, so only the exporting tools can check them. The
+command line checks everything else: the content of each export and its input files.
+
+    python tools/export_manifest.py LEDPortalSimulator/data
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+
+MANIFEST_FILE = 'export_manifest.json'
+JSON_INDENT = 4
+
+
+def content_hash(content):
+    """
+    The SHA-256 hex digest of `str` or `bytes` content.
+    """
+    if isinstance(content, str):
+        content = content.encode()
+    return hashlib.sha256(content).hexdigest()
+
+
+def value_hash(value):
+    """
+    The SHA-256 hex digest of a JSON serialisable value, independent of dict order. Values JSON
+    can't serialise (e.g. vectors and matrices) are hashed by their `repr`.
+    """
+    return content_hash(json.dumps(value, sort_keys=True, default=repr))
+
+
+def file_hash(path):
+    """
+    The SHA-256 hex digest of a file, or None if it doesn't exist.
+    """
+    try:
+        with open(path, 'rb') as stream:
+            return content_hash(stream.read())
+    except FileNotFoundError:
+        return None
+
+
+def serialise_json(serialised):
+    return json.dumps(serialised, indent=JSON_INDENT)
+
+
+def write_if_changed(path, content):
+    """
+    Write `str` or `bytes` content to `path` unless the file already has the same content,
+    replacing it atomically. Returns the content hash and whether the file was written.
+    """
+    data = content.encode() if isinstance(content, str) else content
+    digest = content_hash(data)
+    if file_hash(path) == digest:
+        return digest, False
+    directory = os.path.dirname(path) or '.'
+    descriptor, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as stream:
+            stream.write(data)
+        # mkstemp files are private, exports should have the usual permissions
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return digest, True
+
+
+def manifest_path(export_path):
+    return os.path.join(os.path.dirname(export_path), MANIFEST_FILE)
+
+
+def load_manifest(path):
+    """
+    The manifest at `path` as {export file name: {'sha256': ..., 'inputs': {name: hash}}}, where
+    an entry may also have 'files': {path relative to the manifest: hash}.
+    """
+    try:
+        with open(path) as stream:
+            return json.load(stream)
+    except FileNotFoundError:
+        return {}
+
+
+def file_hashes(directory, paths):
+    """
+    The hashes of the files at `paths`, keyed by their path relative to `directory`.
+    """
+    return {
+        os.path.relpath(path, directory).replace(os.sep, '/'): file_hash(path) for path in paths
+    }
+
+
+def record_export(export_path, digest, inputs=None, files=None):
+    """
+    Record the content hash and input hashes of an export in the manifest of its directory, and
+    the hashes of its input `files` (paths) if any.
+    """
+    path = manifest_path(export_path)
+    manifest = load_manifest(path)
+    entry = {'sha256': digest, 'inputs': dict(inputs or {})}
+    if files:
+        entry['files'] = file_hashes(os.path.dirname(path), files)
+    manifest[os.path.basename(export_path)] = entry
+    write_if_changed(path, serialise_json(dict(sorted(manifest.items()))))
+
+
+def export_status(export_path, inputs=None):
+    """
+    Why an export is stale: 'missing', 'unrecorded', 'modified' (the file was changed after it
+    was exported), 'inputs' (the recorded inputs differ from `inputs`) or 'files' (a recorded
+    input file changed or is gone), or None if it's up to date. Without `inputs`, only the
+    content and the input files of the export are checked.
+    """
+    digest = file_hash(export_path)
+    if digest is None:
+        return 'missing'
+    entry = load_manifest(manifest_path(export_path)).get(os.path.basename(export_path))
+    if entry is None:
+        return 'unrecorded'
+    if entry['sha256'] != digest:
+        return 'modified'
+    if inputs is not None and entry['inputs'] != dict(inputs):
+        return 'inputs'
+    directory = os.path.dirname(manifest_path(export_path))
+    for name, digest in entry.get('files', {}).items():
+        if file_hash(os.path.join(directory, name)) != digest:
+            return 'files'
+    return None
+
+
+def export_json(out_path, serialised, inputs=None, files=None):
+    """
+    Export `serialised` as indented JSON to `out_path` if it changed, and record it in the
+    manifest with the hashes of its `inputs` and input `files`. Returns whether the file was
+    written.
+    """
+    digest, written = write_if_changed(out_path, serialise_json(serialised))
+    if written:
+        logging.info(f"exported to {out_path}")
+    else:
+        logging.info(f"{out_path} is unchanged")
+    record_export(out_path, digest, inputs, files)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check the content and input files of exports against their manifest.")
+    parser.add_argument('directory', help="directory of exports with a manifest")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    manifest = load_manifest(os.path.join(args.directory, MANIFEST_FILE))
+    stale = 0
+    for name in sorted(manifest):
+        # the recorded inputs need Blender to recompute, so only the files are checked
+        status = export_status(os.path.join(args.directory, name))
+        stale += status is not None
+        logging.info(f"{name}: {status or 'up to date'}")
+    logging.info(f"{stale} of {len(manifest)} exports are stale")
+    sys.exit(1 if stale else 0)
+
+
+if __name__ == '__main__':
+    main()
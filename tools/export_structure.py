@@ -7,21 +7,26 @@ from datetime import datetime
 from pprint import pformat
 
 import bpy
+import numpy as np
 
-THIS_FILE = inspect.stack()[-2].filename
+# the file of this code, also when script_wrapper.py exec's it with its own `__file__`
+THIS_FILE = inspect.currentframe().f_code.co_filename
 THIS_DIR = os.path.dirname(THIS_FILE)
 try:
     PATH = sys.path[:]
     sys.path.insert(0, THIS_DIR)
     imp.reload(__import__('common'))  # dumb hacks because of blender's pycache settings
     from common import (ENDLTAB, format_matrix, setup_logger, serialise_matrix, export_json,
-                        get_selected_polygons_suffix, apply_to_selected_objects, get_out_path)
+                        get_selected_polygons_suffix, apply_to_selected_objects, get_out_path,
+                        foreach_get_array, get_polygon_selection)
 finally:
     sys.path = PATH
 LOG_FILE = os.path.splitext(os.path.basename(THIS_FILE))[0] + '.log'
 
 # EXPORT_TYPE = 'FACES'
 EXPORT_TYPE = 'EDGES'
+# Use foreach_get / NumPy to serialise the mesh instead of iterating over it in Python
+FAST_EXPORT = True
 
 
 def serialise_object(obj, method):
@@ -34,7 +39,7 @@ def serialise_object(obj, method):
 
     selected_polygons, suffix = get_selected_polygons_suffix(obj, EXPORT_TYPE)
 
-    for poly_idx, polygon in enumerate(selected_polygons):
+    for poly_idx, polygon in selected_polygons:
 
         logging.debug(f"Vertex IDs:" + ENDLTAB + pformat(list(polygon.vertices)))
 
@@ -62,13 +67,83 @@ def serialise_object(obj, method):
     return serialised
 
 
+def polygon_loops(loop_starts, loop_totals):
+    """
+    Given the `loop_start` and `loop_total` of some polygons, return the indices of each of their
+    loops and of the loop which follows it around the polygon, concatenated in polygon order.
+    """
+    loop_totals_rep = np.repeat(loop_totals, loop_totals)
+    loop_starts_rep = np.repeat(loop_starts, loop_totals)
+    polygon_offsets = np.repeat(np.cumsum(loop_totals) - loop_totals, loop_totals)
+    within = np.arange(loop_totals.sum()) - polygon_offsets
+    return loop_starts_rep + within, loop_starts_rep + (within + 1) % loop_totals_rep
+
+
+def serialise_mesh_arrays(vertices, loop_vertices, loop_starts, loop_totals, selected=None):
+    """
+    Vectorised serialisation of a mesh from its `foreach_get` arrays. `selected` is an optional
+    boolean mask of the polygons to export.
+
+    Returns the vertex list, the sorted unique edges and the faces.
+    """
+    if selected is not None:
+        loop_starts = loop_starts[selected]
+        loop_totals = loop_totals[selected]
+    loops, next_loops = polygon_loops(loop_starts, loop_totals)
+    face_vertices = loop_vertices[loops]
+    edges = np.sort(np.stack([face_vertices, loop_vertices[next_loops]], axis=1), axis=1)
+    edges = np.unique(edges.reshape(-1, 2), axis=0)
+    faces = np.split(face_vertices, np.cumsum(loop_totals)[:-1]) if len(loop_totals) else []
+    return vertices.tolist(), edges.tolist(), [face.tolist() for face in faces]
+
+
+def serialise_object_fast(obj, method):
+    """
+    Same output as `serialise_object`, with the mesh read through `foreach_get` into NumPy arrays.
+    """
+    logging.info(f"Serialising object: {obj}")
+    logging.info(f"Object World Matrix:" + ENDLTAB + format_matrix(obj.matrix_world))
+
+    mesh = obj.data
+    selected = get_polygon_selection(obj)
+    logging.info(f"exporting {selected.sum()} of {len(selected)} polygons")
+
+    vertices, edges, polygons = serialise_mesh_arrays(
+        foreach_get_array(mesh.vertices, 'co', np.float32, 3),
+        foreach_get_array(mesh.loops, 'vertex_index', np.int32),
+        foreach_get_array(mesh.polygons, 'loop_start', np.int32),
+        foreach_get_array(mesh.polygons, 'loop_total', np.int32),
+        selected
+    )
+
+    serialised = {
+        'type': EXPORT_TYPE,
+        'name': obj.name,
+        'vertices': vertices,
+        'matrix': serialise_matrix(obj.matrix_world),
+        'edges': edges,
+        'faces': polygons
+    }
+
+    if EXPORT_TYPE == 'EDGES':
+        logging.info(f"exporting {len(edges)} edges")
+
+    elif EXPORT_TYPE == 'FACES':
+        logging.info(f"exporting {len(polygons)} faces")
+
+    return serialised
+
+
 def main():
     setup_logger(LOG_FILE)
     logging.info(f"*** Starting Structure Export {datetime.now().isoformat()} ***")
 
-    structures = list(apply_to_selected_objects(serialise_object, EXPORT_TYPE))
+    serialiser = serialise_object_fast if FAST_EXPORT else serialise_object
+    structures = list(apply_to_selected_objects(serialiser, EXPORT_TYPE))
 
-    export_json(get_out_path(bpy.context.object, EXPORT_TYPE), {EXPORT_TYPE.lower(): structures})
+    export_json(
+        get_out_path(bpy.context.object, EXPORT_TYPE), {EXPORT_TYPE.lower(): structures},
+        files=[bpy.data.filepath] if bpy.data.filepath else None)
 
     logging.info(f"*** Completed Structure Export {datetime.now().isoformat()} ***")
 
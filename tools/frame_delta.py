@@ -0,0 +1,87 @@
+"""
+Suppress unchanged fixtures when streaming LED frames.
+
+Much show content is static, or only changes on some panels, so re-sending every fixture each
+frame wastes controller bandwidth. `DirtyTracker` compares each fixture's slice of a new LED
+frame with the last frame that was sent for it, and only marks changed fixtures as dirty. An
+unchanged fixture is still re-sent once its keepalive interval has passed, so that controllers
+which time out, restart or drop a packet recover.
+"""
+
+import time
+
+import numpy as np
+
+
+class DirtyTracker:
+    """
+    Tracks which LED ranges `starts[i]:ends[i]` (one per fixture) changed since they were last
+    sent, and how many bytes skipping the unchanged ones saved. Each fixture costs `overhead`
+    bytes plus 3 bytes per pixel to send.
+    """
+
+    def __init__(self, starts, ends, keepalive=1.0, overhead=0):
+        self.starts = np.asarray(starts, dtype=int)
+        self.ends = np.asarray(ends, dtype=int)
+        self.keepalive = keepalive
+        self.fixture_bytes = overhead + 3 * (self.ends - self.starts)
+        # the fixture of each LED, LEDs which belong to no fixture point at an extra False
+        self.led_fixtures = np.full(max(self.ends, default=0), len(self.starts))
+        for idx, (start, end) in enumerate(zip(self.starts, self.ends)):
+            self.led_fixtures[start:end] = idx
+        self.last = None
+        self.last_sent = np.full(len(self.starts), -np.inf)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.frames = 0
+        self.fixtures_sent = 0
+        self.fixtures_skipped = 0
+        self.bytes_sent = 0
+        self.bytes_saved = 0
+
+    def update(self, leds, now=None):
+        """
+        Compare the (N, 3) `leds` with the last sent frame, and return an array with True for
+        every fixture which changed or is due a keepalive. The dirty fixtures are assumed to be
+        sent, see `invalidate` if that fails.
+        """
+        if now is None:
+            now = time.monotonic()
+        if self.last is None:
+            self.last = np.array(leds, copy=True)
+            dirty = np.ones(len(self.starts), dtype=bool)
+        else:
+            changed = np.any(leds != self.last, axis=-1)
+            # changed LEDs before each offset, so ranges need not be contiguous
+            changed_before = np.concatenate([[0], np.cumsum(changed)])
+            dirty = changed_before[self.ends] > changed_before[self.starts]
+            dirty |= now - self.last_sent >= self.keepalive
+            led_dirty = np.append(dirty, False)[self.led_fixtures]
+            np.copyto(self.last[:len(led_dirty)], leds[:len(led_dirty)], where=led_dirty[:, None])
+        self.last_sent[dirty] = now
+
+        self.frames += 1
+        self.fixtures_sent += int(dirty.sum())
+        self.fixtures_skipped += int(len(dirty) - dirty.sum())
+        self.bytes_sent += int(self.fixture_bytes[dirty].sum())
+        self.bytes_saved += int(self.fixture_bytes[~dirty].sum())
+        return dirty
+
+    def invalidate(self, fixtures=None):
+        """
+        Send `fixtures` (indices, default all) with the next frame, e.g. after a reconnect.
+        """
+        if fixtures is None:
+            fixtures = slice(None)
+        self.last_sent[fixtures] = -np.inf
+
+    def summary(self, reset=False):
+        total = max(self.bytes_sent + self.bytes_saved, 1)
+        summary = (
+            f"delta: {self.frames} frames, {self.fixtures_sent} fixtures sent, "
+            f"{self.fixtures_skipped} skipped, {self.bytes_saved} of {total} bytes saved "
+            f"({100 * self.bytes_saved / total: 5.1f}%)")
+        if reset:
+            self.reset_stats()
+        return summary
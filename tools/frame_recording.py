@@ -0,0 +1,214 @@
+"""
+Record LED frames to a file and replay them, to debug shows and benchmark the output stack
+without the renderer.
+
+A recording is a fixed 64 byte header followed by contiguous uint8 (pixels, 3) frames:
+
+    magic (8s) | version (uint32) | pixels (uint32) | fps (float64) | layout hash (32s) | reserved
+
+Frames are only ever appended, so a recording that was cut short loses at most its last partial
+frame. Replay memory-maps the file, so frames are zero-copy views and seeking is O(1).
+
+    python tools/frame_stream.py dome.lxm frames/ --record show.ledrec --dry-run
+    python tools/frame_recording.py show.ledrec --lxm dome.lxm --loop
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import struct
+import time
+
+import numpy as np
+
+from layout_io import fixture_label, fixture_offsets, load_fixtures
+
+MAGIC = b'LEDREC\x00\x00'
+VERSION = 1
+HEADER = struct.Struct('<8sIId32s8x')
+# the fixture parameters which decide where each LED of a frame ends up
+LAYOUT_PARAMETERS = [
+    'pointIndicesJSON', 'protocol', 'host', 'port', 'opcChannel', 'artNetUniverse'
+]
+
+
+def layout_hash(fixtures):
+    """
+    SHA-256 of the LED order and outputs of a fixture export, so that a recording is only
+    replayed onto the layout it was recorded for.
+    """
+    layout = [
+        [fixture_label(fixture)] + [
+            fixture['parameters'].get(parameter) for parameter in LAYOUT_PARAMETERS
+        ]
+        for fixture in fixtures
+    ]
+    return hashlib.sha256(json.dumps(layout).encode()).digest()
+
+
+def read_header(path):
+    """
+    The (pixels, fps, layout hash) of a recording.
+    """
+    with open(path, 'rb') as stream:
+        data = stream.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is too short for a recording header")
+    magic, version, pixels, fps, digest = HEADER.unpack(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a frame recording")
+    if version != VERSION:
+        raise ValueError(f"{path} has unsupported recording version {version}")
+    return pixels, fps, digest
+
+
+class FrameRecorder:
+    """
+    Appends (pixels, 3) uint8 frames to a recording. Appending to an existing recording requires
+    the same pixel count and layout hash. Can be used as a `frame_stream` sink.
+    """
+
+    def __init__(self, path, pixels, fps, digest=bytes(32)):
+        self.path = path
+        self.pixels = pixels
+        if os.path.exists(path) and os.path.getsize(path):
+            existing_pixels, _, existing_digest = read_header(path)
+            if (existing_pixels, existing_digest) != (pixels, digest):
+                raise ValueError(f"{path} was recorded with a different layout")
+            frame_bytes = pixels * 3
+            self.stream = open(path, 'r+b')
+            # drop a partial frame from an interrupted recording
+            frames = (os.path.getsize(path) - HEADER.size) // frame_bytes
+            self.stream.truncate(HEADER.size + frames * frame_bytes)
+            self.stream.seek(0, os.SEEK_END)
+        else:
+            self.stream = open(path, 'wb')
+            self.stream.write(HEADER.pack(MAGIC, VERSION, pixels, fps, digest))
+        self.frames = 0
+
+    def send(self, leds):
+        if leds.shape != (self.pixels, 3) or leds.dtype != np.uint8:
+            raise ValueError(f"expected ({self.pixels}, 3) uint8 frames, got {leds.shape}")
+        # write straight from the frame's buffer rather than a copy of its bytes
+        self.stream.write(memoryview(np.ascontiguousarray(leds)).cast('B'))
+        self.frames += 1
+
+    def close(self):
+        if not self.stream.closed:
+            self.stream.close()
+
+
+class FrameRecording:
+    """
+    A memory-mapped recording. `frames` is a read-only (frames, pixels, 3) array, so indexing it
+    gives zero-copy views.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pixels, self.fps, self.digest = read_header(path)
+        count = (os.path.getsize(path) - HEADER.size) // (self.pixels * 3)
+        if count:
+            self.frames = np.memmap(
+                path, dtype=np.uint8, mode='r', offset=HEADER.size,
+                shape=(count, self.pixels, 3))
+        else:
+            self.frames = np.zeros((0, self.pixels, 3), dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def frame(self, idx, loop=False):
+        """
+        The view of frame `idx`, wrapped around the end of the recording if `loop`.
+        """
+        if loop:
+            idx %= len(self.frames)
+        return self.frames[idx]
+
+    def check_layout(self, fixtures):
+        """
+        Raise a ValueError if the recording doesn't match the fixtures.
+        """
+        pixels = fixture_offsets(fixtures)[-1]
+        if pixels != self.pixels:
+            raise ValueError(f"{self.path} has {self.pixels} pixels, the layout has {pixels}")
+        if self.digest != layout_hash(fixtures):
+            logging.warning(f"{self.path} was recorded with a different layout hash")
+
+    def play(self, sink, fps=None, start=0, frames=None, loop=False, stop_event=None):
+        """
+        Send frames to a sink at `fps` (default: the recorded rate, 0 for as fast as possible),
+        from frame `start`, until `frames` frames were sent or the end of the recording unless
+        `loop`. Returns the number of frames sent and the number of late frames.
+        """
+        if not len(self.frames):
+            return 0, 0
+        fps = self.fps if fps is None else fps
+        period = 1.0 / fps if fps else 0.0
+        if frames is None:
+            frames = np.inf if loop else len(self.frames) - start
+        sent = late = 0
+        idx = start % len(self.frames)
+        # the first frame sets the pace, so it can't be late
+        deadline = None
+        while sent < frames and not (stop_event is not None and stop_event.is_set()):
+            now = time.perf_counter()
+            if deadline is None:
+                deadline = now
+            elif now < deadline:
+                time.sleep(deadline - now)
+            elif period:
+                late += 1
+                deadline = now
+            deadline += period
+            sink.send(self.frames[idx])
+            sent += 1
+            idx += 1
+            if idx == len(self.frames):
+                if not loop:
+                    break
+                idx = 0
+        return sent, late
+
+
+def main():
+    # local import, frame_stream records with this module
+    from frame_stream import NullSink, OpcSink
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('recording', help="frame recording")
+    parser.add_argument('--lxm', help="fixture export to send the frames to")
+    parser.add_argument('--fps', type=float, help="default: the recorded fps, 0 for no pacing")
+    parser.add_argument('--start', type=int, default=0, help="first frame")
+    parser.add_argument('--frames', type=int, help="number of frames to send")
+    parser.add_argument('--loop', action='store_true')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    recording = FrameRecording(args.recording)
+    logging.info(
+        f"{args.recording}: {len(recording)} frames of {recording.pixels} pixels at "
+        f"{recording.fps:.2f} fps")
+    if args.lxm:
+        fixtures = load_fixtures(args.lxm)
+        recording.check_layout(fixtures)
+        sink = OpcSink(fixtures)
+    else:
+        sink = NullSink()
+    start = time.perf_counter()
+    try:
+        sent, late = recording.play(
+            sink, fps=args.fps, start=args.start, frames=args.frames, loop=args.loop)
+    finally:
+        sink.close()
+    elapsed = time.perf_counter() - start
+    logging.info(
+        f"replayed {sent} frames in {elapsed: 7.3f}s ({sent / max(elapsed, 1e-9): 6.2f} fps, "
+        f"{late} late)")
+
+
+if __name__ == '__main__':
+    main()
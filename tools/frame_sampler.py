@@ -0,0 +1,152 @@
+"""
+Sample arbitrary 2D frames (video, images) onto the LEDs using the global grid exported by
+`light_layout.main()` (`globalGridMatrix` / `globalGridOriginX` / `globalGridOriginY`).
+
+The bounding box of the global grid is fitted into a W x H frame, and for every LED the four
+surrounding frame pixels and their bilinear weights are precomputed into a lookup table (LUT), so
+that sampling a frame is a single gather-multiply-add.
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+from layout_io import fixture_grid_positions, load_fixtures
+
+FRAME_LUT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'ledportal_frame_luts')
+FRAME_LUT_VERSION = 1
+
+
+def frame_coordinates(grid_positions, width, height, flip_y=True, keep_aspect=True):
+    """
+    Fit the bounding box of `grid_positions` into a `width` x `height` frame, and return the
+    fractional (column, row) frame coordinates of each position as an (N, 2) array.
+
+    Grid y points up, frame rows point down, so y is flipped unless `flip_y` is False.
+    """
+    grid_positions = np.asarray(grid_positions, dtype=float).reshape(-1, 2)
+    frame_size = np.array([width - 1, height - 1], dtype=float)
+    if not len(grid_positions):
+        return np.zeros((0, 2))
+    grid_min = grid_positions.min(axis=0)
+    grid_span = grid_positions.max(axis=0) - grid_min
+    scale = np.divide(frame_size, grid_span, out=np.zeros(2), where=grid_span > 0)
+    if keep_aspect:
+        nonzero = scale[grid_span > 0]
+        scale[:] = nonzero.min() if len(nonzero) else 0
+    padding = (frame_size - grid_span * scale) / 2
+    coordinates = (grid_positions - grid_min) * scale + padding
+    if flip_y:
+        coordinates[:, 1] = frame_size[1] - coordinates[:, 1]
+    return coordinates
+
+
+def build_frame_lut(grid_positions, width, height, flip_y=True, keep_aspect=True):
+    """
+    Precompute the bilinear sampling LUT of a `width` x `height` frame for each grid position.
+
+    Returns a dict with:
+    - `indices`: (N, 4) flat indices into the (height * width) frame pixels
+    - `weights`: (N, 4) bilinear weights, each row summing to 1
+    """
+    coordinates = frame_coordinates(grid_positions, width, height, flip_y, keep_aspect)
+    limits = np.array([width - 1, height - 1])
+    lower = np.clip(np.floor(coordinates).astype(int), 0, limits)
+    upper = np.minimum(lower + 1, limits)
+    frac = np.clip(coordinates - lower, 0, 1)
+
+    cols = np.stack([lower[:, 0], upper[:, 0], lower[:, 0], upper[:, 0]], axis=1)
+    rows = np.stack([lower[:, 1], lower[:, 1], upper[:, 1], upper[:, 1]], axis=1)
+    weights = np.stack([
+        (1 - frac[:, 0]) * (1 - frac[:, 1]),
+        frac[:, 0] * (1 - frac[:, 1]),
+        (1 - frac[:, 0]) * frac[:, 1],
+        frac[:, 0] * frac[:, 1],
+    ], axis=1)
+
+    return {
+        'width': width,
+        'height': height,
+        'indices': rows * width + cols,
+        'weights': weights.astype(np.float32),
+    }
+
+
+def frame_lut_key(grid_positions, width, height, flip_y=True, keep_aspect=True):
+    digest = hashlib.sha1(np.ascontiguousarray(grid_positions, dtype=np.int64).tobytes())
+    digest.update(repr((FRAME_LUT_VERSION, width, height, flip_y, keep_aspect)).encode())
+    return digest.hexdigest()
+
+
+def load_frame_lut(grid_positions, width, height, flip_y=True, keep_aspect=True, cache_dir=None):
+    """
+    Like `build_frame_lut`, but cached on disk in `cache_dir`, keyed by the grid positions and
+    the frame parameters.
+    """
+    if cache_dir is None:
+        cache_dir = FRAME_LUT_CACHE_DIR
+    key = frame_lut_key(grid_positions, width, height, flip_y, keep_aspect)
+    cache_path = os.path.join(cache_dir, f"frame_lut_{width}x{height}_{key[:16]}.npz")
+    if os.path.exists(cache_path):
+        logging.debug(f"loading frame LUT from {cache_path}")
+        with np.load(cache_path) as cached:
+            return {
+                'width': width,
+                'height': height,
+                'indices': cached['indices'],
+                'weights': cached['weights'],
+            }
+    lut = build_frame_lut(grid_positions, width, height, flip_y, keep_aspect)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = cache_path + '.tmp.npz'
+    np.savez(tmp_path, indices=lut['indices'], weights=lut['weights'])
+    os.replace(tmp_path, cache_path)
+    logging.debug(f"cached frame LUT to {cache_path}")
+    return lut
+
+
+def sample_frame(frame, lut, out=None):
+    """
+    Sample a (height, width, channels) frame onto the LEDs, giving an (N, channels) array with
+    the frame's dtype (or written into `out`).
+    """
+    frame = np.asarray(frame)
+    height, width = frame.shape[:2]
+    if (width, height) != (lut['width'], lut['height']):
+        raise ValueError(
+            f"frame is {width}x{height}, LUT expects {lut['width']}x{lut['height']}")
+    pixels = frame.reshape(height * width, -1)
+    sampled = np.einsum('nk,nkc->nc', lut['weights'], pixels[lut['indices']])
+    if out is None:
+        out = np.empty(sampled.shape, dtype=frame.dtype)
+    if np.issubdtype(out.dtype, np.integer):
+        np.rint(sampled, out=sampled)
+    np.copyto(out, sampled, casting='unsafe')
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('lxm', help="fixture export with global grid parameters")
+    parser.add_argument('--width', type=int, default=256)
+    parser.add_argument('--height', type=int, default=256)
+    parser.add_argument('--stretch', action='store_true', help="don't keep the grid aspect")
+    parser.add_argument('--cache-dir', default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG)
+
+    grid_positions = fixture_grid_positions(load_fixtures(args.lxm))
+    lut = load_frame_lut(
+        grid_positions, args.width, args.height,
+        keep_aspect=not args.stretch, cache_dir=args.cache_dir)
+    logging.info(
+        f"frame LUT for {len(grid_positions)} LEDs sampling {args.width}x{args.height} frames, "
+        f"using {len(np.unique(lut['indices']))} distinct frame pixels")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,545 @@
+"""
+Stream prerecorded content (PNG / NPY frame sequences or raw RGB files) onto the LEDs of a
+fixture export at show frame rates.
+
+The pipeline has three stages, each running in its own thread, connected by bounded queues so
+that a slow stage applies back-pressure to the stages before it:
+
+    reader -> [frame ring buffer] -> mapper -> [LED ring buffer] -> output
+
+- reader: decodes frames ahead into a preallocated ring buffer of frames
+- mapper: samples frames onto the LEDs with the global grid LUT (see `frame_sampler`), and
+  applies the fixtures' colour correction (see `color_correction`)
+- output: paces frames to the target fps and sends them to a sink (e.g. OPC hosts)
+
+Per-stage latency and queue depths are logged periodically and at the end of the stream.
+"""
+
+import argparse
+import glob
+import logging
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from collections.abc import Iterator
+from itertools import count
+
+import numpy as np
+
+from color_correction import ColorCorrection
+from frame_delta import DirtyTracker
+from frame_recording import FrameRecorder, layout_hash
+from frame_sampler import load_frame_lut, sample_frame
+from shared_frames import SharedOutputSink
+from layout_io import (fixture_grid_positions, fixture_label, fixture_offsets,
+                       load_fixtures)
+
+OPC_PROTOCOL = 3
+OPC_SET_PIXELS = 0
+OPC_HEADER_SIZE = 4
+DEFAULT_OPC_PORT = 7890
+REPORT_INTERVAL = 5.0
+
+
+def read_png(path):
+    from PIL import Image
+    with Image.open(path) as image:
+        return np.asarray(image.convert('RGB'))
+
+
+def read_npy(path):
+    frame = np.load(path)
+    if frame.ndim == 2:
+        frame = np.repeat(frame[..., np.newaxis], 3, axis=-1)
+    return frame[..., :3]
+
+
+FRAME_READERS = {
+    '.png': read_png,
+    '.npy': read_npy,
+}
+
+
+def iter_frame_files(paths):
+    """
+    Decode a sequence of image files, in the given order.
+    """
+    for path in paths:
+        reader = FRAME_READERS.get(os.path.splitext(path)[1].lower())
+        if reader is None:
+            raise ValueError(f"unsupported frame file {path}")
+        yield reader(path)
+
+
+def iter_raw_rgb(path, width, height):
+    """
+    Frames from a raw file of concatenated (height, width, 3) uint8 frames.
+    """
+    frame_size = width * height * 3
+    frames = os.path.getsize(path) // frame_size
+    if not frames:
+        return
+    data = np.memmap(path, dtype=np.uint8, mode='r', shape=(frames, height, width, 3))
+    yield from data
+
+
+class FrameSource:
+    """
+    Frames which are decoded again each time they are iterated, with `read(*args)` (e.g.
+    `iter_frame_files` of some paths), so that a looping stream doesn't keep the decoded clip in
+    memory.
+    """
+
+    def __init__(self, read, *args):
+        self.read = read
+        self.args = args
+
+    def __iter__(self):
+        return self.read(*self.args)
+
+
+def frame_source(sources, width=None, height=None):
+    """
+    Create a `FrameSource` from command line style sources: a raw `.rgb` file (which needs
+    `width` and `height`), a directory of frames, or a list of frame files / glob patterns.
+    """
+    if len(sources) == 1 and os.path.splitext(sources[0])[1].lower() in ['.rgb', '.raw']:
+        if width is None or height is None:
+            raise ValueError("raw RGB sources need a width and height")
+        return FrameSource(iter_raw_rgb, sources[0], width, height)
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            paths.extend(sorted(
+                path for path in glob.glob(os.path.join(source, '*'))
+                if os.path.splitext(path)[1].lower() in FRAME_READERS
+            ))
+        else:
+            paths.extend(sorted(glob.glob(source)) or [source])
+    return FrameSource(iter_frame_files, paths)
+
+
+class StageStats:
+    """
+    Thread-safe latency and queue depth statistics for a pipeline stage.
+    """
+
+    def __init__(self, name, depth_label="input queue"):
+        self.name = name
+        self.depth_label = depth_label
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.depth_total = 0
+        self.depth_max = 0
+
+    def record(self, latency, depth):
+        with self.lock:
+            self.frames += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+            self.depth_total += depth
+            self.depth_max = max(self.depth_max, depth)
+
+    def summary(self, reset=False):
+        with self.lock:
+            frames = max(self.frames, 1)
+            summary = (
+                f"{self.name}: {self.frames} frames, "
+                f"latency avg / max {1e3 * self.latency_total / frames: 6.2f} / "
+                f"{1e3 * self.latency_max: 6.2f} ms, "
+                f"{self.depth_label} avg / max {self.depth_total / frames: 4.1f} / "
+                f"{self.depth_max}")
+            if reset:
+                self.reset()
+            return summary
+
+
+class NullSink:
+    """
+    Discards frames, for benchmarking the rest of the pipeline.
+    """
+
+    def send(self, leds):
+        pass
+
+    def build(self, leds):
+        return []
+
+    def send_payloads(self, payloads):
+        pass
+
+    def discard(self, payloads):
+        pass
+
+    def close(self):
+        pass
+
+
+class TeeSink:
+    """
+    Sends frames to several sinks, e.g. to the OPC hosts and a recording.
+    """
+
+    def __init__(self, sinks):
+        self.sinks = sinks
+
+    def send(self, leds):
+        for sink in self.sinks:
+            sink.send(leds)
+
+    def summary(self, reset=False):
+        summaries = [getattr(sink, 'summary', lambda reset: None)(reset) for sink in self.sinks]
+        return '\n'.join(summary for summary in summaries if summary) or None
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+class OpcSink:
+    """
+    Sends each fixture's slice of the LED frame to its OPC host / channel, with one TCP
+    connection per host.
+
+    With a `keepalive` interval (seconds), only fixtures which changed since they were last sent
+    (see `frame_delta.DirtyTracker`) or which are due a keepalive are sent, and hosts without
+    any are skipped. With `hosts`, only the fixtures of those hosts are sent.
+    """
+
+    def __init__(self, fixtures, offsets=None, timeout=1.0, keepalive=None, hosts=None):
+        if offsets is None:
+            offsets = fixture_offsets(fixtures)
+        self.timeout = timeout
+        self.sockets = {}
+        self.fixture_slices = {}
+        ranges = []
+        for fixture, start, end in zip(fixtures, offsets[:-1], offsets[1:]):
+            parameters = fixture['parameters']
+            if parameters.get('protocol') != OPC_PROTOCOL:
+                logging.warning(f"skipping non-OPC fixture {fixture_label(fixture)}")
+                continue
+            if hosts is not None and parameters['host'] not in hosts:
+                continue
+            address = (parameters['host'], parameters.get('port', DEFAULT_OPC_PORT))
+            self.fixture_slices.setdefault(address, []).append(
+                (parameters.get('opcChannel', 0), slice(start, end), len(ranges)))
+            ranges.append((start, end))
+        self.tracker = None
+        if keepalive is not None:
+            starts, ends = np.array(ranges, dtype=int).reshape(-1, 2).T
+            self.tracker = DirtyTracker(starts, ends, keepalive, overhead=OPC_HEADER_SIZE)
+
+    def connect(self, address):
+        if address not in self.sockets:
+            self.sockets[address] = socket.create_connection(address, timeout=self.timeout)
+        return self.sockets[address]
+
+    def send(self, leds):
+        self.send_payloads(self.build(leds))
+
+    def build(self, leds):
+        """
+        The OPC messages of each host for a frame, as a list of (address, fixture indices, bytes).
+        The bytes are copies, so `leds` can change before they are sent with `send_payloads`.
+        """
+        dirty = None if self.tracker is None else self.tracker.update(leds)
+        payloads = []
+        for address, channel_slices in self.fixture_slices.items():
+            if dirty is not None:
+                channel_slices = [item for item in channel_slices if dirty[item[2]]]
+                if not channel_slices:
+                    continue
+            payload = b''.join(
+                struct.pack('>BBH', channel, OPC_SET_PIXELS, 3 * (pixels.stop - pixels.start))
+                + leds[pixels].tobytes()
+                for channel, pixels, _ in channel_slices
+            )
+            payloads.append((address, [idx for _, _, idx in channel_slices], payload))
+        return payloads
+
+    def send_payloads(self, payloads):
+        for address, _, payload in payloads:
+            try:
+                self.connect(address).sendall(payload)
+            except OSError as exc:
+                logging.warning(f"could not send to {address}: {exc}")
+                self.drop(address)
+
+    def discard(self, payloads):
+        """
+        Drop built payloads instead of sending them, so that their fixtures are sent with the
+        next frame.
+        """
+        if self.tracker is not None:
+            self.tracker.invalidate([idx for _, indices, _ in payloads for idx in indices])
+
+    def summary(self, reset=False):
+        if self.tracker is not None:
+            return self.tracker.summary(reset)
+
+    def drop(self, address):
+        if self.tracker is not None:
+            # the host may have missed frames, so resend all of its fixtures
+            self.tracker.invalidate([idx for _, _, idx in self.fixture_slices[address]])
+        sock = self.sockets.pop(address, None)
+        if sock is not None:
+            sock.close()
+
+    def close(self):
+        for address in list(self.sockets):
+            self.drop(address)
+
+
+class FrameStream:
+    """
+    Reader -> mapper -> output pipeline with bounded queues between stages.
+
+    `frames` is an iterable of (height, width, 3) frames, all the same size. With `loop`, it is
+    iterated again for every pass, so it can't be a one-shot iterator (see `FrameSource`, which
+    decodes the frames again). `grid_positions` are the global grid positions of the LEDs (see
+    `layout_io.fixture_grid_positions`). An optional `correction` (see
+    `color_correction.ColorCorrection`) is applied to the LEDs in place.
+    """
+
+    def __init__(
+            self, frames, grid_positions, sink, fps=60.0, read_ahead=8, output_buffers=3,
+            loop=False, lut_cache_dir=None, correction=None):
+        self.frames = frames
+        self.grid_positions = grid_positions
+        self.sink = sink
+        self.fps = fps
+        self.read_ahead = read_ahead
+        self.output_buffers = output_buffers
+        self.loop = loop
+        self.lut_cache_dir = lut_cache_dir
+        self.correction = correction
+        self.stop_event = threading.Event()
+        self.errors = []
+        self.late_frames = 0
+        self.stats = {
+            name: StageStats(name) for name in ['reader', 'mapper', 'output']
+        }
+
+    def prepare(self):
+        """
+        Decode the first frame to size the ring buffers and the sampling LUT.
+        """
+        if self.loop and isinstance(self.frames, Iterator):
+            raise ValueError("looping needs frames which can be iterated again, e.g. FrameSource")
+        self.first_pass = iter(self.frames)
+        first = next(self.first_pass, None)
+        if first is None:
+            raise ValueError("no frames to stream")
+        height, width = first.shape[:2]
+        self.lut = load_frame_lut(self.grid_positions, width, height, cache_dir=self.lut_cache_dir)
+        self.frame_ring = np.zeros((self.read_ahead, height, width, 3), dtype=np.uint8)
+        self.led_ring = np.zeros(
+            (self.output_buffers, len(self.grid_positions), 3), dtype=np.uint8)
+        self.free_frames = queue.Queue()
+        self.free_leds = queue.Queue()
+        for slot in range(self.read_ahead):
+            self.free_frames.put(slot)
+        for slot in range(self.output_buffers):
+            self.free_leds.put(slot)
+        self.mapped = queue.Queue(maxsize=self.output_buffers)
+        self.decoded = queue.Queue(maxsize=self.read_ahead)
+        self.pending_first = first
+
+    def iter_source(self):
+        yield self.pending_first
+        self.pending_first = None
+        yield from self.first_pass
+        # every pass decodes the frames again, stopping if there are none left
+        while self.loop:
+            empty = True
+            for frame in self.frames:
+                empty = False
+                yield frame
+            if empty:
+                return
+
+    def put(self, target, item):
+        while not self.stop_event.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self, source):
+        while not self.stop_event.is_set():
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def run_reader(self):
+        source = iter(self.iter_source())
+        for frame_idx in count():
+            slot = self.get(self.free_frames)
+            if slot is None:
+                return
+            start = time.perf_counter()
+            frame = next(source, None)
+            if frame is None:
+                self.put(self.decoded, None)
+                return
+            np.copyto(self.frame_ring[slot], frame[..., :3], casting='unsafe')
+            self.stats['reader'].record(time.perf_counter() - start, self.decoded.qsize())
+            if not self.put(self.decoded, (frame_idx, slot)):
+                return
+
+    def run_mapper(self):
+        while True:
+            item = self.get(self.decoded)
+            if item is None:
+                self.put(self.mapped, None)
+                return
+            frame_idx, frame_slot = item
+            led_slot = self.get(self.free_leds)
+            if led_slot is None:
+                return
+            start = time.perf_counter()
+            sample_frame(self.frame_ring[frame_slot], self.lut, out=self.led_ring[led_slot])
+            if self.correction is not None:
+                self.correction.apply(self.led_ring[led_slot])
+            self.free_frames.put(frame_slot)
+            self.stats['mapper'].record(time.perf_counter() - start, self.decoded.qsize())
+            if not self.put(self.mapped, (frame_idx, led_slot)):
+                return
+
+    def run_output(self):
+        period = 1.0 / self.fps
+        # the first frame sets the pace, so it can't be late
+        deadline = None
+        last_report = time.perf_counter()
+        while True:
+            depth = self.mapped.qsize()
+            item = self.get(self.mapped)
+            if item is None:
+                return
+            _, led_slot = item
+            now = time.perf_counter()
+            if deadline is None:
+                deadline = now
+            elif now < deadline:
+                time.sleep(deadline - now)
+            else:
+                self.late_frames += 1
+                deadline = now
+            deadline += period
+            start = time.perf_counter()
+            self.sink.send(self.led_ring[led_slot])
+            self.free_leds.put(led_slot)
+            self.stats['output'].record(time.perf_counter() - start, depth)
+            if start - last_report > REPORT_INTERVAL:
+                self.report()
+                last_report = start
+
+    def guarded(self, target):
+        def run():
+            try:
+                target()
+            except Exception as exc:
+                logging.exception(f"stream stage {target.__name__} failed")
+                self.errors.append(exc)
+                self.stop_event.set()
+        return run
+
+    def run(self):
+        self.prepare()
+        threads = [
+            threading.Thread(target=self.guarded(stage), name=stage.__name__, daemon=True)
+            for stage in [self.run_reader, self.run_mapper, self.run_output]
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.1)
+        except KeyboardInterrupt:
+            logging.info("stopping stream")
+            self.stop_event.set()
+        finally:
+            self.stop_event.set()
+            self.sink.close()
+        elapsed = time.perf_counter() - start
+        frames = self.stats['output'].frames
+        logging.info(
+            f"streamed {frames} frames in {elapsed: 7.3f}s ({frames / max(elapsed, 1e-9): 6.2f} fps"
+            f", {self.late_frames} late)")
+        self.report()
+        if self.errors:
+            raise self.errors[0]
+
+    def report(self):
+        for stats in self.stats.values():
+            logging.info(stats.summary())
+        sink_summary = getattr(self.sink, 'summary', lambda: None)()
+        if sink_summary:
+            logging.info(sink_summary)
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('lxm', help="fixture export with global grid parameters")
+    parser.add_argument('sources', nargs='+', help="frame files, directories or a raw .rgb file")
+    parser.add_argument('--fps', type=float, default=60.0)
+    parser.add_argument('--width', type=int, help="frame width of raw RGB sources")
+    parser.add_argument('--height', type=int, help="frame height of raw RGB sources")
+    parser.add_argument('--read-ahead', type=int, default=8)
+    parser.add_argument('--loop', action='store_true')
+    parser.add_argument('--dry-run', action='store_true', help="don't send to the OPC hosts")
+    parser.add_argument('--record', help="also append the LED frames to this recording")
+    parser.add_argument(
+        '--output-processes', type=int,
+        help="send from this many processes through shared memory, 0 for one per host")
+    parser.add_argument(
+        '--keepalive', type=float,
+        help="only send changed fixtures, and unchanged ones after this many seconds")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    fixtures = load_fixtures(args.lxm)
+    if args.output_processes is not None:
+        sink = SharedOutputSink(
+            fixtures, processes=args.output_processes or None, dry_run=args.dry_run,
+            keepalive=args.keepalive)
+    elif args.dry_run:
+        sink = NullSink()
+    else:
+        sink = OpcSink(fixtures, keepalive=args.keepalive)
+    if args.record:
+        recorder = FrameRecorder(
+            args.record, fixture_offsets(fixtures)[-1], args.fps, layout_hash(fixtures))
+        sink = TeeSink([sink, recorder])
+    correction = ColorCorrection(fixtures)
+    stream = FrameStream(
+        frame_source(args.sources, args.width, args.height),
+        fixture_grid_positions(fixtures),
+        sink,
+        fps=args.fps,
+        read_ahead=args.read_ahead,
+        loop=args.loop,
+        correction=None if correction.is_identity() else correction
+    )
+    stream.run()
+
+
+if __name__ == '__main__':
+    main()
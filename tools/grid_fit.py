@@ -0,0 +1,147 @@
+"""
+Fit the global grid transform of every panel at once.
+
+Each pixel is projected onto the projection plane (like `light_layout.grid_project`) and scaled by
+the grid quantization, giving its target global grid coordinates. The grid origin and 2x2 grid
+matrix of a panel are first fitted together, as the least squares affine fit over all of its pixels
+of `origin + matrix @ pixel = target`. The global grid needs integer origins, so the origin is then
+rounded and the matrix fitted again with the origin fixed, so that the rounding doesn't bias it.
+
+The fits for all panels are solved together from stacked normal equations, with pixels from all
+panels concatenated and reduced per panel.
+"""
+
+import numpy as np
+
+
+def grid_project_positions(proj_origin, positions):
+    """
+    Vectorised `light_layout.grid_project`: perspective project (N, 3) world positions (relative
+    to the projection origin) onto the plane through `proj_origin` normal to it, rotated about Y
+    so that the plane is normal to the Z axis.
+    """
+    proj_origin = np.asarray(proj_origin, dtype=float)
+    positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+    magnitude = np.linalg.norm(proj_origin)
+    phi = np.arccos(np.clip(proj_origin[2] / magnitude, -1, 1))
+    rotation = np.array([
+        [np.cos(phi), 0, np.sin(phi)],
+        [0, 1, 0],
+        [-np.sin(phi), 0, np.cos(phi)],
+    ])
+    relative = positions + proj_origin
+    distance = relative @ proj_origin / magnitude
+    return (relative * (magnitude / distance)[:, np.newaxis] - proj_origin) @ rotation.T
+
+
+def grid_coordinates(projected, quantization):
+    """
+    Global grid coordinates of projected positions: the grid x axis is the projected -y axis
+    and the grid y axis is the projected x axis.
+    """
+    projected = np.asarray(projected, dtype=float).reshape(-1, 3)
+    return np.stack([-projected[:, 1], projected[:, 0]], axis=-1) / quantization
+
+
+def panel_moments(panel_ids, panel_count, left, right):
+    """
+    (P, 2, 2) per-panel sums of the outer products of the (N, 2) rows of `left` and `right`.
+    """
+    moments = np.zeros((panel_count, 2, 2))
+    for i in range(2):
+        for j in range(2):
+            moments[:, i, j] = np.bincount(
+                panel_ids, weights=left[:, i] * right[:, j], minlength=panel_count)
+    return moments
+
+
+def concatenate_panels(panel_pixels, panel_targets):
+    lengths = [len(pixels) for pixels in panel_pixels]
+    panel_ids = np.repeat(np.arange(len(lengths)), lengths)
+    pixels = np.concatenate(
+        [np.reshape(pixels, (-1, 2)) for pixels in panel_pixels]).astype(float)
+    targets = np.concatenate([np.reshape(targets, (-1, 2)) for targets in panel_targets])
+    return panel_ids, pixels, targets
+
+
+def solve_matrices(gram, moments):
+    """
+    Solve the normal equations `gram @ M^T = moments` of each panel. The pseudo-inverse copes
+    with panels whose pixels are all in a line.
+    """
+    return np.swapaxes(np.linalg.pinv(gram) @ moments, 1, 2)
+
+
+def fit_grid_affines(panel_pixels, panel_targets):
+    """
+    Least squares fit of the (P, 2) origins and (P, 2, 2) matrices which map each panel's pixels
+    onto its target grid coordinates, as `origin + matrix @ pixel`.
+    """
+    panel_count = len(panel_pixels)
+    panel_ids, pixels, targets = concatenate_panels(panel_pixels, panel_targets)
+    counts = np.maximum(np.bincount(panel_ids, minlength=panel_count), 1)[:, np.newaxis]
+
+    # fitting about the centroids separates the origin from the matrix, and keeps the origin of
+    # a degenerate panel (e.g. a single pixel) on its pixels
+    pixel_means = np.stack([
+        np.bincount(panel_ids, weights=pixels[:, i], minlength=panel_count) for i in range(2)
+    ], axis=-1) / counts
+    target_means = np.stack([
+        np.bincount(panel_ids, weights=targets[:, i], minlength=panel_count) for i in range(2)
+    ], axis=-1) / counts
+    centred_pixels = pixels - pixel_means[panel_ids]
+    matrices = solve_matrices(
+        panel_moments(panel_ids, panel_count, centred_pixels, centred_pixels),
+        panel_moments(panel_ids, panel_count, centred_pixels, targets - target_means[panel_ids]))
+    origins = target_means - np.einsum('nij,nj->ni', matrices, pixel_means)
+    return origins, matrices
+
+
+def fit_grid_matrices(panel_pixels, panel_targets, origins):
+    """
+    Least squares fit of the (P, 2, 2) grid matrices which map each panel's pixels onto its target
+    grid coordinates relative to its (P, 2) `origins`.
+
+    Returns the matrices, and the per-panel RMS and maximum residuals in grid units.
+    """
+    panel_count = len(panel_pixels)
+    panel_ids, pixels, targets = concatenate_panels(panel_pixels, panel_targets)
+    origins = np.asarray(origins, dtype=float).reshape(-1, 2)
+    relative = targets - origins[panel_ids]
+
+    # normal equations: (sum p p^T) M^T = sum p t^T for each panel
+    matrices = solve_matrices(
+        panel_moments(panel_ids, panel_count, pixels, pixels),
+        panel_moments(panel_ids, panel_count, pixels, relative))
+
+    residuals = np.linalg.norm(
+        np.einsum('nij,nj->ni', matrices[panel_ids], pixels) - relative, axis=-1)
+    counts = np.maximum(np.bincount(panel_ids, minlength=panel_count), 1)
+    rms = np.sqrt(np.bincount(panel_ids, weights=residuals ** 2, minlength=panel_count) / counts)
+    maximum = np.zeros(panel_count)
+    np.maximum.at(maximum, panel_ids, residuals)
+    return matrices, rms, maximum
+
+
+def fit_panel_grids(panel_pixels, panel_projected, quantization):
+    """
+    Fit the grid origins and matrices of all panels for a quantization, from the projected
+    positions of their pixels (see `grid_project_positions`).
+
+    Returns a dict with the (P, 2) integer `origins`, (P, 2, 2) `matrices`, per-panel `rms` and
+    `max` residuals, and the `pitch` of each panel's pixels on the grid (the length of the
+    shorter matrix column), all in grid units.
+    """
+    panel_targets = [
+        grid_coordinates(projected, quantization) for projected in panel_projected
+    ]
+    origins, _ = fit_grid_affines(panel_pixels, panel_targets)
+    origins = np.rint(origins)
+    matrices, rms, maximum = fit_grid_matrices(panel_pixels, panel_targets, origins)
+    return {
+        'origins': origins.astype(int),
+        'matrices': matrices,
+        'rms': rms,
+        'max': maximum,
+        'pitch': np.linalg.norm(matrices, axis=1).min(axis=1),
+    }
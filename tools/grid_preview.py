@@ -0,0 +1,231 @@
+"""
+Draw the global grid pixel map of a layout straight into an image array and write it as a PNG,
+without matplotlib.
+
+Each fixture gets its own colour. Its pixels are drawn as dots joined by its wiring path at half
+brightness, and every grid position taken by more than one pixel is drawn as a larger
+`COLLISION_COLOUR` dot. The grid's y axis points up, so image rows are flipped.
+
+The lines are rasterised by sampling each wiring segment at every image pixel along its longer
+axis, all segments at once, and the PNG is written with `zlib`, so a map of 10k pixels takes a
+fraction of a second. `light_layout.main` draws the map of each layout in a background thread
+(see `start_preview`).
+
+    python tools/grid_preview.py dome.lxm mapping.png
+"""
+
+import argparse
+import logging
+import os
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+from grid_quantization import pack_positions
+from layout_io import (fixture_grid_positions, fixture_label, fixture_offsets, load_fixtures,
+                       transform_grid_positions)
+
+# image pixels per grid unit
+DEFAULT_SCALE = 6
+# empty grid units around the pixels
+DEFAULT_MARGIN = 2
+BACKGROUND = (16, 16, 16)
+COLLISION_COLOUR = (255, 0, 0)
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# each fixture's hue is this far around the colour wheel from the last, so neighbours differ
+GOLDEN_RATIO_CONJUGATE = 0.618033988749895
+
+
+def fixture_colours(count, saturation=0.75, value=1.0):
+    """
+    (count, 3) uint8 colours with well spread hues.
+    """
+    hues = (np.arange(count) * GOLDEN_RATIO_CONJUGATE) % 1.0
+    # HSV to RGB, each channel is a clipped triangle wave of the hue
+    channels = np.abs((hues[:, np.newaxis] * 6 + [0, 4, 2]) % 6 - 3) - 1
+    rgb = value * (1 - saturation + saturation * np.clip(channels, 0, 1))
+    return np.rint(255 * rgb).astype(np.uint8)
+
+
+def sample_segments(starts, ends, samples_per_unit):
+    """
+    Points along each segment from `starts[i]` to `ends[i]`, `samples_per_unit` per unit of the
+    segment's longer axis. Returns the (M, 2) points and the segment of each point.
+    """
+    lengths = np.abs(ends - starts).max(axis=1) if len(starts) else np.zeros(0)
+    steps = np.ceil(lengths * samples_per_unit).astype(int) + 1
+    segments = np.repeat(np.arange(len(starts)), steps)
+    first_sample = np.cumsum(steps) - steps
+    fractions = (np.arange(steps.sum()) - first_sample[segments]) / np.maximum(steps - 1, 1)[
+        segments]
+    points = starts[segments] + (ends - starts)[segments] * fractions[:, np.newaxis]
+    return points, segments
+
+
+def draw_squares(image, rows, cols, colours, radius):
+    """
+    Fill a square of `2 * radius + 1` image pixels around each (row, col) with its colour.
+    """
+    offsets = np.arange(-radius, radius + 1)
+    square_rows = (rows[:, np.newaxis, np.newaxis] + offsets[:, np.newaxis]).clip(
+        0, image.shape[0] - 1)
+    square_cols = (cols[:, np.newaxis, np.newaxis] + offsets).clip(0, image.shape[1] - 1)
+    image[square_rows, square_cols] = colours[:, np.newaxis, np.newaxis]
+
+
+def colliding_positions(positions):
+    """
+    A mask of the (N, 2) grid positions which are taken by more than one pixel.
+    """
+    if not len(positions):
+        return np.zeros(0, dtype=bool)
+    _, inverse, counts = np.unique(
+        pack_positions(positions), return_inverse=True, return_counts=True)
+    return counts[inverse.reshape(-1)] > 1
+
+
+def render_grid_preview(panel_positions, scale=DEFAULT_SCALE, margin=DEFAULT_MARGIN):
+    """
+    Draw the (N, 2) integer global grid positions of each panel, in wiring order, into an
+    (H, W, 3) uint8 image.
+    """
+    panel_positions = [np.reshape(positions, (-1, 2)) for positions in panel_positions]
+    positions = np.concatenate(panel_positions or [np.zeros((0, 2), dtype=int)])
+    if not len(positions):
+        return np.full((1, 1, 3), BACKGROUND, dtype=np.uint8)
+    panel_ids = np.repeat(np.arange(len(panel_positions)), [len(p) for p in panel_positions])
+    colours = fixture_colours(len(panel_positions))
+
+    low = positions.min(axis=0) - margin
+    high = positions.max(axis=0) + margin
+    width, height = (high - low + 1) * scale
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = BACKGROUND
+
+    def image_coordinates(points):
+        cols = np.rint((points[:, 0] - low[0]) * scale + scale // 2).astype(int)
+        rows = np.rint((high[1] - points[:, 1]) * scale + scale // 2).astype(int)
+        return rows, cols
+
+    # wiring paths, between consecutive pixels of the same panel
+    wired = panel_ids[1:] == panel_ids[:-1]
+    points, segments = sample_segments(
+        positions[:-1][wired].astype(float), positions[1:][wired].astype(float), scale)
+    rows, cols = image_coordinates(points)
+    image[rows, cols] = colours[panel_ids[:-1][wired][segments]] // 2
+
+    radius = max(scale // 4, 0)
+    rows, cols = image_coordinates(positions)
+    draw_squares(image, rows, cols, colours[panel_ids], radius)
+    colliding = colliding_positions(positions)
+    if colliding.any():
+        draw_squares(
+            image, rows[colliding], cols[colliding],
+            np.tile(np.array(COLLISION_COLOUR, dtype=np.uint8), (colliding.sum(), 1)), radius + 1)
+    return image
+
+
+def png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack(
+        '>I', zlib.crc32(kind + data) & 0xffffffff)
+
+
+def encode_png(image, level=6):
+    """
+    An 8 bit RGB PNG of an (H, W, 3) uint8 image, with no row filters.
+    """
+    height, width, _ = image.shape
+    # every row starts with its filter type, 0 for none
+    scanlines = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    scanlines[:, 1:] = image.reshape(height, -1)
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return PNG_SIGNATURE + png_chunk(b'IHDR', header) + png_chunk(
+        b'IDAT', zlib.compress(scanlines.tobytes(), level)) + png_chunk(b'IEND', b'')
+
+
+def write_png(path, image):
+    """
+    Write an (H, W, 3) uint8 image to `path`, through a temporary file so that a viewer never
+    sees a partial image.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as stream:
+        stream.write(encode_png(image))
+    os.replace(tmp_path, path)
+
+
+def grid_info_positions(grid_info):
+    """
+    The labels and (N, 2) global grid positions of the pixels of each panel of
+    `light_layout.run_layout`'s `grid_info`.
+    """
+    labels = list(grid_info)
+    positions = [
+        transform_grid_positions(
+            info.get('pixels', [[0, 0]]),
+            [float(value) for value in info.get('grid_origin', [0, 0])],
+            [[float(value) for value in row] for row in info.get('grid_matrix', [[1, 0], [0, 1]])])
+        for info in grid_info.values()
+    ]
+    return labels, positions
+
+
+def log_collisions(labels, panel_positions):
+    """
+    Warn about every grid position which is taken by pixels of more than one panel.
+    """
+    if not panel_positions:
+        return
+    positions = np.concatenate([np.reshape(p, (-1, 2)) for p in panel_positions])
+    panel_ids = np.repeat(np.arange(len(labels)), [len(p) for p in panel_positions])
+    colliding = colliding_positions(positions)
+    if not colliding.any():
+        return
+    keys = pack_positions(positions)[colliding]
+    for key in np.unique(keys):
+        panels = sorted({labels[idx] for idx in panel_ids[colliding][keys == key]})
+        position = tuple(positions[colliding][keys == key][0].tolist())
+        logging.warning(f"Duplicate position: {position} mapped by {', '.join(panels)}")
+
+
+def save_grid_preview(labels, panel_positions, path, scale=DEFAULT_SCALE):
+    log_collisions(labels, panel_positions)
+    write_png(path, render_grid_preview(panel_positions, scale))
+    logging.info(f"wrote grid preview of {len(labels)} panels to {path}")
+
+
+def start_preview(grid_info, path, scale=DEFAULT_SCALE):
+    """
+    Save the preview of a `grid_info` in a background thread, which the caller should join.
+    The grid positions are computed before the thread starts, so `grid_info` may change after.
+    """
+    labels, panel_positions = grid_info_positions(grid_info)
+    thread = threading.Thread(
+        target=save_grid_preview, args=(labels, panel_positions, path, scale),
+        name=f"grid-preview-{os.path.basename(path)}")
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('lxm', help="fixture export")
+    parser.add_argument('png', help="image to write")
+    parser.add_argument(
+        '--scale', type=int, default=DEFAULT_SCALE, help="image pixels per grid unit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    fixtures = load_fixtures(args.lxm)
+    offsets = fixture_offsets(fixtures)
+    positions = fixture_grid_positions(fixtures)
+    save_grid_preview(
+        [fixture_label(fixture) for fixture in fixtures],
+        [positions[start:end] for start, end in zip(offsets[:-1], offsets[1:])],
+        args.png, args.scale)
+
+
+if __name__ == '__main__':
+    main()
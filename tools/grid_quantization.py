@@ -0,0 +1,171 @@
+"""
+Search for the coarsest global grid quantization (and optionally small integer offsets for each
+panel) which maps every pixel of every panel onto its own global grid position.
+
+The global grid positions of a panel's pixels depend on the quantization through the grid origin
+and matrix solved for that panel, so the search is given a function which maps a quantization and
+optional (P, 2) integer offsets of the panel grid origins to a list of (N, 2) integer grid position
+arrays, one per panel, e.g.:
+
+    def panel_grid_positions(quantization, offsets=None):
+        return [transform_grid_positions(pixels, origin + offset, matrix) for ...]
+
+Collisions are detected by packing all grid positions into unique integer keys and sorting them,
+rather than inserting pixels into a dict one by one.
+"""
+
+import logging
+from itertools import product
+
+import numpy as np
+
+# scan this many quantizations between `min_factor` and `max_factor` times the starting one
+SCAN_STEPS = 24
+# then refine between the coarsest collision-free scan step and the next one this many times
+REFINE_STEPS = 12
+
+
+def pack_positions(positions):
+    """
+    Pack (N, 2) integer grid positions into (N,) int64 keys, which are equal if and only if the
+    positions are equal.
+    """
+    positions = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+    if not len(positions):
+        return np.zeros(0, dtype=np.int64)
+    low = positions.min(axis=0)
+    span = positions[:, 1].max() - low[1] + 1
+    return (positions[:, 0] - low[0]) * span + (positions[:, 1] - low[1])
+
+
+def count_collisions(panel_positions):
+    """
+    The number of pixels which land on a global grid position already taken by another pixel.
+    """
+    keys = pack_positions(np.concatenate([np.reshape(p, (-1, 2)) for p in panel_positions]))
+    return len(keys) - len(np.unique(keys))
+
+
+def panel_collisions(panel_positions):
+    """
+    The number of pixels of each panel which share their global grid position with any other
+    pixel.
+    """
+    panel_positions = [np.reshape(p, (-1, 2)) for p in panel_positions]
+    keys = pack_positions(np.concatenate(panel_positions))
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    colliding = counts[inverse.reshape(-1)] > 1
+    panel_ids = np.repeat(np.arange(len(panel_positions)), [len(p) for p in panel_positions])
+    return np.bincount(panel_ids[colliding], minlength=len(panel_positions))
+
+
+def resolve_offsets(panel_positions, radius=1, max_passes=4):
+    """
+    Greedily choose an integer (x, y) offset within `radius` for each colliding panel which
+    minimises the collisions of that panel with the others. Returns the (P, 2) offsets and the
+    number of collisions remaining after they are applied.
+    """
+    panel_positions = [np.reshape(p, (-1, 2)).astype(np.int64) for p in panel_positions]
+    offsets = np.zeros((len(panel_positions), 2), dtype=np.int64)
+    candidates = sorted(
+        product(range(-radius, radius + 1), repeat=2), key=lambda offset: np.hypot(*offset))
+    candidates = np.array(candidates, dtype=np.int64)
+
+    def shifted(idx):
+        return panel_positions[idx] + offsets[idx]
+
+    for _ in range(max_passes):
+        collisions = panel_collisions([shifted(idx) for idx in range(len(panel_positions))])
+        if not collisions.any():
+            return offsets, 0
+        for panel_idx in np.argsort(-collisions, kind='stable'):
+            if not collisions[panel_idx]:
+                break
+            others = np.concatenate([
+                shifted(idx) for idx in range(len(panel_positions)) if idx != panel_idx
+            ] or [np.zeros((0, 2), dtype=np.int64)])
+            positions = panel_positions[panel_idx]
+            # pack the candidate positions with the others so that they share a key space
+            stacked = np.concatenate(
+                [others] + [positions + offset for offset in candidates])
+            keys = pack_positions(stacked)
+            candidate_keys = keys[len(others):].reshape(len(candidates), len(positions))
+            hits = np.isin(candidate_keys, keys[:len(others)]).sum(axis=1)
+            offsets[panel_idx] = candidates[np.argmin(hits)]
+    remaining = count_collisions([shifted(idx) for idx in range(len(panel_positions))])
+    return offsets, remaining
+
+
+def evaluate_quantization(panel_grid_positions, quantization, offset_radius=0):
+    """
+    Returns (collisions, offsets) for `quantization`, resolving collisions with panel offsets
+    if `offset_radius` is non-zero. `offsets` is None if no offsets were needed.
+
+    Offsets are chosen on the truncated grid positions, but are applied to the grid origins
+    before truncation, which can differ by one next to the grid axes, so the collisions are
+    counted again with the offsets applied.
+    """
+    panel_positions = panel_grid_positions(quantization)
+    collisions = count_collisions(panel_positions)
+    if not collisions or not offset_radius:
+        return collisions, None
+    offsets, remaining = resolve_offsets(panel_positions, offset_radius)
+    if remaining == collisions:
+        return collisions, None
+    return count_collisions(panel_grid_positions(quantization, offsets)), offsets
+
+
+def optimise_quantization(
+        panel_grid_positions, start, min_factor=0.25, max_factor=4.0, offset_radius=0,
+        scan_steps=SCAN_STEPS, refine_steps=REFINE_STEPS):
+    """
+    Find the coarsest quantization between `start * min_factor` and `start * max_factor` for
+    which `panel_grid_positions` has no collisions (after panel offsets, if `offset_radius` is
+    given).
+
+    Collisions are not strictly monotonic in the quantization, so a geometric scan finds the
+    coarsest collision-free step, then bisection refines towards the next (colliding) step.
+
+    Returns a dict with the `quantization`, the per-panel `offsets` (or None) and the number
+    of `collisions`. If no collision-free quantization is found, `start` is returned along with
+    its collisions, since a finer grid would only make every frame larger (e.g. when panels
+    overlap in the projection, no quantization can separate them).
+    """
+    scan = np.geomspace(start * min_factor, start * max_factor, scan_steps)
+    results = [evaluate_quantization(panel_grid_positions, q, offset_radius) for q in scan]
+    collisions = np.array([result[0] for result in results])
+    for quantization, (count, offsets) in zip(scan, results):
+        logging.debug(
+            f"quantization {quantization:.6f}: {count} collisions"
+            + (f", offsets {offsets.tolist()}" if offsets is not None else ""))
+
+    free = np.flatnonzero(collisions == 0)
+    if not len(free):
+        count, offsets = evaluate_quantization(panel_grid_positions, start, offset_radius)
+        logging.warning(
+            f"no collision-free quantization found, keeping {start:.6f} ({count} collisions)")
+        return {'quantization': start, 'offsets': offsets, 'collisions': count}
+
+    best = free[-1]
+    good, (_, good_offsets) = scan[best], results[best]
+    if best + 1 < len(scan):
+        bad = scan[best + 1]
+        for _ in range(refine_steps):
+            middle = (good + bad) / 2
+            count, offsets = evaluate_quantization(panel_grid_positions, middle, offset_radius)
+            if count:
+                bad = middle
+            else:
+                good, good_offsets = middle, offsets
+
+    logging.info(
+        f"coarsest collision-free quantization: {good:.6f} ({good / start:.3f} x {start:.6f})")
+    return {'quantization': good, 'offsets': good_offsets, 'collisions': 0}
+
+
+def grid_extent(panel_positions):
+    """
+    The (width, height) of the bounding box of all global grid positions.
+    """
+    positions = np.concatenate([np.reshape(p, (-1, 2)) for p in panel_positions])
+    return tuple((positions.max(axis=0) - positions.min(axis=0) + 1).tolist())
@@ -0,0 +1,242 @@
+"""
+Blender add-on which keeps the layout modules loaded between runs, and only reloads a module when
+its file has been modified. Tests, light layout and structure export can be run separately from
+the "LED Portal" tab of the 3D view sidebar, or with `bpy.ops.ledportal.*` operators.
+
+Unlike `script_wrapper.py`, which re-imports and re-executes every module on every run, this
+makes iterating on layout parameters as cheap as re-running `main()`.
+
+Either run this file once from the Scripting tab to register it, or symlink it into Blender's
+add-on directory and enable it in the preferences.
+"""
+
+import ast
+import importlib
+import logging
+import os
+import sys
+import traceback
+import unittest
+
+import bpy
+
+bl_info = {
+    "name": "LED Portal Layout Tools",
+    "description": "Generate LED layouts and export structures for LXStudio",
+    "blender": (2, 80, 0),
+    "category": "Object",
+}
+
+TOOLS_DIR = os.path.dirname(os.path.realpath(__file__))
+REPO_DIR = os.path.dirname(TOOLS_DIR)
+TESTS_DIR = os.path.join(REPO_DIR, 'tests')
+
+TEST_PREFIX = 'test_'
+
+
+def module_imports(path):
+    """
+    The names of the top level modules imported anywhere in the Python file at `path`.
+    """
+    with open(path) as stream:
+        tree = ast.parse(stream.read(), path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and not node.level and node.module:
+            names.add(node.module.split('.')[0])
+    return names
+
+
+def find_test_modules(tests_dir=TESTS_DIR):
+    return sorted(
+        os.path.splitext(name)[0] for name in os.listdir(tests_dir)
+        if name.startswith(TEST_PREFIX) and name.endswith('.py'))
+
+
+class ModuleCache:
+    """
+    Imports modules from the tools and tests directories, and reloads them when the mtime of
+    their file changes, or when a module they import from those directories has been reloaded
+    since they were, since they hold references to its contents.
+
+    The modules a module depends on are found by parsing its imports, so new modules don't need
+    to be registered anywhere.
+    """
+
+    def __init__(self, search_dirs):
+        self.search_dirs = search_dirs
+        self.mtimes = {}
+        self.loaded_at = {}
+        self.generation = 0
+        # name -> (mtime, names of the search dir modules it imports)
+        self.imports = {}
+
+    def ensure_path(self):
+        for search_dir in reversed(self.search_dirs):
+            if search_dir not in sys.path:
+                sys.path.insert(0, search_dir)
+
+    def find_module(self, name):
+        for search_dir in self.search_dirs:
+            path = os.path.join(search_dir, f"{name}.py")
+            if os.path.exists(path):
+                return path
+        return None
+
+    def module_path(self, name):
+        path = self.find_module(name)
+        if path is None:
+            raise ImportError(f"could not find module {name} in {self.search_dirs}")
+        return path
+
+    def dependencies(self, name):
+        """
+        The modules in the search directories which `name` imports, parsed again when its file
+        changes.
+        """
+        path = self.module_path(name)
+        mtime = os.path.getmtime(path)
+        if self.imports.get(name, (None,))[0] != mtime:
+            self.imports[name] = (mtime, sorted(
+                imported for imported in module_imports(path)
+                if imported != name and self.find_module(imported) is not None))
+        return self.imports[name][1]
+
+    def load_order(self, name):
+        """
+        `name` and every module it depends on, each after its own dependencies.
+        """
+        order = []
+        visiting = set()
+
+        def visit(module):
+            if module in order or module in visiting:
+                return
+            visiting.add(module)
+            for dependency in self.dependencies(module):
+                visit(dependency)
+            order.append(module)
+
+        visit(name)
+        return order
+
+    def is_stale(self, name):
+        return name not in sys.modules \
+            or self.mtimes.get(name) != os.path.getmtime(self.module_path(name))
+
+    def load(self, name):
+        """
+        Import `name` and its dependencies. A module is reloaded if its file has changed, or if
+        a module it depends on has been (re)loaded since it was. Returns the module.
+        """
+        self.ensure_path()
+        for module_name in self.load_order(name):
+            newest_dependency = max([
+                self.loaded_at.get(dependency, 0)
+                for dependency in self.dependencies(module_name)
+            ] or [0])
+            if self.is_stale(module_name) \
+                    or self.loaded_at.get(module_name, 0) < newest_dependency:
+                mtime = os.path.getmtime(self.module_path(module_name))
+                if module_name in sys.modules:
+                    logging.info(f"reloading {module_name}")
+                    importlib.reload(sys.modules[module_name])
+                else:
+                    logging.info(f"importing {module_name}")
+                    importlib.import_module(module_name)
+                self.generation += 1
+                self.loaded_at[module_name] = self.generation
+                self.mtimes[module_name] = mtime
+        return sys.modules[name]
+
+
+MODULE_CACHE = ModuleCache([TOOLS_DIR, TESTS_DIR])
+
+
+class LEDPORTAL_OT_run_layout(bpy.types.Operator):
+    """Generate lights for the selected polygons of the active object"""
+    bl_idname = "ledportal.run_layout"
+    bl_label = "Run Light Layout"
+
+    def execute(self, context):
+        return run_main(self, 'light_layout')
+
+
+class LEDPORTAL_OT_export_structure(bpy.types.Operator):
+    """Export the selected meshes as a structure"""
+    bl_idname = "ledportal.export_structure"
+    bl_label = "Export Structure"
+
+    def execute(self, context):
+        return run_main(self, 'export_structure')
+
+
+class LEDPORTAL_OT_run_tests(bpy.types.Operator):
+    """Run the layout tests"""
+    bl_idname = "ledportal.run_tests"
+    bl_label = "Run Tests"
+
+    def execute(self, context):
+        try:
+            suite = unittest.TestSuite()
+            for name in find_test_modules():
+                module = MODULE_CACHE.load(name)
+                suite.addTests(unittest.TestLoader().loadTestsFromModule(module))
+            result = unittest.TextTestRunner(verbosity=2).run(suite)
+        except Exception:
+            traceback.print_exc()
+            self.report({'ERROR'}, "could not load tests, see console")
+            return {'CANCELLED'}
+        if not result.wasSuccessful():
+            self.report(
+                {'ERROR'}, f"{len(result.failures)} failures, {len(result.errors)} errors")
+            return {'CANCELLED'}
+        self.report({'INFO'}, f"{result.testsRun} tests passed")
+        return {'FINISHED'}
+
+
+def run_main(operator, name):
+    try:
+        MODULE_CACHE.load(name).main()
+    except Exception:
+        traceback.print_exc()
+        operator.report({'ERROR'}, f"{name} failed, see console")
+        return {'CANCELLED'}
+    return {'FINISHED'}
+
+
+class LEDPORTAL_PT_tools(bpy.types.Panel):
+    bl_label = "LED Portal"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = "LED Portal"
+
+    def draw(self, context):
+        layout = self.layout
+        layout.operator(LEDPORTAL_OT_run_tests.bl_idname)
+        layout.operator(LEDPORTAL_OT_run_layout.bl_idname)
+        layout.operator(LEDPORTAL_OT_export_structure.bl_idname)
+
+
+CLASSES = [
+    LEDPORTAL_OT_run_layout,
+    LEDPORTAL_OT_export_structure,
+    LEDPORTAL_OT_run_tests,
+    LEDPORTAL_PT_tools,
+]
+
+
+def register():
+    for cls in CLASSES:
+        bpy.utils.register_class(cls)
+
+
+def unregister():
+    for cls in reversed(CLASSES):
+        bpy.utils.unregister_class(cls)
+
+
+if __name__ == '__main__':
+    register()
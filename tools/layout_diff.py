@@ -0,0 +1,293 @@
+"""
+Compare two layout exports (e.g. the `_OG` and `_BACK` variants of a structure), panel by panel.
+
+Each side is a panel export (`.json`) and optionally its fixtures (`.lxm`, found next to the panel
+export by default). Panels are matched by fixture label, panel name or export order, and for each
+matched pair the diff reports the change in pixel count, the largest displacement of an LED (by
+wiring order), the largest change in the panel matrix, angles and global grid transform, and any
+changed fixture parameters like the host or channel. Panels and LEDs are loaded into flat arrays
+so that every comparison is vectorised across all panels.
+
+    python tools/layout_diff.py \\
+        LEDPortalSimulator/data/TeleCortex_Dome_5630_Panels_Full_OG.json \\
+        LEDPortalSimulator/data/TeleCortex_Dome_5630_Panels_Full_BACK.json --match name
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+from layout_io import fixture_grid_transform, fixture_label, load_fixtures, load_panels
+
+ANGLES = ['pitch', 'yaw', 'roll']
+# fixture parameters which are compared as values rather than geometry
+FIXTURE_PARAMETERS = ['label', 'host', 'port', 'protocol', 'opcChannel', 'artNetUniverse']
+MATCH_KEYS = ['label', 'name', 'index']
+# differences smaller than this are not reported
+TOLERANCE = 1e-6
+
+
+def default_fixtures_path(panels_path):
+    path = os.path.splitext(panels_path)[0] + '.lxm'
+    return path if os.path.exists(path) else None
+
+
+def load_layout(panels_path, fixtures_path=None):
+    """
+    Load a panel export and its optional fixtures into arrays:
+    - `names`, `labels`: (P,) panel names and fixture labels (or None)
+    - `counts`, `offsets`: (P,) pixel counts and the (P + 1,) offsets of each panel's LEDs
+    - `positions`: (N, 3) world positions of every LED in export order
+    - `matrices`: (P, 4, 4) panel pixel matrices
+    - `angles`: (P, 3) pitch, yaw and roll, NaN where they weren't exported
+    - `grids`: (P, 6) global grid origins and matrices of the fixtures (see
+      `layout_io.fixture_grid_transform`), or None
+    - `parameters`: the fixture parameters in `FIXTURE_PARAMETERS` of each panel, or None
+    """
+    panels = load_panels(panels_path)
+    fixtures = load_fixtures(fixtures_path) if fixtures_path else None
+    if fixtures is not None and len(fixtures) != len(panels):
+        raise ValueError(
+            f"{fixtures_path} has {len(fixtures)} fixtures but {panels_path} has "
+            f"{len(panels)} panels")
+
+    counts = np.array([len(panel['pixels']) for panel in panels], dtype=int)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    pixels = np.concatenate(
+        [np.reshape(np.array(panel['pixels'], dtype=float), (-1, 2)) for panel in panels]
+        or [np.zeros((0, 2))])
+    matrices = np.array([panel['matrix'] for panel in panels], dtype=float).reshape(-1, 4, 4)
+    # pixels are on the z = 0 plane of their panel
+    panel_ids = np.repeat(np.arange(len(panels)), counts)
+    positions = np.einsum('nij,nj->ni', matrices[panel_ids, :3, :2], pixels) \
+        + matrices[panel_ids, :3, 3]
+
+    angles = np.array([
+        [panel.get(angle, np.nan) for angle in ANGLES] for panel in panels
+    ], dtype=float).reshape(-1, 3)
+    if fixtures is not None:
+        fixture_angles = np.array([
+            [fixture['parameters'].get(angle, np.nan) for angle in ANGLES]
+            for fixture in fixtures
+        ], dtype=float).reshape(-1, 3)
+        angles = np.where(np.isnan(angles), fixture_angles, angles)
+        grids = np.array([
+            np.concatenate([origin, matrix.reshape(-1)])
+            for origin, matrix in map(fixture_grid_transform, fixtures)
+        ]).reshape(-1, 6)
+    else:
+        grids = None
+
+    return {
+        'names': [panel.get('name') for panel in panels],
+        'labels': [fixture_label(fixture) for fixture in fixtures] if fixtures else None,
+        'counts': counts,
+        'offsets': offsets,
+        'positions': positions,
+        'matrices': matrices,
+        'angles': angles,
+        'grids': grids,
+        'parameters': [
+            {key: fixture['parameters'].get(key) for key in FIXTURE_PARAMETERS}
+            for fixture in fixtures
+        ] if fixtures is not None else None,
+    }
+
+
+def panel_keys(layout, match):
+    if match == 'index':
+        return [str(idx) for idx in range(len(layout['counts']))]
+    keys = layout['labels'] if match == 'label' else layout['names']
+    if keys is None or any(key is None for key in keys):
+        raise ValueError(f"can't match panels by {match}, not every panel has one")
+    if len(set(keys)) != len(keys):
+        raise ValueError(f"can't match panels by {match}, they are not unique")
+    return keys
+
+
+def default_match(layout_a, layout_b):
+    """
+    Match by label if both layouts have fixtures, otherwise by name if every panel has one.
+    """
+    for match in MATCH_KEYS[:-1]:
+        try:
+            panel_keys(layout_a, match)
+            panel_keys(layout_b, match)
+        except ValueError:
+            continue
+        return match
+    return 'index'
+
+
+def match_panels(layout_a, layout_b, match=None):
+    """
+    Returns the matched keys, the indices of the matched panels in each layout, and the keys
+    only in `layout_a` (removed) and only in `layout_b` (added).
+    """
+    match = match or default_match(layout_a, layout_b)
+    keys_a = np.array(panel_keys(layout_a, match), dtype=object).astype(str)
+    keys_b = np.array(panel_keys(layout_b, match), dtype=object).astype(str)
+    keys, index_a, index_b = np.intersect1d(keys_a, keys_b, return_indices=True)
+    # keep the export order of the first layout
+    order = np.argsort(index_a)
+    return {
+        'match': match,
+        'keys': keys[order].tolist(),
+        'index_a': index_a[order],
+        'index_b': index_b[order],
+        'removed': keys_a[np.isin(keys_a, keys_b, invert=True)].tolist(),
+        'added': keys_b[np.isin(keys_b, keys_a, invert=True)].tolist(),
+    }
+
+
+def led_displacements(layout_a, layout_b, index_a, index_b):
+    """
+    The largest distance between the LEDs with the same wiring index of each pair of matched
+    panels, over the LEDs which both panels have.
+    """
+    common = np.minimum(layout_a['counts'][index_a], layout_b['counts'][index_b])
+    pair_ids = np.repeat(np.arange(len(common)), common)
+    # position of each LED within its panel
+    within = np.arange(common.sum()) - np.repeat(np.cumsum(common) - common, common)
+    leds_a = layout_a['offsets'][index_a][pair_ids] + within
+    leds_b = layout_b['offsets'][index_b][pair_ids] + within
+    distances = np.linalg.norm(
+        layout_a['positions'][leds_a] - layout_b['positions'][leds_b], axis=-1)
+    maximum = np.zeros(len(common))
+    np.maximum.at(maximum, pair_ids, distances)
+    return maximum
+
+
+def angle_differences(angles_a, angles_b):
+    """
+    Differences between angles in degrees, wrapped to [-180, 180).
+    """
+    return (angles_b - angles_a + 180) % 360 - 180
+
+
+def parameter_changes(parameters_a, parameters_b):
+    """
+    The changed fixture parameters of each pair of matched fixtures, as {key: (a, b)} dicts.
+    """
+    changes = []
+    for params_a, params_b in zip(parameters_a, parameters_b):
+        changes.append({
+            key: (params_a[key], params_b[key])
+            for key in FIXTURE_PARAMETERS if params_a[key] != params_b[key]
+        })
+    return changes
+
+
+def diff_layouts(layout_a, layout_b, match=None):
+    """
+    Compare two layouts loaded with `load_layout`. Returns the panel matching (see
+    `match_panels`) and a list of per-panel differences of the matched panels.
+    """
+    matched = match_panels(layout_a, layout_b, match)
+    index_a, index_b = matched['index_a'], matched['index_b']
+
+    count_changes = layout_b['counts'][index_b] - layout_a['counts'][index_a]
+    displacements = led_displacements(layout_a, layout_b, index_a, index_b)
+    matrix_changes = np.abs(
+        layout_b['matrices'][index_b] - layout_a['matrices'][index_a]).max(axis=(1, 2))
+    angle_changes = angle_differences(layout_a['angles'][index_a], layout_b['angles'][index_b])
+    if layout_a['grids'] is not None and layout_b['grids'] is not None:
+        grid_changes = np.abs(
+            layout_b['grids'][index_b] - layout_a['grids'][index_a]).max(axis=1, initial=0)
+    else:
+        grid_changes = np.zeros(len(index_a))
+    if layout_a['parameters'] is not None and layout_b['parameters'] is not None:
+        changes = parameter_changes(
+            [layout_a['parameters'][idx] for idx in index_a],
+            [layout_b['parameters'][idx] for idx in index_b])
+    else:
+        changes = [{} for _ in index_a]
+
+    panels = []
+    for idx, key in enumerate(matched['keys']):
+        angles = angle_changes[idx]
+        panels.append({
+            'key': key,
+            'count_a': int(layout_a['counts'][index_a[idx]]),
+            'count_b': int(layout_b['counts'][index_b[idx]]),
+            'count_change': int(count_changes[idx]),
+            'max_displacement': float(displacements[idx]),
+            'max_matrix_change': float(matrix_changes[idx]),
+            'max_grid_change': float(grid_changes[idx]),
+            'angle_changes': dict(zip(ANGLES, np.where(np.isnan(angles), 0, angles).tolist())),
+            'parameter_changes': changes[idx],
+        })
+    return {**matched, 'panels': panels}
+
+
+def panel_changed(panel, tolerance=TOLERANCE):
+    return bool(
+        panel['count_change']
+        or panel['max_displacement'] > tolerance
+        or panel['max_matrix_change'] > tolerance
+        or panel['max_grid_change'] > tolerance
+        or any(abs(change) > tolerance for change in panel['angle_changes'].values())
+        or panel['parameter_changes'])
+
+
+def format_diff(diff, show_all=False, tolerance=TOLERANCE):
+    """
+    Format the panels which changed (or all panels if `show_all`) as a table, followed by the
+    parameter changes and a summary.
+    """
+    panels = [
+        panel for panel in diff['panels'] if show_all or panel_changed(panel, tolerance)
+    ]
+    width = max([len(panel['key']) for panel in panels] + [5])
+    lines = [
+        f"{'panel':<{width}} {'count':>11} {'change':>6} {'max disp':>9} {'matrix':>9} "
+        f"{'grid':>9} {'pitch':>8} {'yaw':>8} {'roll':>8}"
+    ]
+    for panel in panels:
+        counts = f"{panel['count_a']}->{panel['count_b']}"
+        angles = ' '.join(f"{panel['angle_changes'][angle]:8.3f}" for angle in ANGLES)
+        lines.append(
+            f"{panel['key']:<{width}} {counts:>11} {panel['count_change']:+6d} "
+            f"{panel['max_displacement']:9.5f} {panel['max_matrix_change']:9.5f} "
+            f"{panel['max_grid_change']:9.5f} {angles}")
+    for panel in panels:
+        for key, (value_a, value_b) in panel['parameter_changes'].items():
+            lines.append(f"{panel['key']}: {key} {value_a!r} -> {value_b!r}")
+    if diff['removed']:
+        lines.append(f"only in a: {', '.join(diff['removed'])}")
+    if diff['added']:
+        lines.append(f"only in b: {', '.join(diff['added'])}")
+    changed = sum(panel_changed(panel, tolerance) for panel in diff['panels'])
+    lines.append(
+        f"{len(diff['panels'])} panels matched by {diff['match']}, {changed} changed, "
+        f"{len(diff['removed'])} removed, {len(diff['added'])} added")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('a', help="panel export")
+    parser.add_argument('b', help="panel export to compare against a")
+    parser.add_argument('--lxm-a', help="fixtures of a, default: a with the .lxm extension")
+    parser.add_argument('--lxm-b', help="fixtures of b, default: b with the .lxm extension")
+    parser.add_argument('--match', choices=MATCH_KEYS, help="default: label, name or index")
+    parser.add_argument('--all', action='store_true', help="show unchanged panels too")
+    parser.add_argument('--json', action='store_true', help="print the diff as JSON")
+    args = parser.parse_args()
+
+    layout_a = load_layout(args.a, args.lxm_a or default_fixtures_path(args.a))
+    layout_b = load_layout(args.b, args.lxm_b or default_fixtures_path(args.b))
+    diff = diff_layouts(layout_a, layout_b, args.match)
+    if args.json:
+        diff = {
+            **diff, 'index_a': diff['index_a'].tolist(), 'index_b': diff['index_b'].tolist()
+        }
+        print(json.dumps(diff, indent=4))
+    else:
+        print(format_diff(diff, show_all=args.all))
+
+
+if __name__ == '__main__':
+    main()
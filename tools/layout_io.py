@@ -0,0 +1,100 @@
+"""
+Helpers for loading the panel (`.json`) and fixture (`.lxm`) exports produced by
+`light_layout.main()` into NumPy arrays, without needing Blender.
+"""
+
+import json
+
+import numpy as np
+
+
+def load_json(path):
+    with open(path) as stream:
+        return json.load(stream)
+
+
+def load_fixtures(path):
+    """
+    Load the fixtures from an `.lxm` export, in export order.
+    """
+    return load_json(path)['fixtures']
+
+
+def load_panels(path):
+    """
+    Load the panels from a panel export. Depending on `EXPORT_TYPE` at the time of export, the
+    panels are stored under a key like `p` or `panels`.
+    """
+    serialised = load_json(path)
+    if len(serialised) != 1:
+        raise ValueError(f"expected a single export type in {path}, got {list(serialised)}")
+    return next(iter(serialised.values()))
+
+
+def fixture_label(fixture):
+    return fixture['parameters'].get('label', str(fixture.get('id')))
+
+
+def fixture_pixels(fixture):
+    """
+    Pixel grid indices of a fixture as an (N, 2) int array, in wiring order.
+    """
+    pixels = json.loads(fixture['parameters'].get('pointIndicesJSON', '[]'))
+    return np.array(pixels, dtype=int).reshape(-1, 2)
+
+
+def fixture_grid_transform(fixture):
+    """
+    The `globalGridOrigin` and `globalGridMatrix` of a fixture. Fixtures exported without a global
+    grid get the identity transformation.
+    """
+    parameters = fixture['parameters']
+    origin = np.array([
+        parameters.get('globalGridOriginX', 0),
+        parameters.get('globalGridOriginY', 0)
+    ], dtype=float)
+    matrix = parameters.get('globalGridMatrix')
+    matrix = np.array(json.loads(matrix) if matrix else [[1, 0], [0, 1]], dtype=float)
+    return origin, matrix
+
+
+def transform_grid_positions(pixels, grid_origin, grid_matrix):
+    """
+    Map pixel grid indices onto the global grid with a panel's grid origin and matrix, truncating
+    towards zero like `int()` does.
+    """
+    pixels = np.asarray(pixels, dtype=float).reshape(-1, 2)
+    positions = np.asarray(grid_origin, dtype=float) + pixels @ np.asarray(grid_matrix).T
+    return np.trunc(positions).astype(int)
+
+
+def fixture_offsets(fixtures):
+    """
+    Start offsets of each fixture in the concatenated LED array, with the total count appended,
+    so that fixture `i` owns LEDs `offsets[i]:offsets[i + 1]`.
+    """
+    counts = [len(fixture_pixels(fixture)) for fixture in fixtures]
+    return np.concatenate([[0], np.cumsum(counts, dtype=int)])
+
+
+def fixture_grid_positions(fixtures):
+    """
+    Global grid positions of every LED of every fixture as an (N, 2) int array.
+    """
+    return np.concatenate([
+        transform_grid_positions(fixture_pixels(fixture), *fixture_grid_transform(fixture))
+        for fixture in fixtures
+    ] or [np.zeros((0, 2), dtype=int)])
+
+
+def panel_pixels(panel):
+    return np.array(panel['pixels'], dtype=float).reshape(-1, 2)
+
+
+def panel_world_positions(panel):
+    """
+    World positions of a panel's pixels as an (N, 3) array, using the panel's pixel matrix.
+    """
+    matrix = np.array(panel['matrix'], dtype=float)
+    pixels = panel_pixels(panel)
+    return pixels @ matrix[:3, :2].T + matrix[:3, 3]
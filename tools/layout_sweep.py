@@ -0,0 +1,300 @@
+"""
+Sweep light layout parameters over the polygons of a structure export, and compare the layouts.
+
+Every combination of the given parameter values is evaluated on every selected polygon with the
+count-only solver in `panel_geometry`, so no pixels are generated and Blender is not needed.
+Combinations are spread across a process pool. For each combination, the table shows the total
+and per-panel light counts, the minimum distance between neighbouring lights and the fill ratio
+(lit area / polygon area) of the panels.
+
+Values can be given as lists or `start:stop:step` ranges (inclusive), e.g.:
+
+    python tools/layout_sweep.py LEDPortalSimulator/data/dome_render_6_5_Dome_EDGES.json \
+        --polygons 0to39 --spacing 0.05:0.06:0.0025 --gradient 1.7320508 inf --rotation 0 1 2
+"""
+
+import argparse
+import csv
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from math import inf, sqrt
+
+import numpy as np
+
+from layout_io import load_json
+from panel_geometry import count_lights_for_polygon, normalise_polygon, polygon_area
+from trig import gradient_cos, gradient_sin
+
+# The LedPortal configuration of light_layout.py
+DEFAULT_PARAMETERS = {
+    'spacing': [1.22 * 2 / (sqrt(3) * 26)],
+    'spacing_vertical': [None],
+    'grid_gradient': [sqrt(3)],
+    'margin': ['auto'],
+    'margin_vertical_top': [None],
+    'margin_left': [None],
+    'margin_right': [None],
+    'vertex_rotation': [1],
+}
+
+TABLE_COLUMNS = [
+    ('spacing', 'spacing', '{:.5f}'),
+    ('spacing_vertical', 'v spacing', '{:.5f}'),
+    ('grid_gradient', 'gradient', '{:.4f}'),
+    ('margin', 'margin', '{:.4f}'),
+    ('margin_vertical_top', 'top', '{:.4f}'),
+    ('margin_left', 'left', '{:.4f}'),
+    ('margin_right', 'right', '{:.4f}'),
+    ('vertex_rotation', 'rot', '{}'),
+    ('total', 'total', '{}'),
+    ('panel_min', 'min', '{}'),
+    ('panel_max', 'max', '{}'),
+    ('min_spacing', 'min dist', '{:.5f}'),
+    ('fill_mean', 'fill', '{:.3f}'),
+    ('fill_min', 'fill min', '{:.3f}'),
+    ('errors', 'errors', '{}'),
+]
+
+
+def parse_value(text):
+    text = text.strip().lower()
+    if text in ['none', 'default']:
+        return None
+    if text == 'auto':
+        return 'auto'
+    return float(text)
+
+
+def parse_values(texts, cast=float):
+    """
+    Parse command line values, expanding inclusive `start:stop:step` ranges.
+    """
+    values = []
+    for text in texts:
+        if text.count(':') == 2:
+            start, stop, step = map(float, text.split(':'))
+            values.extend(
+                cast(value) for value in np.arange(start, stop + step / 2, step).round(12))
+        else:
+            value = parse_value(text)
+            values.append(value if value is None or value == 'auto' else cast(value))
+    return values
+
+
+def parse_index_ranges(text):
+    """
+    Inverse of `common.format_index_ranges`: "0to3 5 7to8" -> [0, 1, 2, 3, 5, 7, 8]
+    """
+    indices = []
+    for token in re.split(r'[\s,]+', text.strip()):
+        if not token:
+            continue
+        start, _, end = token.partition('to')
+        indices.extend(range(int(start), int(end or start) + 1))
+    return indices
+
+
+def load_structure_polygons(path, polygons=None):
+    """
+    The world vertices of each polygon in a structure export, as a list of (index, (N, 3) array).
+    Polygons of all structures are indexed in order.
+    """
+    result = []
+    for structure in load_json(path)['structures']:
+        matrix = np.array(structure['matrix'], dtype=float)
+        vertices = np.array(structure['vertices'], dtype=float)
+        world_vertices = vertices @ matrix[:3, :3].T + matrix[:3, 3]
+        for face in structure.get('faces', []):
+            result.append((len(result), world_vertices[face]))
+    if polygons is not None:
+        selected = set(polygons)
+        result = [(index, vertices) for index, vertices in result if index in selected]
+    return result
+
+
+def normalise_polygons(polygons, vertex_rotation=0):
+    """
+    Rotate the vertices of each polygon like `light_layout.rotate_seq`, then normalise them (see
+    `panel_geometry.normalise_polygon`).
+    """
+    return [
+        normalise_polygon(np.roll(vertices, -(vertex_rotation % len(vertices)), axis=0))
+        for _, vertices in polygons
+    ]
+
+
+def resolve_parameters(parameters):
+    """
+    Fill in the 'auto' margin, which is the margin that LedPortal uses (see light_layout.py).
+    """
+    parameters = dict(parameters)
+    if parameters['margin'] == 'auto':
+        parameters['margin'] = abs(
+            gradient_sin(parameters['grid_gradient']) * parameters['spacing'])
+    return parameters
+
+
+def neighbour_distance(spacing, spacing_vertical, grid_gradient):
+    """
+    The distance between the closest pair of lights on the grid.
+    """
+    row = np.array([spacing, 0])
+    column = np.array([gradient_cos(grid_gradient) * spacing, spacing_vertical])
+    return min(
+        np.linalg.norm(vector) for vector in [row, column, column - row, column + row])
+
+
+def evaluate_layout(polygons, parameters):
+    """
+    Count the lights on each polygon for one combination of parameters.
+    """
+    parameters = resolve_parameters(parameters)
+    counts = []
+    fills = []
+    errors = 0
+    spacing_vertical = None
+    for normalised in normalise_polygons(polygons, int(parameters['vertex_rotation'])):
+        try:
+            count, solution = count_lights_for_polygon(
+                normalised,
+                spacing=parameters['spacing'],
+                spacing_vertical=parameters['spacing_vertical'],
+                grid_gradient=parameters['grid_gradient'],
+                margin=parameters['margin'],
+                margin_vertical_top=parameters['margin_vertical_top'],
+                margin_left=parameters['margin_left'],
+                margin_right=parameters['margin_right'],
+            )
+        except (AssertionError, ValueError, ZeroDivisionError) as exc:
+            logging.debug(f"layout failed for {parameters}: {exc}")
+            errors += 1
+            continue
+        spacing_vertical = solution['spacing_vertical']
+        cell_area = solution['spacing'] * solution['spacing_vertical']
+        counts.append(count)
+        fills.append(count * cell_area / polygon_area(normalised))
+
+    counts = np.array(counts, dtype=int)
+    return {
+        **parameters,
+        'spacing_vertical': spacing_vertical,
+        'counts': counts.tolist(),
+        'total': int(counts.sum()),
+        'panel_min': int(counts.min()) if len(counts) else 0,
+        'panel_max': int(counts.max()) if len(counts) else 0,
+        'min_spacing': neighbour_distance(
+            parameters['spacing'], spacing_vertical or 0, parameters['grid_gradient'])
+        if spacing_vertical is not None else 0,
+        'fill_mean': float(np.mean(fills)) if fills else 0,
+        'fill_min': float(np.min(fills)) if fills else 0,
+        'errors': errors,
+    }
+
+
+def _evaluate_task(args):
+    return evaluate_layout(*args)
+
+
+def parameter_grid(parameters):
+    """
+    Every combination of the parameter value lists in `parameters`, as a list of dicts.
+    """
+    names = list(parameters)
+    return [dict(zip(names, values)) for values in product(*parameters.values())]
+
+
+def run_sweep(polygons, parameters, workers=None):
+    """
+    Evaluate every combination of `parameters` on `polygons`, across `workers` processes (or in
+    this process if `workers` is 1).
+    """
+    combinations = parameter_grid({**DEFAULT_PARAMETERS, **parameters})
+    tasks = [(polygons, combination) for combination in combinations]
+    logging.info(f"evaluating {len(tasks)} layouts of {len(polygons)} polygons")
+    if workers == 1:
+        return [_evaluate_task(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(tasks) // (4 * (workers or os.cpu_count() or 1)))
+        return list(executor.map(_evaluate_task, tasks, chunksize=chunksize))
+
+
+def format_table(results, columns=TABLE_COLUMNS):
+    """
+    Format results as an aligned text table, omitting parameters which are unset in every row.
+    """
+    columns = [
+        column for column in columns
+        if any(result.get(column[0]) is not None for result in results)
+    ]
+
+    def format_cell(value, fmt):
+        if value is None:
+            return '-'
+        if value == inf:
+            return 'inf'
+        return fmt.format(value)
+
+    rows = [[title for _, title, _ in columns]] + [
+        [format_cell(result.get(key), fmt) for key, _, fmt in columns] for result in results
+    ]
+    widths = [max(len(row[idx]) for row in rows) for idx in range(len(columns))]
+    lines = [' '.join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows]
+    lines.insert(1, ' '.join('-' * width for width in widths))
+    return '\n'.join(lines)
+
+
+def write_csv(path, results):
+    fields = [key for key, _, _ in TABLE_COLUMNS] + ['counts']
+    with open(path, 'w', newline='') as stream:
+        writer = csv.DictWriter(stream, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('structure', help="structure export (see export_structure.py)")
+    parser.add_argument('--polygons', help="polygon indices, e.g. '0to39 41'")
+    parser.add_argument('--spacing', nargs='+')
+    parser.add_argument('--spacing-vertical', nargs='+')
+    parser.add_argument('--gradient', nargs='+', help="grid gradients, 'inf' for square grids")
+    parser.add_argument('--margin', nargs='+', help="margins, 'auto' for the LedPortal margin")
+    parser.add_argument('--margin-top', nargs='+')
+    parser.add_argument('--margin-left', nargs='+')
+    parser.add_argument('--margin-right', nargs='+')
+    parser.add_argument('--rotation', nargs='+', help="vertex rotations")
+    parser.add_argument('--workers', type=int, help="processes, default: one per CPU")
+    parser.add_argument(
+        '--sort', default='total', help="column to sort by, descending (default: total)")
+    parser.add_argument('--csv', help="also write the results to this CSV file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    parameters = {}
+    for name, values, cast in [
+        ('spacing', args.spacing, float),
+        ('spacing_vertical', args.spacing_vertical, float),
+        ('grid_gradient', args.gradient, float),
+        ('margin', args.margin, float),
+        ('margin_vertical_top', args.margin_top, float),
+        ('margin_left', args.margin_left, float),
+        ('margin_right', args.margin_right, float),
+        ('vertex_rotation', args.rotation, int),
+    ]:
+        if values:
+            parameters[name] = parse_values(values, cast)
+
+    polygons = load_structure_polygons(
+        args.structure, parse_index_ranges(args.polygons) if args.polygons else None)
+    results = run_sweep(polygons, parameters, workers=args.workers)
+    results.sort(key=lambda result: result.get(args.sort) or 0, reverse=True)
+    print(format_table(results))
+    if args.csv:
+        write_csv(args.csv, results)
+
+
+if __name__ == '__main__':
+    main()
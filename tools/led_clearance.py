@@ -0,0 +1,201 @@
+"""
+Find LEDs on different panels which are closer together than a clearance threshold, e.g. where
+panels of the dome meet at an angle. `generate_lights_for_convex_polygon` only applies margins
+within a panel, so these show up as bright seams.
+
+LED world positions are hashed into a voxel grid with cells as large as the threshold, so every
+pair closer than the threshold is in the same or a neighbouring cell. Only those candidate pairs
+are measured, which keeps the check close to linear in the number of LEDs.
+
+    python tools/led_clearance.py LEDPortalSimulator/data/dome_render_6_5_Dome_ALL_PANELS.json \\
+        --threshold 0.04 --obj clearance.obj
+"""
+
+import argparse
+import logging
+from itertools import product
+
+import numpy as np
+
+from layout_io import load_panels, panel_world_positions
+
+# Half of the 26 neighbouring cells, so that each pair of cells is visited once. The cell itself
+# is handled separately.
+NEIGHBOUR_OFFSETS = np.array([
+    offset for offset in product((-1, 0, 1), repeat=3) if offset > (0, 0, 0)
+], dtype=np.int64)
+# show this many of the closest pairs in the report
+REPORT_PAIRS = 20
+
+
+def panel_led_positions(panels):
+    """
+    World positions of every LED of every panel as an (N, 3) array, and the (N,) panel index and
+    (N,) index within its panel of each LED.
+    """
+    positions = [panel_world_positions(panel) for panel in panels]
+    counts = [len(panel_positions) for panel_positions in positions]
+    panel_ids = np.repeat(np.arange(len(panels)), counts)
+    led_ids = np.arange(sum(counts)) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.concatenate(positions or [np.zeros((0, 3))]), panel_ids, led_ids
+
+
+def wiring_spacing(positions, panel_ids):
+    """
+    The smallest distance between consecutively wired LEDs of a panel, which is at most the LED
+    spacing.
+    """
+    same_panel = panel_ids[1:] == panel_ids[:-1]
+    distances = np.linalg.norm(np.diff(positions, axis=0), axis=-1)[same_panel]
+    return float(distances.min()) if len(distances) else 0.0
+
+
+def candidate_pairs(positions, cell_size):
+    """
+    (M, 2) index pairs (i < j within a cell) of LEDs in the same or neighbouring voxels of size
+    `cell_size`.
+    """
+    positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+    if not len(positions):
+        return np.zeros((0, 2), dtype=np.int64)
+    cells = np.floor(positions / cell_size).astype(np.int64)
+    # leave a cell of space on each side so that neighbouring keys never wrap around
+    cells -= cells.min(axis=0) - 1
+    spans = cells.max(axis=0) + 2
+    strides = np.array([spans[1] * spans[2], spans[2], 1], dtype=np.int64)
+    keys = cells @ strides
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    pairs = []
+    # pairs within a cell: every later LED in the same run of sorted keys
+    ends = np.searchsorted(sorted_keys, sorted_keys, side='right')
+    pairs.append(expand_ranges(np.arange(len(keys)) + 1, ends, order))
+    for offset in NEIGHBOUR_OFFSETS:
+        neighbour_keys = sorted_keys + offset @ strides
+        pairs.append(expand_ranges(
+            np.searchsorted(sorted_keys, neighbour_keys, side='left'),
+            np.searchsorted(sorted_keys, neighbour_keys, side='right'),
+            order))
+    return np.concatenate(pairs)
+
+
+def expand_ranges(starts, ends, order):
+    """
+    Pair each sorted LED `idx` with the sorted LEDs `starts[idx]:ends[idx]`, as original indices.
+    """
+    lengths = np.maximum(ends - starts, 0)
+    firsts = np.repeat(np.arange(len(starts)), lengths)
+    seconds = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) \
+        + np.repeat(starts, lengths)
+    return np.stack([order[firsts], order[seconds]], axis=-1)
+
+
+def find_close_pairs(positions, panel_ids, threshold):
+    """
+    Pairs of LEDs on different panels which are closer than `threshold`. Returns the (M, 2) LED
+    indices and (M,) distances, sorted by distance.
+    """
+    positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+    pairs = candidate_pairs(positions, threshold)
+    pairs = pairs[panel_ids[pairs[:, 0]] != panel_ids[pairs[:, 1]]]
+    distances = np.linalg.norm(positions[pairs[:, 0]] - positions[pairs[:, 1]], axis=-1)
+    close = distances < threshold
+    pairs, distances = pairs[close], distances[close]
+    # list the pair with the lower panel first
+    swap = panel_ids[pairs[:, 0]] > panel_ids[pairs[:, 1]]
+    pairs[swap] = pairs[swap][:, ::-1]
+    order = np.argsort(distances, kind='stable')
+    return pairs[order], distances[order]
+
+
+def panel_pair_summary(pairs, distances, panel_ids):
+    """
+    For each pair of panels with close LEDs: ((panel a, panel b), count, minimum distance),
+    closest first.
+    """
+    if not len(pairs):
+        return []
+    panel_pairs = panel_ids[pairs]
+    unique, inverse, counts = np.unique(
+        panel_pairs, axis=0, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+    minimum = np.full(len(unique), np.inf)
+    np.minimum.at(minimum, inverse, distances)
+    order = np.argsort(minimum, kind='stable')
+    return [
+        (tuple(unique[idx].tolist()), int(counts[idx]), float(minimum[idx])) for idx in order
+    ]
+
+
+def clearance_report(
+        pairs, distances, panel_ids, led_ids, names, threshold, report_pairs=REPORT_PAIRS):
+    lines = [
+        f"{len(pairs)} pairs of LEDs on different panels are closer than {threshold:.5f}"
+    ]
+    if not len(pairs):
+        return '\n'.join(lines)
+    lines.append("panel pairs (count, closest):")
+    for (panel_a, panel_b), count, minimum in panel_pair_summary(pairs, distances, panel_ids):
+        lines.append(f"\t{names[panel_a]} - {names[panel_b]}: {count:5d} {minimum:.5f}")
+    lines.append(f"closest LEDs:")
+    for (led_a, led_b), distance in zip(pairs[:report_pairs], distances[:report_pairs]):
+        lines.append(
+            f"\t{names[panel_ids[led_a]]} {led_ids[led_a]:4d} - "
+            f"{names[panel_ids[led_b]]} {led_ids[led_b]:4d}: {distance:.5f}")
+    return '\n'.join(lines)
+
+
+def clearance_mesh_data(positions, pairs):
+    """
+    Vertices and edges of a mesh with an edge between the LEDs of each pair.
+    """
+    leds, edges = np.unique(pairs, return_inverse=True)
+    return positions[leds], edges.reshape(-1, 2)
+
+
+def add_debug_mesh(positions, pairs, collection, name='led_clearance'):
+    """
+    Add the pairs to a Blender collection as a mesh of edges.
+    """
+    import bpy
+    vertices, edges = clearance_mesh_data(positions, pairs)
+    mesh = bpy.data.meshes.new(f"mesh_{name}")
+    mesh.from_pydata(vertices.tolist(), edges.tolist(), [])
+    obj = bpy.data.objects.new(name, mesh)
+    collection.objects.link(obj)
+    return obj
+
+
+def write_obj(path, positions, pairs):
+    """
+    Write the pairs as line elements of a Wavefront OBJ file.
+    """
+    vertices, edges = clearance_mesh_data(positions, pairs)
+    with open(path, 'w') as stream:
+        stream.writelines(f"v {x:.6f} {y:.6f} {z:.6f}\n" for x, y, z in vertices)
+        stream.writelines(f"l {a + 1} {b + 1}\n" for a, b in edges)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('panels', help="panel export (see light_layout.py)")
+    parser.add_argument(
+        '--threshold', type=float,
+        help="minimum clearance, default: the smallest distance between LEDs within a panel")
+    parser.add_argument('--obj', help="write the close pairs to this OBJ file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    panels = load_panels(args.panels)
+    names = [panel.get('name', str(idx)) for idx, panel in enumerate(panels)]
+    positions, panel_ids, led_ids = panel_led_positions(panels)
+    threshold = args.threshold or wiring_spacing(positions, panel_ids)
+    pairs, distances = find_close_pairs(positions, panel_ids, threshold)
+    print(clearance_report(pairs, distances, panel_ids, led_ids, names, threshold))
+    if args.obj:
+        write_obj(args.obj, positions, pairs)
+
+
+if __name__ == '__main__':
+    main()
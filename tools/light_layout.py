@@ -7,23 +7,24 @@ Light placement works on any coplanar tri / quad polygon, and is highly configur
 
 import imp
 import inspect
+import json
 import logging
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from functools import reduce
 from itertools import starmap
 from more_itertools import windowed
-from math import acos, asin, ceil, copysign, floor, inf, isinf, nan, pi, sin, sqrt, cos, atan2, degrees
+from math import acos, asin, inf, pi, sin, sqrt, cos, atan2, degrees
 from pprint import pformat
 import traceback
-import shutil
-import tempfile
 
 import bpy
 import numpy as np
 from mathutils import Matrix, Vector
 
-THIS_FILE = inspect.stack()[-2].filename
+# the file of this code, also when script_wrapper.py exec's it with its own `__file__`
+THIS_FILE = inspect.currentframe().f_code.co_filename
 THIS_DIR = os.path.dirname(THIS_FILE)
 try:
     PATH = sys.path[:]
@@ -38,7 +39,18 @@ try:
         format_matrix_components, serialise_vector, format_quaternion,
         format_euler, format_vecs, format_angle, get_out_path
     )
+    from export_manifest import value_hash
     from trig import gradient_cos, gradient_sin
+    from panel_geometry import (  # noqa: F401 (re-exported)
+        nan_divide, inf_divide, float_floor, float_ceil, float_abs_floor, float_abs_ceil,
+        axis_centered_lines, intersect_lines, margin_intersect_offset, convex_polygon_rows,
+        polygon_rows)
+    from grid_preview import start_preview
+    from grid_quantization import grid_extent, optimise_quantization
+    from grid_fit import fit_panel_grids, grid_project_positions
+    from layout_io import panel_pixels, panel_world_positions, transform_grid_positions
+    from led_clearance import (
+        add_debug_mesh, clearance_report, find_close_pairs, panel_led_positions)
 finally:
     sys.path = PATH
 
@@ -56,6 +68,19 @@ LED_MARGIN_LEFT = None
 LED_MARGIN_RIGHT = None
 LED_SPACING_VERTICAL = None
 EXPORT_TYPE = 'P'
+# search for the coarsest global grid quantization without pixel collisions
+GRID_QUANTIZATION_OPTIMISE = True
+# if non-zero, panel grid origins may be offset by up to this much to resolve collisions
+GRID_OFFSET_RADIUS = 1
+# warn if a panel's grid matrix misplaces any pixel by more than this many of its pixel pitches
+# on the global grid, or None. The perspective projection is not affine, so large panels far from
+# the projection axis always have some residual: up to about 3.8 pitches on the dome's lower ring.
+GRID_RESIDUAL_TOLERANCE = 4.0
+# warn about LEDs on different panels which are closer than this, and show them in the DEBUG
+# collection
+LED_CLEARANCE = None
+# draw the global grid pixel map of each layout into mapping_<suffix>.png in the background
+GRID_PREVIEW = True
 IGNORE_LAMPS = False
 # IGNORE_LAMPS = True
 # REGION_NAME = "BACK"
@@ -78,8 +103,12 @@ COORDINATE_TRANSFORM = Matrix([
     [0, 0, 0, 1]
 ])
 
+LED_CONFIGS = ['LedPortal', 'TeleCortex']
 LED_CONFIG = 'LedPortal'
 # LED_CONFIG = 'TeleCortex'
+# lay out each region in this JSON file (see `load_layout_config`) from the same geometry,
+# instead of LED_CONFIG / REGION_NAME
+LAYOUT_CONFIG_FILE = None
 
 
 # Telecortex Pixel positions
@@ -543,52 +572,147 @@ def get_tele_overrides():
     }
     return POLY_OVERRIDES
 
-IDX_OFFSET = 1
-
-if LED_CONFIG == 'LedPortal':
-    LED_SPACING = 1.22 * 2 / (sqrt(3) * 26)  # = 0.054182102
-    WIRING_SERPENTINE = True
-    GRID_GRADIENT = sqrt(3)
-    LED_MARGIN = abs(gradient_sin(GRID_GRADIENT) * LED_SPACING)
-    WIRING_REVERSE = False
-    # LED_SPACING_VERTICAL = 1.22 / 26  # = 0.046923077
-    # Z_OFFSET = -0.1
-    Z_OFFSET = 0
-
-    OVERRIDES = {
-        "fixture": {
-            "host": "192.168.1.15",
-            "protocol": 2,  # artnet
-        }
+def get_led_config(led_config, region_name=None):
+    """
+    The layout settings of an LED configuration as a dict. For some configurations, the polygon
+    overrides depend on the region.
+    """
+    config = {
+        'vertex_rotation': VERTEX_ROTATION,
+        'spacing': LED_SPACING,
+        'spacing_vertical': LED_SPACING_VERTICAL,
+        'margin_vertical_top': LED_MARGIN_VERTICAL_TOP,
+        'margin_left': LED_MARGIN_LEFT,
+        'margin_right': LED_MARGIN_RIGHT,
+        'idx_offset': 1,
     }
 
-    POLY_OVERRIDES = get_tele_overrides()
-
-    IDX_OFFSET = 100
-elif LED_CONFIG == 'TeleCortex':
-    LED_SPACING = 1.0 / 16
-    WIRING_SERPENTINE = True
-    LED_SPACING_VERTICAL = 1.0 / 16
-    # LED_SPACING_VERTICAL = None
-    GRID_GRADIENT = inf
-    LED_MARGIN = 0.03
-    LED_MARGIN_VERTICAL_TOP = 0.00
-    LED_MARGIN_LEFT = 0.03
-    LED_MARGIN_RIGHT = 0.03
-    WIRING_REVERSE = True
-    Z_OFFSET = -0.02
-
-    OVERRIDES = {
-        "fixture": {
-            "port": 42069,
-            "protocol": 3  # opc
+    if led_config == 'LedPortal':
+        config['spacing'] = 1.22 * 2 / (sqrt(3) * 26)  # = 0.054182102
+        config['wiring_serpentine'] = True
+        config['grid_gradient'] = sqrt(3)
+        config['margin'] = abs(gradient_sin(config['grid_gradient']) * config['spacing'])
+        config['wiring_reverse'] = False
+        # config['spacing_vertical'] = 1.22 / 26  # = 0.046923077
+        # config['z_offset'] = -0.1
+        config['z_offset'] = 0
+
+        config['overrides'] = {
+            "fixture": {
+                "host": "192.168.1.15",
+                "protocol": 2,  # artnet
+            }
         }
-    }
 
-    if REGION_NAME == "BACK":
-        POLY_OVERRIDES = get_back_overrides()
+        config['poly_overrides'] = get_tele_overrides()
+
+        config['idx_offset'] = 100
+    elif led_config == 'TeleCortex':
+        config['spacing'] = 1.0 / 16
+        config['wiring_serpentine'] = True
+        config['spacing_vertical'] = 1.0 / 16
+        # config['spacing_vertical'] = None
+        config['grid_gradient'] = inf
+        config['margin'] = 0.03
+        config['margin_vertical_top'] = 0.00
+        config['margin_left'] = 0.03
+        config['margin_right'] = 0.03
+        config['wiring_reverse'] = True
+        config['z_offset'] = -0.02
+
+        config['overrides'] = {
+            "fixture": {
+                "port": 42069,
+                "protocol": 3  # opc
+            }
+        }
+
+        if region_name == "BACK":
+            config['poly_overrides'] = get_back_overrides()
+        else:
+            config['poly_overrides'] = get_og_overrides()
     else:
-        POLY_OVERRIDES = get_og_overrides()
+        raise ValueError(f"unknown LED config {led_config}, expected one of {LED_CONFIGS}")
+
+    return config
+
+
+def load_layout_config(path):
+    """
+    Load a list of layouts from a JSON file like:
+
+        {
+            "layouts": [
+                {"led_config": "TeleCortex", "region": "OG"},
+                {"led_config": "TeleCortex", "region": "BACK", "polygons": [1, 2, 3]},
+                {"led_config": "LedPortal", "region": "HEX", "lamps": true,
+                 "settings": {"vertex_rotation": 0, "poly_overrides": {"6": {...}}}}
+            ],
+            "workers": 2
+        }
+
+    `polygons` restricts a layout to some of the selected polygons, `settings` overrides the
+    settings from `get_led_config` (the `fixture` parameters of `poly_overrides` are merged, e.g.
+    with the output of `load_balancer.py`), and `lamps` places that layout's lights in the scene
+    (at most one layout can, by default the first one unless IGNORE_LAMPS is set).
+
+    Returns the resolved layouts and the number of workers.
+    """
+    with open(path) as stream:
+        serialised = json.load(stream)
+
+    layouts = []
+    for entry in serialised['layouts']:
+        unknown = set(entry) - {'led_config', 'region', 'polygons', 'settings', 'lamps'}
+        if unknown:
+            raise ValueError(f"unknown layout keys in {path}: {sorted(unknown)}")
+        layout = layout_from_config(
+            entry['led_config'], entry.get('region'), entry.get('polygons'),
+            entry.get('settings'))
+        layout['lamps'] = entry.get('lamps')
+        layouts.append(layout)
+
+    lamp_layouts = [layout for layout in layouts if layout['lamps']]
+    if len(lamp_layouts) > 1:
+        raise ValueError(f"only one layout can place lamps, got {len(lamp_layouts)} in {path}")
+    if not lamp_layouts and layouts:
+        layouts[0]['lamps'] = not IGNORE_LAMPS
+    for layout in layouts:
+        layout['lamps'] = bool(layout['lamps'])
+
+    return layouts, serialised.get('workers')
+
+
+def layout_from_config(led_config, region_name=None, polygons=None, settings=None):
+    """
+    A layout of the selected `polygons` (or all of them), with the settings of an LED config
+    updated from `settings`.
+    """
+    config = get_led_config(led_config, region_name)
+    settings = dict(settings or {})
+    poly_overrides = {
+        int(poly_idx): overrides
+        for poly_idx, overrides in settings.pop('poly_overrides', {}).items()
+    }
+    unknown = set(settings) - set(config)
+    if unknown:
+        raise ValueError(f"unknown {led_config} settings: {sorted(unknown)}")
+    config.update(settings)
+    config['poly_overrides'] = dict(config['poly_overrides'])
+    for poly_idx, overrides in poly_overrides.items():
+        # merge the fixture parameters, so that e.g. only the host of a polygon can be changed
+        existing = config['poly_overrides'].get(poly_idx, {})
+        merged = {**existing, **overrides}
+        if 'fixture' in existing and 'fixture' in overrides:
+            merged['fixture'] = {**existing['fixture'], **overrides['fixture']}
+        config['poly_overrides'][poly_idx] = merged
+    return {
+        'led_config': led_config,
+        'region': region_name,
+        'polygons': None if polygons is None else set(polygons),
+        'settings': config,
+        'lamps': not IGNORE_LAMPS,
+    }
 
 
 def orientation(*vecs):
@@ -745,186 +869,6 @@ def get_normaliser(oriented):
     return normaliser
 
 
-def nan_divide(quotient, dividend):
-    if np.isclose(dividend, 0, atol=ATOL):
-        return nan
-    if dividend is nan:
-        return 0
-    return quotient / dividend
-
-
-def inf_divide(quotient, dividend):
-    sign = 1 if (quotient >= 0) else -1
-    sign *= 1 if (dividend >= 0) else -1
-    if np.isclose(dividend, 0, atol=ATOL):
-        return copysign(inf, sign)
-    if isinf(dividend):
-        return copysign(0, sign)
-    return quotient / dividend
-
-
-def float_floor(number):
-    closest_int = round(number)
-    if np.isclose(number, closest_int, atol=ATOL):
-        return closest_int
-    return floor(number)
-
-
-def float_ceil(number):
-    closest_int = round(number)
-    if np.isclose(number, closest_int, atol=ATOL):
-        return closest_int
-    return ceil(number)
-
-
-def float_abs_floor(number):
-    closest_int = round(number)
-    if np.isclose(number, closest_int, atol=ATOL):
-        return closest_int
-    return int(copysign(floor(abs(number)), number))
-
-
-def float_abs_ceil(number):
-    closest_int = round(number)
-    if np.isclose(number, closest_int, atol=ATOL):
-        return closest_int
-    return int(copysign(ceil(abs(number)), number))
-
-
-def axis_centered_lines(axis_length, spacing, margin_left, margin_right=None, axis_name=None):
-    """
-    Divide an axis into lines `spacing` units apart, centered on the space inside `axis_length`
-    after removing `margin_left` and `margin_right`. If `margin_right` is not provided, it is
-    assumed to be the same as `margin_left`
-
-    |--------------------|----X---------X----------X----|------------------|
-    ^- origin            |    ^- lines -^         -^    |                  |
-    |<- axis_length ------------------------------------------------------>|
-    |<- margin_left ---->|    |         |          |    |<- margin_right ->|
-    |          usable -> |<---------------------------->|                  |
-    |         padding -> |<-->|         |          |<-->|                  |
-    |              spacing -> |<------->|<-------->|    |                  |
-    """
-
-    if margin_right is None:
-        margin_right = margin_left
-
-    axis_full_name = f"{axis_name if axis_name else ''} axis"
-
-    usable = axis_length - margin_left - margin_right
-    lines = float_floor(usable / spacing) + 1
-    usage = spacing * (lines - 1)
-
-    logging.debug(
-        f"{axis_full_name} Usable / Lines / Usage: {usable: 7.3f} / {lines} / {usage: 7.3f}")
-
-    assert \
-        usage < usable \
-        or np.isclose(usable - usage, 0, atol=ATOL), \
-        f"{axis_full_name} usage {usage} >= usable {usable}"
-    padding = (usable - (spacing * (lines - 1))) / 2
-
-    logging.debug(f"{axis_full_name} Padding: {padding: 7.3f}")
-
-    return lines, padding
-
-
-def intersect_lines(m1, c1, m2, c2):
-    """
-    line 1 = m1 * x + c1, (c1 is x-intercept in case of inf gradient)
-    line 2 = m2 * x + c2, (c2 is x-intercept in case of inf gradient)
-    """
-    if isinf(m1) and isinf(m2):
-        return None, None
-    if isinf(m1):
-        return c1, m2 * c1 + c2
-    elif isinf(m2):
-        return c2, m1 * c2 + c1
-    elif np.isclose(m1, m2, atol=ATOL):
-        return None, None
-    intersect_x = (c2 - c1) / (m1 - m2)
-    intersect_y = m1 * intersect_x + c1
-    return intersect_x, intersect_y
-
-
-def margin_intersect_offset(gradient_left, gradient_right, base_width, margin):
-    r"""
-             mL       <- gradient left
-        mR  /         <- gradient right
-         \ /\/        <- margin
-          x-/----     <- regular intersect
-         / \    |     <- intersect offset
-        / x-\----     <- margin intersect
-       / / \ \
-      / /   \ \
-     /_/_____\_\_____
-    o_/_______\_o___| <- margin
-    |<--------->|     <- base width
-
-    OR
-
-                         mL  <- gradient left
-                    mR  /    <- gradient right
-                    | /
-                    x----    <- regular intersect
-                  / |   |    <- intersect offset
-                / x-|----    <- margin intersect
-              / / | |
-            / /   | |
-          /_/_____|_|___
-        o_/_______|_o___|    <- margin
-        |<--------->|        <- base width
-    """
-
-    logging.debug(
-        f"Gradient Left / Right: "
-        f"{gradient_left: 7.3f} / {gradient_right: 7.3f}")
-
-    if isinf(gradient_left) and isinf(gradient_right):
-        return None
-
-    if np.isclose(gradient_left, gradient_right, atol=ATOL):
-        return None
-
-    regular_axis_intercept_left = 0
-    regular_axis_intercept_right = base_width if isinf(gradient_right) else \
-        - base_width * gradient_right
-
-    logging.debug(
-        f"Regular Axis Intercept Left / Right: "
-        f"{regular_axis_intercept_left: 7.3f} / {regular_axis_intercept_right:7.3f}")
-
-    regular_intersect_x, regular_intersect_y = intersect_lines(
-        gradient_left, regular_axis_intercept_left, gradient_right, regular_axis_intercept_right
-    )
-
-    if regular_intersect_x is None or regular_intersect_y is None:
-        return None
-
-    logging.debug(
-        f"Regular Intersect X / Y: "
-        f"{regular_intersect_x: 7.3f} / {regular_intersect_y:7.3f}")
-
-    margin_axis_intercept_left = margin if isinf(gradient_left) else \
-        - abs(margin / gradient_cos(gradient_left))
-    margin_axis_intercept_right = base_width - margin if isinf(gradient_right) else \
-        regular_axis_intercept_right - abs(margin / gradient_cos(gradient_right))
-
-    logging.debug(
-        f"Margin Axis Intercept Left / Right: "
-        f"{margin_axis_intercept_left: 7.3f} / {margin_axis_intercept_right:7.3f}")
-
-    margin_intersect_x, margin_intersect_y = intersect_lines(
-        gradient_left, margin_axis_intercept_left, gradient_right, margin_axis_intercept_right
-    )
-
-    logging.debug(
-        f"Margin Intersect X / Y: "
-        f"{margin_intersect_x: 7.3f} / {margin_intersect_y:7.3f}")
-
-    return regular_intersect_y - margin_intersect_y
-
-
 def generate_lights_for_convex_polygon(
         base_width: float,
         quad_right_x: float,
@@ -940,7 +884,8 @@ def generate_lights_for_convex_polygon(
         margin_right: float = None,
         z_offset: float = 0.0,
         wiring_serpentine: bool = True,
-        wiring_reverse: bool = None
+        wiring_reverse: bool = None,
+        vertices: list = None
 ):
     r"""
     Geometric Assumptions:
@@ -948,7 +893,7 @@ def generate_lights_for_convex_polygon(
         all points are coplanar
         polygon has already been flattened and normalised (see normalise_plane)
         points 0, 1, 2 and -1 are convex
-        points form a triangle or quadrangle
+        points form a triangle or quadrangle, unless all `vertices` are given
         point 0 is at origin (0, 0)
         point 1 is on y axis, right of base line (base_width, 0)
         point 2 is top right of quad (quad_right_x, quad_right_height)
@@ -986,90 +931,31 @@ def generate_lights_for_convex_polygon(
         wiring_serpentine (bool): pixels alternate direction between each row, default: True
         grid_gradient (bool): determines how much each line of pixels is offset from the last. Inf
             graadient means grid axes are 90 degrees
-
-    TODO:
-    - handle other polygon types
+        vertices (list): all normalised vertices, polygons with more than four are laid out with
+            `panel_geometry.convex_polygon_lattice` (the quad arguments are ignored)
     """
-    logging.debug(
-        f"Spacing: {spacing: 7.3f}\n"
-        f"Z Height: {z_offset: 7.3f}\n"
-        f"Margin: {margin: 7.3f}\n"
-        f"Grid Gradient: {grid_gradient: 7.3f}"
+    logging.debug(f"Z Height: {z_offset: 7.3f}")
+    if vertices is None:
+        vertices = [
+            (0, 0), (base_width, 0), (quad_right_x, quad_right_height),
+            (quad_left_x, quad_left_height)]
+    solution = polygon_rows(
+        [(vertex[0], vertex[1]) for vertex in vertices],
+        spacing=spacing,
+        spacing_vertical=spacing_vertical,
+        grid_gradient=grid_gradient,
+        margin=margin,
+        margin_vertical_top=margin_vertical_top,
+        margin_left=margin_left,
+        margin_right=margin_right,
     )
-    height = max([quad_left_height, quad_right_height])
-    logging.debug(f"Width (Base) / Height: {base_width: 7.3f} / {height: 7.3f}")
-    logging.debug(
-        f"Quad Left / Right (x, height): "
-        f"({quad_left_x: 7.3f}, {quad_left_height: 7.3f})"
-        f"({quad_right_x: 7.3f}, {quad_right_height: 7.3f})")
-    gradient_left = inf_divide(quad_left_height, quad_left_x)
-    gradient_right = inf_divide(quad_right_height, quad_right_x - base_width)
-    logging.debug(
-        f"Left / Right / Grid Gradients: "
-        f"{gradient_left: 7.3f} / {gradient_right: 7.3f} / {grid_gradient: 7.3f}")
-    if spacing_vertical is None:
-        spacing_vertical = abs(gradient_sin(grid_gradient) * spacing)
-    spacing_shear = abs(gradient_cos(grid_gradient) * spacing)
-    logging.debug(
-        f"Horizontal / Vertical / Shear Spacing: "
-        f"{spacing: 7.3f} / {spacing_vertical: 7.3f} / {spacing_shear: 7.3f}")
-
-    if margin_vertical_top is None:
-        margin_vertical_top = margin_intersect_offset(
-            gradient_left, gradient_right, base_width, margin) or margin
-
-    logging.debug(f"Vertical / Top Margin: {margin: 7.3f} / {margin_vertical_top: 7.3f}")
-
-    vertical_lines, vertical_padding = axis_centered_lines(
-        height, spacing_vertical, margin, margin_vertical_top, axis_name="Vertical")
-    vertical_start = margin + vertical_padding
-
-    if margin_left is None:
-        margin_left = abs(margin / gradient_sin(gradient_left))
-    if margin_right is None:
-        margin_right = abs(margin / gradient_sin(gradient_right))
-    logging.debug(f"Left / Right Margin: {margin_left: 7.3f} / {margin_right: 7.3f}")
-
-    horizontal_start_width = base_width \
-        - inf_divide(vertical_start, gradient_left) \
-        + inf_divide(vertical_start, gradient_right)
-
-    horizontal_lines, horizontal_padding = axis_centered_lines(
-        horizontal_start_width, spacing, margin_left, margin_right, axis_name="Horizontal")
-    horizontal_usage = spacing * (horizontal_lines - 1)
-    horizontal_start = margin_left + inf_divide(vertical_start, gradient_left) + horizontal_padding
+    spacing_vertical = solution['spacing_vertical']
+    spacing_shear = solution['spacing_shear']
+    horizontal_start = solution['horizontal_start']
+    vertical_start = solution['vertical_start']
 
     lights = []
-    for vertical_idx in range(vertical_lines):
-        logging.debug(f"Vertical Index: {vertical_idx}")
-        # relative to pixel origin: (horizontal_start, vertical_start)
-        pixel_y_relative = (vertical_idx * spacing_vertical)
-        pixel_y_absolute = pixel_y_relative + vertical_start
-        logging.debug(
-            f"Pixel Y Relative / Absolute: {pixel_y_relative: 7.3f} {pixel_y_absolute: 7.3f}")
-        # x coordinate where row intesects with grid y-axis
-        row_grid_origin_x = inf_divide(pixel_y_relative, grid_gradient)
-        logging.debug(f"Row Grid Origin X: {row_grid_origin_x: 7.3f}")
-
-        row_start_relative = inf_divide(pixel_y_relative, gradient_left)
-        row_grid_start = float_abs_ceil((row_start_relative - row_grid_origin_x) / spacing)
-
-        row_end_relative = horizontal_usage + inf_divide(pixel_y_relative, gradient_right)
-        row_grid_end = float_abs_floor((row_end_relative - row_grid_origin_x) / spacing)
-
-        logging.debug(
-            f"Row Start / End Relative: {row_start_relative: 7.3f} / {row_end_relative: 7.3f}")
-        logging.debug(f"Row Grid Start / End: {row_grid_start} / {row_grid_end}")
-
-        # Sanity check:
-        row_capacity = abs(row_end_relative - row_start_relative)
-        row_usage = max(row_grid_end - row_grid_start - 1, 0) * spacing
-        logging.debug(f"Row Capacity / Usage: {row_capacity: 7.3f} / {row_usage: 7.3f}")
-        assert \
-            row_usage < row_capacity \
-            or np.isclose(row_capacity - row_usage, 0, atol=ATOL), \
-            f"Row usage {row_usage} >= capacity {row_capacity}"
-
+    for vertical_idx, (row_grid_start, row_grid_end) in enumerate(solution['rows']):
         row = []
         if row_grid_end >= row_grid_start:
             for horizontal_idx in range(row_grid_start, row_grid_end + 1):
@@ -1377,18 +1263,6 @@ def lx_decompose(matrix, basis_transform=None, debug_coll=None):
     return (orig, *angles)
 
 
-def transform_grid_pixels(pixels, grid_origin, grid_matrix):
-    mat = Matrix(serialise_matrix(grid_matrix))
-    orig = Vector(grid_origin)
-    result = [
-        (*map(int, orig + (mat @ Vector(pixel))),)
-        for pixel in pixels
-    ]
-    if any(map(lambda x: not x, result)):
-        breakpoint()
-    return result
-
-
 def grid_project(proj_origin, position):
     proj_phi = proj_origin.angle(Z_AXIS_3D)
     proj_rotation = Matrix.Rotation(proj_phi, 3, 'Y')
@@ -1398,96 +1272,173 @@ def grid_project(proj_origin, position):
 
 
 def debug_grid_info(grid_info, suffix):
-    import matplotlib.pyplot as plt
-    plt, ax = plt.subplots()
-    transformed_positions = {}
-    for label, info in grid_info.items():
-        grid_pixels = transform_grid_pixels(
-            info.get('pixels', [[0, 0]]),
-            info.get('grid_origin', [0, 0]),
-            info.get("grid_matrix", [[1, 0], [0, 1]])
-        )
-        ax.plot(*zip(*grid_pixels), 'o-', label=label, markersize=1, linewidth=0.5)
-        for position in grid_pixels:
-            logging.debug(f"{label}: {format_vector(position)}")
-            if position in transformed_positions:
-                logging.warning(
-                    f"Duplicate position: {position} mapped by {label} and {transformed_positions[position]}")
-            else:
-                transformed_positions[position] = label
-
-    handles, labels = ax.get_legend_handles_labels()
-    logging.info(labels)
-
-    # Shrink current axis by 20%
-    box = ax.get_position()
-    ax.set_position([box.x0, box.y0, box.width * 0.8, box.height])
-    # Put a legend to the right of the current axis
-    ax.legend(handles, labels, loc='center left', bbox_to_anchor=(1, 0.5))
-    # plt.show()
-    ax.axis('scaled')
-    tmp_fig = os.path.join(tempfile.gettempdir(), 'mapping.png')
-    plt.savefig(tmp_fig, dpi=1000)
-    shutil.move(tmp_fig, f'mapping_{suffix}.png')
-
-
-def main():
-    setup_logger(LOG_FILE)
+    """
+    Start drawing the global grid pixel map of a layout into `mapping_<suffix>.png` in a
+    background thread (see `grid_preview.py`), and return the thread.
+    """
+    return start_preview(grid_info, f'mapping_{suffix}.png')
 
-    logging.info(f"*** Starting Light Layout ***")
-    obj = bpy.context.object
-    logging.info(f"Selected object: {obj.name}")
-    logging.debug(f"Object World Matrix:" + ENDLTAB + format_matrix(obj.matrix_world))
-    inv_coordinate_transform = COORDINATE_TRANSFORM.inverted()
-    # world_matrix = COORDINATE_TRANSFORM @ obj.matrix_world
-    world_matrix = obj.matrix_world
-    logging.debug(f"Transformed World Matrix:" + ENDLTAB + format_matrix(world_matrix))
-    with mode_set('OBJECT'):
-        if not IGNORE_LAMPS:
-            bpy.ops.object.delete({
-                "selected_objects": bpy.data.collections[LED_COLLECTION_NAME].all_objects})
-        if DEBUG_COLLECTION_NAME in bpy.data.collections:
-            bpy.ops.object.delete({
-                "selected_objects": bpy.data.collections[DEBUG_COLLECTION_NAME].all_objects})
-        led_coll = bpy.data.collections[LED_COLLECTION_NAME]
-        debug_coll = bpy.data.collections[DEBUG_COLLECTION_NAME]
-        # debug_coll = None
 
-    logging.debug("obj.rotation_mode: " + obj.rotation_mode)
+def polygon_geometry(obj, world_matrix, selected_polygon_enum):
+    """
+    The world center, normal and vertices of each selected polygon, which are shared by every
+    layout of the polygon.
+    """
+    geometry = {}
+    for poly_idx, polygon in selected_polygon_enum:
+        world_center = world_matrix @ polygon.center
+        logging.debug(
+            f"Center (local / world):" + ENDLTAB + format_vecs(polygon.center, world_center))
+        world_normal = (world_matrix @ polygon.normal) - (world_matrix @ ORIGIN_3D)
+        logging.debug(
+            f"Normal (local / world):" + ENDLTAB + format_vecs(polygon.normal, world_normal))
+        logging.debug(f"Vertex IDs:" + ENDLTAB + pformat(list(polygon.vertices)))
+        vertices = [obj.data.vertices[vertex_id].co for vertex_id in polygon.vertices]
+        world_vertices = [world_matrix @ vertex for vertex in vertices]
+        logging.debug(
+            f"Vertices (local / world):" + ENDLTAB + ENDLTAB.join(
+                starmap(format_vecs, zip(vertices, world_vertices))))
+        geometry[poly_idx] = {
+            'center': world_center,
+            'normal': world_normal,
+            'vertices': world_vertices,
+            # (panel_matrix, panel_vertices) for each vertex rotation, see `normalise_geometry`
+            'normalised': {},
+        }
+    return geometry
 
-    panels = []
-    fixtures = []
 
-    selected_polygon_enum, suffix = get_selected_polygons_suffix(obj, EXPORT_TYPE)
+def polygon_overrides(settings, poly_idx):
+    """
+    The overrides of a polygon, and the fixture parameter overrides of a polygon.
+    """
+    overrides = settings['overrides']
+    poly_overrides = settings['poly_overrides'].get(poly_idx, {})
+    return (
+        {**overrides, **poly_overrides},
+        {**overrides.get('fixture'), **poly_overrides.get('fixture', {})}
+    )
 
-    if REGION_NAME:
-        suffix = REGION_NAME
 
-    # ALL_GRID_PIXELS = []
-    grid_info = {}
+def polygon_vertex_rotation(settings, poly_idx):
+    poly_overrides, _ = polygon_overrides(settings, poly_idx)
+    vertex_rotation = settings['vertex_rotation']
+    if 'vertex_rotation' in poly_overrides:
+        logging.debug(f"overriding vertex_rotation ({vertex_rotation})")
+        vertex_rotation = poly_overrides['vertex_rotation']
+    return vertex_rotation
 
-    debug_points = []
 
-    # calculate projection normal and average distance along projection vector
+def normalise_geometry(geometry, layouts):
+    """
+    Normalise each polygon once for every vertex rotation that the layouts use, before the
+    layouts are run in parallel.
+    """
+    for layout in layouts:
+        for poly_idx in layout_polygons(layout, geometry):
+            poly_geometry = geometry[poly_idx]
+            vertex_rotation = polygon_vertex_rotation(layout['settings'], poly_idx)
+            if vertex_rotation in poly_geometry['normalised']:
+                continue
+            poly_geometry['normalised'][vertex_rotation] = normalise_plane(
+                poly_geometry['center'], poly_geometry['normal'],
+                rotate_seq(poly_geometry['vertices'], vertex_rotation))
+
+
+def layout_polygons(layout, geometry):
+    if layout['polygons'] is None:
+        return list(geometry)
+    missing = layout['polygons'] - set(geometry)
+    if missing:
+        logging.warning(
+            f"layout {layout['suffix']} polygons are not selected: {sorted(missing)}")
+    return [poly_idx for poly_idx in geometry if poly_idx in layout['polygons']]
+
+
+def projection_origin(centers):
+    """
+    The projection origin of the global grid: along the average direction of the polygon
+    `centers`, at twice their average distance.
+    """
     proj_normal = Vector((0, 0, 0))
-    for poly_idx, polygon in selected_polygon_enum:
-        proj_normal += world_matrix @ polygon.center
-        # debug_points.append((f"polygon_{poly_idx:02d}_center", polygon.center))
-    proj_distance = 2 * proj_normal.magnitude / len(selected_polygon_enum)
+    for center in centers:
+        proj_normal += center
+    proj_distance = 2 * proj_normal.magnitude / len(centers)
     proj_normal = proj_normal.normalized()
     # front is towards negative x axis, theta is angle from Z to projection normal
     proj_theta = proj_normal.to_2d().angle_signed(-1 * X_AXIS_2D)
     if abs(proj_theta) > ATOL:
         logging.warning("projection vector is not perpendicular to x axis")
-    proj_phi = proj_normal.angle(Z_AXIS_3D)
-    proj_rotation = Matrix.Rotation(proj_phi, 3, 'Y')
-    inv_proj_rotation = proj_rotation.inverted()
 
     logging.debug(
         f"Projection Normal:" + ENDLTAB + format_vecs(proj_normal))
 
-    proj_origin = proj_normal * proj_distance
-    debug_points.append((f"proj_origin", proj_origin))
+    return proj_normal * proj_distance
+
+
+def layout_input_hashes(layout, geometry, poly_indices):
+    """
+    Hashes of what the exports of a layout are made from, for the export manifest (see
+    `export_manifest.py`): the world vertices of its polygons (`mesh`), its settings and the
+    module settings which change the layout (`config`), and its fixture `overrides`.
+    """
+    settings = dict(layout['settings'])
+    overrides = {key: settings.pop(key, None) for key in ['overrides', 'poly_overrides']}
+    mesh = [
+        [poly_idx, [serialise_vector(vertex) for vertex in geometry[poly_idx]['vertices']]]
+        for poly_idx in poly_indices
+    ]
+    config = {
+        'led_config': layout['led_config'],
+        'region': layout['region'],
+        'settings': settings,
+        'export_type': EXPORT_TYPE,
+        'coordinate_transform': serialise_matrix(COORDINATE_TRANSFORM),
+        'grid_quantization_optimise': GRID_QUANTIZATION_OPTIMISE,
+        'grid_offset_radius': GRID_OFFSET_RADIUS,
+    }
+    return {
+        'mesh': value_hash(mesh),
+        'config': value_hash(config),
+        'overrides': value_hash(overrides),
+    }
+
+
+def layout_input_files(config_file=None):
+    """
+    The files the exports of a layout are made from, which `export_manifest.py` can check
+    without Blender: the saved `.blend` file, the layout config and this module, which holds
+    the layout settings. Unsaved changes to the `.blend` file aren't seen.
+    """
+    return [path for path in [bpy.data.filepath, config_file, THIS_FILE] if path]
+
+
+def run_layout(layout, geometry, inv_coordinate_transform):
+    """
+    Lay out the lights of every polygon of a layout and solve its global grid.
+
+    Returns a dict with the `panels` and `fixtures` to export, the `grid_info` for
+    `debug_grid_info`, the world positions of the `lamps` of each polygon, the
+    `debug_points` and the laid out `polygons`. Nothing is added to the scene, so that layouts
+    can run in parallel.
+    """
+    settings = layout['settings']
+    suffix = layout['suffix']
+    logging.info(f"laying out {suffix} ({layout['led_config']})")
+
+    panels = []
+    fixtures = []
+    lamps = []
+
+    # ALL_GRID_PIXELS = []
+    grid_info = {}
+
+    debug_points = []
+
+    # calculate projection normal and average distance along projection vector
+    poly_indices = layout_polygons(layout, geometry)
+    proj_origin = projection_origin([geometry[poly_idx]['center'] for poly_idx in poly_indices])
+    debug_points.append((f"proj_origin_{suffix}", proj_origin))
 
     # minimal distance between adjacent projected pixels
     min_adjacency = inf
@@ -1496,13 +1447,9 @@ def main():
     # pixel layout #
     # ############ #
 
-    for poly_idx, polygon in selected_polygon_enum:
+    for poly_idx in poly_indices:
 
-        poly_overrides = {**OVERRIDES, **POLY_OVERRIDES.get(poly_idx, {})}
-        poly_fix_overrides = {
-            **OVERRIDES.get('fixture'),
-            **POLY_OVERRIDES.get(poly_idx, {}).get('fixture', {})
-        }
+        poly_overrides, poly_fix_overrides = polygon_overrides(settings, poly_idx)
 
         name = f"[{poly_idx}]"
         logging.info(f"polygon name: {name}")
@@ -1512,36 +1459,15 @@ def main():
         }
 
         fixture = {
-            "id": poly_idx + IDX_OFFSET,
+            "id": poly_idx + settings['idx_offset'],
             "class": "flavius.ledportal.structure.LPPanelFixture",
             "parameters": {
                 "label": name,
             },
         }
 
-        world_center = world_matrix @ polygon.center
-        logging.debug(
-            f"Center (local / world):" + ENDLTAB + format_vecs(polygon.center, world_center))
-        world_normal = (world_matrix @ polygon.normal) - (world_matrix @ ORIGIN_3D)
-        logging.debug(
-            f"Normal (local / world):" + ENDLTAB + format_vecs(polygon.normal, world_normal))
-        logging.debug(f"Vertex IDs:" + ENDLTAB + pformat(list(polygon.vertices)))
-        vertices = [obj.data.vertices[vertex_id].co for vertex_id in polygon.vertices]
-        world_vertices = [world_matrix @ vertex for vertex in vertices]
-        logging.debug(
-            f"Vertices (local / world):" + ENDLTAB + ENDLTAB.join(
-                starmap(format_vecs, zip(vertices, world_vertices))))
-
-        vertex_rotation = VERTEX_ROTATION
-        if 'vertex_rotation' in poly_overrides:
-            logging.debug(f"overriding vertex_rotation ({vertex_rotation})")
-            vertex_rotation = poly_overrides['vertex_rotation']
-
-        world_vertices = rotate_seq(world_vertices, vertex_rotation)
-
-        panel_matrix, panel_vertices = normalise_plane(
-            world_center, world_normal, world_vertices
-        )
+        vertex_rotation = polygon_vertex_rotation(settings, poly_idx)
+        panel_matrix, panel_vertices = geometry[poly_idx]['normalised'][vertex_rotation]
 
         info, pixels = generate_lights_for_convex_polygon(
             panel_vertices[1].x,
@@ -1549,16 +1475,17 @@ def main():
             panel_vertices[2].y,
             panel_vertices[-1].x,
             panel_vertices[-1].y,
-            spacing=LED_SPACING,
-            spacing_vertical=LED_SPACING_VERTICAL,
-            grid_gradient=GRID_GRADIENT,
-            margin=LED_MARGIN,
-            margin_vertical_top=LED_MARGIN_VERTICAL_TOP,
-            margin_left=LED_MARGIN_LEFT,
-            margin_right=LED_MARGIN_RIGHT,
-            wiring_serpentine=WIRING_SERPENTINE,
-            wiring_reverse=WIRING_REVERSE,
-            z_offset=Z_OFFSET,
+            spacing=settings['spacing'],
+            spacing_vertical=settings['spacing_vertical'],
+            grid_gradient=settings['grid_gradient'],
+            margin=settings['margin'],
+            margin_vertical_top=settings['margin_vertical_top'],
+            margin_left=settings['margin_left'],
+            margin_right=settings['margin_right'],
+            wiring_serpentine=settings['wiring_serpentine'],
+            wiring_reverse=settings['wiring_reverse'],
+            z_offset=settings['z_offset'],
+            vertices=panel_vertices,
         )
 
         if 'pixels' in poly_overrides:
@@ -1615,10 +1542,12 @@ def main():
         fixtures.append(fixture)
 
         proj_pixels = []
+        world_positions = []
         for light_idx, position in enumerate(pixels):
             norm_position = info['transformation'] @ Vector((position[0], position[1], 0))
             logging.debug('\t' + format_vector(norm_position))
-            proj_position = grid_project(proj_origin, panel_matrix @ norm_position)
+            world_positions.append(panel_matrix @ norm_position)
+            proj_position = grid_project(proj_origin, world_positions[-1])
             # position = panel_matrix @ norm_position
             # position = position + proj_origin
             # distance = position.dot(proj_normal)
@@ -1634,110 +1563,88 @@ def main():
             # 'grid_matrix': grid_matrix
         }
 
-        if IGNORE_LAMPS:
-            continue
+        if layout['lamps']:
+            lamps.append((poly_idx, world_positions))
 
-        logging.info(f"adding {len(pixels)} lights to scene")
+    logging.debug(f"min_adjacency: {min_adjacency}")
 
-        logging.debug("Lights (Norm):")
+    solve_global_grid(
+        panels, fixtures, grid_info, proj_origin, min_adjacency, inv_coordinate_transform)
 
-        for light_idx, position in enumerate(pixels):
-            name = f"LED {poly_idx:4d} {light_idx:4d}"
-            lamp_data = bpy.data.lights.new(name=f"{name} data", type='POINT')
-            lamp_data.energy = 1.0
-            lamp_object = bpy.data.objects.new(name=f"{name} object", object_data=lamp_data)
-            norm_position = info['transformation'] @ Vector((position[0], position[1], 0))
-            position = panel_matrix @ norm_position
-            lamp_object.location = position
-            led_coll.objects.link(lamp_object)
+    return {
+        'panels': panels,
+        'fixtures': fixtures,
+        'grid_info': grid_info,
+        'lamps': lamps,
+        'debug_points': debug_points,
+        'polygons': poly_indices,
+    }
 
-    logging.debug(f"min_adjacency: {min_adjacency}")
+
+def solve_global_grid(
+        panels, fixtures, grid_info, proj_origin, min_adjacency, inv_coordinate_transform):
+    """
+    Fit the global grid origin and matrix of every panel, and add them to its fixture and
+    `grid_info`.
+    """
 
     # ########### #
     # grid pixels #
     # ########### #
 
-    quantization = min_adjacency / 2
-    for fixture, panel in zip(fixtures, panels):
-        matrix = inv_coordinate_transform @ Matrix(panel['matrix'])
-        proj_grid_origin = grid_project(proj_origin, matrix @ Vector((0, 0, 0)))
-        # world_grid_origin = matrix @ Vector((0, 0, 0)) + proj_origin
-        # distance = world_grid_origin.dot(proj_normal)
-        # proj_grid_origin = proj_rotation @ (world_grid_origin * proj_distance / distance - proj_origin)
-        # debug_points.append((f"panel_{fixture['parameters']['label']}_origin", proj_grid_origin))
-        proj_grid_origin = proj_grid_origin / quantization
-        grid_origin = Vector((-proj_grid_origin.y, proj_grid_origin.x))
-        grid_origin = Vector((int(grid_origin.x), int(grid_origin.y)))
-        # grid_origin = Vector((-int(round(proj_grid_origin.y)), int(round(proj_grid_origin.x))))
-
-        max_x_pixel = None
-        max_y_pixel = None
-        for pixel in panel['pixels']:
-            if max_x_pixel is None or pixel[0] > max_x_pixel[0]:
-                max_x_pixel = pixel
-            if max_y_pixel is None or pixel[1] > max_y_pixel[1]:
-                max_y_pixel = pixel
-
-        proj_grid_x = grid_project(
-            proj_origin, matrix @ Vector((max_x_pixel[0], max_x_pixel[1], 0)))
-        # debug_points.append((f"panel_{fixture['parameters']['label']}_x", proj_grid_x))
-        proj_grid_x = proj_grid_x / quantization
-        grid_x = Vector((-proj_grid_x.y, proj_grid_x.x)) - grid_origin
-
-        proj_grid_y = grid_project(
-            proj_origin, matrix @ Vector((max_y_pixel[0], max_y_pixel[1], 0)))
-        # debug_points.append((f"panel_{fixture['parameters']['label']}_y", proj_grid_y))
-        proj_grid_y = proj_grid_y / quantization
-        grid_y = Vector((-proj_grid_y.y, proj_grid_y.x)) - grid_origin
-
-        grid_solution = np.linalg.solve(
-            np.array([
-                [max_x_pixel[0], max_x_pixel[1], 0, 0],
-                [0, 0, max_x_pixel[0], max_x_pixel[1]],
-                [max_y_pixel[0], max_y_pixel[1], 0, 0],
-                [0, 0, max_y_pixel[0], max_y_pixel[1]],
-            ]),
-            np.array([
-                grid_x[0],
-                grid_x[1],
-                grid_y[0],
-                grid_y[1]
-            ])
-        )
-
-        inner_quantization = 1e-1
+    panel_pixel_matrices = [
+        np.array(inv_coordinate_transform @ Matrix(panel['matrix'])) for panel in panels
+    ]
+    all_panel_pixels = [panel_pixels(panel) for panel in panels]
+    panel_projected = [
+        grid_project_positions(proj_origin, panel_world_positions({**panel, 'matrix': matrix}))
+        for panel, matrix in zip(panels, panel_pixel_matrices)
+    ]
 
-        def quantize(f):
-            if abs(f) - int(f) < inner_quantization:
-                return int(f)
-            return f
+    def fit_grids(quantization, offsets=None):
+        grids = fit_panel_grids(all_panel_pixels, panel_projected, quantization)
+        if offsets is not None:
+            grids['origins'] = grids['origins'] + offsets
+        return grids
+
+    def panel_grid_positions(quantization, offsets=None):
+        grids = fit_grids(quantization, offsets)
+        return [
+            transform_grid_positions(pixels, grid_origin, grid_matrix)
+            for pixels, grid_origin, grid_matrix in zip(
+                all_panel_pixels, grids['origins'], grids['matrices'])
+        ]
 
-        grid_matrix = Matrix([
-            [grid_solution[0], quantize(grid_solution[1])],
-            [quantize(grid_solution[2]), grid_solution[3]],
-        ])
+    quantization = min_adjacency / 2
+    offsets = None
+    if GRID_QUANTIZATION_OPTIMISE:
+        optimised = optimise_quantization(
+            panel_grid_positions, quantization, offset_radius=GRID_OFFSET_RADIUS)
+        logging.info(
+            f"grid extent {grid_extent(panel_grid_positions(quantization))} at quantization "
+            f"{quantization:.6f}, "
+            f"{grid_extent(panel_grid_positions(optimised['quantization'], optimised['offsets']))}"
+            f" at {optimised['quantization']:.6f}")
+        quantization, offsets = optimised['quantization'], optimised['offsets']
+
+    grids = fit_grids(quantization, offsets)
+    worst = int(np.argmax(grids['rms']))
+    logging.info(
+        f"grid residual mean rms / max: {np.mean(grids['rms']):.3f} / {np.max(grids['max']):.3f}, "
+        f"worst panel {fixtures[worst]['parameters']['label']}")
+    for fixture, grid_origin, grid_matrix, rms, max_residual, pitch in zip(
+            fixtures, grids['origins'], grids['matrices'], grids['rms'], grids['max'],
+            grids['pitch']):
+        grid_origin = Vector(grid_origin.tolist())
+        grid_matrix = Matrix(grid_matrix.tolist())
         logging.debug(format_matrix(grid_matrix, name="Grid Matrix"))
-        # grid_matrix = Matrix([
-        #     [grid_x[0], grid_y[0]],
-        #     [grid_x[1], grid_y[1]],
-        # ])
-
-        grid_x_validation = grid_matrix @ Vector(max_x_pixel)
-        if (grid_x_validation - grid_x).magnitude > inner_quantization:
+        logging.debug(f"grid residual rms / max: {rms:.3f} / {max_residual:.3f}")
+        if GRID_RESIDUAL_TOLERANCE is not None \
+                and max_residual > GRID_RESIDUAL_TOLERANCE * pitch:
             logging.warning(
-                f"matrix does not grid_x correctly. Expected {grid_x}, got {grid_x_validation}")
-        grid_y_validation = grid_matrix @ Vector(max_y_pixel)
-        if (grid_y_validation - grid_y).magnitude > inner_quantization:
-            logging.warning(
-                f"matrix does not grid_y correctly. Expected {grid_y}, got {grid_y_validation}")
-
-        logging.debug(f"panel {fixture['parameters']['label']} gridpoints: " + ENDLTAB \
-            + ENDLTAB.join([
-                f"{n:8s}: {format_vector(p)} -> {format_vector(g)}" for n, p, g in [
-                ("origin", [0, 0], grid_origin),
-                ("max_x", max_x_pixel, grid_x),
-                ("max_y", max_y_pixel, grid_y)
-            ]]))
+                f"panel {fixture['parameters']['label']} grid matrix residuals are too large: "
+                f"rms {rms:.3f}, max {max_residual:.3f} grid units, pixel pitch {pitch:.3f}")
+
         fixture['parameters']['globalGridMatrix'] = repr(
             serialise_matrix(grid_matrix)).replace(' ', '')
         fixture['parameters']['globalGridOriginX'] = grid_origin[0]
@@ -1745,28 +1652,142 @@ def main():
         grid_info[fixture['parameters']['label']]['grid_origin'] = grid_origin
         grid_info[fixture['parameters']['label']]['grid_matrix'] = grid_matrix
 
-    if debug_coll:
+
+def add_lamps(led_coll, lamps):
+    for poly_idx, world_positions in lamps:
+        logging.info(f"adding {len(world_positions)} lights to scene")
+        for light_idx, position in enumerate(world_positions):
+            name = f"LED {poly_idx:4d} {light_idx:4d}"
+            lamp_data = bpy.data.lights.new(name=f"{name} data", type='POINT')
+            lamp_data.energy = 1.0
+            lamp_object = bpy.data.objects.new(name=f"{name} object", object_data=lamp_data)
+            lamp_object.location = position
+            led_coll.objects.link(lamp_object)
+
+
+def add_debug_points(debug_coll, debug_points):
+    with mode_set('OBJECT'):
+        for name, point in debug_points:
+            debug_verts = [
+                ORIGIN_3D,
+                point + ORIGIN_3D
+            ]
+            debug_edges = [
+                (0, 1)
+            ]
+            debug_mesh = bpy.data.meshes.new(f"mesh_{name}")
+            debug_mesh.from_pydata(debug_verts, debug_edges, [])
+            debug_obj = bpy.data.objects.new(name, debug_mesh)
+            debug_coll.objects.link(debug_obj)
+
+
+def check_clearance(panels, threshold, inv_coordinate_transform, debug_coll=None, suffix=''):
+    """
+    Report LEDs on different panels which are closer than `threshold` (see `led_clearance`), and
+    add a mesh of the offending pairs to `debug_coll`.
+    """
+    positions, panel_ids, led_ids = panel_led_positions(panels)
+    pairs, distances = find_close_pairs(positions, panel_ids, threshold)
+    report = clearance_report(
+        pairs, distances, panel_ids, led_ids, [panel['name'] for panel in panels], threshold)
+    if len(pairs):
+        logging.warning(report)
+    else:
+        logging.info(report)
+    if debug_coll and len(pairs):
+        # panel matrices are in the coordinate transform's axes
+        world_positions = positions @ np.array(inv_coordinate_transform)[:3, :3].T
         with mode_set('OBJECT'):
-            for name, point in debug_points:
-                debug_verts = [
-                    ORIGIN_3D,
-                    point + ORIGIN_3D
-                ]
-                debug_edges = [
-                    (0, 1)
-                ]
-                debug_mesh = bpy.data.meshes.new(f"mesh_{name}")
-                debug_mesh.from_pydata(debug_verts, debug_edges, [])
-                debug_obj = bpy.data.objects.new(name, debug_mesh)
-                debug_coll.objects.link(debug_obj)
+            add_debug_mesh(world_positions, pairs, debug_coll, f"led_clearance_{suffix}")
+    return pairs, distances
 
-    logging.info(f"exporting {len(panels)} {EXPORT_TYPE.lower()}")
-    export_json(get_out_path(obj, suffix), {EXPORT_TYPE.lower(): panels})
-    export_json(get_out_path(obj, suffix, 'lxm'), {'fixtures': fixtures})
 
-    logging.info(f"*** Completed Light Layout ***")
+def main(config_file=None):
+    """
+    Lay out the selected polygons of the selected object for each layout in `config_file` (or
+    LAYOUT_CONFIG_FILE), or for LED_CONFIG and REGION_NAME if there is none.
+
+    The polygon geometry is computed once and shared by every layout. Layouts are run in a
+    thread pool (the NumPy grid solving releases the GIL, and Blender data can't be passed to
+    other processes), then the scene is updated and the exports are written one at a time.
+    """
+    setup_logger(LOG_FILE)
 
-    debug_grid_info(grid_info, suffix)
+    logging.info(f"*** Starting Light Layout ***")
+    config_file = config_file or LAYOUT_CONFIG_FILE
+    if config_file:
+        logging.info(f"layout config: {config_file}")
+        layouts, workers = load_layout_config(config_file)
+    else:
+        layouts, workers = [layout_from_config(LED_CONFIG, REGION_NAME)], None
+
+    obj = bpy.context.object
+    logging.info(f"Selected object: {obj.name}")
+    logging.debug(f"Object World Matrix:" + ENDLTAB + format_matrix(obj.matrix_world))
+    inv_coordinate_transform = COORDINATE_TRANSFORM.inverted()
+    # world_matrix = COORDINATE_TRANSFORM @ obj.matrix_world
+    world_matrix = obj.matrix_world
+    logging.debug(f"Transformed World Matrix:" + ENDLTAB + format_matrix(world_matrix))
+    with mode_set('OBJECT'):
+        if any(layout['lamps'] for layout in layouts):
+            bpy.ops.object.delete({
+                "selected_objects": bpy.data.collections[LED_COLLECTION_NAME].all_objects})
+        if DEBUG_COLLECTION_NAME in bpy.data.collections:
+            bpy.ops.object.delete({
+                "selected_objects": bpy.data.collections[DEBUG_COLLECTION_NAME].all_objects})
+        led_coll = bpy.data.collections[LED_COLLECTION_NAME]
+        debug_coll = bpy.data.collections[DEBUG_COLLECTION_NAME]
+        # debug_coll = None
+
+    logging.debug("obj.rotation_mode: " + obj.rotation_mode)
+
+    selected_polygon_enum, selected_suffix = get_selected_polygons_suffix(obj, EXPORT_TYPE)
+
+    for layout in layouts:
+        layout['suffix'] = layout['region'] or selected_suffix
+    suffixes = [layout['suffix'] for layout in layouts]
+    if len(set(suffixes)) != len(suffixes):
+        raise ValueError(f"layouts would overwrite each other's exports: {suffixes}")
+
+    geometry = polygon_geometry(obj, world_matrix, selected_polygon_enum)
+    normalise_geometry(geometry, layouts)
+
+    def run(layout):
+        return run_layout(layout, geometry, inv_coordinate_transform)
+
+    if len(layouts) > 1 and workers != 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(run, layouts))
+    else:
+        results = [run(layout) for layout in layouts]
+
+    previews = []
+    files = layout_input_files(config_file)
+    for layout, result in zip(layouts, results):
+        suffix = layout['suffix']
+        add_lamps(led_coll, result['lamps'])
+        if debug_coll:
+            add_debug_points(debug_coll, result['debug_points'])
+
+        logging.info(f"exporting {len(result['panels'])} {EXPORT_TYPE.lower()}")
+        inputs = layout_input_hashes(layout, geometry, result['polygons'])
+        export_json(
+            get_out_path(obj, suffix), {EXPORT_TYPE.lower(): result['panels']}, inputs=inputs,
+            files=files)
+        export_json(
+            get_out_path(obj, suffix, 'lxm'), {'fixtures': result['fixtures']}, inputs=inputs,
+            files=files)
+
+        if LED_CLEARANCE:
+            check_clearance(
+                result['panels'], LED_CLEARANCE, inv_coordinate_transform, debug_coll, suffix)
+
+        if GRID_PREVIEW:
+            previews.append(debug_grid_info(result['grid_info'], suffix))
+
+    for preview in previews:
+        preview.join()
+    logging.info(f"*** Completed Light Layout ***")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,347 @@
+"""
+Assign panels to controller hosts and output channels so that the busiest channel has as few
+pixels as possible, since every channel clocks its pixels out serially (see `output_timing`) and
+the slowest channel limits the frame rate of the whole installation.
+
+Panels are read from a fixture export (`.lxm`). The assignment starts from a longest-first
+greedy packing, then exchanges panels between the busiest channel and the others until no
+exchange helps. Channels can be limited in pixels or panels, hosts in pixels (e.g. for network
+bandwidth), and with `--adjacent`, the panels which share a channel must form a physically
+connected chain, where panels are adjacent if any of their LEDs are within `--adjacency-distance`
+of each other.
+
+The result is printed as a table and written as `poly_overrides` for a layout config (see
+`light_layout.load_layout_config`), keyed by polygon index (fixture id - `--idx-offset`).
+
+    python tools/load_balancer.py LEDPortalSimulator/data/TeleCortex_Dome_5630_Panels_Full_OG.lxm \\
+        --hosts lingering-brook quiet-hill still-brook --channels 4 --adjacent
+"""
+
+import argparse
+import json
+import logging
+import os
+from itertools import combinations
+
+import numpy as np
+
+from layout_io import fixture_label, fixture_pixels, load_fixtures, load_panels
+from led_clearance import find_close_pairs, panel_led_positions, wiring_spacing
+from output_timing import strip_refresh_rate
+
+# give up improving the assignment after this many exchanges
+MAX_MOVES = 10000
+# exchange at most this many panels each way between two channels
+MAX_EXCHANGE = 2
+
+
+def channel_list(hosts, channels=4):
+    """
+    (host, channel) pairs of each output. Hosts can be given as 'name:channels' to override the
+    default number of `channels`.
+    """
+    result = []
+    for host in hosts:
+        name, _, host_channels = host.partition(':')
+        result.extend((name, channel) for channel in range(int(host_channels or channels)))
+    return result
+
+
+def panel_adjacency(panels, distance=None):
+    """
+    Sets of adjacent panel indices for each panel, where panels are adjacent if any of their LEDs
+    are within `distance` (by default twice the LED spacing).
+    """
+    positions, panel_ids, _ = panel_led_positions(panels)
+    if distance is None:
+        distance = 2 * wiring_spacing(positions, panel_ids)
+    pairs, _ = find_close_pairs(positions, panel_ids, distance)
+    adjacency = [set() for _ in panels]
+    for panel_a, panel_b in np.unique(panel_ids[pairs], axis=0).tolist():
+        adjacency[panel_a].add(panel_b)
+        adjacency[panel_b].add(panel_a)
+    return adjacency
+
+
+def is_connected(members, adjacency):
+    members = set(members)
+    if len(members) <= 1:
+        return True
+    start = next(iter(members))
+    seen = {start}
+    stack = [start]
+    while stack:
+        for neighbour in adjacency[stack.pop()] & members:
+            if neighbour not in seen:
+                seen.add(neighbour)
+                stack.append(neighbour)
+    return seen == members
+
+
+class Assignment:
+    """
+    Panels assigned to channels, with the pixel load of every channel and host.
+    """
+
+    def __init__(
+            self, pixels, channels, max_pixels=None, max_panels=None, max_host_pixels=None,
+            adjacency=None):
+        self.pixels = np.asarray(pixels, dtype=int)
+        self.channels = channels
+        self.max_pixels = max_pixels
+        self.max_panels = max_panels
+        self.max_host_pixels = max_host_pixels
+        self.adjacency = adjacency
+        hosts = sorted({host for host, _ in channels})
+        self.channel_hosts = np.array([hosts.index(host) for host, _ in channels], dtype=int)
+        self.panel_channels = np.full(len(self.pixels), -1, dtype=int)
+        self.members = [set() for _ in channels]
+        self.loads = np.zeros(len(channels), dtype=int)
+        self.host_loads = np.zeros(len(hosts), dtype=int)
+
+    def objective(self, loads=None):
+        """
+        Channel loads from the busiest down, compared lexicographically.
+        """
+        return tuple(np.sort(self.loads if loads is None else loads)[::-1].tolist())
+
+    def fits(self, channel, added=(), removed=(), check_host=True):
+        """
+        Whether `channel` satisfies the constraints after adding and removing panels.
+        """
+        load = self.loads[channel] + self.pixels[list(added)].sum() \
+            - self.pixels[list(removed)].sum()
+        if self.max_pixels is not None and load > self.max_pixels:
+            return False
+        members = (self.members[channel] | set(added)) - set(removed)
+        if self.max_panels is not None and len(members) > self.max_panels:
+            return False
+        if check_host and self.max_host_pixels is not None:
+            host = self.channel_hosts[channel]
+            host_load = self.host_loads[host] + load - self.loads[channel]
+            if host_load > self.max_host_pixels:
+                return False
+        if self.adjacency is not None and not is_connected(members, self.adjacency):
+            return False
+        return True
+
+    def assign(self, panel, channel):
+        previous = self.panel_channels[panel]
+        if previous >= 0:
+            self.members[previous].discard(panel)
+            self.loads[previous] -= self.pixels[panel]
+            self.host_loads[self.channel_hosts[previous]] -= self.pixels[panel]
+        self.panel_channels[panel] = channel
+        self.members[channel].add(panel)
+        self.loads[channel] += self.pixels[panel]
+        self.host_loads[self.channel_hosts[channel]] += self.pixels[panel]
+
+    def greedy(self):
+        """
+        Assign the largest panels first, each to the least loaded channel it fits on. With
+        adjacency constraints, panels next to already assigned panels go first.
+        """
+        unassigned = set(range(len(self.pixels)))
+        while unassigned:
+            candidates = sorted(unassigned, key=lambda panel: -self.pixels[panel])
+            if self.adjacency is not None:
+                # grow existing chains before starting new ones
+                candidates.sort(key=lambda panel: not any(
+                    self.panel_channels[neighbour] >= 0 for neighbour in self.adjacency[panel]))
+            for panel in candidates:
+                channels = [
+                    channel for channel in np.argsort(self.loads, kind='stable')
+                    if self.fits(channel, added=[panel])
+                ]
+                if channels:
+                    self.assign(panel, channels[0])
+                    unassigned.discard(panel)
+                    break
+            else:
+                raise ValueError(
+                    f"can't assign panels {sorted(unassigned)} to any channel within the "
+                    f"constraints")
+
+    def improve(self, max_moves=MAX_MOVES):
+        """
+        Exchange up to `MAX_EXCHANGE` panels of a busiest channel for fewer pixels' worth of
+        panels of another channel, while that lowers the objective. Returns the number of
+        exchanges made.
+        """
+        for moves in range(max_moves):
+            best = None
+            best_objective = self.objective()
+            for source in np.flatnonzero(self.loads == self.loads.max()):
+                outgoing = subsets(self.members[source], 1)
+                for target in range(len(self.channels)):
+                    gap = self.loads[source] - self.loads[target]
+                    if target == source or gap <= 0:
+                        continue
+                    for incoming in subsets(self.members[target], 0):
+                        for leaving in outgoing:
+                            delta = self.pixels[list(leaving)].sum() \
+                                - self.pixels[list(incoming)].sum()
+                            # only exchanges which narrow the gap can help
+                            if not 0 < delta < gap:
+                                continue
+                            objective = self.evaluate_exchange(
+                                source, leaving, target, incoming)
+                            if objective is not None and objective < best_objective:
+                                best, best_objective = (leaving, target, incoming), objective
+            if best is None:
+                return moves
+            leaving, target, incoming = best
+            source = self.panel_channels[leaving[0]]
+            for panel in incoming:
+                self.assign(panel, source)
+            for panel in leaving:
+                self.assign(panel, target)
+        return max_moves
+
+    def evaluate_exchange(self, source, leaving, target, incoming):
+        """
+        The objective after moving the `leaving` panels from `source` to `target` and the
+        `incoming` panels the other way, or None if that breaks a constraint.
+        """
+        if not self.fits(source, added=incoming, removed=leaving, check_host=False):
+            return None
+        if not self.fits(target, added=leaving, removed=incoming, check_host=False):
+            return None
+        delta = self.pixels[list(leaving)].sum() - self.pixels[list(incoming)].sum()
+        if self.max_host_pixels is not None:
+            host_loads = self.host_loads.copy()
+            host_loads[self.channel_hosts[source]] -= delta
+            host_loads[self.channel_hosts[target]] += delta
+            if host_loads.max() > self.max_host_pixels:
+                return None
+        loads = self.loads.copy()
+        loads[source] -= delta
+        loads[target] += delta
+        return self.objective(loads)
+
+
+def subsets(members, smallest):
+    """
+    Subsets of `smallest` up to `MAX_EXCHANGE` panels, as sorted tuples.
+    """
+    members = sorted(members)
+    return [
+        subset
+        for size in range(smallest, MAX_EXCHANGE + 1)
+        for subset in combinations(members, size)
+    ]
+
+
+def balance(
+        pixels, channels, max_pixels=None, max_panels=None, max_host_pixels=None,
+        adjacency=None):
+    """
+    Assign panels with the given `pixels` counts to `channels` (see `channel_list`), minimising
+    the largest number of pixels on a channel. Returns the `Assignment`.
+    """
+    assignment = Assignment(
+        pixels, channels, max_pixels, max_panels, max_host_pixels, adjacency)
+    assignment.greedy()
+    moves = assignment.improve()
+    logging.info(
+        f"balanced {len(assignment.pixels)} panels on {len(channels)} channels after {moves} "
+        f"moves, max {assignment.loads.max()} pixels per channel")
+    return assignment
+
+
+def lower_bound(pixels, channel_count):
+    """
+    No assignment can have fewer pixels on its busiest channel than this.
+    """
+    pixels = np.asarray(pixels)
+    return int(max(pixels.max(initial=0), np.ceil(pixels.sum() / max(channel_count, 1))))
+
+
+def current_loads(fixtures):
+    """
+    Pixels on each (host, opcChannel) of the current fixture assignment, if every fixture has one.
+    """
+    loads = {}
+    for fixture in fixtures:
+        parameters = fixture['parameters']
+        if 'host' not in parameters:
+            return None
+        key = (parameters['host'], parameters.get('opcChannel', 0))
+        loads[key] = loads.get(key, 0) + len(fixture_pixels(fixture))
+    return loads
+
+
+def poly_overrides(fixtures, assignment, idx_offset=1):
+    """
+    The host and channel of each fixture, as layout config `poly_overrides`.
+    """
+    overrides = {}
+    for fixture, channel in zip(fixtures, assignment.panel_channels):
+        host, opc_channel = assignment.channels[channel]
+        overrides[str(fixture['id'] - idx_offset)] = {
+            'fixture': {'host': host, 'opcChannel': opc_channel}
+        }
+    return overrides
+
+
+def format_assignment(assignment, labels):
+    lines = [f"{'host':<20} {'channel':>7} {'pixels':>6} {'max fps':>8}  panels"]
+    for channel, (host, opc_channel) in enumerate(assignment.channels):
+        members = sorted(assignment.members[channel])
+        lines.append(
+            f"{host:<20} {opc_channel:7d} {assignment.loads[channel]:6d} "
+            f"{strip_refresh_rate(assignment.loads[channel]):8.1f}  "
+            + ' '.join(labels[panel] for panel in members))
+    busiest = assignment.loads.max()
+    lines.append(
+        f"busiest channel: {busiest} pixels (lower bound "
+        f"{lower_bound(assignment.pixels, len(assignment.channels))}), refresh rate ceiling "
+        f"{strip_refresh_rate(busiest):.1f} fps")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('fixtures', help="fixture export (.lxm)")
+    parser.add_argument(
+        '--hosts', nargs='+', required=True, help="controller hosts, as 'name' or 'name:channels'")
+    parser.add_argument('--channels', type=int, default=4, help="default channels per host")
+    parser.add_argument('--max-pixels', type=int, help="maximum pixels per channel")
+    parser.add_argument('--max-panels', type=int, help="maximum panels per channel")
+    parser.add_argument('--max-host-pixels', type=int, help="maximum pixels per host")
+    parser.add_argument(
+        '--adjacent', action='store_true',
+        help="panels on a channel must be adjacent, needs the panel export next to the fixtures")
+    parser.add_argument('--adjacency-distance', type=float)
+    parser.add_argument('--idx-offset', type=int, default=1, help="fixture id - polygon index")
+    parser.add_argument('--output', help="write the poly_overrides to this JSON file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    fixtures = load_fixtures(args.fixtures)
+    labels = [fixture_label(fixture) for fixture in fixtures]
+    pixels = [len(fixture_pixels(fixture)) for fixture in fixtures]
+    adjacency = None
+    if args.adjacent:
+        panels = load_panels(os.path.splitext(args.fixtures)[0] + '.json')
+        adjacency = panel_adjacency(panels, args.adjacency_distance)
+
+    channels = channel_list(args.hosts, args.channels)
+    assignment = balance(
+        pixels, channels, args.max_pixels, args.max_panels, args.max_host_pixels, adjacency)
+
+    loads = current_loads(fixtures)
+    if loads:
+        busiest = max(loads.values())
+        print(
+            f"current assignment: {busiest} pixels on the busiest channel, "
+            f"{strip_refresh_rate(busiest):.1f} fps")
+    print(format_assignment(assignment, labels))
+    overrides = poly_overrides(fixtures, assignment, args.idx_offset)
+    if args.output:
+        with open(args.output, 'w') as stream:
+            json.dump({'poly_overrides': overrides}, stream, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""
+Timing models for the outputs which drive the LEDs, and an estimate of the frame rate each output
+of a fixture export (`.lxm`) can reach.
+
+A WS281x style strip clocks every pixel out serially, followed by a reset (latch) gap, so the
+refresh rate of an output channel is inversely proportional to the number of pixels on it. On top
+of that, each OPC host receives all of its channels over one TCP connection, and each Art-Net
+universe (up to 170 RGB pixels) is one UDP packet, which share the network link.
+
+    python tools/output_timing.py LEDPortalSimulator/data/TeleCortex_Dome_5630_Panels_Full_OG.lxm \
+        --fps 60
+"""
+
+import argparse
+import logging
+
+from frame_stream import DEFAULT_OPC_PORT, OPC_PROTOCOL
+from layout_io import fixture_label, fixture_pixels, load_fixtures
+
+ARTNET_PROTOCOL = 2
+# 512 DMX channels hold 170 RGB pixels
+ARTNET_UNIVERSE_PIXELS = 170
+# ArtDmx header: ID, OpCode, version, sequence, physical, universe, length
+ARTNET_HEADER = 18
+# channel, command and length
+OPC_HEADER = 4
+# UDP + IPv4 and TCP + IPv4 headers without options
+UDP_IP_HEADERS = 28
+TCP_IP_HEADERS = 40
+TCP_MSS = 1460
+# Ethernet header, FCS, preamble and inter-frame gap
+ETHERNET_OVERHEAD = 38
+LINK_RATE = 100e6
+# DMX512 at 250 kbit/s: 11 bits per slot
+DMX_SLOT_TIME = 44e-6
+DMX_BREAK = 92e-6
+DMX_MARK_AFTER_BREAK = 12e-6
+
+# WS2811 / WS2812B: 800 kbit/s, 24 bits per RGB pixel. Newer WS2812B revisions need a 280 us
+# reset, older ones 50 us.
+WS281X_BIT_RATE = 800e3
+WS281X_BITS_PER_PIXEL = 24
+WS281X_RESET = 280e-6
+
+
+def strip_frame_time(
+        pixels, bit_rate=WS281X_BIT_RATE, bits_per_pixel=WS281X_BITS_PER_PIXEL,
+        reset=WS281X_RESET):
+    """
+    Seconds to clock out a frame of `pixels` (a number or array) on one strip.
+    """
+    return pixels * bits_per_pixel / bit_rate + reset
+
+
+def strip_refresh_rate(pixels, **kwargs):
+    """
+    The highest frame rate of a strip of `pixels`, see `strip_frame_time`.
+    """
+    return 1 / strip_frame_time(pixels, **kwargs)
+
+
+def dmx_frame_time(slots=512, break_time=DMX_BREAK, mark_after_break=DMX_MARK_AFTER_BREAK):
+    """
+    Seconds to send a DMX512 frame of `slots` channels (plus the start code) at 250 kbit/s.
+    """
+    return break_time + mark_after_break + (slots + 1) * DMX_SLOT_TIME
+
+
+def tcp_wire_bytes(payload, mss=TCP_MSS):
+    """
+    Bytes on the wire for a TCP `payload`, split into segments of at most `mss` bytes.
+    """
+    segments = -(-payload // mss)
+    return payload + segments * (TCP_IP_HEADERS + ETHERNET_OVERHEAD), segments
+
+
+def artnet_wire_bytes(pixels):
+    """
+    Bytes on the wire of the ArtDmx packet for a universe of `pixels` RGB pixels (the data
+    length is rounded up to an even number, as Art-Net requires).
+    """
+    data = 3 * pixels + (3 * pixels) % 2
+    return ARTNET_HEADER + data + UDP_IP_HEADERS + ETHERNET_OVERHEAD
+
+
+def fixture_outputs(fixtures):
+    """
+    Group the pixels of each fixture by output, as a dict of output keys to pixel counts:
+    ('opc', host, port, channel) for OPC fixtures and ('artnet', host, universe) for Art-Net
+    fixtures, which fill consecutive universes of `ARTNET_UNIVERSE_PIXELS` from their
+    `artNetUniverse`. Also returns the labels of the fixtures on each output, and the labels
+    of fixtures which have no output.
+    """
+    outputs = {}
+    labels = {}
+    unassigned = []
+    for fixture in fixtures:
+        parameters = fixture['parameters']
+        label = fixture_label(fixture)
+        pixels = len(fixture_pixels(fixture))
+        protocol = parameters.get('protocol')
+        if protocol == OPC_PROTOCOL and 'host' in parameters:
+            keys = [(
+                ('opc', parameters['host'], parameters.get('port', DEFAULT_OPC_PORT),
+                 parameters.get('opcChannel', 0)),
+                pixels)]
+        elif protocol == ARTNET_PROTOCOL and 'artNetUniverse' in parameters:
+            first = parameters['artNetUniverse']
+            keys = [
+                (('artnet', parameters.get('host'), first + idx),
+                 min(ARTNET_UNIVERSE_PIXELS, pixels - idx * ARTNET_UNIVERSE_PIXELS))
+                for idx in range(-(-pixels // ARTNET_UNIVERSE_PIXELS))
+            ]
+        else:
+            unassigned.append(label)
+            continue
+        for key, count in keys:
+            outputs[key] = outputs.get(key, 0) + count
+            labels.setdefault(key, []).append(label)
+    return outputs, labels, unassigned
+
+
+def estimate_outputs(fixtures, link_rate=LINK_RATE, dmx=False, **strip_timing):
+    """
+    Estimate the pixels, bytes and packets per frame and the maximum frame rate of every output
+    of a fixture export:
+    - each OPC channel and Art-Net universe drives a strip (see `strip_frame_time`), or with
+      `dmx`, each universe is sent as DMX512
+    - each host receives its frames over a network link of `link_rate` bits per second
+
+    Returns a list of dicts with the `kind`, `name`, `pixels`, `bytes`, `packets`, `fps`,
+    `fixtures` labels and `warnings` of each output, and the unassigned fixture labels.
+    """
+    outputs, labels, unassigned = fixture_outputs(fixtures)
+    rows = []
+    hosts = {}
+    for key, pixels in sorted(outputs.items(), key=lambda item: tuple(map(str, item[0]))):
+        warnings = []
+        if key[0] == 'opc':
+            _, host, port, channel = key
+            name = f"{host}:{port} ch {channel}"
+            payload = OPC_HEADER + 3 * pixels
+            wire, packets = payload, 0
+            host_key = ('opc host', f"{host}:{port}")
+        else:
+            _, host, universe = key
+            name = f"{host} universe {universe}"
+            payload = 3 * pixels
+            wire, packets = artnet_wire_bytes(pixels), 1
+            host_key = ('artnet host', host)
+            if pixels > ARTNET_UNIVERSE_PIXELS:
+                warnings.append(
+                    f"{pixels} pixels from overlapping fixtures {', '.join(labels[key])}")
+        fps = 1 / dmx_frame_time(3 * pixels) if dmx and key[0] == 'artnet' \
+            else strip_refresh_rate(pixels, **strip_timing)
+        rows.append({
+            'kind': 'universe' if key[0] == 'artnet' else 'channel',
+            'name': name,
+            'pixels': pixels,
+            'bytes': payload,
+            'packets': packets,
+            'fps': fps,
+            'fixtures': labels[key],
+            'warnings': warnings,
+        })
+        host = hosts.setdefault(host_key, {'pixels': 0, 'bytes': 0, 'wire': 0, 'packets': 0})
+        host['pixels'] += pixels
+        host['bytes'] += payload
+        host['wire'] += wire
+        host['packets'] += packets
+
+    for (kind, name), host in hosts.items():
+        if kind == 'opc host':
+            # all channels of a host are sent together over one TCP connection
+            host['wire'], host['packets'] = tcp_wire_bytes(host['bytes'])
+        rows.append({
+            'kind': kind,
+            'name': name,
+            'pixels': host['pixels'],
+            'bytes': host['bytes'],
+            'packets': host['packets'],
+            'fps': link_rate / (8 * host['wire']),
+            'fixtures': [],
+            'warnings': [],
+        })
+    return rows, unassigned
+
+
+def format_estimate(rows, target_fps=None):
+    """
+    Format the outputs from slowest to fastest, marking the bottleneck with `*` and every output
+    below `target_fps` with `!`.
+    """
+    rows = sorted(rows, key=lambda row: row['fps'])
+    lines = [
+        f"  {'output':<12} {'name':<32} {'pixels':>7} {'bytes':>8} {'packets':>7} {'max fps':>9}"
+    ]
+    for idx, row in enumerate(rows):
+        mark = '*' if idx == 0 else '!' if target_fps and row['fps'] < target_fps else ' '
+        lines.append(
+            f"{mark} {row['kind']:<12} {row['name']:<32} {row['pixels']:7d} {row['bytes']:8d} "
+            f"{row['packets']:7d} {row['fps']:9.1f}")
+        lines.extend(f"    warning: {warning}" for warning in row['warnings'])
+    if rows:
+        lines.append(
+            f"bottleneck: {rows[0]['kind']} {rows[0]['name']} at {rows[0]['fps']:.1f} fps")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('fixtures', help="fixture export (.lxm)")
+    parser.add_argument('--fps', type=float, help="target frame rate, flags slower outputs")
+    parser.add_argument(
+        '--link-rate', type=float, default=LINK_RATE / 1e6, help="network link in Mbit/s")
+    parser.add_argument(
+        '--bit-rate', type=float, default=WS281X_BIT_RATE / 1e3, help="strip kbit/s")
+    parser.add_argument(
+        '--reset', type=float, default=WS281X_RESET * 1e6, help="strip reset time in us")
+    parser.add_argument(
+        '--dmx', action='store_true', help="Art-Net universes are output as DMX512")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    rows, unassigned = estimate_outputs(
+        load_fixtures(args.fixtures), link_rate=args.link_rate * 1e6, dmx=args.dmx,
+        bit_rate=args.bit_rate * 1e3, reset=args.reset * 1e-6)
+    if unassigned:
+        logging.warning(
+            f"{len(unassigned)} fixtures have no OPC host or Art-Net universe: "
+            f"{', '.join(unassigned)}")
+    print(format_estimate(rows, args.fps))
+
+
+if __name__ == '__main__':
+    main()
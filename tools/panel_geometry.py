@@ -0,0 +1,702 @@
+"""
+Geometry of laying out lights on a normalised convex polygon, independent of Blender.
+
+`light_layout.generate_lights_for_convex_polygon` materialises the pixels of each row, while
+`count_lights_for_convex_polygon` only counts them, which is enough to compare layouts (see
+`layout_sweep.py`). Triangles and quads are solved from their side edges by
+`convex_polygon_rows`, other convex polygons with a half-plane test of the whole lattice by
+`convex_polygon_lattice`. `count_lights_for_polygons_array` counts many candidate layouts at
+once, e.g. for a solver. `normalise_polygon` is a NumPy equivalent of
+`light_layout.normalise_plane` for polygons loaded from a structure export.
+
+The tolerant arithmetic helpers live in `tolerant.py`, and are re-exported from here.
+"""
+
+import logging
+from math import ceil, floor, inf, isinf, nan
+
+import numpy as np
+
+from tolerant import (  # noqa: F401 (re-exported)
+        ATOL, axis_centered_lines, float_abs_ceil, float_abs_ceil_array, float_abs_floor,
+        float_abs_floor_array, float_ceil, float_floor, float_floor_array, inf_divide,
+        inf_divide_array, intersect_lines, intersect_lines_array, isclose, isclose_array,
+        nan_divide)
+from trig import gradient_cos, gradient_cos_array, gradient_sin, gradient_sin_array
+
+TRI_VERTS = 3
+QUAD_VERTS = 4
+
+
+def margin_intersect_offset(gradient_left, gradient_right, base_width, margin):
+    r"""
+             mL       <- gradient left
+        mR  /         <- gradient right
+         \ /\/        <- margin
+          x-/----     <- regular intersect
+         / \    |     <- intersect offset
+        / x-\----     <- margin intersect
+       / / \ \
+      / /   \ \
+     /_/_____\_\_____
+    o_/_______\_o___| <- margin
+    |<--------->|     <- base width
+
+    OR
+
+                         mL  <- gradient left
+                    mR  /    <- gradient right
+                    | /
+                    x----    <- regular intersect
+                  / |   |    <- intersect offset
+                / x-|----    <- margin intersect
+              / / | |
+            / /   | |
+          /_/_____|_|___
+        o_/_______|_o___|    <- margin
+        |<--------->|        <- base width
+    """
+
+    logging.debug(
+        f"Gradient Left / Right: "
+        f"{gradient_left: 7.3f} / {gradient_right: 7.3f}")
+
+    if isinf(gradient_left) and isinf(gradient_right):
+        return None
+
+    if isclose(gradient_left, gradient_right):
+        return None
+
+    regular_axis_intercept_left = 0
+    regular_axis_intercept_right = base_width if isinf(gradient_right) else \
+        - base_width * gradient_right
+
+    logging.debug(
+        f"Regular Axis Intercept Left / Right: "
+        f"{regular_axis_intercept_left: 7.3f} / {regular_axis_intercept_right:7.3f}")
+
+    regular_intersect_x, regular_intersect_y = intersect_lines(
+        gradient_left, regular_axis_intercept_left, gradient_right, regular_axis_intercept_right
+    )
+
+    if regular_intersect_x is None or regular_intersect_y is None:
+        return None
+
+    logging.debug(
+        f"Regular Intersect X / Y: "
+        f"{regular_intersect_x: 7.3f} / {regular_intersect_y:7.3f}")
+
+    margin_axis_intercept_left = margin if isinf(gradient_left) else \
+        - abs(margin / gradient_cos(gradient_left))
+    margin_axis_intercept_right = base_width - margin if isinf(gradient_right) else \
+        regular_axis_intercept_right - abs(margin / gradient_cos(gradient_right))
+
+    logging.debug(
+        f"Margin Axis Intercept Left / Right: "
+        f"{margin_axis_intercept_left: 7.3f} / {margin_axis_intercept_right:7.3f}")
+
+    margin_intersect_x, margin_intersect_y = intersect_lines(
+        gradient_left, margin_axis_intercept_left, gradient_right, margin_axis_intercept_right
+    )
+
+    logging.debug(
+        f"Margin Intersect X / Y: "
+        f"{margin_intersect_x: 7.3f} / {margin_intersect_y:7.3f}")
+
+    return regular_intersect_y - margin_intersect_y
+
+
+def margin_intersect_offset_array(gradient_left, gradient_right, base_width, margin):
+    """
+    `margin_intersect_offset` of each polygon, with NaN where it returns None.
+    """
+    gradient_left, gradient_right, base_width, margin = np.broadcast_arrays(*[
+        np.asarray(value, dtype=float)
+        for value in (gradient_left, gradient_right, base_width, margin)])
+    infinite_left, infinite_right = np.isinf(gradient_left), np.isinf(gradient_right)
+    with np.errstate(invalid='ignore'):
+        regular_axis_intercept_right = np.where(
+            infinite_right, base_width, - base_width * gradient_right)
+        margin_axis_intercept_left = np.where(
+            infinite_left, margin, - np.abs(margin / gradient_cos_array(gradient_left)))
+        margin_axis_intercept_right = np.where(
+            infinite_right, base_width - margin,
+            regular_axis_intercept_right - np.abs(margin / gradient_cos_array(gradient_right)))
+    # parallel sides, including two vertical sides, don't intersect
+    _, regular_intersect_y = intersect_lines_array(
+        gradient_left, 0, gradient_right, regular_axis_intercept_right)
+    _, margin_intersect_y = intersect_lines_array(
+        gradient_left, margin_axis_intercept_left, gradient_right, margin_axis_intercept_right)
+    return regular_intersect_y - margin_intersect_y
+
+
+def check_grid_gradient(grid_gradient):
+    """
+    Raise a ValueError for a horizontal grid gradient, which would put every row on one line.
+    """
+    if isclose(grid_gradient, 0):
+        raise ValueError(f"grid gradient {grid_gradient} is horizontal")
+
+
+def convex_polygon_rows(
+        base_width: float,
+        quad_right_x: float,
+        quad_right_height: float,
+        quad_left_x: float,
+        quad_left_height: float,
+        spacing: float,
+        spacing_vertical: float = None,
+        grid_gradient: float = inf,
+        margin: float = 0.0,
+        margin_vertical_top: float = None,
+        margin_left: float = None,
+        margin_right: float = None,
+):
+    """
+    Solve the rows of lights in a normalised convex polygon, without generating the lights. See
+    `light_layout.generate_lights_for_convex_polygon` for the geometry and arguments.
+
+    Returns a dict with the `spacing`, `spacing_vertical` and `spacing_shear` of the grid, the
+    `horizontal_start` and `vertical_start` of the pixel origin, the `grid_gradient` and the
+    (first, last) horizontal grid index of each row in `rows`. A row is empty if last < first.
+    """
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    if debug:
+        logging.debug(
+            f"Spacing: {spacing: 7.3f}\n"
+            f"Margin: {margin: 7.3f}\n"
+            f"Grid Gradient: {grid_gradient: 7.3f}"
+        )
+    height = max([quad_left_height, quad_right_height])
+    if debug:
+        logging.debug(f"Width (Base) / Height: {base_width: 7.3f} / {height: 7.3f}")
+        logging.debug(
+            f"Quad Left / Right (x, height): "
+            f"({quad_left_x: 7.3f}, {quad_left_height: 7.3f})"
+            f"({quad_right_x: 7.3f}, {quad_right_height: 7.3f})")
+    gradient_left = inf_divide(quad_left_height, quad_left_x)
+    gradient_right = inf_divide(quad_right_height, quad_right_x - base_width)
+    if debug:
+        logging.debug(
+            f"Left / Right / Grid Gradients: "
+            f"{gradient_left: 7.3f} / {gradient_right: 7.3f} / {grid_gradient: 7.3f}")
+    check_grid_gradient(grid_gradient)
+    if spacing_vertical is None:
+        spacing_vertical = abs(gradient_sin(grid_gradient) * spacing)
+    spacing_shear = abs(gradient_cos(grid_gradient) * spacing)
+    if debug:
+        logging.debug(
+            f"Horizontal / Vertical / Shear Spacing: "
+            f"{spacing: 7.3f} / {spacing_vertical: 7.3f} / {spacing_shear: 7.3f}")
+
+    if margin_vertical_top is None:
+        margin_vertical_top = margin_intersect_offset(
+            gradient_left, gradient_right, base_width, margin) or margin
+
+    if debug:
+        logging.debug(f"Vertical / Top Margin: {margin: 7.3f} / {margin_vertical_top: 7.3f}")
+
+    vertical_lines, vertical_padding = axis_centered_lines(
+        height, spacing_vertical, margin, margin_vertical_top, axis_name="Vertical")
+    vertical_start = margin + vertical_padding
+
+    if margin_left is None:
+        margin_left = abs(margin / gradient_sin(gradient_left))
+    if margin_right is None:
+        margin_right = abs(margin / gradient_sin(gradient_right))
+    if debug:
+        logging.debug(f"Left / Right Margin: {margin_left: 7.3f} / {margin_right: 7.3f}")
+
+    horizontal_start_width = base_width \
+        - inf_divide(vertical_start, gradient_left) \
+        + inf_divide(vertical_start, gradient_right)
+
+    horizontal_lines, horizontal_padding = axis_centered_lines(
+        horizontal_start_width, spacing, margin_left, margin_right, axis_name="Horizontal")
+    horizontal_usage = spacing * (horizontal_lines - 1)
+    horizontal_start = margin_left + inf_divide(vertical_start, gradient_left) + horizontal_padding
+
+    # all rows at once, relative to pixel origin: (horizontal_start, vertical_start)
+    pixel_y_relative = np.arange(vertical_lines) * spacing_vertical
+    # x coordinate where each row intesects with grid y-axis
+    row_grid_origin_x = inf_divide_array(pixel_y_relative, grid_gradient)
+
+    row_start_relative = inf_divide_array(pixel_y_relative, gradient_left)
+    row_grid_starts = float_abs_ceil_array((row_start_relative - row_grid_origin_x) / spacing)
+
+    row_end_relative = horizontal_usage + inf_divide_array(pixel_y_relative, gradient_right)
+    row_grid_ends = float_abs_floor_array((row_end_relative - row_grid_origin_x) / spacing)
+
+    # Sanity check:
+    row_capacity = np.abs(row_end_relative - row_start_relative)
+    row_usage = np.maximum(row_grid_ends - row_grid_starts - 1, 0) * spacing
+    if debug:
+        for vertical_idx in range(vertical_lines):
+            logging.debug(f"Vertical Index: {vertical_idx}")
+            logging.debug(
+                f"Pixel Y Relative / Absolute: {pixel_y_relative[vertical_idx]: 7.3f} "
+                f"{pixel_y_relative[vertical_idx] + vertical_start: 7.3f}")
+            logging.debug(f"Row Grid Origin X: {row_grid_origin_x[vertical_idx]: 7.3f}")
+            logging.debug(
+                f"Row Start / End Relative: {row_start_relative[vertical_idx]: 7.3f} / "
+                f"{row_end_relative[vertical_idx]: 7.3f}")
+            logging.debug(
+                f"Row Grid Start / End: {row_grid_starts[vertical_idx]:.0f} / "
+                f"{row_grid_ends[vertical_idx]:.0f}")
+            logging.debug(
+                f"Row Capacity / Usage: {row_capacity[vertical_idx]: 7.3f} / "
+                f"{row_usage[vertical_idx]: 7.3f}")
+    overused = ~((row_usage < row_capacity) | isclose_array(row_capacity - row_usage, 0))
+    assert not overused.any(), \
+        f"Row usage {row_usage[overused][0]} >= capacity {row_capacity[overused][0]}"
+
+    rows = [(int(start), int(end)) for start, end in zip(row_grid_starts, row_grid_ends)]
+
+    return {
+        'spacing': spacing,
+        'spacing_vertical': spacing_vertical,
+        'spacing_shear': spacing_shear,
+        'grid_gradient': grid_gradient,
+        'horizontal_start': horizontal_start,
+        'vertical_start': vertical_start,
+        'rows': rows,
+    }
+
+
+def count_lights_for_convex_polygon(*args, **kwargs):
+    """
+    The number of lights `light_layout.generate_lights_for_convex_polygon` would generate with the
+    same arguments, without generating them. Returns the count and the solved rows.
+
+    This is not a closed form: the first and last grid index of every row are still solved (as
+    arrays, see `convex_polygon_rows`) and the row lengths summed, since the tolerant rounding of
+    each row end doesn't reduce to a formula over the rows. It skips building the pixel lists and
+    their positions, which is most of the cost of a layout.
+    """
+    solution = convex_polygon_rows(*args, **kwargs)
+    count = sum(max(end - start + 1, 0) for start, end in solution['rows'])
+    return count, solution
+
+
+def _centered_lines_array(axis_length, spacing, margin_left, margin_right):
+    """
+    `tolerant.axis_centered_lines_array`, which returns a mask of the axes that fit instead of
+    asserting that they all do.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        usable = axis_length - margin_left - margin_right
+        lines = float_floor_array(usable / spacing)
+    fits = np.isfinite(lines)
+    lines = np.where(fits, lines, 0).astype(int) + 1
+    usage = spacing * (lines - 1)
+    fits &= (usage < usable) | isclose_array(usable - usage, 0)
+    return lines, (usable - usage) / 2, fits
+
+
+def count_lights_for_convex_polygon_array(
+        base_width,
+        quad_right_x,
+        quad_right_height,
+        quad_left_x,
+        quad_left_height,
+        spacing,
+        grid_gradient=inf,
+        margin=0.0,
+):
+    """
+    `count_lights_for_convex_polygon` of many triangles or quads, spacings and margins at once:
+    the arguments broadcast together, and the counts have their shape. The top, left and right
+    margins are derived from `margin`. A count is -1 where `convex_polygon_rows` would fail, e.g.
+    for a horizontal side, and 0 where the margins leave no room.
+
+    The rows of every layout are solved together, padded to the most rows of any layout, so this
+    is for evaluating many candidate layouts, like the spacings of `spacing_solver.py`.
+    """
+    arguments = np.broadcast_arrays(*[
+        np.asarray(value, dtype=float) for value in (
+            base_width, quad_right_x, quad_right_height, quad_left_x, quad_left_height, spacing,
+            grid_gradient, margin)])
+    shape = arguments[0].shape
+    (base_width, quad_right_x, quad_right_height, quad_left_x, quad_left_height, spacing,
+     grid_gradient, margin) = [argument.reshape(-1) for argument in arguments]
+
+    height = np.maximum(quad_left_height, quad_right_height)
+    gradient_left = inf_divide_array(quad_left_height, quad_left_x)
+    gradient_right = inf_divide_array(quad_right_height, quad_right_x - base_width)
+    spacing_vertical = np.abs(gradient_sin_array(grid_gradient) * spacing)
+
+    margin_vertical_top = margin_intersect_offset_array(
+        gradient_left, gradient_right, base_width, margin)
+    margin_vertical_top = np.where(
+        np.isnan(margin_vertical_top) | (margin_vertical_top == 0), margin, margin_vertical_top)
+    vertical_lines, vertical_padding, valid = _centered_lines_array(
+        height, spacing_vertical, margin, margin_vertical_top)
+    vertical_start = margin + vertical_padding
+    valid &= ~isclose_array(grid_gradient, 0)
+
+    # `convex_polygon_rows` divides by zero for a horizontal side
+    sin_left, sin_right = gradient_sin_array(gradient_left), gradient_sin_array(gradient_right)
+    valid &= (sin_left != 0) & (sin_right != 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        margin_left = np.abs(margin / sin_left)
+        margin_right = np.abs(margin / sin_right)
+        horizontal_start_width = base_width \
+            - inf_divide_array(vertical_start, gradient_left) \
+            + inf_divide_array(vertical_start, gradient_right)
+    horizontal_lines, _, fits = _centered_lines_array(
+        horizontal_start_width, spacing, margin_left, margin_right)
+    valid &= fits
+    horizontal_usage = spacing * (horizontal_lines - 1)
+
+    # all rows of all layouts at once, (layouts, rows)
+    vertical_lines = np.where(valid, vertical_lines, 0)
+    row_indices = np.arange(max(vertical_lines.max(initial=0), 0))
+    in_layout = row_indices < vertical_lines[:, np.newaxis]
+    pixel_y_relative = row_indices * spacing_vertical[:, np.newaxis]
+    row_grid_origin_x = inf_divide_array(pixel_y_relative, grid_gradient[:, np.newaxis])
+    with np.errstate(invalid='ignore'):
+        row_start_relative = inf_divide_array(pixel_y_relative, gradient_left[:, np.newaxis])
+        row_grid_starts = float_abs_ceil_array(
+            (row_start_relative - row_grid_origin_x) / spacing[:, np.newaxis])
+        row_end_relative = horizontal_usage[:, np.newaxis] \
+            + inf_divide_array(pixel_y_relative, gradient_right[:, np.newaxis])
+        row_grid_ends = float_abs_floor_array(
+            (row_end_relative - row_grid_origin_x) / spacing[:, np.newaxis])
+        row_capacity = np.abs(row_end_relative - row_start_relative)
+        row_usage = np.maximum(row_grid_ends - row_grid_starts - 1, 0) * spacing[:, np.newaxis]
+        overused = ~((row_usage < row_capacity) | isclose_array(row_capacity - row_usage, 0))
+    overused |= ~np.isfinite(row_grid_starts) | ~np.isfinite(row_grid_ends)
+    valid &= ~(overused & in_layout).any(axis=1)
+
+    row_lengths = np.where(in_layout, np.maximum(row_grid_ends - row_grid_starts + 1, 0), 0)
+    counts = np.where(valid, np.nan_to_num(row_lengths).sum(axis=1), -1).astype(int)
+    return counts.reshape(shape)
+
+
+def normalise_polygon(vertices):
+    """
+    NumPy equivalent of `light_layout.normalise_plane` for an (N, 3) array of coplanar vertices,
+    in order around the polygon: returns the (N, 2) vertices on the X-Y plane such that point 0 is
+    at the origin, point 1 is on the positive X-axis and point 2 is above the X-axis, with the
+    first three points reordered like `light_layout.orient_flattened_points`.
+    """
+    vertices = np.asarray(vertices, dtype=float)
+    centered = vertices - vertices.mean(axis=0)
+    # Newell's method, which is what Blender uses for polygon normals
+    normal = np.cross(centered, np.roll(centered, -1, axis=0)).sum(axis=0)
+    normal /= np.linalg.norm(normal)
+    axis_x = centered[1] - centered[0]
+    axis_x -= axis_x.dot(normal) * normal
+    axis_x /= np.linalg.norm(axis_x)
+    axis_y = np.cross(normal, axis_x)
+    flattened = np.stack([centered @ axis_x, centered @ axis_y], axis=-1)
+
+    def orientation(points):
+        relative = points[1:3] - points[0]
+        return relative[0, 0] * relative[1, 1] - relative[0, 1] * relative[1, 0]
+
+    if orientation(flattened) < 0:
+        flattened = flattened[::-1]
+    lengths = [
+        np.linalg.norm(flattened[i] - flattened[(i + 1) % TRI_VERTS]) for i in range(TRI_VERTS)
+    ]
+    ratios = [lengths[i] / lengths[(i + 1) % TRI_VERTS] for i in range(TRI_VERTS)]
+    equalities = [np.isclose(ratio, 1, atol=ATOL) for ratio in ratios]
+    equal_index = equalities.index(True) if sum(equalities) == 1 else 0
+    oriented = np.roll(flattened, -((equal_index + 2) % len(flattened)), axis=0)
+
+    base = oriented[1] - oriented[0]
+    angle = np.arctan2(base[1], base[0])
+    rotation = np.array([[np.cos(angle), np.sin(angle)], [-np.sin(angle), np.cos(angle)]])
+    return (oriented - oriented[0]) @ rotation.T
+
+
+def polygon_area(points):
+    """
+    Area of a simple polygon from its (N, 2) vertices.
+    """
+    points = np.asarray(points, dtype=float)
+    x, y = points[:, 0], points[:, 1]
+    return abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))) / 2
+
+
+def polygon_half_planes(vertices, margins):
+    """
+    Inward unit normals (E, 2) and offsets (E,) of the edges of a counter-clockwise convex polygon,
+    such that points inside every edge inset by its margin satisfy `normals @ point >= offsets`.
+    Degenerate (zero length) edges are skipped.
+    """
+    vertices = np.asarray(vertices, dtype=float)
+    edges = np.roll(vertices, -1, axis=0) - vertices
+    lengths = np.linalg.norm(edges, axis=-1)
+    keep = lengths > ATOL * lengths.max()
+    normals = np.stack([-edges[keep, 1], edges[keep, 0]], axis=-1) / lengths[keep, np.newaxis]
+    offsets = np.einsum('ij,ij->i', normals, vertices[keep]) + np.asarray(margins)[keep]
+    return normals, offsets
+
+
+def half_plane_vertices(normals, offsets, tolerance=0.0):
+    """
+    The (M, 2) vertices of the intersection of the half-planes, found by intersecting every pair
+    of boundaries and keeping the intersections inside all of them.
+    """
+    first, second = np.triu_indices(len(normals), 1)
+    systems = np.stack([normals[first], normals[second]], axis=1)
+    solvable = np.abs(np.linalg.det(systems)) > ATOL
+    rhs = np.stack([offsets[first], offsets[second]], axis=-1)[solvable]
+    points = np.linalg.solve(systems[solvable], rhs[..., np.newaxis])[..., 0]
+    inside = np.all(points @ normals.T >= offsets - tolerance, axis=-1)
+    return points[inside]
+
+
+def half_plane_interval(normals, offsets, y):
+    """
+    The (low, high) x interval of the half-planes along the horizontal line at `y`, and the
+    indices of the half-planes which bound it.
+    """
+    bounds = np.full(len(normals), nan)
+    sloped = ~np.isclose(normals[:, 0], 0, atol=ATOL)
+    bounds[sloped] = (offsets[sloped] - normals[sloped, 1] * y) / normals[sloped, 0]
+    lower = np.where(normals[:, 0] > 0, bounds, -inf)
+    upper = np.where(normals[:, 0] < 0, bounds, inf)
+    lower[~sloped] = -inf
+    upper[~sloped] = inf
+    low_edge, high_edge = int(np.argmax(lower)), int(np.argmin(upper))
+    return lower[low_edge], upper[high_edge], low_edge, high_edge
+
+
+def convex_polygon_lattice(
+        vertices,
+        spacing: float,
+        spacing_vertical: float = None,
+        grid_gradient: float = inf,
+        margin: float = 0.0,
+        margins=None,
+        margin_bottom: float = None,
+        margin_top: float = None,
+):
+    """
+    Solve the rows of lights in any normalised convex polygon (see `normalise_polygon`), with
+    the same grid as `convex_polygon_rows`:
+    - rows are `spacing_vertical` apart and centred between `margin_bottom` and `margin_top`,
+      which default to the bottom and top of the polygon inset by the edge margins
+    - the first row is centred between the edges which bound it, and every row is sheared along
+      `grid_gradient`
+    - lights are kept if they are inside every edge inset by its margin (`margins`, one per edge
+      from vertex i to i + 1, default: `margin`), with the edges that bound the first row moved
+      in by its horizontal padding, so that the rows stay centred like in `convex_polygon_rows`
+
+    The whole candidate lattice over the bounding box is tested against all edges at once, so
+    pentagons, hexagons and other convex polygons are handled the same way as triangles and
+    quads.
+
+    For triangles and quads (see `quad_lattice_arguments`) the lights are the same as those of
+    `convex_polygon_rows` for equilateral triangles, and otherwise apart from ties within the
+    tolerance of an edge, except that on a positive `grid_gradient`:
+    - the rows shear right so their grid indices go negative, and `convex_polygon_rows` rounds
+      those the wrong way (`float_abs_ceil` and `float_abs_floor` round away from and towards
+      zero), which puts up to one more light at either end of a row, outside the inset edges.
+      So many other triangles, and most rectangles and trapezoids, have fewer lights here.
+    - `convex_polygon_rows` fails its row capacity assertion for some narrow triangles and
+      quads, which are laid out here.
+
+    Returns a dict like `convex_polygon_rows`, without any rows if the margins leave no room for
+    lights, which `convex_polygon_rows` also counts as 0 lights.
+    """
+    check_grid_gradient(grid_gradient)
+    vertices = np.asarray(vertices, dtype=float).reshape(-1, 2)
+    if margins is None:
+        margins = np.full(len(vertices), margin, dtype=float)
+    normals, offsets = polygon_half_planes(vertices, margins)
+    tolerance = ATOL * spacing
+
+    if spacing_vertical is None:
+        spacing_vertical = abs(gradient_sin(grid_gradient) * spacing)
+    spacing_shear = abs(gradient_cos(grid_gradient) * spacing)
+
+    inset = half_plane_vertices(normals, offsets, tolerance)
+    vertical_lines = 0
+    if len(inset):
+        height = vertices[:, 1].max()
+        if margin_bottom is None:
+            margin_bottom = inset[:, 1].min()
+        if margin_top is None:
+            margin_top = height - inset[:, 1].max()
+        vertical_lines, vertical_padding = axis_centered_lines(
+            height, spacing_vertical, margin_bottom, margin_top, axis_name="Vertical")
+    if vertical_lines < 1:
+        logging.debug(f"margins {margins} leave no room inside the polygon")
+        return {
+            'spacing': spacing,
+            'spacing_vertical': spacing_vertical,
+            'spacing_shear': spacing_shear,
+            'grid_gradient': grid_gradient,
+            'horizontal_start': vertices[:, 0].mean(),
+            'vertical_start': vertices[:, 1].mean(),
+            'rows': [],
+        }
+    vertical_start = margin_bottom + vertical_padding
+
+    low, high, low_edge, high_edge = half_plane_interval(normals, offsets, vertical_start)
+    horizontal_lines, horizontal_padding = axis_centered_lines(
+        high - low, spacing, 0, 0, axis_name="Horizontal")
+    horizontal_start = low + horizontal_padding
+    offsets = offsets.copy()
+    offsets[low_edge] += horizontal_padding * abs(normals[low_edge, 0])
+    offsets[high_edge] += horizontal_padding * abs(normals[high_edge, 0])
+
+    # candidate lattice over the bounding box, (rows, columns)
+    pixel_y_relative = np.arange(vertical_lines) * spacing_vertical
+    row_grid_origin_x = pixel_y_relative / grid_gradient
+    relative_x = vertices[:, 0] - horizontal_start
+    columns = np.arange(
+        floor((relative_x.min() - row_grid_origin_x.max()) / spacing) - 1,
+        ceil((relative_x.max() - row_grid_origin_x.min()) / spacing) + 2)
+    points = np.stack(np.broadcast_arrays(
+        horizontal_start + row_grid_origin_x[:, np.newaxis] + columns * spacing,
+        vertical_start + pixel_y_relative[:, np.newaxis]), axis=-1)
+    inside = np.all(points @ normals.T >= offsets - tolerance, axis=-1)
+
+    # convex, so the lights of each row are contiguous
+    filled = inside.any(axis=1)
+    firsts = np.where(filled, columns[np.argmax(inside, axis=1)], 0)
+    lasts = np.where(filled, columns[len(columns) - 1 - np.argmax(inside[:, ::-1], axis=1)], -1)
+
+    return {
+        'spacing': spacing,
+        'spacing_vertical': spacing_vertical,
+        'spacing_shear': spacing_shear,
+        'grid_gradient': grid_gradient,
+        'horizontal_start': horizontal_start,
+        'vertical_start': vertical_start,
+        'rows': [(int(first), int(last)) for first, last in zip(firsts, lasts)],
+    }
+
+
+def quad_lattice_arguments(
+        base_width: float,
+        quad_right_x: float,
+        quad_right_height: float,
+        quad_left_x: float,
+        quad_left_height: float,
+        margin: float = 0.0,
+        margin_vertical_top: float = None,
+        margin_left: float = None,
+        margin_right: float = None,
+):
+    """
+    The `vertices`, `margins`, `margin_bottom` and `margin_top` arguments of
+    `convex_polygon_lattice` for the triangle or quad arguments of `convex_polygon_rows`, where
+    the left and right margins are horizontal distances, and the top margin is measured
+    vertically from the highest vertex.
+    """
+    vertices = np.array([
+        (0.0, 0.0), (base_width, 0.0), (quad_right_x, quad_right_height),
+        (quad_left_x, quad_left_height)])
+    gradient_left = inf_divide(quad_left_height, quad_left_x)
+    gradient_right = inf_divide(quad_right_height, quad_right_x - base_width)
+    if margin_vertical_top is None:
+        margin_vertical_top = margin_intersect_offset(
+            gradient_left, gradient_right, base_width, margin) or margin
+    if margin_left is None:
+        margin_left = abs(margin / gradient_sin(gradient_left))
+    if margin_right is None:
+        margin_right = abs(margin / gradient_sin(gradient_right))
+    # horizontal margins are perpendicular margins over the sine of the edge angle
+    margins = np.array([
+        margin,
+        margin_right * abs(gradient_sin(gradient_right)),
+        margin_vertical_top,
+        margin_left * abs(gradient_sin(gradient_left)),
+    ])
+    return {
+        'vertices': vertices,
+        'margins': margins,
+        'margin_bottom': margin,
+        'margin_top': margin_vertical_top,
+    }
+
+
+def polygon_edge_margins(vertices, margin=0.0, margin_left=None, margin_right=None):
+    """
+    The perpendicular margin of each edge of a counter-clockwise convex polygon, from vertex i to
+    i + 1, for `convex_polygon_lattice`. Like in `convex_polygon_rows`, `margin_left` and
+    `margin_right` are horizontal distances from the edges which bound the rows on the left and
+    right (default: `margin` from the edge), and the other edges are `margin` from the lights.
+    """
+    vertices = np.asarray(vertices, dtype=float).reshape(-1, 2)
+    edges = np.roll(vertices, -1, axis=0) - vertices
+    lengths = np.linalg.norm(edges, axis=-1)
+    # the horizontal component of each inward unit normal, which is the sine of the edge angle
+    with np.errstate(divide='ignore', invalid='ignore'):
+        normal_x = np.where(lengths > 0, -edges[:, 1] / lengths, 0)
+    margins = np.full(len(vertices), margin, dtype=float)
+    left, right = normal_x > ATOL, normal_x < -ATOL
+    if margin_left is not None:
+        margins[left] = margin_left * normal_x[left]
+    if margin_right is not None:
+        margins[right] = margin_right * -normal_x[right]
+    return margins
+
+
+def polygon_rows(vertices, **kwargs):
+    """
+    Solve the rows of lights in a normalised convex polygon with `convex_polygon_rows` for
+    triangles and quads, or `convex_polygon_lattice` for polygons with more vertices, where
+    `margin_vertical_top` is the top margin and the horizontal margins apply to every edge which
+    bounds the rows on that side (see `polygon_edge_margins`).
+    """
+    vertices = np.asarray(vertices, dtype=float).reshape(-1, 2)
+    if len(vertices) <= QUAD_VERTS:
+        return convex_polygon_rows(
+            vertices[1][0], vertices[2][0], vertices[2][1], vertices[-1][0], vertices[-1][1],
+            **kwargs)
+    margin_left, margin_right = kwargs.pop('margin_left', None), kwargs.pop('margin_right', None)
+    if margin_left is not None or margin_right is not None:
+        kwargs['margins'] = polygon_edge_margins(
+            vertices, kwargs.get('margin', 0.0), margin_left, margin_right)
+    return convex_polygon_lattice(
+        vertices, margin_top=kwargs.pop('margin_vertical_top', None), **kwargs)
+
+
+def count_lights_for_polygon(vertices, **kwargs):
+    """
+    Like `count_lights_for_convex_polygon`, for the (N, 2) vertices of any normalised convex
+    polygon (see `polygon_rows`).
+    """
+    solution = polygon_rows(vertices, **kwargs)
+    count = sum(max(end - start + 1, 0) for start, end in solution['rows'])
+    return count, solution
+
+
+def count_lights_for_polygons_array(polygons, spacing, grid_gradient=inf, margin=0.0):
+    """
+    The counts of `count_lights_for_polygon` for each of the normalised `polygons` (P) at each of
+    the spacings and margins, which broadcast to (P, K), as a (P, K) array with -1 for the
+    layouts that fail, and 0 for every polygon where the margins leave no room. Triangles and
+    quads are counted together with `count_lights_for_convex_polygon_array`, and other polygons
+    one layout at a time.
+    """
+    polygons = [np.asarray(vertices, dtype=float).reshape(-1, 2) for vertices in polygons]
+    spacing, margin = np.asarray(spacing, dtype=float), np.asarray(margin, dtype=float)
+    shape = np.broadcast_shapes((len(polygons), 1), spacing.shape, margin.shape)
+    spacing, margin = np.broadcast_to(spacing, shape), np.broadcast_to(margin, shape)
+    counts = np.full(shape, -1, dtype=int)
+
+    quads = [index for index, vertices in enumerate(polygons) if len(vertices) <= QUAD_VERTS]
+    if quads:
+        corners = np.array([polygons[index][[1, 2, -1]] for index in quads])[:, np.newaxis]
+        counts[quads] = count_lights_for_convex_polygon_array(
+            corners[..., 0, 0], corners[..., 1, 0], corners[..., 1, 1], corners[..., 2, 0],
+            corners[..., 2, 1], spacing[quads], grid_gradient, margin[quads])
+    for index, vertices in enumerate(polygons):
+        if len(vertices) <= QUAD_VERTS:
+            continue
+        for column in range(shape[1]):
+            try:
+                counts[index, column], _ = count_lights_for_polygon(
+                    vertices, spacing=spacing[index, column], grid_gradient=grid_gradient,
+                    margin=margin[index, column])
+            except (AssertionError, ValueError, ZeroDivisionError):
+                pass
+    return counts
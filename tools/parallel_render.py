@@ -0,0 +1,319 @@
+"""
+Evaluate LED patterns on several cores by splitting the LEDs into contiguous chunks.
+
+Expensive patterns (noise fields, multi-octave plasma, volumetric effects) over the whole dome
+may not reach show frame rates on one core, even vectorised. `ParallelRenderer` splits the LED
+positions into contiguous chunks along fixture boundaries, and evaluates each chunk in a
+persistent worker process. Positions and the output frame live in shared memory, so each worker
+writes its chunk of the frame in place. Every frame, the workers wait on a barrier for the frame
+time, and the renderer waits on it again for all chunks to be done. The time each worker spends on
+its chunk is recorded, to show load imbalance.
+
+A pattern is a function `pattern(positions, t, out)` which writes the (n, 3) uint8 colours of the
+(n, 3) normalised positions at time `t` into `out`, and must be importable by name from
+`PATTERNS` in the worker processes.
+
+    python tools/parallel_render.py dome.lxm --panels dome.json --pattern noise --workers 4 \\
+        --frames 600 --dry-run
+"""
+
+import argparse
+import logging
+import multiprocessing
+import threading
+import time
+
+import numpy as np
+
+from layout_io import (fixture_grid_positions, fixture_offsets, load_fixtures, load_panels,
+                       panel_world_positions)
+from shared_frames import SharedArray
+
+# seconds to wait for the workers before assuming one of them died
+BARRIER_TIMEOUT = 10.0
+# control fields
+TIME, STOP = range(2)
+PLASMA_OCTAVES = 4
+NOISE_OCTAVES = 5
+# a cosine palette, each channel is phase shifted by a third
+PALETTE_PHASES = np.array([0.0, 1 / 3, 2 / 3])
+
+
+def palette(values, out):
+    """
+    Map values (repeating every 1.0) to colours.
+    """
+    colours = 127.5 + 127.5 * np.cos(2 * np.pi * (values[:, np.newaxis] + PALETTE_PHASES))
+    np.copyto(out, colours, casting='unsafe')
+
+
+def plasma(positions, t, out, octaves=PLASMA_OCTAVES):
+    value = np.zeros(len(positions))
+    for octave in range(octaves):
+        frequency = 3.0 * 2 ** octave
+        value += np.sin(frequency * positions[:, 0] + t * (1 + octave)) / 2 ** octave
+        value += np.sin(frequency * positions[:, 1] - 1.3 * t) / 2 ** octave
+        value += np.sin(frequency * np.hypot(positions[:, 0], positions[:, 2]) + 0.7 * t) \
+            / 2 ** octave
+    palette(value / 4, out)
+
+
+def lattice_hash(cells):
+    """
+    Pseudo-random values in [0, 1) for (n, 3) integer lattice cells.
+    """
+    cells = cells.astype(np.uint32)
+    hashed = cells[:, 0] * np.uint32(73856093) ^ cells[:, 1] * np.uint32(19349663) \
+        ^ cells[:, 2] * np.uint32(83492791)
+    hashed ^= hashed >> np.uint32(13)
+    hashed *= np.uint32(0x5bd1e995)
+    hashed ^= hashed >> np.uint32(15)
+    return (hashed & np.uint32(0xffff)) / 65536.0
+
+
+def value_noise(points):
+    """
+    Trilinearly interpolated lattice noise with a smoothstep fade, in [0, 1).
+    """
+    cells = np.floor(points)
+    fractions = points - cells
+    fade = fractions * fractions * (3 - 2 * fractions)
+    cells = cells.astype(np.int64)
+    value = np.zeros(len(points))
+    for corner in np.ndindex(2, 2, 2):
+        corner = np.array(corner)
+        weights = np.prod(np.where(corner, fade, 1 - fade), axis=-1)
+        value += weights * lattice_hash(cells + corner)
+    return value
+
+
+def noise(positions, t, out, octaves=NOISE_OCTAVES):
+    value = np.zeros(len(positions))
+    drift = np.array([0.0, 0.0, 0.5 * t])
+    for octave in range(octaves):
+        scale = 4.0 * 2 ** octave
+        value += value_noise(positions * scale + drift * (1 + octave)) / 2 ** octave
+    palette(value, out)
+
+
+PATTERNS = {
+    'plasma': plasma,
+    'noise': noise,
+}
+
+
+def normalise_positions(positions):
+    """
+    (N, 3) positions centred on the origin and scaled to fit in [-0.5, 0.5], padding 2D
+    positions with zeros.
+    """
+    positions = np.asarray(positions, dtype=float).reshape(len(positions), -1)
+    positions = np.pad(positions, ((0, 0), (0, 3 - positions.shape[1])))
+    if not len(positions):
+        return positions
+    low, high = positions.min(axis=0), positions.max(axis=0)
+    return (positions - (low + high) / 2) / max(float((high - low).max()), 1e-12)
+
+
+def pixel_chunks(offsets, workers):
+    """
+    Split LEDs `0:offsets[-1]` into at most `workers` contiguous (start, end) chunks of about
+    the same size, cutting at the fixture `offsets`.
+    """
+    offsets = np.asarray(offsets)
+    targets = np.arange(1, workers) * offsets[-1] / workers
+    cuts = offsets[np.abs(offsets[:, np.newaxis] - targets).argmin(axis=0)]
+    cuts = np.unique(np.concatenate([[0], cuts, [offsets[-1]]]))
+    return [(int(start), int(end)) for start, end in zip(cuts[:-1], cuts[1:])]
+
+
+def run_worker(idx, pattern_name, chunk, positions, output, control, timings, barrier):
+    pattern = PATTERNS[pattern_name]
+    start, end = chunk
+    chunk_positions = positions.array[start:end]
+    chunk_output = output.array[start:end]
+    try:
+        while True:
+            barrier.wait()
+            if control.array[STOP]:
+                break
+            begin = time.perf_counter()
+            pattern(chunk_positions, control.array[TIME], chunk_output)
+            timings.array[idx] = time.perf_counter() - begin
+            barrier.wait()
+    except threading.BrokenBarrierError:
+        pass
+    except Exception:
+        logging.exception(f"render worker {idx} failed")
+        barrier.abort()
+    finally:
+        for shared in [positions, output, control, timings]:
+            shared.close()
+
+
+class ParallelRenderer:
+    """
+    Renders a pattern over `positions` with a worker process per chunk (see `pixel_chunks`),
+    or in this process if `workers` is 0. `render` returns the shared (N, 3) uint8 frame, which
+    is overwritten by the next call.
+    """
+
+    def __init__(self, pattern_name, positions, offsets=None, workers=0):
+        if pattern_name not in PATTERNS:
+            raise ValueError(f"unknown pattern {pattern_name}, expected one of {list(PATTERNS)}")
+        self.pattern_name = pattern_name
+        if offsets is None:
+            offsets = [0, len(positions)]
+        self.chunks = pixel_chunks(offsets, max(workers, 1))
+        self.positions = SharedArray((len(positions), 3), np.float64)
+        self.positions.array[:] = positions
+        self.output = SharedArray((len(positions), 3), np.uint8)
+        self.control = SharedArray((2,), np.float64)
+        self.control.array[:] = 0
+        self.timings = SharedArray((len(self.chunks),), np.float64)
+        self.frames = 0
+        self.chunk_totals = np.zeros(len(self.chunks))
+        self.chunk_max = np.zeros(len(self.chunks))
+        self.processes = []
+        self.barrier = None
+        if workers:
+            self.barrier = multiprocessing.Barrier(len(self.chunks) + 1)
+            self.processes = [
+                multiprocessing.Process(
+                    target=run_worker,
+                    args=(
+                        idx, pattern_name, chunk, self.positions, self.output, self.control,
+                        self.timings, self.barrier),
+                    name=f"render-{idx}", daemon=True)
+                for idx, chunk in enumerate(self.chunks)
+            ]
+            for process in self.processes:
+                process.start()
+
+    def render(self, t):
+        self.control.array[TIME] = t
+        if self.barrier is None:
+            begin = time.perf_counter()
+            PATTERNS[self.pattern_name](self.positions.array, t, self.output.array)
+            self.timings.array[0] = time.perf_counter() - begin
+        else:
+            try:
+                # start the frame, then wait for every chunk
+                self.barrier.wait(BARRIER_TIMEOUT)
+                self.barrier.wait(BARRIER_TIMEOUT)
+            except threading.BrokenBarrierError:
+                raise RuntimeError("a render worker failed or timed out")
+        self.frames += 1
+        self.chunk_totals += self.timings.array
+        np.maximum(self.chunk_max, self.timings.array, out=self.chunk_max)
+        return self.output.array
+
+    def summary(self):
+        frames = max(self.frames, 1)
+        averages = self.chunk_totals / frames
+        lines = [
+            f"worker {idx}: {end - start:6d} pixels, avg / max {1e3 * average: 6.2f} / "
+            f"{1e3 * maximum: 6.2f} ms"
+            for idx, ((start, end), average, maximum) in enumerate(
+                zip(self.chunks, averages, self.chunk_max))
+        ]
+        imbalance = averages.max() / max(averages.mean(), 1e-12)
+        lines.append(f"{self.frames} frames, imbalance (slowest / mean worker) {imbalance:.2f}")
+        return '\n'.join(lines)
+
+    def close(self):
+        if self.barrier is not None and not self.barrier.broken:
+            self.control.array[STOP] = 1
+            try:
+                self.barrier.wait(BARRIER_TIMEOUT)
+            except threading.BrokenBarrierError:
+                pass
+        for process in self.processes:
+            process.join(BARRIER_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+        self.barrier = None
+        self.processes = []
+        for shared in [self.positions, self.output, self.control, self.timings]:
+            if shared.array is not None:
+                shared.close()
+
+
+def render_frames(renderer, sink, frames, fps=0.0):
+    """
+    Render `frames` frames and send them to `sink` at `fps` (0 for as fast as possible), until
+    interrupted. Returns the number of frames which were late.
+    """
+    period = 1.0 / fps if fps else 0.0
+    late = 0
+    start = time.perf_counter()
+    # the first frame sets the pace, so it can't be late
+    deadline = None
+    try:
+        for frame in range(frames):
+            now = time.perf_counter()
+            if deadline is None:
+                deadline = now
+            elif now < deadline:
+                time.sleep(deadline - now)
+            elif period:
+                late += 1
+                deadline = now
+            deadline += period
+            sink.send(renderer.render(frame * period if period else now - start))
+    except KeyboardInterrupt:
+        logging.info("stopping render")
+    return late
+
+
+def main():
+    from frame_recording import FrameRecorder, layout_hash
+    from frame_stream import NullSink, OpcSink
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('lxm', help="fixture export to send to")
+    parser.add_argument(
+        '--panels', help="panel export for world positions, default: global grid positions")
+    parser.add_argument('--pattern', default='plasma', choices=list(PATTERNS))
+    parser.add_argument(
+        '--workers', type=int, default=multiprocessing.cpu_count(),
+        help="worker processes, 0 to render in this process")
+    parser.add_argument('--fps', type=float, default=60.0, help="0 for as fast as possible")
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--dry-run', action='store_true', help="don't send to the OPC hosts")
+    parser.add_argument('--record', help="append the frames to this recording instead")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    fixtures = load_fixtures(args.lxm)
+    offsets = fixture_offsets(fixtures)
+    if args.panels:
+        positions = np.concatenate(
+            [panel_world_positions(panel) for panel in load_panels(args.panels)])
+        if len(positions) != offsets[-1]:
+            raise ValueError(
+                f"{args.panels} has {len(positions)} LEDs, {args.lxm} has {offsets[-1]}")
+    else:
+        positions = fixture_grid_positions(fixtures)
+    if args.record:
+        sink = FrameRecorder(args.record, offsets[-1], args.fps, layout_hash(fixtures))
+    else:
+        sink = NullSink() if args.dry_run else OpcSink(fixtures)
+
+    renderer = ParallelRenderer(args.pattern, normalise_positions(positions), offsets, args.workers)
+    start = time.perf_counter()
+    late = 0
+    try:
+        late = render_frames(renderer, sink, args.frames, args.fps)
+    finally:
+        renderer.close()
+        sink.close()
+    elapsed = time.perf_counter() - start
+    logging.info(
+        f"rendered {renderer.frames} frames in {elapsed: 7.3f}s "
+        f"({renderer.frames / max(elapsed, 1e-9): 6.2f} fps, {late} late)")
+    logging.info(renderer.summary())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+"""
+Exchange LED frames between a renderer process and output processes through shared memory, so
+that a heavy pattern holding the GIL can't stall the network senders.
+
+The shared block holds a small control area and a ring of frame slots (three by default):
+
+    published frame number | per slot: sequence, frame number, publish time | slots of (N, 3) uint8
+
+The renderer writes frame `n` into slot `n % slots` and then publishes `n`. Every slot is
+guarded by a seqlock: its sequence is odd while it is being written, so a reader which sees the
+same even sequence before and after using a slot knows the frame wasn't torn. Readers only ever
+look at the latest published frame, and hand out views of the slot rather than copies. Output
+processes build their payloads from the view and check the sequence before sending them, so a
+frame which was overwritten meanwhile is dropped rather than sent torn.
+
+One output process is started per host group of the fixture export, each with its own
+`OpcSink`, and each reports its latency (publish to sent) and skipped frames when stopped.
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from layout_io import fixture_offsets
+
+DEFAULT_SLOTS = 3
+# published frame number, then the per slot fields
+CONTROL_FIELDS = 1
+SLOT_FIELDS = 3
+ALIGNMENT = 64
+POLL_INTERVAL = 0.5e-3
+
+
+class SharedArray:
+    """
+    A NumPy array in shared memory, which can be passed to other processes as a
+    `multiprocessing.Process` argument. Only the creating process unlinks the memory.
+    """
+
+    def __init__(self, shape, dtype, name=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        size = max(int(np.prod(self.shape)) * self.dtype.itemsize, 1)
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = os.getpid()
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = None
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    def __getstate__(self):
+        return {'shape': self.shape, 'dtype': self.dtype.str, 'name': self.shm.name}
+
+    def __setstate__(self, state):
+        self.__init__(state['shape'], state['dtype'], state['name'])
+
+    def close(self):
+        self.array = None
+        self.shm.close()
+        if self.owner == os.getpid():
+            self.shm.unlink()
+
+
+class SharedFrames:
+    """
+    A ring of (pixels, 3) uint8 frame slots in shared memory with one writer and any number of
+    readers. Create it with `create` in the writer, it can be passed to other processes as a
+    `multiprocessing.Process` argument.
+    """
+
+    def __init__(self, shm, pixels, slots, owner=False):
+        self.shm = shm
+        self.pixels = pixels
+        self.slots = slots
+        # only the creating process unlinks the memory, forked readers inherit this object
+        self.owner = os.getpid() if owner else None
+        self.fields = np.ndarray(
+            (CONTROL_FIELDS + SLOT_FIELDS * slots,), dtype=np.int64, buffer=shm.buf)
+        self.sequences = self.fields[CONTROL_FIELDS::SLOT_FIELDS]
+        self.slot_frames = self.fields[CONTROL_FIELDS + 1::SLOT_FIELDS]
+        # publish times are float64 bit patterns in the int64 fields
+        self.times = self.fields.view(np.float64)[CONTROL_FIELDS + 2::SLOT_FIELDS]
+        self.data = np.ndarray(
+            (slots, pixels, 3), dtype=np.uint8, buffer=shm.buf,
+            offset=self.data_offset(slots))
+        self.written = int(self.fields[0])
+
+    @staticmethod
+    def data_offset(slots):
+        control = (CONTROL_FIELDS + SLOT_FIELDS * slots) * 8
+        return -(-control // ALIGNMENT) * ALIGNMENT
+
+    @classmethod
+    def create(cls, pixels, slots=DEFAULT_SLOTS):
+        shm = shared_memory.SharedMemory(
+            create=True, size=cls.data_offset(slots) + slots * pixels * 3)
+        frames = cls(shm, pixels, slots, owner=True)
+        frames.fields[:] = 0
+        frames.fields[0] = -1
+        frames.slot_frames[:] = -1
+        frames.written = -1
+        return frames
+
+    def __getstate__(self):
+        return {'name': self.shm.name, 'pixels': self.pixels, 'slots': self.slots}
+
+    def __setstate__(self, state):
+        self.__init__(
+            shared_memory.SharedMemory(name=state['name']), state['pixels'], state['slots'])
+
+    def begin_write(self):
+        """
+        Start writing the next frame, and return its slot to render into.
+        """
+        self.written += 1
+        slot = self.written % self.slots
+        self.sequences[slot] += 1
+        self.slot_frames[slot] = self.written
+        return self.data[slot]
+
+    def publish(self):
+        slot = self.written % self.slots
+        self.times[slot] = time.monotonic()
+        self.sequences[slot] += 1
+        self.fields[0] = self.written
+
+    def write(self, leds):
+        np.copyto(self.begin_write(), leds)
+        self.publish()
+
+    def read(self, after=-1):
+        """
+        The latest published frame if it is newer than frame `after`, as (frame number, view,
+        sequence), or None. Check `consistent` after using the view.
+        """
+        while True:
+            frame = int(self.fields[0])
+            if frame <= after:
+                return None
+            slot = frame % self.slots
+            sequence = int(self.sequences[slot])
+            if sequence % 2 == 0 and self.slot_frames[slot] == frame:
+                return frame, self.data[slot], sequence
+            # the writer lapped this slot since publishing, try the newer frame
+
+    def consistent(self, frame, sequence):
+        """
+        Whether the slot of `frame` was left alone since `read` returned `sequence`.
+        """
+        return self.sequences[frame % self.slots] == sequence
+
+    def publish_time(self, frame):
+        return float(self.times[frame % self.slots])
+
+    def close(self):
+        # views of the buffer must go before the memory can be unmapped
+        self.fields = self.sequences = self.slot_frames = self.times = self.data = None
+        self.shm.close()
+        if self.owner == os.getpid():
+            self.shm.unlink()
+
+
+def host_groups(fixtures, processes=None):
+    """
+    Group the hosts of a fixture export for the output processes: one group per host, or the
+    hosts spread over `processes` groups with the most pixels first onto the emptiest group.
+    """
+    offsets = fixture_offsets(fixtures)
+    host_pixels = {}
+    for fixture, start, end in zip(fixtures, offsets[:-1], offsets[1:]):
+        host = fixture['parameters'].get('host')
+        if host is not None:
+            host_pixels[host] = host_pixels.get(host, 0) + int(end - start)
+    if processes is None or processes >= len(host_pixels):
+        return [[host] for host in host_pixels]
+    groups = [[] for _ in range(processes)]
+    loads = [0] * processes
+    for host, pixels in sorted(host_pixels.items(), key=lambda item: -item[1]):
+        emptiest = loads.index(min(loads))
+        groups[emptiest].append(host)
+        loads[emptiest] += pixels
+    return groups
+
+
+def send_frames(frames, sink, stop_event, stats):
+    """
+    Send the latest frame with `sink` (see `frame_stream.OpcSink.build`) whenever a new one is
+    published, until `stop_event` is set and the last frame was sent. The payloads are only
+    sent if the slot wasn't overwritten while they were built, otherwise they are dropped and
+    the newest frame is read instead, so torn frames never reach the hosts.
+    Returns the number of torn frames.
+    """
+    last = -1
+    torn = 0
+    while True:
+        item = frames.read(after=last)
+        if item is None:
+            # send the last frame before stopping
+            if stop_event.is_set():
+                break
+            time.sleep(POLL_INTERVAL)
+            continue
+        frame, leds, sequence = item
+        published = frames.publish_time(frame)
+        payloads = sink.build(leds)
+        if not frames.consistent(frame, sequence):
+            sink.discard(payloads)
+            torn += 1
+            continue
+        sink.send_payloads(payloads)
+        stats.record(time.monotonic() - published, frame - last - 1 if last >= 0 else 0)
+        last = frame
+    return torn
+
+
+def run_output_process(frames, fixtures, hosts, stop_event, results, dry_run=False, **kwargs):
+    """
+    Send the latest frame to the `hosts` whenever a new one is published (see `send_frames`).
+    Puts (hosts, summary, frames sent, torn frames) on `results` when done.
+    """
+    # frame_stream imports this module for its sink
+    from frame_stream import NullSink, OpcSink, StageStats
+
+    name = f"output {','.join(hosts)}"
+    stats = StageStats(name, depth_label="skipped frames")
+    sink = NullSink() if dry_run else OpcSink(fixtures, hosts=hosts, **kwargs)
+    torn = 0
+    try:
+        torn = send_frames(frames, sink, stop_event, stats)
+    finally:
+        sink.close()
+        results.put((hosts, stats.summary(), stats.frames, torn))
+        frames.close()
+
+
+class SharedOutputSink:
+    """
+    A `frame_stream` sink which publishes frames to shared memory, for output processes to send
+    to each host group (see `host_groups`).
+    """
+
+    def __init__(
+            self, fixtures, processes=None, slots=DEFAULT_SLOTS, dry_run=False, join_timeout=5.0,
+            **kwargs):
+        self.frames = SharedFrames.create(fixture_offsets(fixtures)[-1], slots)
+        self.stop_event = multiprocessing.Event()
+        self.results = multiprocessing.Queue()
+        self.join_timeout = join_timeout
+        self.groups = host_groups(fixtures, processes)
+        self.processes = [
+            multiprocessing.Process(
+                target=run_output_process,
+                args=(self.frames, fixtures, hosts, self.stop_event, self.results, dry_run),
+                kwargs=kwargs, name=f"output-{idx}", daemon=True)
+            for idx, hosts in enumerate(self.groups)
+        ]
+        for process in self.processes:
+            process.start()
+        self.summaries = []
+
+    def send(self, leds):
+        self.frames.write(leds)
+
+    def summary(self, reset=False):
+        return '\n'.join(
+            f"{summary}, {torn} torn frames dropped" for _, summary, _, torn in self.summaries) or None
+
+    def close(self):
+        if self.frames is None:
+            return
+        self.stop_event.set()
+        for _ in self.processes:
+            try:
+                self.summaries.append(self.results.get(timeout=self.join_timeout))
+            except queue.Empty:
+                logging.warning("an output process did not report")
+                break
+        for process in self.processes:
+            process.join(self.join_timeout)
+            if process.is_alive():
+                process.terminate()
+        self.frames.close()
+        self.frames = None
@@ -0,0 +1,282 @@
+"""
+Find the LED spacing and margins which make the best use of a fixed LED budget per panel, e.g. one
+strip reel or one Art-Net universe (170 RGB pixels).
+
+For a target count, the solver searches the spacing over the count-only layout in
+`panel_geometry` to find the highest count that fits in the budget, then the largest spacing which
+still gives that count, then the widest margin which keeps it. The light count is a step function
+of the spacing which is non-increasing in practice, but not strictly monotonic, so the result is
+checked after each search.
+
+With `--per-panel`, every panel gets its own spacing, otherwise one spacing is shared by all
+panels and the fullest panel determines it.
+
+Each search is a k-section: every round counts the lights of all panels at `SEARCH_CANDIDATES`
+spacings (or margins) between the bounds at once with `count_lights_for_polygons_array`, and
+narrows the bounds to the first candidate which passes. With `--per-panel`, the panels are
+searched together, each within its own bounds. On the 40 dome triangles this takes about 4 ms per
+panel, about a tenth of the time of bisecting one layout at a time.
+
+    python tools/spacing_solver.py LEDPortalSimulator/data/dome_render_6_5_Dome_EDGES.json \
+        --polygons 0to39 --target 510
+"""
+
+import argparse
+import logging
+import time
+from math import inf, sqrt
+
+import numpy as np
+
+from layout_sweep import load_structure_polygons, normalise_polygons, parse_index_ranges
+from panel_geometry import count_lights_for_polygon, count_lights_for_polygons_array, polygon_area
+from trig import gradient_sin
+
+# each round of a search narrows the bounds by a factor of SEARCH_CANDIDATES + 1, so these
+# resolve the boundary to about 1e-12 of the initial bounds
+SEARCH_CANDIDATES = 32
+SEARCH_ROUNDS = 8
+# give up widening a bracket after doubling it this many times
+MAX_DOUBLINGS = 64
+# search the spacing between these multiples of the spacing estimated from the panel area
+SPACING_RANGE = (0.25, 4.0)
+
+
+def auto_margin(spacing, grid_gradient):
+    """
+    The margin that LedPortal uses (see light_layout.py), which scales with the spacing.
+    """
+    return abs(gradient_sin(grid_gradient) * spacing)
+
+
+def panel_count(normalised, spacing, grid_gradient=sqrt(3), margin='auto', **kwargs):
+    """
+    The number of lights on a normalised polygon, or None if the layout is impossible.
+    """
+    if margin == 'auto':
+        margin = auto_margin(spacing, grid_gradient)
+    try:
+        count, _ = count_lights_for_polygon(
+            normalised, spacing=spacing, grid_gradient=grid_gradient, margin=margin, **kwargs)
+    except (AssertionError, ValueError, ZeroDivisionError):
+        return None
+    return count
+
+
+def panel_counts(panels, spacings, grid_gradient=sqrt(3), margin='auto', **kwargs):
+    """
+    The number of lights on each normalised panel (P) at each of the spacings and margins, which
+    broadcast to (P, K), with -1 where the layout is impossible.
+    """
+    spacings = np.asarray(spacings, dtype=float)
+    if isinstance(margin, str):
+        margin = auto_margin(spacings, grid_gradient)
+    if not kwargs:
+        return count_lights_for_polygons_array(panels, spacings, grid_gradient, margin)
+    # the other layout options are only supported one layout at a time
+    shape = np.broadcast_shapes((len(panels), 1), spacings.shape, np.shape(margin))
+    spacings, margins = np.broadcast_to(spacings, shape), np.broadcast_to(margin, shape)
+    counts = np.full(shape, -1, dtype=int)
+    for index, column in np.ndindex(shape):
+        count = panel_count(
+            panels[index], spacings[index, column], grid_gradient=grid_gradient,
+            margin=margins[index, column], **kwargs)
+        if count is not None:
+            counts[index, column] = count
+    return counts
+
+
+def layout_counts(panels, spacings, per_panel=False, **kwargs):
+    """
+    The light counts at each of the (B, K) spacings: of each panel (B = P) if `per_panel`,
+    otherwise of the fullest panel (B = 1), with inf where any layout is impossible.
+    """
+    counts = panel_counts(panels, spacings, **kwargs).astype(float)
+    counts[counts < 0] = inf
+    if per_panel:
+        return counts
+    return counts.max(axis=0, keepdims=True)
+
+
+def search(predicate, low, high, candidates=SEARCH_CANDIDATES, rounds=SEARCH_ROUNDS):
+    """
+    Given predicate(low) is False and predicate(high) is True for each of the (B,) brackets,
+    narrow down to the boundaries and return the (low, high) brackets. The predicate takes a (B,
+    K) array of candidates and returns a (B, K) array of results, and each bracket narrows to the
+    first of its candidates that passes.
+    """
+    low, high = np.broadcast_arrays(np.asarray(low, dtype=float), np.asarray(high, dtype=float))
+    fractions = np.linspace(0, 1, candidates + 2)
+    for _ in range(rounds):
+        points = low[:, np.newaxis] + (high - low)[:, np.newaxis] * fractions
+        points[:, 0], points[:, -1] = low, high
+        passed = predicate(points[:, 1:-1])
+        first = np.where(passed.any(axis=1), passed.argmax(axis=1), candidates)[:, np.newaxis]
+        low = np.take_along_axis(points, first, axis=1)[:, 0]
+        high = np.take_along_axis(points, first + 1, axis=1)[:, 0]
+    return low, high
+
+
+def estimate_spacing(panels, target, grid_gradient):
+    """
+    The spacing which would fit `target` lights into the largest panel if it had no edges.
+    """
+    area = max(polygon_area(panel) for panel in panels)
+    return sqrt(area / (max(target, 1) * abs(gradient_sin(grid_gradient))))
+
+
+def solve_spacings(
+        panels, target, per_panel=False, grid_gradient=sqrt(3), margin='auto', **kwargs):
+    """
+    Find the largest spacing for which each of the normalised `panels` (or the fullest of them,
+    unless `per_panel`) has the most lights that fit in `target`. The panels are searched
+    together, and the spacings are returned as a (P,) array (or (1,) unless `per_panel`).
+    """
+    groups = [[panel] for panel in panels] if per_panel else [panels]
+    estimate = np.array([estimate_spacing(group, target, grid_gradient) for group in groups])
+    low, high = estimate * SPACING_RANGE[0], estimate * SPACING_RANGE[1]
+
+    def count(spacings):
+        return layout_counts(
+            panels, spacings, per_panel, grid_gradient=grid_gradient, margin=margin, **kwargs)
+
+    for _ in range(MAX_DOUBLINGS):
+        over = count(high[:, np.newaxis])[:, 0] > target
+        if not over.any():
+            break
+        low, high = np.where(over, high, low), np.where(over, high * 2, high)
+    for _ in range(MAX_DOUBLINGS):
+        under = count(low[:, np.newaxis])[:, 0] <= target
+        if not under.any():
+            break
+        low, high = np.where(under, low / 2, low), np.where(under, low, high)
+
+    # the smallest spacing within budget gives the highest count
+    _, tightest = search(lambda spacings: count(spacings) <= target, low, high)
+    best = count(tightest[:, np.newaxis])
+    # then spread those lights out as far as possible
+    widest, _ = search(lambda spacings: count(spacings) < best, tightest, high)
+    return np.where(count(widest[:, np.newaxis])[:, 0] == best[:, 0], widest, tightest)
+
+
+def solve_spacing(panels, target, grid_gradient=sqrt(3), margin='auto', **kwargs):
+    """
+    Find the largest spacing for which the fullest of the normalised `panels` has the most lights
+    that fit in `target`.
+
+    Returns a dict with the `spacing`, the resolved `margin` and the `counts` of each panel.
+    """
+    spacing = float(solve_spacings(
+        panels, target, grid_gradient=grid_gradient, margin=margin, **kwargs)[0])
+    resolved_margin = auto_margin(spacing, grid_gradient) if margin == 'auto' else margin
+    return {
+        'spacing': spacing,
+        'margin': resolved_margin,
+        'counts': [
+            panel_count(
+                panel, spacing, grid_gradient=grid_gradient, margin=resolved_margin, **kwargs)
+            for panel in panels
+        ],
+    }
+
+
+def widen_margins(panels, spacings, margins, grid_gradient=sqrt(3), **kwargs):
+    """
+    The widest margin for which each panel keeps the light count it has with its spacing and
+    margin, searched for all panels together.
+    """
+    spacings, margins = np.broadcast_arrays(
+        np.asarray(spacings, dtype=float).reshape(-1), np.asarray(margins, dtype=float).reshape(-1))
+    spacings, margins = [np.broadcast_to(value, (len(panels),)) for value in (spacings, margins)]
+    counts = panel_counts(
+        panels, spacings[:, np.newaxis], grid_gradient=grid_gradient,
+        margin=margins[:, np.newaxis], **kwargs)[:, 0]
+    # panels without lights keep their margin
+    empty = counts <= 0
+
+    def fewer(candidates):
+        candidate_counts = panel_counts(
+            panels, spacings[:, np.newaxis], grid_gradient=grid_gradient, margin=candidates,
+            **kwargs)
+        return (candidate_counts < 0) | (candidate_counts < counts[:, np.newaxis]) \
+            | empty[:, np.newaxis]
+
+    high = np.maximum(margins, spacings)
+    for _ in range(MAX_DOUBLINGS):
+        keeps = ~fewer(high[:, np.newaxis])[:, 0]
+        if not keeps.any():
+            break
+        high = np.where(keeps, high * 2, high)
+    widest, _ = search(fewer, margins, high)
+    return np.where(empty, margins, widest)
+
+
+def widen_margin(panel, spacing, margin, grid_gradient=sqrt(3), **kwargs):
+    """
+    The widest margin for which a panel keeps the light count it has with `margin`.
+    """
+    return float(widen_margins([panel], spacing, margin, grid_gradient=grid_gradient, **kwargs)[0])
+
+
+def solve_panels(
+        panels, target, per_panel=False, widen=True, grid_gradient=sqrt(3), margin='auto',
+        **kwargs):
+    """
+    Solve the spacing for all panels together (or for each panel if `per_panel`), then widen
+    each panel's margin. Returns a dict of results for each panel.
+    """
+    kwargs['grid_gradient'] = grid_gradient
+    spacings = np.broadcast_to(
+        solve_spacings(panels, target, per_panel, margin=margin, **kwargs), (len(panels),))
+    margins = auto_margin(spacings, grid_gradient) if margin == 'auto' \
+        else np.full(len(panels), margin, dtype=float)
+    counts = panel_counts(
+        panels, spacings[:, np.newaxis], margin=margins[:, np.newaxis], **kwargs)[:, 0]
+    if widen:
+        margins = widen_margins(panels, spacings, margins, **kwargs)
+    return [
+        {
+            'spacing': float(spacing),
+            'margin': float(margin),
+            'count': None if count < 0 else int(count),
+        }
+        for spacing, margin, count in zip(spacings, margins, counts)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('structure', help="structure export (see export_structure.py)")
+    parser.add_argument('--target', type=int, required=True, help="maximum lights per panel")
+    parser.add_argument('--polygons', help="polygon indices, e.g. '0to39 41'")
+    parser.add_argument('--gradient', type=float, default=sqrt(3), help="'inf' for square grids")
+    parser.add_argument('--margin', default='auto', help="margin, or 'auto' to scale with spacing")
+    parser.add_argument('--rotation', type=int, default=1, help="vertex rotation")
+    parser.add_argument('--per-panel', action='store_true', help="solve each panel separately")
+    parser.add_argument('--no-widen', action='store_true', help="don't widen the margins")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    polygons = load_structure_polygons(
+        args.structure, parse_index_ranges(args.polygons) if args.polygons else None)
+    panels = normalise_polygons(polygons, args.rotation)
+    margin = args.margin if args.margin == 'auto' else float(args.margin)
+
+    start = time.perf_counter()
+    results = solve_panels(
+        panels, args.target, per_panel=args.per_panel, widen=not args.no_widen,
+        grid_gradient=args.gradient, margin=margin)
+    elapsed = time.perf_counter() - start
+    logging.info(
+        f"solved {len(panels)} panels in {1e3 * elapsed: 7.2f} ms "
+        f"({1e3 * elapsed / max(len(panels), 1): 5.2f} ms per panel)")
+
+    print(f"{'panel':>5} {'spacing':>9} {'margin':>9} {'count':>6}")
+    for (index, _), result in zip(polygons, results):
+        print(
+            f"{index:5d} {result['spacing']:9.5f} {result['margin']:9.5f} {result['count']:6d}")
+    print(f"total: {sum(result['count'] for result in results)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""
+Arithmetic which tolerates floating point error, for the layout geometry.
+
+Every helper has a scalar version, which sits in per-row and per-polygon loops and so avoids
+`np.isclose` on Python scalars (a few microseconds a call), and an `_array` version which applies
+the same rules elementwise to NumPy arrays (or anything that broadcasts), so whole rows or
+polygons can be solved at once. Numbers within `ATOL + RTOL * |b|` of `b` are treated as `b`, the
+same as `np.isclose(a, b, atol=ATOL)`.
+
+Infinite gradients are vertical lines, and a NaN gradient is the inverse of a vertical line.
+"""
+
+import logging
+from math import ceil, copysign, floor, inf, isinf, nan
+
+import numpy as np
+
+ATOL = 1e-3
+# the default relative tolerance of `np.isclose`
+RTOL = 1e-5
+
+
+def isclose(a, b):
+    """
+    `np.isclose(a, b, atol=ATOL)` for scalars: equal infinities are close, NaN is never close.
+    """
+    # the tolerance is infinite if b is, but a finite a is never close to an infinite b
+    return a == b or abs(a - b) <= ATOL + RTOL * abs(b) < inf
+
+
+def isclose_array(a, b):
+    return np.isclose(a, b, rtol=RTOL, atol=ATOL)
+
+
+def nan_divide(quotient, dividend):
+    if isclose(dividend, 0):
+        return nan
+    if dividend != dividend:
+        # dividing by a NaN gradient
+        return 0
+    return quotient / dividend
+
+
+def nan_divide_array(quotient, dividend):
+    quotient, dividend = np.broadcast_arrays(
+        np.asarray(quotient, dtype=float), np.asarray(dividend, dtype=float))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = quotient / dividend
+    result[np.isnan(dividend)] = 0
+    result[isclose_array(dividend, 0)] = nan
+    return result
+
+
+def inf_divide(quotient, dividend):
+    sign = 1 if (quotient >= 0) else -1
+    sign *= 1 if (dividend >= 0) else -1
+    if isclose(dividend, 0):
+        return copysign(inf, sign)
+    if isinf(dividend):
+        return copysign(0, sign)
+    return quotient / dividend
+
+
+def inf_divide_array(quotient, dividend):
+    quotient, dividend = np.broadcast_arrays(
+        np.asarray(quotient, dtype=float), np.asarray(dividend, dtype=float))
+    # comparisons with NaN are False, like the scalar version
+    sign = np.where(quotient >= 0, 1.0, -1.0) * np.where(dividend >= 0, 1.0, -1.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = quotient / dividend
+    infinite = np.isinf(dividend)
+    result[infinite] = np.copysign(0.0, sign[infinite])
+    near_zero = isclose_array(dividend, 0)
+    result[near_zero] = np.copysign(inf, sign[near_zero])
+    return result
+
+
+def float_floor(number):
+    closest_int = round(number)
+    if isclose(number, closest_int):
+        return closest_int
+    return floor(number)
+
+
+def float_ceil(number):
+    closest_int = round(number)
+    if isclose(number, closest_int):
+        return closest_int
+    return ceil(number)
+
+
+def float_abs_floor(number):
+    closest_int = round(number)
+    if isclose(number, closest_int):
+        return closest_int
+    return int(copysign(floor(abs(number)), number))
+
+
+def float_abs_ceil(number):
+    closest_int = round(number)
+    if isclose(number, closest_int):
+        return closest_int
+    return int(copysign(ceil(abs(number)), number))
+
+
+def _snap_array(number, rounded):
+    """
+    `rounded`, except where `number` is close to its nearest integer.
+    """
+    number = np.asarray(number, dtype=float)
+    # `np.rint` rounds halves to even like `round`
+    closest_int = np.rint(number)
+    return np.where(isclose_array(number, closest_int), closest_int, rounded)
+
+
+def float_floor_array(number):
+    """
+    `float_floor` of each number, as floats like `np.floor`.
+    """
+    return _snap_array(number, np.floor(number))
+
+
+def float_ceil_array(number):
+    return _snap_array(number, np.ceil(number))
+
+
+def float_abs_floor_array(number):
+    return _snap_array(number, np.trunc(number))
+
+
+def float_abs_ceil_array(number):
+    return _snap_array(number, np.copysign(np.ceil(np.abs(number)), number))
+
+
+def axis_centered_lines(axis_length, spacing, margin_left, margin_right=None, axis_name=None):
+    """
+    Divide an axis into lines `spacing` units apart, centered on the space inside `axis_length`
+    after removing `margin_left` and `margin_right`. If `margin_right` is not provided, it is
+    assumed to be the same as `margin_left`
+
+    |--------------------|----X---------X----------X----|------------------|
+    ^- origin            |    ^- lines -^         -^    |                  |
+    |<- axis_length ------------------------------------------------------>|
+    |<- margin_left ---->|    |         |          |    |<- margin_right ->|
+    |          usable -> |<---------------------------->|                  |
+    |         padding -> |<-->|         |          |<-->|                  |
+    |              spacing -> |<------->|<-------->|    |                  |
+    """
+
+    if margin_right is None:
+        margin_right = margin_left
+
+    axis_full_name = f"{axis_name if axis_name else ''} axis"
+
+    usable = axis_length - margin_left - margin_right
+    lines = float_floor(usable / spacing) + 1
+    usage = spacing * (lines - 1)
+
+    logging.debug(
+        f"{axis_full_name} Usable / Lines / Usage: {usable: 7.3f} / {lines} / {usage: 7.3f}")
+
+    assert \
+        usage < usable \
+        or isclose(usable - usage, 0), \
+        f"{axis_full_name} usage {usage} >= usable {usable}"
+    padding = (usable - (spacing * (lines - 1))) / 2
+
+    logging.debug(f"{axis_full_name} Padding: {padding: 7.3f}")
+
+    return lines, padding
+
+
+def axis_centered_lines_array(axis_length, spacing, margin_left, margin_right=None):
+    """
+    `axis_centered_lines` of each axis, as integer line counts and float paddings.
+    """
+    if margin_right is None:
+        margin_right = margin_left
+    usable = np.asarray(axis_length, dtype=float) - margin_left - margin_right
+    lines = float_floor_array(usable / spacing).astype(int) + 1
+    usage = spacing * (lines - 1)
+    overused = ~((usage < usable) | isclose_array(usable - usage, 0))
+    assert not overused.any(), f"axis usage {usage[overused]} >= usable {usable[overused]}"
+    return lines, (usable - usage) / 2
+
+
+def intersect_lines(m1, c1, m2, c2):
+    """
+    line 1 = m1 * x + c1, (c1 is x-intercept in case of inf gradient)
+    line 2 = m2 * x + c2, (c2 is x-intercept in case of inf gradient)
+    """
+    if isinf(m1) and isinf(m2):
+        return None, None
+    if isinf(m1):
+        return c1, m2 * c1 + c2
+    elif isinf(m2):
+        return c2, m1 * c2 + c1
+    elif isclose(m1, m2):
+        return None, None
+    intersect_x = (c2 - c1) / (m1 - m2)
+    intersect_y = m1 * intersect_x + c1
+    return intersect_x, intersect_y
+
+
+def intersect_lines_array(m1, c1, m2, c2):
+    """
+    `intersect_lines` of each pair of lines, with NaN where it returns None.
+    """
+    m1, c1, m2, c2 = np.broadcast_arrays(*[
+        np.asarray(value, dtype=float) for value in (m1, c1, m2, c2)])
+    inf_1, inf_2 = np.isinf(m1), np.isinf(m2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        intersect_x = (c2 - c1) / (m1 - m2)
+        intersect_y = m1 * intersect_x + c1
+        intersect_x = np.where(inf_1, c1, np.where(inf_2, c2, intersect_x))
+        intersect_y = np.where(inf_1, m2 * c1 + c2, np.where(inf_2, m1 * c2 + c1, intersect_y))
+    parallel = (inf_1 & inf_2) | (~inf_1 & ~inf_2 & isclose_array(m1, m2))
+    intersect_x[parallel] = nan
+    intersect_y[parallel] = nan
+    return intersect_x, intersect_y
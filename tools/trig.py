@@ -1,5 +1,7 @@
 from math import atan, cos, sin
 
+import numpy as np
+
 
 def gradient_sin(gradient):
     """
@@ -34,3 +36,17 @@ def gradient_cos(gradient):
     => rise = cos(atan(gradient))
     """
     return cos(atan(gradient))
+
+
+def gradient_sin_array(gradient):
+    """
+    `gradient_sin` of each gradient.
+    """
+    return np.sin(np.arctan(gradient))
+
+
+def gradient_cos_array(gradient):
+    """
+    `gradient_cos` of each gradient.
+    """
+    return np.cos(np.arctan(gradient))